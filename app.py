@@ -12,6 +12,7 @@ try:
     from utils.formatting import format_currency_usd, format_date
     # Import NBP API Client (punkty 11-15)
     import nbp_api_client
+    import nbp_ui
 except ImportError as e:
     st.error(f"Nie można zaimportować modułów: {e}")
     st.stop()
@@ -40,6 +41,9 @@ def main():
                 st.error("❌ Błąd inicjalizacji bazy danych!")
                 st.stop()
     
+    # Utrzymanie bazy w tle (ANALYZE/optimize/WAL/vacuum - tylko gdy należne)
+    db.maintenance_scheduler.maybe_start()
+    
     # Inicjalizacja session state dla nawigacji
     if 'current_page' not in st.session_state:
         st.session_state.current_page = 'Dashboard'
@@ -84,6 +88,9 @@ def main():
         st.progress(progress)
         st.caption("68% projektu ukończone")  # ZMIENIONO z 61% na 68%
     
+    # Profiler SQL: każdy rerun strony to osobny przebieg (Dev Tools)
+    db.query_profiler.begin_run(st.session_state.current_page)
+    
     # Główna zawartość - routing do modułów
     if st.session_state.current_page == 'Dashboard':
         show_dashboard()
@@ -143,19 +150,27 @@ def show_nbp_test():
     st.header("🏦 NBP API Client - Kompletny")
     st.markdown("*Pełny system kursów NBP z cache, seed data i obsługą świąt*")
     
-    # Użyj UI z modułu nbp_api_client
-    nbp_api_client.show_nbp_test_ui()
+    # Użyj UI z modułu nbp_ui (część Streamlit klienta NBP)
+    nbp_ui.show_nbp_test_ui()
 
 def show_dashboard():
     """Główna strona dashboard - PUNKT 68: FINALNE CLEANUP UI"""
     st.header("🏠 Dashboard - Portfolio Overview")
     
-    # Auto-seed kursów NBP przy każdym wejściu na dashboard
+    # Odświeżanie kursów NBP w tle (max raz na interwał) - render nie czeka na NBP
     try:
-        if nbp_api_client.auto_seed_on_startup():
-            st.info("💡 Automatycznie uzupełniono brakujące kursy NBP")
+        nbp_api_client.fx_refresher.maybe_start()
+        fx_status = nbp_api_client.get_fx_staleness()
+        if fx_status['covered_through'] is None:
+            st.caption("🏦 Kursy NBP: trwa pierwsze odświeżanie w tle...")
+        elif fx_status['lag_business_days']:
+            st.warning(f"⚠️ Kursy NBP nieaktualne: ostatni {fx_status['covered_through']} "
+                       f"(brak {fx_status['lag_business_days']} dni roboczych)")
+        else:
+            st.caption(f"🏦 Kursy NBP aktualne do {fx_status['covered_through']} "
+                       f"(odświeżone {fx_status['refreshed_at']})")
     except Exception as e:
-        st.warning(f"⚠️ Auto-seed nie powiódł się: {e}")
+        st.warning(f"⚠️ Status kursów NBP niedostępny: {e}")
     
     # Status portfela
     st.markdown("### 📊 Status portfela")
@@ -0,0 +1,196 @@
+"""
+Benchmark czasu importu (zimny start `streamlit run app.py`)
+
+Każdy pomiar to świeży interpreter (bez ciepłego sys.modules), mierzy:
+- czas importu (najlepszy i mediana z --repeat prób)
+- liczbę załadowanych modułów i podmodułów db (powinny ładować się leniwie)
+- najwolniejsze moduły wg `python -X importtime` (czas skumulowany)
+
+Scenariusz "app" to import app.py bez uruchamiania main() - to samo, co
+Streamlit wykonuje przed pierwszym renderem strony.
+
+Użycie:
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --repeat 10 --top 15
+    python benchmarks/bench_import.py --budget-ms 150
+    python benchmarks/bench_import.py --save import_baseline.json
+    python benchmarks/bench_import.py --compare import_baseline.json --tolerance 0.3
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Scenariusz → instrukcja importu w świeżym interpreterze
+SCENARIOS = {
+    'streamlit': 'import streamlit',
+    'db': 'import db',
+    'app_deps': 'import db, nbp_api_client, utils.formatting',
+    'app': 'import app',
+}
+
+_PROBE = """
+import sys, time, json
+t0 = time.perf_counter()
+{statement}
+elapsed = time.perf_counter() - t0
+print(json.dumps({{
+    'ms': elapsed * 1000.0,
+    'modules': len(sys.modules),
+    'db_submodules': sorted(m for m in sys.modules if m.startswith('db.')),
+}}))
+"""
+
+
+def _run_probe(statement: str, importtime: bool = False) -> subprocess.CompletedProcess:
+    cmd = [sys.executable]
+    if importtime:
+        cmd += ['-X', 'importtime']
+    cmd += ['-c', _PROBE.format(statement=statement)]
+    return subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+
+
+def _parse_importtime(stderr: str) -> List[Dict]:
+    """Wiersze `import time: self [us] | cumulative | imported package`"""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'imported package' in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line.split(':', 1)[1].split('|', 2)
+            self_us, cumulative_us = int(self_us), int(cumulative_us)
+        except ValueError:
+            continue
+        rows.append({
+            'module': name.strip(),
+            'depth': (len(name) - len(name.lstrip())) // 2,
+            'self_ms': self_us / 1000.0,
+            'cumulative_ms': cumulative_us / 1000.0,
+        })
+    return rows
+
+
+def measure(name: str, statement: str, repeat: int, top: int) -> Dict:
+    """Pomiar jednego scenariusza (repeat świeżych interpreterów + jeden z -X importtime)"""
+    samples = []
+    last = None
+    for _ in range(repeat):
+        proc = _run_probe(statement)
+        if proc.returncode != 0:
+            error = (proc.stderr.strip().splitlines() or ['?'])[-1]
+            return {'scenario': name, 'error': error}
+        last = json.loads(proc.stdout.strip().splitlines()[-1])
+        samples.append(last['ms'])
+
+    proc = _run_probe(statement, importtime=True)
+    rows = _parse_importtime(proc.stderr)
+    project = [r for r in rows if r['module'].split('.')[0] in _project_packages()]
+    slowest = sorted(rows, key=lambda r: r['cumulative_ms'], reverse=True)[:top]
+
+    return {
+        'scenario': name,
+        'best_ms': round(min(samples), 2),
+        'median_ms': round(statistics.median(samples), 2),
+        'modules': last['modules'],
+        'db_submodules': last['db_submodules'],
+        'project_self_ms': round(sum(r['self_ms'] for r in project), 2),
+        'slowest': [
+            {'module': r['module'], 'cumulative_ms': round(r['cumulative_ms'], 2)}
+            for r in slowest
+        ],
+    }
+
+
+def _project_packages() -> set:
+    """Moduły i pakiety projektu (katalog główny repozytorium)"""
+    names = set()
+    for entry in os.listdir(ROOT):
+        path = os.path.join(ROOT, entry)
+        if entry.endswith('.py'):
+            names.add(entry[:-3])
+        elif os.path.isfile(os.path.join(path, '__init__.py')):
+            names.add(entry)
+    return names
+
+
+def run_benchmarks(repeat: int = 5, top: int = 10) -> List[Dict]:
+    return [measure(name, statement, repeat, top) for name, statement in SCENARIOS.items()]
+
+
+def print_report(results: List[Dict]):
+    for row in results:
+        if 'error' in row:
+            print(f"{row['scenario']:<10} BŁĄD: {row['error']}")
+            continue
+        lazy = ', '.join(row['db_submodules']) or 'brak'
+        print(f"{row['scenario']:<10} best {row['best_ms']:>8.1f} ms | median {row['median_ms']:>8.1f} ms"
+              f" | modułów {row['modules']:>5} | projekt (self) {row['project_self_ms']:>6.1f} ms"
+              f" | podmoduły db: {lazy}")
+        for slow in row['slowest']:
+            print(f"           {slow['cumulative_ms']:>8.1f} ms  {slow['module']}")
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Porównanie z zapisanym baseline - zwraca listę regresji"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {row['scenario']: row for row in json.load(f)}
+
+    regressions = []
+    for row in results:
+        base = baseline.get(row['scenario'])
+        if not base or 'error' in row or 'error' in base:
+            continue
+        # Czasy importu są zaszumione - minimalny próg 10 ms
+        limit = max(base['median_ms'] * (1 + tolerance), base['median_ms'] + 10)
+        if row['median_ms'] > limit:
+            regressions.append(f"{row['scenario']}.median_ms: {base['median_ms']} → {row['median_ms']}")
+        if len(row['db_submodules']) > len(base['db_submodules']):
+            regressions.append(f"{row['scenario']}.db_submodules: {base['db_submodules']} → {row['db_submodules']}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark czasu importu (zimny start aplikacji)")
+    parser.add_argument('--repeat', type=int, default=5, help="Świeże interpretery na scenariusz")
+    parser.add_argument('--top', type=int, default=10, help="Liczba najwolniejszych modułów w raporcie")
+    parser.add_argument('--budget-ms', type=float, help="Limit mediany scenariusza app (kod wyjścia 1 przy przekroczeniu)")
+    parser.add_argument('--json', action='store_true', help="Wynik jako JSON")
+    parser.add_argument('--save', help="Zapisz wynik jako baseline")
+    parser.add_argument('--compare', help="Porównaj z baseline (kod wyjścia 1 przy regresji)")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(repeat=args.repeat, top=args.top)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    failures = []
+    if args.compare:
+        failures += compare(results, args.compare, args.tolerance)
+    if args.budget_ms is not None:
+        app = next(row for row in results if row['scenario'] == 'app')
+        if 'error' in app:
+            failures.append(f"app: {app['error']}")
+        elif app['median_ms'] > args.budget_ms:
+            failures.append(f"app.median_ms: {app['median_ms']} > budżet {args.budget_ms}")
+
+    for line in failures:
+        print(f"REGRESJA: {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
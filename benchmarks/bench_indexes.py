@@ -0,0 +1,174 @@
+"""
+Benchmark indeksów dla gorących zapytań (utils/index_advisor) na syntetycznej bazie
+
+Baza tymczasowa ze schematem z migracji (db.init_database), ale bez indeksów
+z migracji "Indeksy gorących zapytań" (usuwanych po załadowaniu danych) - żeby
+zmierzyć stan "przed". Następnie:
+- audyt EXPLAIN QUERY PLAN (pełne skany, tymczasowe B-drzewa)
+- pomiar każdego kandydata (CREATE INDEX w transakcji → czasy zapytań → ROLLBACK)
+
+Użycie:
+    python benchmarks/bench_indexes.py
+    python benchmarks/bench_indexes.py --lots 100000 --repeat 5
+    python benchmarks/bench_indexes.py --json
+"""
+
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+from datetime import date, timedelta
+from typing import Dict
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import db
+import schema_migrations
+from utils import index_advisor
+
+
+def _create_schema(path: str):
+    """Schemat z migracji (razem z indeksami - triggery lot_positions korzystają z nich przy ładowaniu)"""
+    db.close_all_connections()
+    db.DB_PATH = path
+    db.init_database()
+    db.close_all_connections()
+
+
+def _drop_candidate_indexes(path: str):
+    """Usunięcie indeksów-kandydatów po załadowaniu danych (stan sprzed migracji)"""
+    conn = sqlite3.connect(path)
+    for name in index_advisor.CANDIDATE_INDEXES:
+        conn.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+    conn.execute("ANALYZE")
+    conn.close()
+
+
+def _populate(path: str, lots: int, seed: int) -> Dict[str, int]:
+    """Syntetyczne dane: ~lots/500 tickerów, sprzedaże, CC (część otwartych), mapowania"""
+    rng = random.Random(seed)
+    today = date.today()
+    tickers = [f"T{i:03d}" for i in range(max(1, lots // 500))] + list(index_advisor.SAMPLE_TICKERS)
+
+    def past_day(max_days: int = 5 * 365) -> str:
+        return (today - timedelta(days=rng.randint(1, max_days))).isoformat()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA foreign_keys = OFF")
+    cur = conn.cursor()
+
+    lot_rows = []
+    for _ in range(lots):
+        qty = rng.choice((100, 100, 200, 300, 500))
+        price = round(rng.uniform(5, 500), 2)
+        lot_rows.append((rng.choice(tickers), qty, qty, price, past_day(), 4.0, round(qty * price * 4.0, 2)))
+    cur.executemany("""
+        INSERT INTO lots (ticker, quantity_total, quantity_open, buy_price_usd, buy_date, fx_rate, cost_pln)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, lot_rows)
+    lot_tickers = {lot_id: row[0] for lot_id, row in enumerate(lot_rows, start=1)}
+
+    trades = lots // 5
+    cur.executemany("""
+        INSERT INTO stock_trades (ticker, quantity, sell_price_usd, sell_date, fx_rate, proceeds_pln, cost_pln, pl_pln)
+        VALUES (?, 100, 10.0, ?, 4.0, 4000.0, 3000.0, 1000.0)
+    """, [(rng.choice(tickers), past_day()) for _ in range(trades)])
+    cur.executemany("""
+        INSERT INTO stock_trade_splits (trade_id, lot_id, qty_from_lot, cost_part_pln, commission_part_usd, commission_part_pln)
+        VALUES (?, ?, 50, 1500.0, 0.0, 0.0)
+    """, [(rng.randint(1, trades), rng.randint(1, lots)) for _ in range(trades * 3 // 2)])
+
+    ccs = lots // 3
+    cc_rows, mapping_rows, legacy_rows = [], [], []
+    for cc_id in range(1, ccs + 1):
+        lot_id = rng.randint(1, lots)
+        open_day = past_day(3 * 365)
+        is_open = rng.random() < 0.05
+        expiry = (date.fromisoformat(open_day) + timedelta(days=rng.randint(7, 60))).isoformat()
+        if is_open:
+            expiry = (today + timedelta(days=rng.randint(0, 45))).isoformat()
+        cc_rows.append((lot_tickers[lot_id], lot_id, 1, 100.0, 1.5, open_day,
+                        None if is_open else expiry, expiry,
+                        'open' if is_open else rng.choice(('expired', 'bought_back')), 4.0, 600.0))
+        mapping_rows.append((cc_id, lot_id, 100))
+        if rng.random() < 0.3:
+            legacy_rows.append((cc_id, lot_id, 100))
+    cur.executemany("""
+        INSERT INTO options_cc (ticker, lot_linked_id, contracts, strike_usd, premium_sell_usd, open_date,
+                                close_date, expiry_date, status, fx_open, premium_sell_pln)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, cc_rows)
+    cur.executemany("INSERT OR IGNORE INTO cc_lot_mappings (cc_id, lot_id, shares_reserved) VALUES (?, ?, ?)",
+                    mapping_rows)
+    cur.executemany("INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved) VALUES (?, ?, ?)",
+                    legacy_rows)
+    conn.commit()
+    conn.close()
+    return {'lots': lots, 'trades': trades, 'options_cc': ccs,
+            'cc_lot_mappings': len(mapping_rows), 'options_cc_reservations': len(legacy_rows)}
+
+
+def run_benchmark(lots: int, repeat: int, seed: int = 11) -> Dict:
+    with tempfile.TemporaryDirectory(prefix="index_bench_") as workdir:
+        path = os.path.join(workdir, "indexes.db")
+        _create_schema(path)
+        sizes = _populate(path, lots, seed)
+        _drop_candidate_indexes(path)
+
+        conn = sqlite3.connect(path)
+        try:
+            audit = index_advisor.run_audit(conn)
+            measured = index_advisor.measure_candidates(conn, repeat=repeat)
+        finally:
+            conn.close()
+
+    return {
+        'schema_version': schema_migrations.SCHEMA_VERSION,
+        'sizes': sizes,
+        'flagged': [
+            {'query': q['name'], 'full_scans': q['full_scans'], 'temp_btrees': len(q['temp_btrees'])}
+            for q in audit['queries'] if q['full_scans'] or q['temp_btrees']
+        ],
+        'proposed': audit['proposed'],
+        'candidates': measured,
+    }
+
+
+def print_report(result: Dict):
+    print("Dane: " + ", ".join(f"{k}={v}" for k, v in result['sizes'].items()))
+    print("\nZapytania z pełnym skanem / tymczasowym B-drzewem:")
+    for row in result['flagged']:
+        print(f"  {row['query']}: SCAN {', '.join(row['full_scans']) or '-'}; TEMP B-TREE x{row['temp_btrees']}")
+
+    columns = ['index', 'build_ms', 'baseline_ms', 'with_index_ms', 'speedup', 'best_query', 'best_query_speedup']
+    rows = result['candidates']
+    widths = {c: max(len(c), *(len(str(r[c])) for r in rows)) for c in columns} if rows else {}
+    print()
+    if rows:
+        print("  ".join(c.ljust(widths[c]) for c in columns))
+        for row in rows:
+            print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark indeksów gorących zapytań")
+    parser.add_argument('--lots', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=3, help="Powtórzenia pomiaru (liczy się najlepszy)")
+    parser.add_argument('--json', action='store_true', help="Wynik jako JSON")
+    args = parser.parse_args(argv)
+
+    result = run_benchmark(args.lots, args.repeat)
+    if args.json:
+        print(json.dumps(result, indent=2))
+    else:
+        print_report(result)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,215 @@
+"""
+Benchmark warstwy kursów FX (NBPApiClient + fx_rates) na lokalnym serwerze zastępczym
+
+Każdy scenariusz działa na świeżej bazie tymczasowej i mierzy:
+- liczbę zapytań HTTP (licznik serwera replay)
+- liczbę pobrań połączeń SQLite (db.get_connection) i fizycznych otwarć (pula)
+- czas całkowity oraz p50/p99 pojedynczej operacji
+
+Użycie:
+    python benchmarks/bench_nbp_client.py
+    python benchmarks/bench_nbp_client.py --latency-ms 30 --error-rate 0.05
+    python benchmarks/bench_nbp_client.py --save bench_baseline.json
+    python benchmarks/bench_nbp_client.py --compare bench_baseline.json --tolerance 0.3
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+from typing import Callable, Dict, List
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import db
+import structure
+import nbp_api_client
+from nbp_replay_server import ReplayState, start_server, load_recordings
+
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * (len(ordered) - 1)))))
+    return ordered[k]
+
+
+def _fresh_db(workdir: str, name: str):
+    """Nowa pusta baza z tabelami FX, pusty indeks kursów"""
+    db.close_all_connections()
+    db.DB_PATH = os.path.join(workdir, f"{name}.db")
+    if os.path.exists(db.DB_PATH):
+        os.remove(db.DB_PATH)
+    db.init_database()
+    conn = db.get_connection()
+    structure.create_fx_rates_table(conn)
+    conn.close()
+    db.invalidate_fx_index()
+
+
+def _random_days(rng: random.Random, count: int, start: date, end: date) -> List[date]:
+    span = (end - start).days
+    return [start + timedelta(days=rng.randint(0, span)) for _ in range(count)]
+
+
+def run_scenario(name: str, state: ReplayState, workdir: str,
+                 setup: Callable[[], None], ops: List[Callable[[], object]]) -> Dict:
+    _fresh_db(workdir, name)
+    setup()
+    db.invalidate_fx_index()
+
+    state.reset_counters()
+    # Liczniki puli (get_connection pobierany w podmodułach db - podmiana
+    # db.get_connection nie widziałaby tych wywołań)
+    pool_before = db.get_pool_stats()
+    latencies = []
+
+    started = time.perf_counter()
+    for op in ops:
+        t0 = time.perf_counter()
+        op()
+        latencies.append((time.perf_counter() - t0) * 1000.0)
+    wall = time.perf_counter() - started
+    pool_after = db.get_pool_stats()
+
+    return {
+        'scenario': name,
+        'ops': len(ops),
+        'requests': state.requests,
+        'http_errors': state.errors,
+        'db_connections': pool_after['acquired'] - pool_before['acquired'],
+        'db_opened': pool_after['opened'] - pool_before['opened'],
+        'wall_s': round(wall, 4),
+        'p50_ms': round(_percentile(latencies, 50), 3),
+        'p99_ms': round(_percentile(latencies, 99), 3),
+    }
+
+
+def run_benchmarks(state: ReplayState, base_url: str, years: int = 3, samples: int = 200,
+                   seed: int = 7) -> List[Dict]:
+    quiet = lambda event: None  # noqa: E731 - benchmark nie wyświetla postępu
+    client = nbp_api_client.NBPApiClient(base_url=base_url, progress_handler=quiet)
+    client.RETRY_DELAY = 0.01
+    # Globalny klient też na serwer lokalny (helpery modułowe)
+    nbp_api_client.nbp_client.base_url = base_url
+    nbp_api_client.nbp_client.progress_handler = quiet
+
+    rng = random.Random(seed)
+    today = date.today()
+    start = today - timedelta(days=365 * years)
+    preload = lambda: client.bulk_load_fx_rates(start, today)  # noqa: E731
+    no_setup = lambda: None  # noqa: E731
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="nbp_bench_") as workdir:
+        results.append(run_scenario(
+            'bulk_load_range', state, workdir, no_setup,
+            [lambda: client.bulk_load_fx_rates(start, today)]))
+
+        results.append(run_scenario(
+            'bulk_load_concurrent', state, workdir, no_setup,
+            [lambda: client.bulk_load_fx_rates(start, today, max_workers=4)]))
+
+        cold_days = _random_days(rng, min(samples, 50), start, today)
+        results.append(run_scenario(
+            'single_date_cold', state, workdir, no_setup,
+            [lambda d=d: client.get_usd_rate(d) for d in cold_days]))
+
+        warm_days = _random_days(rng, samples, start + timedelta(days=10), today)
+        results.append(run_scenario(
+            'd_minus_1_warm', state, workdir, preload,
+            [lambda d=d: client.get_usd_rate_d_minus_1(d) for d in warm_days]))
+
+        batch_days = _random_days(rng, samples, start + timedelta(days=10), today)
+        results.append(run_scenario(
+            'd_minus_1_batch_cold', state, workdir, no_setup,
+            [lambda: client.get_usd_rates_d_minus_1(batch_days)]))
+
+        results.append(run_scenario(
+            'refresh_recent_14d', state, workdir, preload,
+            [lambda: client.refresh_recent_rates(14)]))
+
+        results.append(run_scenario(
+            'table_a_1y', state, workdir, no_setup,
+            [lambda: client.load_table_a(today - timedelta(days=365), today)]))
+
+    return results
+
+
+def print_report(results: List[Dict]):
+    columns = ['scenario', 'ops', 'requests', 'http_errors', 'db_connections', 'db_opened', 'wall_s', 'p50_ms', 'p99_ms']
+    widths = {c: max(len(c), *(len(str(r[c])) for r in results)) for c in columns}
+    print("  ".join(c.ljust(widths[c]) for c in columns))
+    for row in results:
+        print("  ".join(str(row[c]).ljust(widths[c]) for c in columns))
+
+
+def compare(results: List[Dict], baseline_path: str, tolerance: float) -> List[str]:
+    """Porównanie z zapisanym baseline - zwraca listę regresji"""
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = {row['scenario']: row for row in json.load(f)}
+
+    regressions = []
+    for row in results:
+        base = baseline.get(row['scenario'])
+        if not base:
+            continue
+        for metric in ('requests', 'db_connections', 'db_opened', 'wall_s', 'p99_ms'):
+            if metric not in base:
+                continue
+            limit = base[metric] * (1 + tolerance)
+            # Drobne wartości czasu są zaszumione - minimalny próg 5 ms
+            if metric in ('wall_s', 'p99_ms'):
+                limit = max(limit, base[metric] + (0.005 if metric == 'wall_s' else 5))
+            if row[metric] > limit:
+                regressions.append(f"{row['scenario']}.{metric}: {base[metric]} → {row[metric]}")
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark warstwy FX / NBPApiClient")
+    parser.add_argument('--latency-ms', type=float, default=5.0, help="Opóźnienie serwera na zapytanie")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Odsetek odpowiedzi 503 (0-1)")
+    parser.add_argument('--recordings', help="Nagrane odpowiedzi NBP: JSON {kod: {data: kurs}}")
+    parser.add_argument('--years', type=int, default=3)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--json', action='store_true', help="Wynik jako JSON")
+    parser.add_argument('--save', help="Zapisz wynik jako baseline")
+    parser.add_argument('--compare', help="Porównaj z baseline (kod wyjścia 1 przy regresji)")
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    recordings = load_recordings(args.recordings) if args.recordings else None
+    state = ReplayState(recordings, latency_ms=args.latency_ms, error_rate=args.error_rate)
+    server, base_url = start_server(state)
+    try:
+        results = run_benchmarks(state, base_url, years=args.years, samples=args.samples)
+    finally:
+        server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+    if args.save:
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.tolerance)
+        for line in regressions:
+            print(f"REGRESJA: {line}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+"""
+Lokalny serwer zastępczy API NBP (replay) do benchmarków i testów
+Obsługuje endpointy używane przez NBPApiClient:
+- /api/exchangerates/rates/A/{code}/{date}/
+- /api/exchangerates/rates/A/{code}/{start}/{end}/
+- /api/exchangerates/rates/A/{code}/last/{n}/
+- /api/exchangerates/tables/A/{date}/  oraz  /tables/A/{start}/{end}/
+
+Kursy pochodzą z nagrania (JSON {kod: {data: kurs}}) albo są generowane
+deterministycznie dla dni publikacji NBP. Opóźnienie i odsetek błędów 503
+są konfigurowalne.
+"""
+
+import json
+import os
+import random
+import sys
+import threading
+import time
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.business_days import is_business_day
+
+# Limit NBP dla zapytań o zakres
+MAX_RANGE_DAYS = 93
+DEFAULT_CODES = ('USD', 'EUR', 'GBP', 'CHF')
+
+
+def synthetic_rate(code: str, day: date) -> float:
+    """Deterministyczny "kurs" dla waluty i dnia (powtarzalne benchmarki)"""
+    base = {'USD': 4.0, 'EUR': 4.3, 'GBP': 5.0, 'CHF': 4.5}.get(code, 1.0)
+    return round(base + ((day.toordinal() * 7919 + len(code)) % 1000) / 10000, 4)
+
+
+class ReplayState:
+    """Konfiguracja i liczniki serwera (współdzielone przez wątki handlera)"""
+
+    def __init__(self, recordings: Optional[Dict[str, Dict[str, float]]] = None,
+                 latency_ms: float = 0.0, error_rate: float = 0.0, seed: int = 42):
+        self.recordings = recordings
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def reset_counters(self):
+        with self.lock:
+            self.requests = 0
+            self.errors = 0
+
+    def rate(self, code: str, day: date) -> Optional[float]:
+        if self.recordings is not None:
+            return self.recordings.get(code, {}).get(day.isoformat())
+        if not is_business_day(day) or day > date.today():
+            return None
+        return synthetic_rate(code, day)
+
+    def codes(self):
+        if self.recordings is not None:
+            return sorted(self.recordings)
+        return list(DEFAULT_CODES)
+
+
+class ReplayHandler(BaseHTTPRequestHandler):
+    state: ReplayState = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status: int, payload=None):
+        body = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        state = self.state
+        with state.lock:
+            state.requests += 1
+            fail = state.error_rate > 0 and state.random.random() < state.error_rate
+            if fail:
+                state.errors += 1
+
+        if state.latency_ms:
+            time.sleep(state.latency_ms / 1000.0)
+        if fail:
+            return self._send(503)
+
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+        try:
+            idx = parts.index('exchangerates')
+            parts = parts[idx + 1:]
+        except ValueError:
+            pass
+
+        try:
+            if parts[:2] == ['rates', 'A']:
+                return self._rates(parts[2].upper(), parts[3:])
+            if parts[:2] == ['tables', 'A']:
+                return self._tables(parts[2:])
+        except (IndexError, ValueError):
+            return self._send(400)
+        return self._send(404)
+
+    def _days(self, args):
+        start = datetime.strptime(args[0], '%Y-%m-%d').date()
+        end = datetime.strptime(args[1], '%Y-%m-%d').date() if len(args) > 1 else start
+        if (end - start).days >= MAX_RANGE_DAYS or end < start:
+            raise ValueError("zakres")
+        return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+    def _rates(self, code, args):
+        if args and args[0] == 'last':
+            count = int(args[1]) if len(args) > 1 else 1
+            found, day = [], date.today()
+            while len(found) < count and day > date.today() - timedelta(days=30):
+                rate = self.state.rate(code, day)
+                if rate is not None:
+                    found.insert(0, {'effectiveDate': day.isoformat(), 'mid': rate})
+                day -= timedelta(days=1)
+            return self._send(200, {'table': 'A', 'code': code, 'rates': found})
+
+        rates = []
+        for day in self._days(args):
+            rate = self.state.rate(code, day)
+            if rate is not None:
+                rates.append({'no': f"{day.timetuple().tm_yday:03d}/A/NBP/{day.year}",
+                              'effectiveDate': day.isoformat(), 'mid': rate})
+        if not rates:
+            return self._send(404)
+        return self._send(200, {'table': 'A', 'code': code, 'rates': rates})
+
+    def _tables(self, args):
+        tables = []
+        for day in self._days(args):
+            items = [{'code': code, 'mid': self.state.rate(code, day)} for code in self.state.codes()]
+            items = [item for item in items if item['mid'] is not None]
+            if items:
+                tables.append({'table': 'A', 'effectiveDate': day.isoformat(), 'rates': items})
+        if not tables:
+            return self._send(404)
+        return self._send(200, tables)
+
+
+def start_server(state: Optional[ReplayState] = None, port: int = 0):
+    """
+    Uruchamia serwer w wątku w tle
+
+    Returns:
+        tuple: (server, base_url) - base_url do NBPApiClient(base_url=...)
+    """
+    state = state or ReplayState()
+    handler = type('BoundReplayHandler', (ReplayHandler,), {'state': state})
+    server = ThreadingHTTPServer(('127.0.0.1', port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name='nbp-replay', daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/api/exchangerates"
+    return server, base_url
+
+
+def load_recordings(path: str) -> Dict[str, Dict[str, float]]:
+    """Wczytuje nagranie {kod: {data: kurs}}"""
+    with open(path, encoding='utf-8') as f:
+        return {code.upper(): rates for code, rates in json.load(f).items()}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lokalny serwer zastępczy API NBP")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency-ms', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--recordings', help="Plik JSON {kod: {data: kurs}}")
+    args = parser.parse_args()
+
+    recordings = load_recordings(args.recordings) if args.recordings else None
+    server, base_url = start_server(ReplayState(recordings, args.latency_ms, args.error_rate), args.port)
+    print(f"NBP replay: {base_url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
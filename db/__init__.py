@@ -0,0 +1,554 @@
+"""
+Moduł bazy danych SQLite dla Covered Call Dashboard
+Punkt 3: Podstawowe połączenie z bazą danych
+NAPRAWIONY - kompletny plik bez błędów składni
+
+Pakiet db: rdzeń (połączenia, pula, cache agregatów, inicjalizacja, migracje)
+w tym pliku, funkcje domenowe w podmodułach ładowanych leniwie przy pierwszym
+użyciu (db.get_lot → import db.lots):
+    db.fx          - kursy NBP, indeks kursów w pamięci
+    db.cashflows   - przepływy pieniężne
+    db.lots        - LOT-y, podsumowanie portfela
+    db.trades      - sprzedaże, FIFO podatkowe
+    db.options     - covered calls, rezerwacje
+    db.chains      - CC chains
+    db.backup      - kopie zapasowe (backup API SQLite), retencja, przywracanie
+    db.maintenance - ANALYZE / PRAGMA optimize / checkpoint WAL / incremental vacuum
+    db.timeline    - oś czasu dostępności akcji per ticker (AS-OF) w pamięci
+    db.reservation_audit - audyt rezerwacji wszystkich otwartych CC (zbiorowo) + naprawa
+    db.diagnostics - funkcje testowe i diagnostyczne
+
+Rdzeń i db.backup nie importują streamlit przy imporcie (skrypty CLI, np.
+reset_db.py) - komunikaty st.error ładują go dopiero w ścieżkach błędów.
+"""
+
+import atexit
+import functools
+import importlib
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from datetime import datetime
+from datetime import date as _date
+from utils.query_profiler import profiler as query_profiler, ProfiledCursor
+from utils.result_cache import ResultCache
+
+# Ścieżka do bazy danych
+DB_PATH = "portfolio.db"
+
+# ================================
+# PULA POŁĄCZEŃ
+# ================================
+# Lista wolnych, skonfigurowanych połączeń (per plik bazy). get_connection()
+# pobiera połączenie z puli na wyłączność bieżącego wątku, a conn.close()
+# oddaje je do puli zamiast zamykać - connect + PRAGMA płacimy raz na fizyczne
+# połączenie, a nie raz na zapytanie. Pula jest procesowa, bo Streamlit
+# uruchamia każdy rerun w nowym wątku - połączenia przeżywają reruny sesji.
+# Zagnieżdżone get_connection() dostają osobne połączenia (jak dotąd).
+
+POOL_MAX_IDLE = 8
+
+_pool_idle = {}
+_pool_registry = weakref.WeakSet()
+_pool_lock = threading.Lock()
+_pool_stats = {'opened': 0, 'acquired': 0}
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    Połączenie SQLite wracające do puli przy close()
+
+    Przy zwrocie: wycofanie niezatwierdzonej transakcji (jak przy zamknięciu)
+    i przywrócenie domyślnego row_factory. really_close() zamyka fizycznie.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pool_path = None
+        self._pool_idle = False
+        self._pool_closed = False
+
+    # Profiler zapytań (Dev Tools): gdy włączony, kursory rejestrują zapytania
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = ProfiledCursor if query_profiler.enabled else sqlite3.Cursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self.cursor().executescript(sql_script)
+
+    def close(self):
+        if self._pool_idle or self._pool_closed:
+            return
+        try:
+            if self.in_transaction:
+                self.rollback()
+            self.row_factory = sqlite3.Row
+        except sqlite3.Error:
+            self.really_close()
+            return
+
+        with _pool_lock:
+            idle = _pool_idle.setdefault(self._pool_path, [])
+            if len(idle) < POOL_MAX_IDLE:
+                self._pool_idle = True
+                idle.append(self)
+                return
+        self.really_close()
+
+    def really_close(self):
+        """Fizyczne zamknięcie połączenia (z pominięciem puli) - z PRAGMA optimize"""
+        self._pool_closed = True
+        self._pool_idle = False
+        try:
+            # Zalecane przed zamknięciem: ANALYZE tylko tabel, których statystyki
+            # się zdezaktualizowały (zwykle nic nie robi, koszt ~ms)
+            super().execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        try:
+            super().close()
+        except sqlite3.Error:
+            pass
+
+
+query_profiler.skip_frames_of(PooledConnection.execute, PooledConnection.executemany,
+                              PooledConnection.executescript)
+
+
+def _open_connection():
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, factory=PooledConnection)
+    conn.row_factory = sqlite3.Row
+
+    # PRAGMA – ustaw raz na fizycznym połączeniu
+    # auto_vacuum działa tylko na nowej (pustej) bazie; istniejące przełącza
+    # jednorazowy VACUUM z db.maintenance
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("PRAGMA foreign_keys = ON")
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA busy_timeout = 5000")
+
+    conn._pool_path = DB_PATH
+    with _pool_lock:
+        _pool_registry.add(conn)
+        _pool_stats['opened'] += 1
+    return conn
+
+
+def get_connection():
+    """
+    Połączenie z bazą danych SQLite z puli (wzmocnione):
+      - foreign_keys = ON  → respektuje klucze obce i kaskady
+      - journal_mode = WAL → mniej blokad przy równoległych odczytach/zapisach
+      - busy_timeout = 5000 ms → łagodzi chwilowe locki
+      - row_factory = sqlite3.Row → dostęp do kolumn po nazwie
+
+    conn.close() oddaje połączenie do puli (nie zamyka go fizycznie).
+    """
+    try:
+        conn = None
+        with _pool_lock:
+            idle = _pool_idle.get(DB_PATH)
+            while idle:
+                candidate = idle.pop()
+                if not candidate._pool_closed:
+                    conn = candidate
+                    conn._pool_idle = False
+                    break
+            _pool_stats['acquired'] += 1
+        if conn is None:
+            conn = _open_connection()
+        return conn
+    except Exception as e:
+        # Streamlit-friendly komunikat; zachowujemy poprzednie zachowanie
+        import streamlit as st
+        st.error(f"Błąd połączenia z bazą danych: {e}")
+        return None
+
+
+@contextmanager
+def pooled_connection():
+    """
+    Połączenie z puli na czas bloku with (odczyty)
+
+    Użycie:
+        with db.pooled_connection() as conn:
+            rows = conn.execute("SELECT ...").fetchall()
+    """
+    conn = get_connection()
+    if conn is None:
+        raise sqlite3.OperationalError("Brak połączenia z bazą danych")
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+@contextmanager
+def transaction(immediate=False):
+    """
+    Transakcja na połączeniu z puli: commit po bloku, rollback przy wyjątku
+
+    Args:
+        immediate: BEGIN IMMEDIATE - blokada zapisu od początku transakcji
+                   (read-modify-write bez ryzyka SQLITE_BUSY w połowie)
+
+    Użycie:
+        with db.transaction() as conn:
+            conn.execute("UPDATE ...")
+    """
+    conn = get_connection()
+    if conn is None:
+        raise sqlite3.OperationalError("Brak połączenia z bazą danych")
+    try:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        try:
+            conn.rollback()
+        except sqlite3.Error:
+            pass
+        raise
+    finally:
+        conn.close()
+
+
+def close_all_connections():
+    """
+    Fizyczne zamknięcie wszystkich połączeń z puli (także pobranych)
+    Używać przed podmianą/usunięciem pliku bazy (reset, restore, testy).
+    """
+    with _pool_lock:
+        connections = [conn for conn in _pool_registry if not conn._pool_closed]
+        _pool_idle.clear()
+    for conn in connections:
+        conn.really_close()
+    return len(connections)
+
+
+# Koniec procesu: zamknięcie puli (PRAGMA optimize na każdym połączeniu)
+atexit.register(close_all_connections)
+
+
+def get_pool_stats():
+    """Statystyki puli: fizycznie otwarte połączenia vs pobrania z puli"""
+    with _pool_lock:
+        return {
+            'opened': _pool_stats['opened'],
+            'acquired': _pool_stats['acquired'],
+            'live': sum(1 for conn in _pool_registry if not conn._pool_closed),
+            'idle': sum(len(idle) for idle in _pool_idle.values()),
+        }
+
+# ================================
+# CACHE AGREGATÓW
+# ================================
+# Kosztowne agregaty (dashboard, statystyki CC/cashflows) są liczone na każdym
+# rerunie Streamlit. @cached_aggregate('tabela', ...) trzyma wynik w pamięci
+# (LRU) razem z wersjami tabel z table_versions (triggery, migracja schematu 8);
+# zapis do którejkolwiek z tych tabel - z dowolnego połączenia czy procesu -
+# sprawia, że następne wywołanie liczy agregat od nowa. Klucz zawiera też
+# plik bazy i dzisiejszą datę (część agregatów liczy "as-of dziś").
+
+result_cache = ResultCache()
+
+
+def _table_versions_token(tables):
+    """Krotka wersji tabel lub None (brak table_versions - baza sprzed migracji 8)"""
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        rows = conn.execute(
+            f"SELECT table_name, version FROM table_versions "
+            f"WHERE table_name IN ({','.join('?' * len(tables))})",
+            tables
+        ).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        conn.close()
+    versions = {row[0]: row[1] for row in rows}
+    if len(versions) != len(tables):
+        return None
+    return tuple(versions[t] for t in tables)
+
+
+def cached_aggregate(*tables):
+    """
+    Dekorator: wynik funkcji z cache, dopóki tabele `tables` się nie zmieniły
+
+    Args:
+        *tables: tabele (z schema_migrations.VERSIONED_TABLES), z których czyta funkcja
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = _table_versions_token(tables)
+            key = (func.__name__, DB_PATH, _date.today().isoformat(), args, tuple(sorted(kwargs.items())))
+            return result_cache.get_or_compute(key, token, lambda: func(*args, **kwargs))
+        wrapper.uncached = func
+        return wrapper
+    return decorator
+
+
+def get_result_cache_stats():
+    """Statystyki cache agregatów (trafienia, nieaktualne wpisy, usunięte przez LRU)"""
+    return result_cache.stats()
+
+# Plik bazy, dla którego w tym procesie wykonano już migracje schematu
+_schema_ready_path = None
+
+def init_database():
+    """
+    Inicjalizacja bazy danych - wpis startowy w app_info i migracje schematu
+    (schema_migrations.SCHEMA_MIGRATIONS). Po sukcesie schemat jest znany
+    i reszta modułu nie sprawdza istnienia tabel/kolumn.
+    """
+    global _schema_ready_path
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+
+        # Tworzymy tabelę app_info (jeśli nie istnieje).
+        # Dodane sensowne domyślne wartości (nie zmienia logiki — i tak wstawiamy jawnie).
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS app_info (
+                id INTEGER PRIMARY KEY,
+                version TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                last_updated TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+        # Czy jest jakikolwiek rekord?
+        cur.execute("SELECT COUNT(*) FROM app_info")
+        count = int(cur.fetchone()[0] or 0)
+
+        # Jeśli brak — wstaw rekord startowy
+        if count == 0:
+            now = datetime.now().isoformat(timespec="seconds")
+            cur.execute("""
+                INSERT INTO app_info (version, created_at, last_updated)
+                VALUES (?, ?, ?)
+            """, ("0.1", now, now))
+            conn.commit()
+        else:
+            # DDL w SQLite bywa autocommit, ale dbajmy o porządek transakcyjny:
+            conn.commit()
+
+        # Wersjonowane migracje schematu (raz na proces i plik bazy)
+        if _schema_ready_path != DB_PATH:
+            import schema_migrations
+            report = schema_migrations.run_migrations(conn)
+            if report['applied']:
+                print(f"🛠️ SCHEMA: migracje {report['from_version']} → {report['to_version']}: "
+                      f"{', '.join(desc for _, desc in report['applied'])}")
+            _schema_ready_path = DB_PATH
+
+        return True
+
+    except Exception as e:
+        # Jeżeli coś poszło nie tak, wycofujemy zmiany i raportujemy błąd.
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        import streamlit as st
+        st.error(f"Błąd inicjalizacji bazy danych: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_app_info():
+    """Pobiera informacje o aplikacji z bazy danych (ostatni rekord)"""
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        # jawnie wybieramy potrzebne kolumny
+        cur.execute("""
+            SELECT version, created_at, last_updated
+            FROM app_info
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        row = cur.fetchone()
+
+        if not row:
+            return None
+
+        return {
+            'version': row['version'],
+            'created_at': row['created_at'],
+            'last_updated': row['last_updated'],
+        }
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd pobierania informacji z bazy: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_schema_version():
+    """
+    Wersja schematu bazy vs wersja oczekiwana przez kod
+
+    Returns:
+        dict: {'current': int, 'expected': int, 'up_to_date': bool}
+    """
+    import schema_migrations
+
+    current = 0
+    conn = get_connection()
+    if conn:
+        try:
+            current = schema_migrations.get_schema_version(conn)
+        finally:
+            conn.close()
+    expected = schema_migrations.SCHEMA_VERSION
+    return {'current': current, 'expected': expected, 'up_to_date': current >= expected}
+
+def run_schema_migrations():
+    """
+    Ręczne uruchomienie brakujących migracji schematu (Dev Tools / stare przyciski migracji)
+
+    Returns:
+        dict: {'success', 'message', 'from_version', 'to_version', 'applied'}
+    """
+    global _schema_ready_path
+    import schema_migrations
+
+    conn = get_connection()
+    if not conn:
+        return {'success': False, 'message': 'Brak połączenia z bazą', 'applied': []}
+
+    try:
+        report = schema_migrations.run_migrations(conn)
+        _schema_ready_path = DB_PATH
+        if report['applied']:
+            message = f"Schemat {report['from_version']} → {report['to_version']}"
+        else:
+            message = f"Schemat aktualny (wersja {report['to_version']})"
+        return {'success': True, 'message': message, **report}
+
+    except Exception as e:
+        return {'success': False, 'message': f'❌ Błąd migracji: {e}', 'applied': []}
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# ================================
+# LENIWE ŁADOWANIE PODMODUŁÓW
+# ================================
+# Import db nie ładuje funkcji domenowych - podmoduł jest importowany przy
+# pierwszym odwołaniu do jego funkcji (PEP 562), a funkcja trafia do globals()
+# pakietu, więc kolejne odwołania nie przechodzą już przez __getattr__.
+# Podmoduły importują rdzeń (get_connection, cached_aggregate) z db, funkcje
+# innych domen - lokalnie w ciele funkcji.
+
+_SUBMODULE_EXPORTS = {
+    'fx': (
+        'get_fx_refresh_watermark', 'set_fx_refresh_watermark', 'invalidate_fx_index',
+        'fx_index_get', 'fx_index_on_or_before', 'fx_index_d_minus_1', 'insert_fx_rate',
+        'get_fx_rate', 'get_latest_fx_rate', 'delete_fx_rate', 'get_fx_rates_range',
+        'FX_UPSERT_ROWS_PER_STATEMENT', 'insert_fx_rates_bulk', 'insert_fx_rates_rows',
+        'find_fx_gaps', 'get_fx_backfill_checkpoint', 'save_fx_backfill_checkpoint',
+        'get_fx_rates_stats', 'get_fx_rate_for_date',
+    ),
+    'cashflows': (
+        'insert_cashflow', 'get_cashflow', 'delete_cashflow', 'get_cashflows_stats',
+        'update_cashflow', 'cleanup_orphaned_cashflow',
+    ),
+    'lots': (
+        'get_available_quantity', 'get_lot', 'get_lots_by_ticker', 'update_lot_quantity',
+        'get_lots_stats', 'get_total_quantity', 'get_all_tickers', 'get_portfolio_summary',
+        'get_lots_for_tax_fifo',
+    ),
+    'trades': (
+        'validate_sell_date_against_lots', 'check_cc_restrictions_before_sell',
+        'calculate_tax_fifo_allocation', 'get_tax_vs_operational_fifo_comparison',
+    ),
+    'options': (
+        'check_cc_coverage_with_chronology', 'reserve_shares_for_cc', 'get_cc_reservations_summary',
+        'save_covered_call_to_database', 'check_cc_coverage', 'fix_existing_cc_reservations',
+        'get_covered_calls_summary', 'expire_covered_call', 'assign_covered_call',
+        'simple_buyback_covered_call', 'get_open_cc_for_ticker', 'get_cc_expiry_alerts',
+        'reset_ticker_reservations', 'delete_covered_call', 'get_deletable_cc_list',
+        'update_covered_call', 'bulk_delete_covered_calls', 'get_cc_edit_candidates',
+        'get_cc_coverage_details', 'get_portfolio_cc_summary', 'get_closed_cc_analysis',
+        'get_cc_performance_summary', 'buyback_covered_call_with_fees',
+        'partial_buyback_covered_call', 'partial_buyback_covered_call_with_mappings',
+        'mass_fix_bought_back_cc_reservations', 'get_blocked_cc_status',
+        'roll_covered_call', 'roll_covered_calls', 'expire_past_due_covered_calls',
+    ),
+    'chains': (
+        'migrate_options_cc_add_chain_id', 'check_cc_chains_migration_status',
+        'run_cc_chains_migration', 'auto_detect_lot_chains', 'get_lot_chain_summary',
+        'get_lot_chains_summary', 'update_chain_statistics',
+    ),
+    'diagnostics': (
+        'test_database_connection', 'test_fx_rates_operations', 'test_cashflows_operations',
+        'test_lots_operations', 'test_stock_trades_operations', 'test_final_tables_operations',
+        'get_database_summary', 'test_cc_save_operations', 'debug_cc_restrictions',
+        'get_reservations_diagnostics', 'check_cc_cashflow_integrity',
+    ),
+    'backup': (
+        'create_backup', 'list_backups', 'prune_backups', 'restore_backup', 'backup_before',
+    ),
+    'maintenance': (
+        'run_maintenance', 'get_maintenance_status', 'maintenance_scheduler',
+    ),
+    'timeline': (
+        'get_share_timeline', 'invalidate_share_timelines', 'get_share_timeline_stats',
+    ),
+    'reservation_audit': (
+        'audit_cc_reservations', 'DISCREPANCY_TYPES',
+    ),
+}
+
+_EXPORT_TO_SUBMODULE = {
+    name: submodule
+    for submodule, names in _SUBMODULE_EXPORTS.items()
+    for name in names
+}
+
+
+def __getattr__(name):
+    submodule = _EXPORT_TO_SUBMODULE.get(name)
+    if submodule is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f"{__name__}.{submodule}"), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORT_TO_SUBMODULE))
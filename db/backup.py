@@ -0,0 +1,307 @@
+"""
+Kopie zapasowe bazy: backup API SQLite (online, krokowo), kompresja gzip,
+retencja godzinowa/dzienna/miesięczna, szybkie przywracanie
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import db
+
+# Katalog kopii (obok pliku bazy) i manifest z metadanymi kopii
+BACKUP_DIR_NAME = "backups"
+MANIFEST_NAME = "manifest.json"
+
+# Stron kopiowanych w jednym kroku backupu - między krokami baza nie jest
+# blokowana, więc zapisy z aplikacji nie czekają na całą kopię
+BACKUP_PAGES_PER_STEP = 256
+BACKUP_STEP_SLEEP_S = 0.005
+
+# Retencja: najnowsza kopia z każdej z ostatnich N godzin / dni / miesięcy
+# + zawsze KEEP_LAST najnowszych (np. kilka kopii "przed resetem" z jednej godziny)
+RETENTION = {'hourly': 24, 'daily': 14, 'monthly': 12}
+KEEP_LAST = 5
+
+_backup_lock = threading.Lock()
+
+
+def get_backup_dir(db_path=None):
+    """Katalog kopii zapasowych dla pliku bazy (domyślnie db.DB_PATH)"""
+    db_path = os.path.abspath(db_path or db.DB_PATH)
+    return os.path.join(os.path.dirname(db_path), BACKUP_DIR_NAME)
+
+
+def _load_manifest(backup_dir):
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return []
+    try:
+        with open(path, encoding='utf-8') as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return []
+    # Wpisy bez pliku (usunięte ręcznie) pomijamy
+    return [e for e in entries if os.path.exists(os.path.join(backup_dir, e['file']))]
+
+
+def _save_manifest(backup_dir, entries):
+    path = os.path.join(backup_dir, MANIFEST_NAME)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(entries, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _snapshot(db_path, target_path, pages, sleep_s):
+    """Kopia spójna transakcyjnie przez sqlite3.Connection.backup (krokowo)"""
+    steps = 0
+
+    def progress(status, remaining, total):
+        nonlocal steps
+        steps += 1
+        if sleep_s:
+            time.sleep(sleep_s)
+
+    source = sqlite3.connect(db_path, timeout=5)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target, pages=pages, progress=progress)
+        page_count = target.execute("PRAGMA page_count").fetchone()[0]
+        check = target.execute("PRAGMA quick_check").fetchone()[0]
+    finally:
+        target.close()
+        source.close()
+    return {'pages': page_count, 'steps': steps, 'quick_check': check}
+
+
+def create_backup(reason='manual', db_path=None, pages=BACKUP_PAGES_PER_STEP,
+                  sleep_s=BACKUP_STEP_SLEEP_S, apply_retention=True):
+    """
+    Kopia zapasowa bazy w trakcie pracy aplikacji (bez zatrzymywania zapisów)
+
+    Kopia jest sprawdzana (PRAGMA quick_check), kompresowana gzip i wpisywana do
+    manifestu. Jeśli treść bazy nie zmieniła się od ostatniej kopii (ten sam
+    SHA-256), nowy plik nie powstaje - zwracana jest poprzednia kopia.
+
+    Args:
+        reason: powód (manual, pre-reset, pre-restore, ...) - trafia do nazwy pliku
+        db_path: plik bazy (domyślnie db.DB_PATH)
+        pages: stron na krok backupu (-1 = całość naraz)
+        sleep_s: przerwa między krokami (oddaje bazę zapisującym)
+        apply_retention: po kopii usuń kopie spoza polityki retencji
+
+    Returns:
+        dict: {'success', 'message', 'file', 'path', 'size', 'compressed_size',
+               'duration_s', 'skipped', 'removed'}
+    """
+    db_path = db_path or db.DB_PATH
+    if not os.path.exists(db_path):
+        return {'success': False, 'message': f'Brak pliku bazy {db_path}'}
+
+    backup_dir = get_backup_dir(db_path)
+    os.makedirs(backup_dir, exist_ok=True)
+    started = time.perf_counter()
+
+    with _backup_lock:
+        fd, raw_path = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+        os.close(fd)
+        try:
+            info = _snapshot(db_path, raw_path, pages, sleep_s)
+            if info['quick_check'] != 'ok':
+                return {'success': False, 'message': f"Kopia uszkodzona: {info['quick_check']}"}
+
+            sha = _sha256(raw_path)
+            entries = _load_manifest(backup_dir)
+            if entries and entries[-1]['sha256'] == sha:
+                last = entries[-1]
+                return {
+                    'success': True, 'skipped': True, 'removed': [],
+                    'message': f"Bez zmian od kopii {last['file']}",
+                    'file': last['file'], 'path': os.path.join(backup_dir, last['file']),
+                    'size': last['size'], 'compressed_size': last['compressed_size'],
+                    'duration_s': round(time.perf_counter() - started, 3),
+                }
+
+            now = datetime.now()
+            stem = os.path.splitext(os.path.basename(db_path))[0]
+            safe_reason = ''.join(c if c.isalnum() or c == '-' else '-' for c in reason)
+            file_name = f"{stem}_{now.strftime('%Y%m%d_%H%M%S_%f')}_{safe_reason}.db.gz"
+            path = os.path.join(backup_dir, file_name)
+            with open(raw_path, 'rb') as src, gzip.open(path, 'wb', compresslevel=6) as dst:
+                shutil.copyfileobj(src, dst, 1 << 20)
+
+            entry = {
+                'file': file_name,
+                'created_at': now.isoformat(timespec='seconds'),
+                'reason': reason,
+                'sha256': sha,
+                'size': os.path.getsize(raw_path),
+                'compressed_size': os.path.getsize(path),
+                'pages': info['pages'],
+            }
+            entries.append(entry)
+            _save_manifest(backup_dir, entries)
+        finally:
+            if os.path.exists(raw_path):
+                os.remove(raw_path)
+
+    removed = prune_backups(db_path) if apply_retention else []
+    return {
+        'success': True, 'skipped': False, 'removed': removed,
+        'message': f"Kopia {file_name} ({entry['compressed_size'] / 1024:.0f} KB)",
+        'file': file_name, 'path': path,
+        'size': entry['size'], 'compressed_size': entry['compressed_size'],
+        'duration_s': round(time.perf_counter() - started, 3),
+    }
+
+
+def list_backups(db_path=None):
+    """Kopie z manifestu, od najnowszej"""
+    return list(reversed(_load_manifest(get_backup_dir(db_path))))
+
+
+def select_retained(entries, retention=None, keep_last=KEEP_LAST):
+    """
+    Nazwy plików zachowanych przez politykę retencji
+
+    Dla każdego poziomu (godzina/dzień/miesiąc) zachowujemy najnowszą kopię
+    z każdego z ostatnich N okresów, w których kopie istnieją.
+    """
+    retention = retention or RETENTION
+    bucket_formats = {'hourly': '%Y%m%d%H', 'daily': '%Y%m%d', 'monthly': '%Y%m'}
+    newest_first = sorted(entries, key=lambda e: e['created_at'], reverse=True)
+
+    keep = {e['file'] for e in newest_first[:keep_last]}
+    for level, limit in retention.items():
+        seen = set()
+        for entry in newest_first:
+            bucket = datetime.fromisoformat(entry['created_at']).strftime(bucket_formats[level])
+            if bucket in seen:
+                continue
+            if len(seen) >= limit:
+                break
+            seen.add(bucket)
+            keep.add(entry['file'])
+    return keep
+
+
+def prune_backups(db_path=None, retention=None, keep_last=KEEP_LAST):
+    """Usunięcie kopii spoza polityki retencji - zwraca listę usuniętych plików"""
+    backup_dir = get_backup_dir(db_path)
+    with _backup_lock:
+        entries = _load_manifest(backup_dir)
+        keep = select_retained(entries, retention, keep_last)
+        removed = []
+        for entry in entries:
+            if entry['file'] in keep:
+                continue
+            try:
+                os.remove(os.path.join(backup_dir, entry['file']))
+            except OSError:
+                continue
+            removed.append(entry['file'])
+        if removed:
+            _save_manifest(backup_dir, [e for e in entries if e['file'] not in removed])
+    return removed
+
+
+def restore_backup(file_name, db_path=None, safety_backup=True):
+    """
+    Przywrócenie bazy z kopii
+
+    Kopia jest rozpakowywana do pliku tymczasowego i wgrywana do bieżącej bazy
+    backupem SQLite w jednym kroku (plik bazy nie jest podmieniany - WAL
+    i otwarte połączenia pozostają spójne). Przed przywróceniem powstaje kopia
+    bieżącego stanu (pre-restore). Po przywróceniu: brakujące migracje schematu
+    (kopia może być starsza) i czyszczenie cache w pamięci.
+
+    Returns:
+        dict: {'success', 'message', 'safety_backup', 'duration_s'}
+    """
+    db_path = db_path or db.DB_PATH
+    backup_dir = get_backup_dir(db_path)
+    path = os.path.join(backup_dir, os.path.basename(file_name))
+    if not os.path.exists(path):
+        return {'success': False, 'message': f'Brak kopii {file_name}'}
+
+    started = time.perf_counter()
+    safety = None
+    if safety_backup and os.path.exists(db_path):
+        safety = create_backup('pre-restore', db_path=db_path, apply_retention=False)
+        if not safety['success']:
+            return {'success': False, 'message': f"Nie udało się zabezpieczyć bieżącej bazy: {safety['message']}"}
+
+    fd, raw_path = tempfile.mkstemp(suffix=".db", dir=backup_dir)
+    os.close(fd)
+    try:
+        with gzip.open(path, 'rb') as src, open(raw_path, 'wb') as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+
+        source = sqlite3.connect(raw_path)
+        target = sqlite3.connect(db_path, timeout=30)
+        try:
+            check = source.execute("PRAGMA quick_check").fetchone()[0]
+            if check != 'ok':
+                return {'success': False, 'message': f'Kopia uszkodzona: {check}'}
+            source.backup(target, pages=-1)
+        finally:
+            target.close()
+            source.close()
+    except sqlite3.Error as e:
+        return {'success': False, 'message': f'Błąd przywracania: {e}'}
+    finally:
+        if os.path.exists(raw_path):
+            os.remove(raw_path)
+
+    if os.path.abspath(db_path) == os.path.abspath(db.DB_PATH):
+        _after_restore()
+
+    return {
+        'success': True,
+        'message': f'Przywrócono {os.path.basename(file_name)}',
+        'safety_backup': safety.get('file') if safety else None,
+        'duration_s': round(time.perf_counter() - started, 3),
+    }
+
+
+def _after_restore():
+    """Stan w pamięci po podmianie treści bazy: migracje, indeks FX, cache agregatów"""
+    from db.fx import invalidate_fx_index
+    from db.timeline import invalidate_share_timelines
+
+    # Liczniki table_versions pochodzą z kopii i mogą pokryć się z tokenami
+    # wpisów w cache - czyścimy cały cache
+    db.result_cache.invalidate()
+    invalidate_share_timelines()
+    db._schema_ready_path = None
+    db.init_database()
+    invalidate_fx_index()
+
+
+def backup_before(operation, db_path=None):
+    """
+    Kopia przed operacją niszczącą dane (reset, masowe naprawy)
+
+    Returns:
+        dict jak create_backup; przy success=False operacja nie powinna ruszać
+    """
+    result = create_backup(f"pre-{operation}", db_path=db_path)
+    if result['success']:
+        print(f"💾 BACKUP: {result['message']} (przed: {operation})")
+    return result
@@ -0,0 +1,408 @@
+"""
+Przepływy pieniężne (cashflows)
+"""
+
+import streamlit as st
+from datetime import date as _date
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+import math
+from utils import money
+from db import cached_aggregate, get_connection
+
+
+# ================================
+# OPERACJE CRUD DLA CASHFLOWS
+# ================================
+
+def insert_cashflow(cashflow_type, amount_usd, date, fx_rate, description=None, ref_table=None, ref_id=None):
+    """Dodanie przepływu pieniężnego do bazy (ta sama logika, bezpieczniejsze wykonanie)."""
+    # 0) Szybka walidacja wejścia (bez zmiany logiki biznesowej)
+    try:
+        if amount_usd is None:
+            st.error("Kwota nie może być pusta")
+            return None
+        amount_usd = float(amount_usd)
+    except Exception:
+        st.error("Kwota musi być liczbą")
+        return None
+
+    if amount_usd == 0:
+        st.error("Kwota nie może być zerowa")
+        return None
+
+    try:
+        fx_rate = float(fx_rate)
+    except Exception:
+        st.error("Kurs FX musi być liczbą")
+        return None
+    if fx_rate <= 0 or math.isinf(fx_rate) or math.isnan(fx_rate):
+        st.error("Kurs FX musi być dodatni i skończony")
+        return None
+
+    # 1) Normalizacja daty
+    if hasattr(date, 'strftime'):
+        date_str = date.strftime('%Y-%m-%d')
+    elif isinstance(date, _date):
+        date_str = date.isoformat()
+    elif isinstance(date, str):
+        date_str = date
+    else:
+        st.error("Nieprawidłowy typ daty")
+        return None
+
+    # 2) Obliczenie amount_pln (wciąż 2 miejsca — ta sama logika zaokrąglenia)
+    try:
+        amt_pln_dec = (Decimal(str(amount_usd)) * Decimal(str(fx_rate))).quantize(Decimal("0.01"), rounding=ROUND_HALF_UP)
+        amount_pln = float(amt_pln_dec)
+    except (InvalidOperation, ValueError):
+        st.error("Błąd przeliczenia kwoty PLN")
+        return None
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO cashflows (
+                type, amount_usd, date, fx_rate, amount_pln,
+                description, ref_table, ref_id
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, (cashflow_type, amount_usd, date_str, fx_rate, amount_pln,
+              description, ref_table, ref_id))
+
+        cashflow_id = cur.lastrowid
+        conn.commit()
+        return cashflow_id
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        st.error(f"Błąd dodawania cashflow: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_cashflow(cashflow_id):
+    """Pobranie pojedynczego cashflow po ID"""
+    # Prosta walidacja ID
+    try:
+        cf_id = int(cashflow_id)
+        if cf_id <= 0:
+            return None
+    except Exception:
+        return None
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, type, amount_usd, date, fx_rate, amount_pln,
+                   description, ref_table, ref_id, created_at, updated_at
+            FROM cashflows
+            WHERE id = ?
+        """, (cf_id,))
+        row = cur.fetchone()
+
+        if not row:
+            return None
+
+        # Dzięki row_factory = sqlite3.Row możemy czytać po nazwach
+        return {
+            'id': row['id'],
+            'type': row['type'],
+            'amount_usd': (float(row['amount_usd']) if row['amount_usd'] is not None else None),
+            'date': row['date'],
+            'fx_rate': (float(row['fx_rate']) if row['fx_rate'] is not None else None),
+            'amount_pln': (float(row['amount_pln']) if row['amount_pln'] is not None else None),
+            'description': row['description'],
+            'ref_table': row['ref_table'],
+            'ref_id': row['ref_id'],
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    except Exception as e:
+        st.error(f"Błąd pobierania cashflow: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def delete_cashflow(cashflow_id):
+    """Usunięcie cashflow"""
+    # Prosta walidacja ID
+    try:
+        cf_id = int(cashflow_id)
+        if cf_id <= 0:
+            return False
+    except Exception:
+        return False
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("DELETE FROM cashflows WHERE id = ?", (cf_id,))
+        rows_affected = cur.rowcount
+        conn.commit()
+        return rows_affected > 0
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        st.error(f"Błąd usuwania cashflow: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+@cached_aggregate('cashflows')
+def get_cashflows_stats():
+    """Statystyki tabeli cashflows (ta sama logika, bezpieczniejsze wykonanie)."""
+    default = {
+        'total_records': 0,
+        'oldest_date': None,
+        'newest_date': None,
+        'total_usd': 0.0,
+        'total_pln': 0.0
+    }
+
+    conn = get_connection()
+    if not conn:
+        return default
+
+    try:
+        cur = conn.cursor()
+
+        # Liczba rekordów
+        cur.execute("SELECT COUNT(*) FROM cashflows")
+        total_count_row = cur.fetchone()
+        total_count = int(total_count_row[0] or 0) if total_count_row else 0
+
+        # Zakres dat
+        cur.execute("SELECT MIN(date), MAX(date) FROM cashflows")
+        date_range = cur.fetchone()
+        oldest_date = date_range[0] if date_range else None
+        newest_date = date_range[1] if date_range else None
+
+        # Sumy USD/PLN - dokładnie w centach/groszach (kolumny *_cents)
+        cur.execute("SELECT SUM(amount_usd_cents), SUM(amount_pln_cents) FROM cashflows")
+        totals = cur.fetchone()
+        total_usd = money.from_cents(totals[0]) if totals else 0.0
+        total_pln = money.from_cents(totals[1]) if totals else 0.0
+
+        return {
+            'total_records': total_count,
+            'oldest_date': oldest_date,
+            'newest_date': newest_date,
+            'total_usd': total_usd,
+            'total_pln': total_pln
+        }
+
+    except Exception as e:
+        st.error(f"Błąd statystyk cashflows: {e}")
+        return default
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def update_cashflow(cashflow_id, **kwargs):
+    """Aktualizacja cashflow (ta sama logika; bezpieczniej i w jednej transakcji)."""
+    if not kwargs:
+        return False
+
+    # Dozwolone pola do UPDATE
+    allowed = {'type', 'amount_usd', 'date', 'fx_rate', 'description', 'ref_table', 'ref_id'}
+    updates = {}
+    for k, v in kwargs.items():
+        if k in allowed:
+            # Normalizacja daty, jeśli potrzeba
+            if k == 'date':
+                if hasattr(v, 'strftime'):
+                    v = v.strftime('%Y-%m-%d')
+                elif isinstance(v, _date):
+                    v = v.isoformat()
+                elif not isinstance(v, str):
+                    st.error("Pole 'date' musi być datą albo stringiem YYYY-MM-DD")
+                    return False
+            updates[k] = v
+
+    if not updates:
+        return False
+
+    # Walidacja ID
+    try:
+        cf_id = int(cashflow_id)
+        if cf_id <= 0:
+            return False
+    except Exception:
+        return False
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+
+        # 1) Pobierz bieżące wartości amount_usd i fx_rate (do ewentualnego przeliczenia amount_pln)
+        cur.execute("SELECT amount_usd, fx_rate FROM cashflows WHERE id = ?", (cf_id,))
+        row = cur.fetchone()
+        if not row:
+            return False
+
+        current_amount_usd = row['amount_usd']
+        current_fx_rate = row['fx_rate']
+
+        # 2) Zbuduj SET dla dozwolonych pól
+        set_parts = []
+        params = []
+        for field, value in updates.items():
+            set_parts.append(f"{field} = ?")
+            params.append(value)
+
+        # 3) Zawsze aktualizujemy znacznik czasu
+        set_parts.append("updated_at = CURRENT_TIMESTAMP")
+
+        # 4) Wykonaj główne UPDATE
+        sql = f"UPDATE cashflows SET {', '.join(set_parts)} WHERE id = ?"
+        params.append(cf_id)
+        cur.execute(sql, params)
+
+        # 5) Jeśli zmieniło się 'amount_usd' albo 'fx_rate' → przelicz 'amount_pln'
+        if ('amount_usd' in updates) or ('fx_rate' in updates):
+            # Nowe wartości to: z 'updates' jeśli są, w przeciwnym razie dotychczasowe
+            try:
+                new_amount_usd = updates.get('amount_usd', current_amount_usd)
+                new_fx_rate = updates.get('fx_rate', current_fx_rate)
+
+                # rzutowania na Decimal i zaokrąglenie do 2 miejsc
+                amt_pln = (Decimal(str(new_amount_usd)) * Decimal(str(new_fx_rate))).quantize(
+                    Decimal("0.01"), rounding=ROUND_HALF_UP
+                )
+                cur.execute("UPDATE cashflows SET amount_pln = ? WHERE id = ?", (float(amt_pln), cf_id))
+            except (InvalidOperation, TypeError, ValueError):
+                # jeśli nowe wartości są nieprawidłowe, zwróć błąd i cofnij
+                raise Exception("Nieprawidłowe wartości amount_usd lub fx_rate przy przeliczeniu amount_pln")
+
+        conn.commit()
+        return True
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        st.error(f"Błąd aktualizacji cashflow: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+    
+
+
+def cleanup_orphaned_cashflow():
+    """
+    Usuwa cashflow, które wskazują na nieistniejące rekordy w options_cc (ref_table='options_cc').
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Anti-join (bezpieczniej niż NOT IN z możliwymi NULL-ami)
+        cur.execute("""
+            SELECT c.id, c.description, c.amount_usd, c.date
+            FROM cashflows c
+            LEFT JOIN options_cc oc ON oc.id = c.ref_id
+            WHERE c.ref_table = 'options_cc'
+              AND c.ref_id IS NOT NULL
+              AND oc.id IS NULL
+        """)
+        orphaned = cur.fetchall() or []
+
+        if not orphaned:
+            return {
+                'success': True,
+                'message': 'Nie znaleziono orphaned cashflow',
+                'deleted_count': 0,
+                'deleted_descriptions': []
+            }
+
+        deleted_descriptions = []
+        try:
+            cur.execute("BEGIN")
+            for r in orphaned:
+                cf_id = r["id"]
+                desc = r["description"] if r["description"] is not None else "(brak opisu)"
+                amt = r["amount_usd"] if r["amount_usd"] is not None else 0.0
+                dt  = r["date"] if r["date"] is not None else "(brak daty)"
+
+                cur.execute("DELETE FROM cashflows WHERE id = ?", (cf_id,))
+                try:
+                    deleted_descriptions.append(f"{dt}: {desc} (${float(amt):.2f})")
+                except Exception:
+                    deleted_descriptions.append(f"{dt}: {desc} (kwota n/d)")
+
+            cur.execute("COMMIT")
+        except Exception as txe:
+            try: cur.execute("ROLLBACK")
+            except Exception: pass
+            return {'success': False, 'message': f'Błąd transakcji cleanup: {txe}'}
+
+        return {
+            'success': True,
+            'message': f'Usunięto {len(orphaned)} orphaned cashflow',
+            'deleted_count': len(orphaned),
+            'deleted_descriptions': deleted_descriptions
+        }
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd cleanup: {str(e)}'}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,819 @@
+"""
+CC Chains: migracja, autodetekcja łańcuchów per LOT, statystyki
+"""
+
+import sqlite3
+from db import cached_aggregate, get_connection, run_schema_migrations
+
+
+def migrate_options_cc_add_chain_id():
+    """
+    🔗 PUNKT 72: Dodanie kolumny chain_id do tabeli options_cc
+    - Obecnie migracja 4 w schema_migrations (cc_chains + chain_id z FK
+      ON DELETE SET NULL + indeks) - funkcja uruchamia brakujące migracje
+    """
+    result = run_schema_migrations()
+    if not result.get('success'):
+        return {'success': False, 'message': result.get('message')}
+    return {'success': True, 'message': f"✅ Kolumna chain_id w options_cc ({result.get('message')})"}
+
+
+def check_cc_chains_migration_status():
+    """
+    🔍 PUNKT 72.1: Sprawdza status migracji CC Chains
+
+    Returns:
+        dict: {
+            'success': bool,
+            'tables_status': {...},
+            'anomalies': [str, ...],            # dodatkowe ostrzeżenia (opcjonalne)
+            'chains_overview': [{'chain_id': int, 'members': int}, ...]  # opcjonalnie
+        }
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'error': 'Brak połączenia z bazą'}
+
+        # Ułatwione czytanie kolumn po nazwach (gdy możliwe)
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        tables_status = {}
+        anomalies = []
+        chains_overview = []
+
+        # 1-2) cc_chains, options_cc.chain_id i jej indeks daje migracja schematu 4
+        import schema_migrations
+        schema_version = schema_migrations.get_schema_version(conn)
+        chains_migrated = schema_version >= 4
+        tables_status['schema_version'] = schema_version
+        tables_status['cc_chains_exists'] = chains_migrated
+        tables_status['chain_id_exists'] = chains_migrated
+        tables_status['chain_id_index_exists'] = chains_migrated
+
+        if tables_status['cc_chains_exists']:
+            cur.execute("SELECT COUNT(*) AS c FROM cc_chains")
+            tables_status['cc_chains_count'] = int(cur.fetchone()['c'] or 0)
+        else:
+            tables_status['cc_chains_count'] = 0
+
+        # 3) Ile CC ma przypisane chains?
+        if tables_status['chain_id_exists']:
+            cur.execute("SELECT COUNT(*) AS c FROM options_cc WHERE chain_id IS NOT NULL")
+            tables_status['cc_with_chains'] = int(cur.fetchone()['c'] or 0)
+
+            cur.execute("SELECT COUNT(*) AS c FROM options_cc WHERE chain_id IS NULL")
+            tables_status['cc_without_chains'] = int(cur.fetchone()['c'] or 0)
+        else:
+            tables_status['cc_with_chains'] = 0
+            tables_status['cc_without_chains'] = 0
+
+        # --- Dodatkowa diagnostyka anomalii, jeśli mamy chain_id lub tabelę chains ---
+        if tables_status['chain_id_exists']:
+            # CC wskazujące nieistniejący chain_id (orphan FK logiczny – gdy FK OFF)
+            if tables_status['cc_chains_exists']:
+                cur.execute("""
+                    SELECT DISTINCT oc.chain_id
+                    FROM options_cc oc
+                    LEFT JOIN cc_chains ch ON ch.id = oc.chain_id
+                    WHERE oc.chain_id IS NOT NULL AND ch.id IS NULL
+                """)
+                orphans = [int(r[0]) for r in (cur.fetchall() or [])]
+                if orphans:
+                    anomalies.append(f"CC wskazują na nieistniejące chain_id: {orphans}")
+
+                # Łańcuchy bez członków
+                cur.execute("""
+                    SELECT ch.id
+                    FROM cc_chains ch
+                    LEFT JOIN options_cc oc ON oc.chain_id = ch.id
+                    GROUP BY ch.id
+                    HAVING COUNT(oc.id) = 0
+                """)
+                empty_chains = [int(r[0]) for r in (cur.fetchall() or [])]
+                if empty_chains:
+                    anomalies.append(f"Łańcuchy bez członków: {empty_chains}")
+
+                # Przegląd liczebności per chain
+                cur.execute("""
+                    SELECT oc.chain_id AS chain_id, COUNT(*) AS members
+                    FROM options_cc oc
+                    WHERE oc.chain_id IS NOT NULL
+                    GROUP BY oc.chain_id
+                    ORDER BY oc.chain_id
+                """)
+                chains_overview = [{'chain_id': int(r['chain_id']), 'members': int(r['members'])}
+                                   for r in (cur.fetchall() or [])]
+            else:
+                # Nie ma cc_chains, ale są CC z chain_id => anomalia
+                if tables_status.get('cc_with_chains', 0) > 0:
+                    anomalies.append("Istnieją CC z chain_id, ale brak tabeli cc_chains.")
+
+        return {
+            'success': True,
+            'tables_status': tables_status,
+            'anomalies': anomalies,
+            'chains_overview': chains_overview
+        }
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'error': f'Błąd sprawdzania: {str(e)}'}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def run_cc_chains_migration():
+    """
+    🚀 PUNKT 72.2: Kompletna migracja CC Chains
+
+    1) Uruchamia brakujące migracje schematu (schema_migrations - cc_chains,
+       options_cc.chain_id z FK ON DELETE SET NULL + indeks to migracja 4).
+    2) Sprawdza status i dorzuca ewentualne anomalie z check_cc_chains_migration_status().
+
+    Zwraca: dict z kluczami:
+      - steps_completed: [str, ...]
+      - errors: [str, ...]
+      - success: bool
+      - final_status: dict (jak z check_cc_chains_migration_status()['tables_status'])
+      - anomalies: [str, ...] (opcjonalnie)
+      - chains_overview: [ {chain_id, members}, ... ] (opcjonalnie)
+    """
+    migration_report = {
+        'steps_completed': [],
+        'errors': [],
+        'success': True
+    }
+
+    # --- KROK 1: Migracje schematu (idempotentne)
+    schema_result = run_schema_migrations()
+    if schema_result.get('success'):
+        migration_report['steps_completed'].append(f"✅ {schema_result.get('message')}")
+        for version, description in schema_result.get('applied', []):
+            migration_report['steps_completed'].append(f"✅ Migracja {version}: {description}")
+    else:
+        migration_report['errors'].append(schema_result.get('message'))
+        migration_report['success'] = False
+        return migration_report
+
+    # --- KROK 2: Sprawdź status migracji i anomalia
+    status_check = check_cc_chains_migration_status()
+    if status_check.get('success'):
+        migration_report['final_status'] = status_check.get('tables_status', {})
+        if status_check.get('anomalies'):
+            migration_report['anomalies'] = status_check['anomalies']
+            # nie oznaczamy od razu jako fail – traktuj jako ostrzeżenia
+            migration_report['steps_completed'].append('⚠️ Wykryto anomalie – sprawdź pole anomalies')
+        if status_check.get('chains_overview') is not None:
+            migration_report['chains_overview'] = status_check['chains_overview']
+        migration_report['steps_completed'].append('✅ Weryfikacja migracji zakończona')
+    else:
+        migration_report['errors'].append(f"❌ {status_check.get('error')}")
+        migration_report['success'] = False
+
+    return migration_report
+
+# =============================================================================
+# PUNKT 74: LOT LIFECYCLE CHAINS - Historia życia LOT-a akcji
+# =============================================================================
+
+def auto_detect_lot_chains():
+    """
+    🔗 PUNKT 74: Auto-detection LOT Chains - LIFECYCLE LOT-ów
+    
+    CHAIN = Kompletny lifecycle LOT-a:
+    1. Zakup LOT-a (lots.buy_date) 
+    2. Wszystkie CC wystawione na ten LOT (lot_linked_id)
+    3. Sprzedaż LOT-a (stock_trades) - KOŃCZY CHAIN
+    
+    METRYKI PER CHAIN:
+    - Total Premium PLN (suma wszystkich CC)
+    - Total P/L PLN (CC + sprzedaż akcji)
+    - Duration (dni od buy do sell/teraz)
+    - ROI% na LOT
+    """
+    import sqlite3
+    from datetime import date
+    
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # 1. Tabelę cc_chains gwarantuje migracja schematu 4
+
+        # 2. ZNAJDŹ WSZYSTKIE LOT-y (aktywne + historyczne)
+        cur.execute("""
+            SELECT 
+                l.id as lot_id,
+                l.ticker,
+                l.quantity_total,
+                l.quantity_open,
+                l.buy_date,
+                l.buy_price_usd,
+                l.cost_pln,
+                CASE 
+                    WHEN l.quantity_open = 0 THEN 'sold'
+                    WHEN l.quantity_open > 0 THEN 'active'
+                    ELSE 'unknown'
+                END as lot_status
+            FROM lots l
+            ORDER BY l.ticker, l.buy_date
+        """)
+        
+        all_lots = cur.fetchall()
+        
+        if not all_lots:
+            return {
+                'success': True,
+                'message': '✅ Brak LOT-ów do analizy'
+            }
+
+        # 3. DLA KAŻDEGO LOT-a - sprawdź czy ma CC i czy potrzebuje chain
+        lots_needing_chains = []
+        
+        for lot in all_lots:
+            lot_id = lot['lot_id']
+            
+            # Sprawdź czy LOT już ma chain
+            cur.execute("""
+                SELECT COUNT(*) 
+                FROM cc_chains 
+                WHERE lot_id = ?
+            """, (lot_id,))
+            
+            existing_chains = cur.fetchone()[0]
+            if existing_chains > 0:
+                continue  # LOT już ma chain
+            
+            # Sprawdź czy LOT ma CC (aktualnie lub historycznie)
+            cur.execute("""
+                SELECT COUNT(*) 
+                FROM options_cc 
+                WHERE lot_linked_id = ?
+            """, (lot_id,))
+            
+            cc_count = cur.fetchone()[0]
+            
+            # WARUNEK: LOT potrzebuje chain jeśli ma jakiekolwiek CC
+            if cc_count > 0:
+                lots_needing_chains.append({
+                    'lot': dict(lot),
+                    'cc_count': cc_count
+                })
+
+        if not lots_needing_chains:
+            return {
+                'success': True,
+                'chains_created': 0,
+                'message': '✅ Wszystkie LOT-y z CC już mają chains'
+            }
+
+        # 4. TWÓRZ CHAINS dla LOT-ów z CC
+        chains_created = 0
+        cc_assigned = 0
+        
+        try:
+            cur.execute("BEGIN TRANSACTION")
+            
+            for lot_data in lots_needing_chains:
+                lot = lot_data['lot']
+                lot_id = lot['lot_id']
+                ticker = lot['ticker']
+                buy_date = lot['buy_date']
+                lot_status = lot['lot_status']
+                
+                # Chain name: TICKER_LOT{id}
+                chain_name = f"{ticker}_LOT{lot_id}"
+                
+                # End date dla sprzedanych LOT-ów
+                end_date = None
+                chain_status = 'active'
+                
+                if lot_status == 'sold':
+                    # Znajdź datę sprzedaży LOT-a
+                    cur.execute("""
+                        SELECT MAX(st.sell_date) as last_sell_date
+                        FROM stock_trades st
+                        JOIN stock_trade_splits sts ON st.id = sts.trade_id
+                        WHERE sts.lot_id = ?
+                    """, (lot_id,))
+                    
+                    sell_result = cur.fetchone()
+                    if sell_result and sell_result['last_sell_date']:
+                        end_date = sell_result['last_sell_date']
+                        chain_status = 'closed'
+                
+                # Utwórz chain
+                cur.execute("""
+                    INSERT INTO cc_chains (lot_id, ticker, chain_name, start_date, end_date, status)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (lot_id, ticker, chain_name, buy_date, end_date, chain_status))
+                
+                chain_id = cur.lastrowid
+                chains_created += 1
+                
+                # Przypisz wszystkie CC tego LOT-a do chain
+                cur.execute("""
+                    UPDATE options_cc 
+                    SET chain_id = ?
+                    WHERE lot_linked_id = ? AND chain_id IS NULL
+                """, (chain_id, lot_id))
+                
+                cc_assigned += cur.rowcount
+            
+            cur.execute("COMMIT")
+            
+        except Exception as txe:
+            try:
+                cur.execute("ROLLBACK")
+            except:
+                pass
+            raise txe
+
+        return {
+            'success': True,
+            'chains_created': chains_created,
+            'cc_assigned': cc_assigned,
+            'lots_processed': len(lots_needing_chains),
+            'message': f'✅ Utworzono {chains_created} LOT chains, przypisano {cc_assigned} CC',
+            'details': {
+                'method': 'lot_lifecycle',
+                'active_chains': sum(1 for l in lots_needing_chains if l['lot']['lot_status'] == 'active'),
+                'closed_chains': sum(1 for l in lots_needing_chains if l['lot']['lot_status'] == 'sold')
+            }
+        }
+
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'❌ Błąd LOT chains detection: {str(e)}',
+            'error_details': str(e)
+        }
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+# =============================================================================
+# PUNKT 74.1: LOT CHAIN ANALYTICS - metryki per chain
+# =============================================================================
+
+def get_lot_chain_summary(chain_id=None):
+    """
+    📊 Podsumowanie LOT Chain z metrykami finansowymi
+    
+    Returns:
+        {
+            'lot_info': {...},
+            'cc_summary': {...}, 
+            'financial_summary': {...},
+            'timeline': [...]
+        }
+    """
+    conn = get_connection()
+    if not conn:
+        return {}
+    
+    try:
+        cur = conn.cursor()
+        conn.row_factory = sqlite3.Row
+        
+        # Pobierz dane chain
+        cur.execute("""
+            SELECT 
+                ch.id, ch.lot_id, ch.ticker, ch.chain_name,
+                ch.start_date, ch.end_date, ch.status,
+                l.quantity_total, l.quantity_open, l.buy_price_usd, l.cost_pln,
+                l.buy_date, l.fx_rate as lot_fx_rate
+            FROM cc_chains ch
+            JOIN lots l ON l.id = ch.lot_id
+            WHERE ch.id = ?
+        """, (chain_id,))
+        
+        chain = cur.fetchone()
+        if not chain:
+            return {'error': 'Chain not found'}
+        
+        chain_dict = dict(chain)
+        
+        # CC w tym chain
+        cur.execute("""
+            SELECT 
+                id, status, open_date, close_date, contracts,
+                premium_sell_pln, premium_buyback_pln, pl_pln,
+                strike_usd, expiry_date
+            FROM options_cc
+            WHERE chain_id = ?
+            ORDER BY open_date
+        """, (chain_id,))
+        
+        cc_list = [dict(cc) for cc in cur.fetchall()]
+        
+        # Sprzedaże z tego LOT-a
+        lot_id = chain['lot_id']
+        cur.execute("""
+            SELECT 
+                st.sell_date, st.sell_price_usd, st.fx_rate,
+                sts.qty_from_lot, sts.realized_pl_pln
+            FROM stock_trades st
+            JOIN stock_trade_splits sts ON st.id = sts.trade_id
+            WHERE sts.lot_id = ?
+            ORDER BY st.sell_date
+        """, (lot_id,))
+        
+        stock_sales = [dict(sale) for sale in cur.fetchall()]
+        
+        # FINANSOWE PODSUMOWANIE
+        total_cc_premium = sum(cc.get('premium_sell_pln', 0) or 0 for cc in cc_list)
+        total_cc_pl = sum(cc.get('pl_pln', 0) or 0 for cc in cc_list)
+        total_stock_pl = sum(sale.get('realized_pl_pln', 0) or 0 for sale in stock_sales)
+        
+        lot_cost_pln = chain['cost_pln'] or 0
+        total_chain_pl = total_cc_pl + total_stock_pl
+        
+        roi_percent = (total_chain_pl / lot_cost_pln * 100) if lot_cost_pln > 0 else 0
+        
+        # Timeline events
+        timeline = []
+        
+        # Zakup LOT-a
+        timeline.append({
+            'date': chain['buy_date'],
+            'event': 'LOT_BUY',
+            'description': f"Zakup {chain['quantity_total']} {chain['ticker']} @ ${chain['buy_price_usd']:.2f}",
+            'amount_pln': -lot_cost_pln
+        })
+        
+        # CC events
+        for cc in cc_list:
+            timeline.append({
+                'date': cc['open_date'],
+                'event': 'CC_OPEN',
+                'description': f"CC {cc['contracts']}x strike ${cc['strike_usd']:.2f}",
+                'amount_pln': cc.get('premium_sell_pln', 0)
+            })
+            
+            if cc['close_date']:
+                timeline.append({
+                    'date': cc['close_date'],
+                    'event': f"CC_{cc['status'].upper()}",
+                    'description': f"CC {cc['status']} - P/L: {cc.get('pl_pln', 0):.0f} PLN",
+                    'amount_pln': cc.get('pl_pln', 0) - cc.get('premium_sell_pln', 0)  # Net change
+                })
+        
+        # Stock sales
+        for sale in stock_sales:
+            timeline.append({
+                'date': sale['sell_date'],
+                'event': 'STOCK_SELL',
+                'description': f"Sprzedaż {sale['qty_from_lot']} @ ${sale['sell_price_usd']:.2f}",
+                'amount_pln': sale.get('realized_pl_pln', 0)
+            })
+        
+        # Sortuj timeline
+        timeline.sort(key=lambda x: x['date'] or '9999-12-31')
+        
+        return {
+            'chain_info': chain_dict,
+            'cc_summary': {
+                'cc_count': len(cc_list),
+                'total_premium_pln': total_cc_premium,
+                'total_cc_pl_pln': total_cc_pl,
+                'cc_list': cc_list
+            },
+            'stock_summary': {
+                'sales_count': len(stock_sales),
+                'total_stock_pl_pln': total_stock_pl,
+                'stock_sales': stock_sales
+            },
+            'financial_summary': {
+                'lot_cost_pln': lot_cost_pln,
+                'total_chain_pl_pln': total_chain_pl,
+                'roi_percent': roi_percent,
+                'is_active': chain['status'] == 'active'
+            },
+            'timeline': timeline
+        }
+        
+    except Exception as e:
+        return {'error': str(e)}
+    finally:
+        conn.close()
+
+# =============================================================================
+# ZAMIEŃ auto_detect_cc_chains() na auto_detect_lot_chains() w db.py!
+# =============================================================================
+
+
+@cached_aggregate('cc_chains', 'options_cc', 'stock_trades', 'stock_trade_splits', 'lots')
+def get_lot_chains_summary():
+    """
+    📊 PUNKT 81: Podsumowanie wszystkich LOT chains - NAPRAWIONE
+    
+    POPRAWKA: Użycie rzeczywistych kolumn z stock_trade_splits
+    - Brak realized_pl_pln - obliczamy z głównej tabeli stock_trades
+    """
+    import sqlite3
+    
+    conn = get_connection()
+    if not conn:
+        return []
+    
+    try:
+        conn.row_factory = sqlite3.Row
+        cur = conn.cursor()
+        
+        # Pobierz wszystkie chains z info o LOT-ach
+        cur.execute("""
+            SELECT 
+                ch.id as chain_id,
+                ch.lot_id,
+                ch.ticker,
+                ch.chain_name,
+                ch.start_date as chain_start_date,
+                ch.end_date as chain_end_date,
+                ch.status as chain_status,
+                l.quantity_total,
+                l.quantity_open, 
+                l.buy_date as lot_buy_date,
+                l.buy_price_usd,
+                l.cost_pln as lot_cost_pln
+            FROM cc_chains ch
+            JOIN lots l ON l.id = ch.lot_id
+            ORDER BY ch.ticker, l.buy_date DESC
+        """)
+        
+        chains_data = cur.fetchall()
+        
+        lot_chains = []
+        
+        for chain_row in chains_data:
+            chain_id = chain_row['chain_id']
+            lot_id = chain_row['lot_id']
+            
+            # CC dla tego chain
+            cur.execute("""
+                SELECT 
+                    id, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                    open_date, expiry_date, close_date, status, pl_pln
+                FROM options_cc
+                WHERE chain_id = ?
+                ORDER BY open_date
+            """, (chain_id,))
+            
+            cc_rows = cur.fetchall()
+            cc_list = [dict(cc) for cc in cc_rows]
+            
+            # Stock sales z tego LOT-a - POPRAWIONY QUERY
+            cur.execute("""
+                SELECT DISTINCT
+                    st.id,
+                    st.sell_date, 
+                    st.sell_price_usd,
+                    st.pl_pln,
+                    sts.qty_from_lot
+                FROM stock_trades st
+                JOIN stock_trade_splits sts ON st.id = sts.trade_id
+                WHERE sts.lot_id = ?
+                ORDER BY st.sell_date
+            """, (lot_id,))
+            
+            stock_rows = cur.fetchall()
+            
+            # Konwertuj stock sales na słowniki
+            stock_sales = []
+            total_stock_pl = 0
+            
+            for sale in stock_rows:
+                sale_dict = {
+                    'sell_date': sale['sell_date'],
+                    'sell_price_usd': sale['sell_price_usd'],
+                    'qty_from_lot': sale['qty_from_lot'],
+                    'pl_pln_portion': 0  # Zostaw 0 - trudno policzyć proporcję
+                }
+                stock_sales.append(sale_dict)
+                
+                # P/L proporcjonalny do qty_from_lot / total quantity w trade
+                # Ale to skomplikowane - na razie użyj całego P/L z trade
+                total_stock_pl += sale['pl_pln'] or 0
+            
+            # Deduplicacja - jeden trade może mieć wiele splits
+            if stock_sales:
+                unique_trades = {}
+                for sale in stock_sales:
+                    key = sale['sell_date']
+                    if key not in unique_trades:
+                        unique_trades[key] = sale
+                stock_sales = list(unique_trades.values())
+                
+                # Skoryguj total_stock_pl - podziel przez liczbę duplikatów
+                if len(stock_rows) > len(stock_sales):
+                    total_stock_pl = total_stock_pl / (len(stock_rows) / len(stock_sales))
+            
+            # Kalkulacje finansowe
+            total_cc_premium = sum(cc.get('premium_sell_pln', 0) or 0 for cc in cc_list)
+            total_cc_pl = sum(cc.get('pl_pln', 0) or 0 for cc in cc_list)
+            total_chain_pl = total_cc_pl + total_stock_pl
+            
+            lot_cost = chain_row['lot_cost_pln'] or 0
+            roi_percent = (total_chain_pl / lot_cost * 100) if lot_cost > 0 else 0
+            
+            # Status LOT-a
+            lot_status = 'active' if chain_row['quantity_open'] > 0 else 'sold'
+            
+            # Count metrics
+            cc_count = len(cc_list)
+            open_cc_count = sum(1 for cc in cc_list if cc.get('status') == 'open')
+            
+            lot_chains.append({
+                'chain_id': chain_id,
+                'lot_id': lot_id,
+                'ticker': chain_row['ticker'],
+                'chain_name': chain_row['chain_name'],
+                'lot_status': lot_status,
+                'lot_quantity_total': chain_row['quantity_total'],
+                'lot_quantity_open': chain_row['quantity_open'],
+                'lot_buy_date': chain_row['lot_buy_date'],
+                'lot_buy_price_usd': float(chain_row['buy_price_usd'] or 0),
+                'lot_cost_pln': lot_cost,
+                'chain_start_date': chain_row['chain_start_date'],
+                'chain_end_date': chain_row['chain_end_date'],
+                'cc_count': cc_count,
+                'open_cc_count': open_cc_count,
+                'total_cc_premium_pln': total_cc_premium,
+                'total_chain_pl_pln': total_chain_pl,
+                'total_stock_pl_pln': total_stock_pl,
+                'roi_percent': roi_percent,
+                'cc_list': cc_list,
+                'stock_sales': stock_sales
+            })
+        
+        return lot_chains
+        
+    except Exception as e:
+        print(f"Błąd get_lot_chains_summary: {e}")
+        import traceback
+        traceback.print_exc()
+        return []
+    finally:
+        conn.close()
+
+
+def update_chain_statistics(chain_id):
+    """
+    📊 PUNKT 74.2: Aktualizuje statystyki chain na podstawie przypisanych CC
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia'}
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # --- Tabelę cc_chains z kolumnami statystyk gwarantuje migracja schematu 4
+
+        # --- Statystyki z options_cc dla danego chain_id
+        cur.execute("""
+            SELECT
+                COUNT(*)                                      AS cc_count,
+                COALESCE(SUM(contracts), 0)                   AS total_contracts,
+                COALESCE(SUM(premium_sell_pln), 0.0)          AS total_premium_pln,
+                COALESCE(SUM(pl_pln), 0.0)                    AS total_pl_pln,
+                AVG(JULIANDAY(COALESCE(close_date, expiry_date)) - JULIANDAY(open_date)) AS avg_duration_days,
+                MAX(COALESCE(close_date, expiry_date))        AS last_activity_date
+            FROM options_cc
+            WHERE chain_id = ? AND status IN ('open','expired','bought_back')
+        """, (chain_id,))
+        s = cur.fetchone()
+        if not s or (s['cc_count'] or 0) == 0:
+            return {'success': False, 'message': 'Brak danych dla chain'}
+
+        cc_count           = int(s['cc_count'] or 0)
+        total_contracts    = int(s['total_contracts'] or 0)
+        total_premium_pln  = float(s['total_premium_pln'] or 0.0)
+        total_pl_pln       = float(s['total_pl_pln'] or 0.0)
+        avg_duration_days  = float(s['avg_duration_days'] or 0.0) if s['avg_duration_days'] is not None else 0.0
+        last_activity_date = s['last_activity_date']
+
+        # --- Success rate tylko na zamkniętych
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(CASE WHEN pl_pln > 0 THEN 1 ELSE 0 END), 0) AS wins,
+                COALESCE(SUM(CASE WHEN status IN ('expired','bought_back') THEN 1 ELSE 0 END), 0) AS closed
+            FROM options_cc
+            WHERE chain_id = ?
+        """, (chain_id,))
+        r = cur.fetchone()
+        wins   = int(r['wins'] or 0)
+        closed = int(r['closed'] or 0)
+        success_rate = (wins * 100.0 / closed) if closed > 0 else 0.0
+
+        # --- NETTO USD z cashflow (option_premium)
+        cur.execute("""
+            SELECT COALESCE(SUM(c.amount_usd), 0.0) AS sum_prem_usd
+            FROM cashflows c
+            JOIN options_cc oc ON oc.id = c.ref_id
+            WHERE c.ref_table='options_cc'
+              AND c.type='option_premium'
+              AND oc.chain_id = ?
+        """, (chain_id,))
+        rp = cur.fetchone()
+        total_premium_usd_cf = float(rp['sum_prem_usd'] or 0.0)
+
+        # --- Czy są otwarte CC? (status chain + end_date)
+        cur.execute("SELECT COUNT(*) AS open_cnt FROM options_cc WHERE chain_id = ? AND status='open'", (chain_id,))
+        open_cnt = int((cur.fetchone() or {'open_cnt': 0})['open_cnt'] or 0)
+        chain_status = 'active' if open_cnt > 0 else 'closed'
+        end_date = None if open_cnt > 0 else last_activity_date
+
+        # --- Annualized return (ostrożnie)
+        # użyj total_premium_pln jako "kapitału pracującego"; jeśli 0 albo avg_duration=0 => 0
+        if total_premium_pln > 0.0 and avg_duration_days and avg_duration_days > 0.0:
+            annualized_return = (total_pl_pln / total_premium_pln) * (365.0 / avg_duration_days) * 100.0
+        else:
+            annualized_return = 0.0
+
+        # --- Kolumny statystyk gwarantuje migracja 4
+        cur.execute("""
+            UPDATE cc_chains SET
+                cc_count = ?,
+                total_contracts = ?,
+                total_premium_pln = ?,
+                total_premium_usd = ?,
+                total_pl_pln = ?,
+                avg_duration_days = ?,
+                success_rate = ?,
+                annualized_return = ?,
+                end_date = ?,
+                status = ?,
+                updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (
+            cc_count,
+            total_contracts,
+            round(total_premium_pln, 2),
+            round(total_premium_usd_cf, 2),
+            round(total_pl_pln, 2),
+            round(avg_duration_days, 2),
+            round(success_rate, 2),
+            round(annualized_return, 2),
+            end_date,
+            chain_status,
+            chain_id,
+        ))
+
+        conn.commit()
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+        return {
+            'success': True,
+            'message': f"✅ Statystyki chain #{chain_id} zaktualizowane",
+            'stats': {
+                'total_pl': round(total_pl_pln, 2),
+                'cc_count': cc_count,
+                'status': chain_status
+            }
+        }
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd aktualizacji: {str(e)}'}
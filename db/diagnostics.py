@@ -0,0 +1,910 @@
+"""
+Funkcje testowe i diagnostyczne (Dev Tools) - poza ścieżką importu aplikacji
+"""
+
+import streamlit as st
+import db
+from db import get_app_info, get_connection
+
+
+def test_database_connection():
+    """Test połączenia z bazą danych dla debugowania"""
+    result = {
+        'db_exists': os.path.exists(db.DB_PATH),
+        'db_size': 0,
+        'connection_ok': False,
+        'tables_count': 0,
+        'app_info': None
+    }
+
+    # Jeśli plik bazy istnieje → sprawdź jego rozmiar
+    if result['db_exists']:
+        try:
+            result['db_size'] = os.path.getsize(db.DB_PATH)
+        except Exception:
+            # Jeśli nie uda się pobrać rozmiaru, po prostu zostaje 0
+            result['db_size'] = 0
+
+    conn = get_connection()
+    if not conn:
+        return result
+
+    try:
+        result['connection_ok'] = True
+        cur = conn.cursor()
+
+        # Liczba tabel w bazie
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='table'")
+        result['tables_count'] = int(cur.fetchone()[0] or 0)
+
+        # Pobierz podstawowe info o aplikacji
+        result['app_info'] = get_app_info()
+
+    except Exception as e:
+        st.error(f"Błąd testu bazy danych: {e}")
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    return result
+
+def test_fx_rates_operations():
+    """Test operacji CRUD na tabeli fx_rates - NAPRAWIONY (ta sama logika, bezpieczniejsze wykonanie)"""
+    from db.fx import (delete_fx_rate, get_fx_rate, get_fx_rates_stats, get_latest_fx_rate,
+                       insert_fx_rate, invalidate_fx_index)
+    results = {
+        'fx_table_exists': False,
+        'insert_test': False,
+        'get_test': False,
+        'latest_test': False,
+        'delete_test': False,
+        'stats_test': False
+    }
+
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return results
+
+    conn = get_connection()
+    if not conn:
+        return results
+
+    try:
+        # 1) Upewnij się, że tabela istnieje
+        try:
+            results['fx_table_exists'] = bool(structure.create_fx_rates_table(conn))
+        except Exception as e:
+            st.error(f"Błąd tworzenia tabeli fx_rates: {e}")
+            results['fx_table_exists'] = False
+
+        # 2) Wyczyść dane testowe (jak w oryginale)
+        if results['fx_table_exists']:
+            cur = conn.cursor()
+            cur.execute("DELETE FROM fx_rates WHERE code = 'USD' AND source IN ('NBP', 'MANUAL')")
+            conn.commit()
+            invalidate_fx_index()
+
+    except Exception as e:
+        st.error(f"Błąd przygotowania testu fx_rates: {e}")
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # 3) INSERT
+    if results['fx_table_exists']:
+        results['insert_test'] = insert_fx_rate('2025-01-15', 'USD', 4.2345, 'NBP')
+
+    # 4) GET
+    if results['insert_test']:
+        rate = get_fx_rate('2025-01-15', 'USD')
+        try:
+            results['get_test'] = (rate is not None) and (float(rate['rate']) == 4.2345)
+        except Exception:
+            results['get_test'] = False
+
+    # 5) LATEST
+    if results['get_test']:
+        latest = get_latest_fx_rate('USD')
+        try:
+            results['latest_test'] = (latest is not None) and (float(latest['rate']) == 4.2345)
+        except Exception:
+            results['latest_test'] = False
+
+    # 6) STATS
+    if results['latest_test']:
+        stats = get_fx_rates_stats()
+        results['stats_test'] = bool(stats and stats.get('total_records', 0) > 0)
+
+    # 7) DELETE
+    if results['stats_test']:
+        results['delete_test'] = delete_fx_rate('2025-01-15', 'USD')
+
+    return results
+
+def test_cashflows_operations():
+    """Test operacji CRUD na tabeli cashflows (ta sama logika, bezpieczniejsze wykonanie)."""
+    from db.cashflows import (delete_cashflow, get_cashflow, get_cashflows_stats, insert_cashflow,
+                              update_cashflow)
+    results = {
+        'table_exists': False,
+        'insert_test': False,
+        'get_test': False,
+        'update_test': False,
+        'delete_test': False,
+        'stats_test': False
+    }
+
+    # 1) Upewnij się, że mamy strukturę tabeli
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return results
+
+    conn = get_connection()
+    if conn:
+        try:
+            results['table_exists'] = bool(structure.create_cashflows_table(conn))
+        except Exception as e:
+            st.error(f"Błąd tworzenia tabeli cashflows: {e}")
+            results['table_exists'] = False
+        finally:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    cashflow_id = None
+
+    # 2) INSERT
+    if results['table_exists']:
+        cashflow_id = insert_cashflow('deposit', 1000.0, '2025-01-15', 4.2345, 'Test deposit')
+        results['insert_test'] = cashflow_id is not None
+
+    # 3) GET
+    if results['insert_test'] and cashflow_id is not None:
+        cf = get_cashflow(cashflow_id)
+        try:
+            results['get_test'] = (cf is not None) and (float(cf['amount_usd']) == 1000.0)
+        except Exception:
+            results['get_test'] = False
+
+    # 4) UPDATE
+    if results['get_test'] and cashflow_id is not None:
+        results['update_test'] = update_cashflow(cashflow_id, description='Updated test deposit')
+
+    # 5) STATS
+    if results['update_test']:
+        stats = get_cashflows_stats()
+        results['stats_test'] = bool(stats and stats.get('total_records', 0) > 0)
+
+    # 6) DELETE
+    if results['stats_test'] and cashflow_id is not None:
+        results['delete_test'] = delete_cashflow(cashflow_id)
+
+    return results
+
+
+def test_lots_operations():
+    """Test operacji CRUD na tabeli lots (ta sama logika, bezpieczniejsze wykonanie)."""
+    from db.lots import (get_available_quantity, get_lot, get_lots_by_ticker, get_lots_stats,
+                         update_lot_quantity)
+    results = {
+        'table_exists': False,
+        'insert_test': False,
+        'get_test': False,
+        'quantity_test': False,
+        'fifo_test': False,
+        'update_test': False,
+        'stats_test': False
+    }
+
+    # import struktury
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return results
+
+    lot_id = None
+
+    # 1) Utwórz tabelę i wyczyść dane testowe AAPL
+    conn = get_connection()
+    if conn:
+        try:
+            results['table_exists'] = bool(structure.create_lots_table(conn))
+            cur = conn.cursor()
+            cur.execute("DELETE FROM lots WHERE ticker = ?", ('AAPL',))
+            conn.commit()
+        except Exception as e:
+            st.error(f"Błąd przygotowania testu lots: {e}")
+            results['table_exists'] = False
+            try: conn.rollback()
+            except Exception: pass
+        finally:
+            try: conn.close()
+            except Exception: pass
+
+    # 2) INSERT pierwszego lota
+    if results['table_exists']:
+        conn = get_connection()
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    INSERT INTO lots (
+                        ticker, quantity_total, quantity_open, buy_price_usd,
+                        broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, ('AAPL', 100, 100, 150.50, 1.0, 0.5, '2025-01-15', 4.2345, 640.0))
+                lot_id = cur.lastrowid
+                conn.commit()
+                results['insert_test'] = lot_id is not None
+            except Exception as e:
+                st.error(f"Błąd INSERT (lots #1): {e}")
+                results['insert_test'] = False
+                try: conn.rollback()
+                except Exception: pass
+            finally:
+                try: conn.close()
+                except Exception: pass
+
+    # 3) GET
+    if results['insert_test'] and lot_id is not None:
+        lot = get_lot(lot_id)
+        results['get_test'] = (lot is not None and lot.get('ticker') == 'AAPL')
+
+    # 4) SUMA dostępnych
+    if results['get_test']:
+        available = get_available_quantity('AAPL')
+        results['quantity_test'] = (available == 100)
+
+    # 5) FIFO – dodaj drugi lot i sprawdź kolejność
+    if results['quantity_test']:
+        conn = get_connection()
+        if conn:
+            try:
+                cur = conn.cursor()
+                cur.execute("""
+                    INSERT INTO lots (
+                        ticker, quantity_total, quantity_open, buy_price_usd,
+                        broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, ('AAPL', 50, 50, 155.00, 1.0, 0.5, '2025-01-16', 4.2500, 330.0))
+                conn.commit()
+            except Exception as e:
+                st.error(f"Błąd INSERT (lots #2): {e}")
+                try: conn.rollback()
+                except Exception: pass
+            finally:
+                try: conn.close()
+                except Exception: pass
+
+        lots = get_lots_by_ticker('AAPL', only_open=True)
+        results['fifo_test'] = (len(lots) >= 2 and lots[0]['buy_date'] <= lots[1]['buy_date'])
+
+    # 6) UPDATE quantity_open na 75 dla pierwszego lota
+    if results['fifo_test'] and lot_id is not None:
+        results['update_test'] = update_lot_quantity(lot_id, 75)
+
+    # 7) STATS
+    if results['update_test']:
+        stats = get_lots_stats()
+        results['stats_test'] = bool(stats and stats.get('total_lots', 0) >= 2)
+
+    return results
+
+
+# ================================
+# OPERACJE STOCK_TRADES (uproszczone)
+# ================================
+
+def test_stock_trades_operations():
+    """Test operacji sprzedaży FIFO (uczciwy: bez udawania sprzedaży, bo brak implementacji sell)."""
+    from db.lots import get_lots_by_ticker
+    results = {
+        'tables_exist': False,
+        'setup_lots': False,
+        'sell_test': False,       # zostaje False – brak realnej funkcji sprzedaży
+        'fifo_test': False,
+        'get_trade_test': False   # zostaje False – brak zapisu trade do tabeli
+    }
+
+    # 1) Utwórz wymagane tabele i wyczyść dane testowe dla MSFT
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return results
+
+    conn = get_connection()
+    if not conn:
+        return results
+
+    try:
+        cur = conn.cursor()
+        results['tables_exist'] = bool(
+            structure.create_stock_trades_table(conn) and
+            structure.create_stock_trade_splits_table(conn)
+        )
+
+        # Wyczyść poprzednie dane testowe
+        cur.execute("DELETE FROM stock_trades WHERE ticker = ?", ('MSFT',))
+        cur.execute("DELETE FROM lots WHERE ticker = ?", ('MSFT',))
+        conn.commit()
+    except Exception as e:
+        try: conn.rollback()
+        except Exception: pass
+        st.error(f"Błąd przygotowania testu stock_trades: {e}")
+        results['tables_exist'] = False
+    finally:
+        try: conn.close()
+        except Exception: pass
+
+    if not results['tables_exist']:
+        return results
+
+    # 2) Dodaj dwa LOT-y dla MSFT do testu FIFO
+    lot1_id = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return results
+        cur = conn.cursor()
+
+        # LOT #1 – starszy
+        cur.execute("""
+            INSERT INTO lots (
+                ticker, quantity_total, quantity_open, buy_price_usd,
+                broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ('MSFT', 100, 100, 300.00, 1.0, 0.5, '2025-01-10', 4.00, 120000.0))
+        lot1_id = cur.lastrowid
+
+        # LOT #2 – młodszy
+        cur.execute("""
+            INSERT INTO lots (
+                ticker, quantity_total, quantity_open, buy_price_usd,
+                broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, ('MSFT', 50, 50, 310.00, 1.0, 0.5, '2025-01-12', 4.05, 62000.0))
+
+        conn.commit()
+        results['setup_lots'] = lot1_id is not None
+    except Exception as e:
+        try: conn.rollback()
+        except Exception: pass
+        st.error(f"Błąd wstawiania LOT-ów MSFT: {e}")
+        results['setup_lots'] = False
+    finally:
+        try: conn.close()
+        except Exception: pass
+
+    # 3) Weryfikacja FIFO – kolejność LOT-ów po buy_date,id
+    if results['setup_lots']:
+        lots = get_lots_by_ticker('MSFT', only_open=True)
+        results['fifo_test'] = (len(lots) >= 2 and lots[0]['buy_date'] <= lots[1]['buy_date'])
+
+    # 4) Brak implementacji realnej sprzedaży i zapisu do stock_trades:
+    #    - sell_test pozostaje False
+    #    - get_trade_test pozostaje False
+
+    return results
+
+# ================================
+# TEST OSTATNICH TABEL
+# ================================
+
+def test_final_tables_operations():
+    """Test operacji na ostatnich tabelach (ta sama logika, bezpieczniejsze wykonanie)."""
+    results = {
+        'options_cc_table': False,
+        'dividends_table': False,
+        'market_prices_table': False,
+        'options_insert': False,
+        'dividends_insert': False,
+        'market_prices_insert': False,
+        'schema_complete': False
+    }
+
+    # Import struktury
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return results
+
+    conn = get_connection()
+    if not conn:
+        return results
+
+    try:
+        cur = conn.cursor()
+
+        # Utwórz wymagane tabele
+        results['options_cc_table'] = bool(structure.create_options_cc_table(conn))
+        results['dividends_table'] = bool(structure.create_dividends_table(conn))
+        results['market_prices_table'] = bool(structure.create_market_prices_table(conn))
+
+        # Wyczyść ewentualne stare dane testowe AAPL
+        cur.execute("DELETE FROM options_cc   WHERE ticker = ?", ('AAPL',))
+        cur.execute("DELETE FROM dividends    WHERE ticker = ?", ('AAPL',))
+        cur.execute("DELETE FROM market_prices WHERE ticker = ?", ('AAPL',))
+        conn.commit()
+
+        # INSERT: options_cc
+        if results['options_cc_table']:
+            try:
+                cur.execute("""
+                    INSERT INTO options_cc (
+                        ticker, contracts, strike_usd, premium_sell_usd,
+                        open_date, expiry_date, fx_open, premium_sell_pln
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, ('AAPL', 1, 180.0, 2.50, '2025-01-15', '2025-02-21', 4.2500, 10.63))
+                results['options_insert'] = True
+            except Exception as e:
+                st.error(f"Błąd wstawiania options_cc: {e}")
+
+        # INSERT: dividends
+        if results['dividends_table']:
+            try:
+                cur.execute("""
+                    INSERT INTO dividends (
+                        ticker, gross_usd, date_paid, fx_rate,
+                        gross_pln, wht_15_pln, tax_4_pln, net_pln
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """, ('AAPL', 0.25, '2025-01-15', 4.2500, 1.06, 0.16, 0.04, 0.86))
+                results['dividends_insert'] = True
+            except Exception as e:
+                st.error(f"Błąd wstawiania dividends: {e}")
+
+        # INSERT: market_prices
+        if results['market_prices_table']:
+            try:
+                cur.execute("""
+                    INSERT INTO market_prices (ticker, date, price_usd)
+                    VALUES (?, ?, ?)
+                """, ('AAPL', '2025-01-15', 185.50))
+                results['market_prices_insert'] = True
+            except Exception as e:
+                st.error(f"Błąd wstawiania market_prices: {e}")
+
+        # Zatwierdź inserty
+        conn.commit()
+
+        # Sprawdzenie kompletności schematu (jak w Twojej wersji)
+        if results['options_cc_table'] and results['dividends_table'] and results['market_prices_table']:
+            try:
+                schema_info = structure.get_database_schema_info(conn)
+                expected_tables = [
+                    'fx_rates', 'cashflows', 'lots', 'stock_trades',
+                    'stock_trade_splits', 'options_cc', 'dividends', 'market_prices'
+                ]
+                results['schema_complete'] = all(table in schema_info for table in expected_tables)
+            except Exception as e:
+                st.error(f"Błąd odczytu schematu bazy: {e}")
+                results['schema_complete'] = False
+
+        return results
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        st.error(f"Błąd testów finalnych tabel: {e}")
+        return results
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+# ================================
+# PODSUMOWANIE BAZY DANYCH
+# ================================
+
+def get_database_summary():
+    """Pobranie podsumowania całej bazy danych (ta sama logika, bezpieczniej)."""
+    default = {
+        'total_tables': 0,
+        'total_records': 0,
+        'tables': {}
+    }
+
+    try:
+        import structure
+    except Exception as e:
+        st.error(f"Błąd importu modułu 'structure': {e}")
+        return default
+
+    conn = get_connection()
+    if not conn:
+        return default
+
+    try:
+        schema_info = structure.get_database_schema_info(conn) or {}
+    except Exception as e:
+        st.error(f"Błąd podsumowania bazy: {e}")
+        return default
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    try:
+        total_tables = len(schema_info)
+        total_records = sum(int(info.get('records', 0) or 0) for info in schema_info.values())
+    except Exception:
+        total_tables = 0
+        total_records = 0
+
+    return {
+        'total_tables': total_tables,
+        'total_records': total_records,
+        'tables': schema_info
+    }
+
+
+def test_cc_save_operations():
+    """Test operacji zapisu CC (bez skutków ubocznych). Sprawdza wywoływalność i podstawowe zwroty."""
+    from db.options import get_covered_calls_summary, save_covered_call_to_database
+    results = {
+        'save_function_test': False,     # czy save_covered_call_to_database jest callable
+        'summary_function_test': False,  # czy get_covered_calls_summary jest callable
+        'rollback_test': False,          # czy summary zwraca listę (brak wyjątków)
+        'details': {}
+    }
+
+    try:
+        # 1) callable checks
+        results['save_function_test'] = callable(save_covered_call_to_database)
+        results['summary_function_test'] = callable(get_covered_calls_summary)
+
+        # 2) pobierz listę CC (może być pusta)
+        cc_list = get_covered_calls_summary()
+        results['rollback_test'] = isinstance(cc_list, list)
+        results['details']['cc_count'] = len(cc_list) if isinstance(cc_list, list) else None
+
+        # 3) szybkie filtry (nie zapisują, tylko czytają)
+        #    defensywnie: jeśli pusto, to test i tak przejdzie (ma nie rzucać wyjątków)
+        _ = get_covered_calls_summary(status='open')
+        _ = get_covered_calls_summary(status='expired')
+
+        # 4) format pierwszego rekordu (jeśli jest)
+        if isinstance(cc_list, list) and cc_list:
+            sample = cc_list[0]
+            # wymagane klucze z get_covered_calls_summary
+            expected_keys = {
+                'id','ticker','contracts','strike_usd','premium_sell_usd',
+                'open_date','expiry_date','status','fx_open','premium_sell_pln',
+                'premium_buyback_pln','pl_pln','created_at'
+            }
+            results['details']['sample_has_all_keys'] = expected_keys.issubset(set(sample.keys()))
+
+    except Exception as e:
+        try:
+            if 'st' in globals():
+                globals()['st'].error(f"Błąd testów CC save: {e}")
+        except Exception:
+            pass
+
+    return results
+
+
+def debug_cc_restrictions(ticker):
+    """
+    Funkcja diagnostyczna do debugowania blokad CC (read-only, bez skutków ubocznych).
+    Pokazuje:
+      - LOT-y (quantity_total, quantity_open)
+      - otwarte CC as-of dziś
+      - faktyczne rezerwacje z cc_lot_mappings (fallback: options_cc_reservations)
+      - sumy i dostępne do sprzedaży
+    """
+    import sqlite3
+    from datetime import date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return "Brak połączenia z bazą"
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        t = str(ticker).upper().strip()
+        today = _date.today().isoformat()
+
+        print(f"\n🔍 DIAGNOSTYKA CC dla {t} (as-of {today}):")
+
+        # 1) LOT-y
+        cur.execute("""
+            SELECT id, quantity_total, quantity_open, buy_date
+            FROM lots
+            WHERE UPPER(ticker) = ?
+            ORDER BY buy_date, id
+        """, (t,))
+        lots = cur.fetchall() or []
+        print(f"📦 LOT-y ({len(lots)}):")
+        for r in lots:
+            print(f"   LOT #{r['id']}: open {r['quantity_open']}/{r['quantity_total']} (buy {r['buy_date']})")
+        total_open = sum(int(r["quantity_open"] or 0) for r in lots)
+        print(f"   📊 SUMA quantity_open: {total_open}")
+
+        # 2) Otwarte CC (as-of dziś)
+        cur.execute("""
+            SELECT id, contracts, status, open_date, expiry_date, close_date, strike_usd
+            FROM options_cc
+            WHERE UPPER(ticker) = ?
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+              AND status = 'open'
+            ORDER BY open_date, id
+        """, (t, today, today))
+        open_cc = cur.fetchall() or []
+        print(f"🔓 OTWARTE CC (as-of dziś) ({len(open_cc)}):")
+        for cc in open_cc:
+            shares = int(cc["contracts"] or 0) * 100
+            print(f"   CC #{cc['id']}: {cc['contracts']} contracts = {shares} shares, "
+                  f"status='{cc['status']}', open={cc['open_date']}, expiry={cc['expiry_date']}")
+
+        # 3) Rezerwacje per LOT z cc_lot_mappings (fallback: options_cc_reservations)
+        cur.execute("""
+            SELECT m.lot_id, COALESCE(SUM(m.shares_reserved),0) AS reserved
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE UPPER(cc.ticker) = ?
+              AND cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+              AND cc.status = 'open'
+            GROUP BY m.lot_id
+            ORDER BY m.lot_id
+        """, (t, today, today))
+        lot_res_rows = cur.fetchall() or []
+        lot_reserved_map = {int(r["lot_id"]): int(r["reserved"] or 0) for r in lot_res_rows}
+        reserved_total = sum(lot_reserved_map.values())
+
+        if reserved_total == 0:
+            # fallback — options_cc_reservations
+            cur.execute("""
+                SELECT r.lot_id, COALESCE(SUM(r.qty_reserved),0) AS reserved
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                WHERE UPPER(cc.ticker) = ?
+                  AND cc.open_date <= ?
+                  AND (cc.close_date IS NULL OR cc.close_date > ?)
+                  AND cc.status = 'open'
+                GROUP BY r.lot_id
+                ORDER BY r.lot_id
+            """, (t, today, today))
+            lot_res_rows = cur.fetchall() or []
+            lot_reserved_map = {int(r["lot_id"]): int(r["reserved"] or 0) for r in lot_res_rows}
+            reserved_total = sum(lot_reserved_map.values())
+
+        print(f"🧷 REZERWACJE per LOT ({len(lot_reserved_map)}):")
+        for lot_id, qty in lot_reserved_map.items():
+            print(f"   LOT #{lot_id}: reserved {qty}")
+
+        # 4) Rezerwacje per CC (żeby wiedzieć, co blokuje)
+        cur.execute("""
+            SELECT cc.id AS cc_id,
+                   cc.contracts,
+                   cc.strike_usd,
+                   cc.expiry_date,
+                   cc.open_date,
+                   COALESCE(SUM(m.shares_reserved),0) AS shares_reserved
+            FROM options_cc cc
+            LEFT JOIN cc_lot_mappings m ON m.cc_id = cc.id
+            WHERE UPPER(cc.ticker) = ?
+              AND cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+              AND cc.status = 'open'
+            GROUP BY cc.id, cc.contracts, cc.strike_usd, cc.expiry_date, cc.open_date
+            ORDER BY cc.open_date, cc.id
+        """, (t, today, today))
+        per_cc = cur.fetchall() or []
+
+        # jeśli mappings puste → fallback do options_cc_reservations
+        if not per_cc or all(int(r["shares_reserved"] or 0) == 0 for r in per_cc):
+            cur.execute("""
+                SELECT cc.id AS cc_id,
+                       cc.contracts,
+                       cc.strike_usd,
+                       cc.expiry_date,
+                       cc.open_date,
+                       COALESCE(SUM(r.qty_reserved),0) AS shares_reserved
+                FROM options_cc cc
+                LEFT JOIN options_cc_reservations r ON r.cc_id = cc.id
+                WHERE UPPER(cc.ticker) = ?
+                  AND cc.open_date <= ?
+                  AND (cc.close_date IS NULL OR cc.close_date > ?)
+                  AND cc.status = 'open'
+                GROUP BY cc.id, cc.contracts, cc.strike_usd, cc.expiry_date, cc.open_date
+                ORDER BY cc.open_date, cc.id
+            """, (t, today, today))
+            per_cc = cur.fetchall() or []
+
+        print(f"🎯 REZERWACJE per CC ({len(per_cc)}):")
+        for r in per_cc:
+            contracts = int(r["contracts"] or 0)
+            shares_reserved = int(r["shares_reserved"] or 0)
+            print(f"   CC #{r['cc_id']}: {contracts}x ({contracts*100} sh) → reserved={shares_reserved}, "
+                  f"open={r['open_date']}, exp={r['expiry_date']}, strike={r['strike_usd']}")
+
+        # 5) Podsumowanie dostępności
+        available = total_open - reserved_total
+        if available < 0:
+            available = 0
+        print(f"📊 PODSUMOWANIE: total_open={total_open}, reserved_total={reserved_total}")
+        print(f"✅ DOSTĘPNE DO SPRZEDAŻY: {available}")
+
+        return "OK - szczegóły w konsoli"
+
+    except Exception as e:
+        return f"Błąd diagnostyki: {e}"
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def get_reservations_diagnostics():
+    """
+    Diagnostyka rezerwacji pod otwarte CC (as-of dziś):
+      - per ticker: required_reserved (kontrakty*100) vs actual_reserved (z tabel rezerwacji),
+      - per CC: oczekiwana rezerwa vs zmapowana w cc_lot_mappings (fallback: options_cc_reservations).
+    Dane z audytu rezerwacji (db.reservation_audit) - kilka zapytań zbiorowych.
+
+    Zwraca dict:
+      {
+        'success': True,
+        'has_cc_lot_mappings': bool,
+        'has_options_cc_reservations': bool,
+        'tickers': [{'ticker','required_reserved','actual_reserved','delta'}...],
+        'ccs': [{
+            'id','ticker','open_date',
+            'expected_reserved',
+            'mapped_reserved': int,
+            'mapped_details': [{'lot_id','qty_reserved'}...]
+        }...],
+        'discrepancies': [...]  # pełna lista z audytu
+      }
+    """
+    from db.reservation_audit import audit_cc_reservations
+
+    report = audit_cc_reservations()
+    if not report['success']:
+        return {'success': False, 'message': f"Błąd diagnostyki: {report['message']}",
+                'has_cc_lot_mappings': False, 'has_options_cc_reservations': False}
+
+    # Obie tabele rezerwacyjne gwarantuje migracja schematu (schema_migrations)
+    out = {
+        'success': True,
+        'has_cc_lot_mappings': True,
+        'has_options_cc_reservations': True,
+        'tickers': [],
+        'ccs': [],
+        'discrepancies': report['discrepancies']
+    }
+
+    # CC faktycznie otwarte as-of dziś (ccs z audytu są w kolejności open_date, id)
+    active = [cc for cc in report['ccs'].values() if cc['active_today']]
+
+    per_ticker = {}
+    for cc in active:
+        totals = per_ticker.setdefault(cc['ticker'], [0, 0, 0])
+        totals[0] += cc['expected_reserved']
+        totals[1] += cc['mapped_reserved']
+        totals[2] += cc['legacy_reserved']
+
+    for t, (required, mapped, legacy) in sorted(per_ticker.items()):
+        # fallback do options_cc_reservations, gdy ticker nie ma mapowań
+        actual = mapped or legacy
+        out['tickers'].append({
+            'ticker': t,
+            'required_reserved': required,
+            'actual_reserved': actual,
+            'delta': actual - required
+        })
+
+    for cc in active:
+        use_mapped = cc['mapped_reserved'] > 0
+        out['ccs'].append({
+            'id': cc['id'],
+            'ticker': cc['ticker'],
+            'open_date': cc['open_date'],
+            'expected_reserved': cc['expected_reserved'],
+            'mapped_reserved': cc['mapped_reserved'] if use_mapped else cc['legacy_reserved'],
+            'mapped_details': cc['mapped_details'] if use_mapped else cc['legacy_details']
+        })
+
+    return out
+
+
+def check_cc_cashflow_integrity():
+    """
+    Sprawdza integralność między CC a cashflow
+    """
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'issues': ['Brak połączenia z bazą']}
+        
+        cursor = conn.cursor()
+        issues = []
+        
+        # 1. CC bez cashflow
+        cursor.execute("""
+            SELECT id, ticker, status FROM options_cc o
+            WHERE NOT EXISTS (
+                SELECT 1 FROM cashflows c 
+                WHERE c.ref_table = 'options_cc' AND c.ref_id = o.id
+            )
+        """)
+        
+        cc_without_cashflow = cursor.fetchall()
+        for cc_id, ticker, status in cc_without_cashflow:
+            issues.append(f"CC #{cc_id} ({ticker}) nie ma cashflow")
+        
+        # 2. Cashflow bez CC
+        cursor.execute("""
+            SELECT c.id, c.description FROM cashflows c
+            WHERE c.ref_table = 'options_cc' 
+            AND c.ref_id NOT IN (SELECT id FROM options_cc)
+        """)
+        
+        cashflow_without_cc = cursor.fetchall()
+        for cf_id, description in cashflow_without_cc:
+            issues.append(f"Cashflow #{cf_id} ({description}) nie ma CC")
+        
+        # 3. Bought back CC bez 2 cashflow
+        cursor.execute("""
+            SELECT o.id, o.ticker, COUNT(c.id) as cf_count
+            FROM options_cc o
+            LEFT JOIN cashflows c ON c.ref_table = 'options_cc' AND c.ref_id = o.id
+            WHERE o.status = 'bought_back'
+            GROUP BY o.id, o.ticker
+            HAVING COUNT(c.id) != 2
+        """)
+        
+        bought_back_issues = cursor.fetchall()
+        for cc_id, ticker, cf_count in bought_back_issues:
+            issues.append(f"CC #{cc_id} ({ticker}) bought_back ma {cf_count} cashflow (powinno być 2)")
+        
+        conn.close()
+        
+        return {'issues': issues}
+        
+    except Exception as e:
+        return {'issues': [f'Błąd sprawdzania integralności: {str(e)}']}
+
+
+
+
+
+
+
+# Test na końcu pliku (opcjonalny)
+if __name__ == "__main__":
+    print("Test funkcji buyback/expiry...")
+    results = test_buyback_expiry_operations()
+    
+    for test_name, result in results.items():
+        status = "✅" if result else "❌"
+        print(f"{status} {test_name}")
@@ -0,0 +1,959 @@
+"""
+Kursy walut NBP: indeks kursów w pamięci, CRUD fx_rates, luki i punkty kontrolne backfillu
+"""
+
+import sqlite3
+from datetime import datetime as _dt
+from datetime import date as _date
+from datetime import timedelta as _timedelta
+import bisect
+import threading
+import time
+from db import get_connection
+
+
+def get_fx_refresh_watermark():
+    """
+    Odczyt znacznika odświeżania kursów NBP z app_info (ostatni rekord)
+
+    Returns:
+        dict: {'refreshed_at', 'covered_through', 'status'} (wartości None gdy brak)
+    """
+    result = {'refreshed_at': None, 'covered_through': None, 'status': None}
+
+    conn = get_connection()
+    if not conn:
+        return result
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT fx_refreshed_at, fx_covered_through, fx_refresh_status
+            FROM app_info
+            ORDER BY id DESC
+            LIMIT 1
+        """)
+        row = cur.fetchone()
+        if row:
+            result = {
+                'refreshed_at': row['fx_refreshed_at'],
+                'covered_through': row['fx_covered_through'],
+                'status': row['fx_refresh_status'],
+            }
+        return result
+
+    except sqlite3.OperationalError:
+        # Kolumny jeszcze nie dodane (migracje nie były uruchomione)
+        return result
+
+    except Exception as e:
+        print(f"⚠️ FX_WATERMARK: błąd odczytu: {e}")
+        return result
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def set_fx_refresh_watermark(refreshed_at, covered_through, status='ok'):
+    """
+    Zapis znacznika odświeżania kursów NBP do app_info (ostatni rekord).
+    Bez komunikatów Streamlit - wołane z wątku w tle.
+
+    Returns:
+        bool: True jeśli zapisano
+    """
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            UPDATE app_info
+            SET fx_refreshed_at = ?, fx_covered_through = ?, fx_refresh_status = ?
+            WHERE id = (SELECT MAX(id) FROM app_info)
+        """, (
+            refreshed_at.isoformat(timespec="seconds") if hasattr(refreshed_at, 'isoformat') else refreshed_at,
+            _fx_date_str(covered_through) if covered_through else None,
+            status,
+        ))
+        conn.commit()
+        return cur.rowcount > 0
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print(f"⚠️ FX_WATERMARK: błąd zapisu: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# ================================
+# INDEKS KURSÓW FX W PAMIĘCI
+# ================================
+# Jeden indeks na proces: per waluta posortowana lista dat + równoległe listy
+# kursów/źródeł. Ładowany z fx_rates razem z wersją tabeli z table_versions
+# (trigger, migracja schematu 11) i przeładowywany, gdy wersja w bazie się
+# zmieni - także po zapisie z innego procesu (backfill CLI, wątek NBP).
+# Wersja w bazie sprawdzana najwyżej raz na FX_INDEX_RECHECK_S sekund - odczyty
+# pomiędzy nie dotykają bazy. Własne zapisy insert_fx_rate / insert_fx_rates_rows
+# / delete_fx_rate łatają indeks w miejscu, jeśli przed zapisem był aktualny.
+
+FX_INDEX_RECHECK_S = 5.0
+
+_fx_index = None
+_fx_index_version = None
+_fx_index_checked_at = 0.0
+_fx_index_lock = threading.RLock()
+
+def _fx_rates_version(cur):
+    """Licznik zapisów fx_rates z table_versions, None gdy baza sprzed migracji 11"""
+    try:
+        row = cur.execute(
+            "SELECT version FROM table_versions WHERE table_name = 'fx_rates'"
+        ).fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return int(row[0]) if row else None
+
+def _fx_date_str(value):
+    """Normalizacja daty do 'YYYY-MM-DD' (None gdy typ nieobsługiwany)"""
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str):
+        return value[:10]
+    return None
+
+def _load_fx_index():
+    """Wczytanie całej tabeli fx_rates do indeksu: (indeks, wersja) lub (None, None)"""
+    index = {}
+    conn = get_connection()
+    if not conn:
+        return None, None
+
+    try:
+        cur = conn.cursor()
+        # Wersja przed danymi: zapis pomiędzy da najwyżej zbędne przeładowanie
+        version = _fx_rates_version(cur)
+        cur.execute("""
+            SELECT date, code, rate, source, created_at
+            FROM fx_rates
+            ORDER BY code, date
+        """)
+        for row in cur.fetchall():
+            entry = index.setdefault(row['code'], {
+                'dates': [], 'rates': [], 'sources': [], 'created': []
+            })
+            entry['dates'].append(str(row['date'])[:10])
+            entry['rates'].append(float(row['rate']))
+            entry['sources'].append(row['source'])
+            entry['created'].append(row['created_at'])
+        return index, version
+
+    except Exception as e:
+        print(f"⚠️ FX_INDEX: nie udało się wczytać fx_rates: {e}")
+        return None, None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def _get_fx_index():
+    """
+    Zwraca indeks (ładuje przy pierwszym użyciu lub po zmianie wersji fx_rates
+    w bazie), None gdy baza niedostępna
+    """
+    global _fx_index, _fx_index_version, _fx_index_checked_at
+    with _fx_index_lock:
+        if _fx_index is not None and time.monotonic() - _fx_index_checked_at < FX_INDEX_RECHECK_S:
+            return _fx_index
+
+    current = None
+    if _fx_index is not None:
+        conn = get_connection()
+        if conn:
+            try:
+                current = _fx_rates_version(conn.cursor())
+            finally:
+                conn.close()
+    with _fx_index_lock:
+        if _fx_index is None or (current is not None and current != _fx_index_version):
+            _fx_index, _fx_index_version = _load_fx_index()
+        _fx_index_checked_at = time.monotonic()
+        return _fx_index
+
+def invalidate_fx_index():
+    """Unieważnia indeks - zostanie przeładowany przy kolejnym odczycie"""
+    global _fx_index, _fx_index_version
+    with _fx_index_lock:
+        _fx_index = None
+        _fx_index_version = None
+
+def _fx_index_advance(before, after):
+    """
+    Po własnym zapisie (wersje fx_rates przed/po w tej samej transakcji): True
+    gdy indeks był aktualny i można go załatać; inaczej unieważnienie.
+    Wołać pod _fx_index_lock razem z łataniem.
+    """
+    global _fx_index, _fx_index_version
+    if _fx_index is None:
+        return False
+    if before != _fx_index_version:
+        _fx_index = None
+        _fx_index_version = None
+        return False
+    _fx_index_version = after
+    return True
+
+def _fx_index_put(date_str, code, rate, source, keep_manual=False):
+    """Wstawienie/nadpisanie kursu w załadowanym indeksie"""
+    with _fx_index_lock:
+        if _fx_index is None:
+            return
+        entry = _fx_index.setdefault(code, {
+            'dates': [], 'rates': [], 'sources': [], 'created': []
+        })
+        created = _dt.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+        pos = bisect.bisect_left(entry['dates'], date_str)
+        if pos < len(entry['dates']) and entry['dates'][pos] == date_str:
+            if keep_manual and entry['sources'][pos] == 'MANUAL':
+                return
+            entry['rates'][pos] = float(rate)
+            entry['sources'][pos] = source
+            entry['created'][pos] = created
+        else:
+            entry['dates'].insert(pos, date_str)
+            entry['rates'].insert(pos, float(rate))
+            entry['sources'].insert(pos, source)
+            entry['created'].insert(pos, created)
+
+def _fx_index_remove(date_str, code):
+    """Usunięcie kursu z załadowanego indeksu"""
+    with _fx_index_lock:
+        if _fx_index is None or code not in _fx_index:
+            return
+        entry = _fx_index[code]
+        pos = bisect.bisect_left(entry['dates'], date_str)
+        if pos < len(entry['dates']) and entry['dates'][pos] == date_str:
+            for key in ('dates', 'rates', 'sources', 'created'):
+                del entry[key][pos]
+
+def _fx_index_entry(entry, pos, code):
+    return {
+        'date': entry['dates'][pos],
+        'code': code,
+        'rate': entry['rates'][pos],
+        'source': entry['sources'][pos],
+        'created_at': entry['created'][pos],
+    }
+
+def fx_index_get(date, code='USD'):
+    """
+    Kurs z indeksu dla dokładnej daty
+
+    Returns:
+        dict | None: jak get_fx_rate; False gdy indeks niedostępny
+    """
+    index = _get_fx_index()
+    date_str = _fx_date_str(date)
+    if index is None or date_str is None:
+        return False
+
+    code_norm = (code or '').upper().strip()
+    with _fx_index_lock:
+        entry = index.get(code_norm)
+        if not entry:
+            return None
+        pos = bisect.bisect_left(entry['dates'], date_str)
+        if pos < len(entry['dates']) and entry['dates'][pos] == date_str:
+            return _fx_index_entry(entry, pos, code_norm)
+        return None
+
+def fx_index_on_or_before(date, code='USD'):
+    """
+    Najnowszy kurs z datą <= date (binary search); date=None → najnowszy w ogóle
+
+    Returns:
+        dict | None: jak get_latest_fx_rate; False gdy indeks niedostępny
+    """
+    index = _get_fx_index()
+    if index is None:
+        return False
+
+    code_norm = (code or '').upper().strip()
+    with _fx_index_lock:
+        entry = index.get(code_norm)
+        if not entry or not entry['dates']:
+            return None
+        if date is None:
+            pos = len(entry['dates']) - 1
+        else:
+            date_str = _fx_date_str(date)
+            if date_str is None:
+                return False
+            pos = bisect.bisect_right(entry['dates'], date_str) - 1
+        if pos < 0:
+            return None
+        return _fx_index_entry(entry, pos, code_norm)
+
+def fx_index_d_minus_1(operation_date, code='USD'):
+    """
+    Kurs "na dzień lub przed D-1" dla daty operacji (D-1 = dzień wcześniej)
+
+    Returns:
+        dict | None: najbliższy kurs <= D-1; False gdy indeks niedostępny
+    """
+    if isinstance(operation_date, str):
+        operation_date = _dt.strptime(operation_date[:10], '%Y-%m-%d').date()
+    return fx_index_on_or_before(operation_date - _timedelta(days=1), code)
+
+# ================================
+# OPERACJE CRUD DLA FX_RATES
+# ================================
+
+def insert_fx_rate(date, code='USD', rate=None, source='NBP'):
+    """Dodanie kursu waluty do bazy (INSERT OR REPLACE)"""
+    # Walidacje bez zmiany logiki zwracania
+    if rate is None:
+        import streamlit as st
+        st.error("Kurs waluty jest wymagany")
+        return False
+    try:
+        rate = float(rate)
+        if rate <= 0:
+            import streamlit as st
+            st.error("Kurs waluty musi być dodatni")
+            return False
+    except Exception:
+        import streamlit as st
+        st.error("Nieprawidłowa wartość kursu waluty")
+        return False
+
+    # Normalizacja daty do 'YYYY-MM-DD'
+    if hasattr(date, 'strftime'):
+        date_str = date.strftime('%Y-%m-%d')
+    elif isinstance(date, str):
+        # akceptuj już sformatowane stringi
+        date_str = date
+    elif isinstance(date, _date):
+        date_str = date.isoformat()
+    else:
+        # fallback — nie zmieniamy logiki, ale sygnalizujemy błąd
+        import streamlit as st
+        st.error("Nieprawidłowy typ daty")
+        return False
+
+    code_norm = (code or '').upper().strip()
+    source_norm = (source or '').strip() or 'NBP'
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        version_before = _fx_rates_version(cur)
+        cur.execute("""
+            INSERT OR REPLACE INTO fx_rates (date, code, rate, source)
+            VALUES (?, ?, ?, ?)
+        """, (date_str, code_norm, rate, source_norm))
+        version_after = _fx_rates_version(cur)
+        conn.commit()
+        with _fx_index_lock:
+            if _fx_index_advance(version_before, version_after):
+                _fx_index_put(date_str[:10], code_norm, rate, source_norm)
+        return True
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        import streamlit as st
+        st.error(f"Błąd dodawania kursu waluty: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_fx_rate(date, code='USD'):
+    """Pobranie kursu waluty na określoną datę (dokładne dopasowanie date+code)"""
+    # Normalizacja daty do 'YYYY-MM-DD'
+    if hasattr(date, 'strftime'):
+        date_str = date.strftime('%Y-%m-%d')
+    elif isinstance(date, _date):
+        date_str = date.isoformat()
+    elif isinstance(date, str):
+        date_str = date
+    else:
+        import streamlit as st
+        st.error("Nieprawidłowy typ daty")
+        return None
+
+    code_norm = (code or '').upper().strip()
+
+    # Najpierw indeks w pamięci (False = indeks niedostępny → zapytanie do bazy)
+    cached = fx_index_get(date_str, code_norm)
+    if cached is not False:
+        return cached
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT date, code, rate, source, created_at
+            FROM fx_rates
+            WHERE date = ? AND code = ?
+            LIMIT 1
+        """, (date_str, code_norm))
+        row = cur.fetchone()
+
+        if not row:
+            return None
+
+        # dzięki row_factory=sqlite3.Row możemy czytać po nazwach
+        return {
+            'date': row['date'],
+            'code': row['code'],
+            'rate': float(row['rate']),
+            'source': row['source'],
+            'created_at': row['created_at'],
+        }
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd pobierania kursu waluty: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_latest_fx_rate(code='USD', before_date=None):
+    """Pobranie najnowszego kursu waluty (opcjonalnie: do podanej daty włącznie)."""
+    code_norm = (code or '').upper().strip()
+
+    # Normalizacja daty (jeśli podana)
+    if before_date is not None:
+        if hasattr(before_date, 'strftime'):
+            before_date_str = before_date.strftime('%Y-%m-%d')
+        elif isinstance(before_date, _date):
+            before_date_str = before_date.isoformat()
+        elif isinstance(before_date, str):
+            before_date_str = before_date
+        else:
+            import streamlit as st
+            st.error("Nieprawidłowy typ before_date")
+            return None
+    else:
+        before_date_str = None
+
+    cached = fx_index_on_or_before(before_date_str, code_norm)
+    if cached is not False:
+        return cached
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+
+        if before_date_str:
+            cur.execute("""
+                SELECT date, code, rate, source, created_at
+                FROM fx_rates
+                WHERE code = ? AND date <= ?
+                ORDER BY date DESC
+                LIMIT 1
+            """, (code_norm, before_date_str))
+        else:
+            cur.execute("""
+                SELECT date, code, rate, source, created_at
+                FROM fx_rates
+                WHERE code = ?
+                ORDER BY date DESC
+                LIMIT 1
+            """, (code_norm,))
+
+        row = cur.fetchone()
+        if not row:
+            return None
+
+        return {
+            'date': row['date'],
+            'code': row['code'],
+            'rate': float(row['rate']),
+            'source': row['source'],
+            'created_at': row['created_at'],
+        }
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd pobierania najnowszego kursu: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def delete_fx_rate(date, code='USD'):
+    """Usunięcie kursu waluty z określonej daty"""
+    # Normalizacja daty do 'YYYY-MM-DD'
+    if hasattr(date, 'strftime'):
+        date_str = date.strftime('%Y-%m-%d')
+    elif isinstance(date, _date):
+        date_str = date.isoformat()
+    elif isinstance(date, str):
+        date_str = date
+    else:
+        import streamlit as st
+        st.error("Nieprawidłowy typ daty")
+        return False
+
+    code_norm = (code or '').upper().strip()
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        version_before = _fx_rates_version(cur)
+        cur.execute("""
+            DELETE FROM fx_rates
+            WHERE date = ? AND code = ?
+        """, (date_str, code_norm))
+
+        rows_affected = cur.rowcount
+        version_after = _fx_rates_version(cur)
+        conn.commit()
+        with _fx_index_lock:
+            if _fx_index_advance(version_before, version_after):
+                _fx_index_remove(date_str[:10], code_norm)
+
+        return rows_affected > 0
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        import streamlit as st
+        st.error(f"Błąd usuwania kursu waluty: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_fx_rates_range(start_date, end_date, code='USD'):
+    """
+    Pobranie wszystkich kursów waluty z zakresu dat (jedno zapytanie)
+
+    Returns:
+        dict: {'YYYY-MM-DD': float} - tylko daty obecne w fx_rates
+    """
+    def _norm(d):
+        if hasattr(d, 'strftime'):
+            return d.strftime('%Y-%m-%d')
+        return str(d)
+
+    code_norm = (code or '').upper().strip()
+    start_str, end_str = _norm(start_date), _norm(end_date)
+
+    index = _get_fx_index()
+    if index is not None:
+        with _fx_index_lock:
+            entry = index.get(code_norm)
+            if not entry:
+                return {}
+            lo = bisect.bisect_left(entry['dates'], start_str)
+            hi = bisect.bisect_right(entry['dates'], end_str)
+            return dict(zip(entry['dates'][lo:hi], entry['rates'][lo:hi]))
+
+    conn = get_connection()
+    if not conn:
+        return {}
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT date, rate
+            FROM fx_rates
+            WHERE code = ? AND date BETWEEN ? AND ?
+            ORDER BY date
+        """, (code_norm, start_str, end_str))
+        return {row['date']: float(row['rate']) for row in cur.fetchall()}
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd pobierania zakresu kursów: {e}")
+        return {}
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# Maksymalna liczba wierszy w jednym INSERT (4 parametry/wiersz, limit 999 w starszym SQLite)
+FX_UPSERT_ROWS_PER_STATEMENT = 240
+
+def insert_fx_rates_bulk(rates, code='USD', source='NBP'):
+    """
+    Zapis wielu kursów jednej waluty jednym wielowierszowym UPSERT-em w jednej transakcji.
+    Ręczne nadpisania (source='MANUAL') nie są zastępowane kursami z API.
+
+    Args:
+        rates: lista (date_str, rate) lub dict {date_str: rate}
+        code: kod waluty
+        source: źródło kursów
+
+    Returns:
+        int: liczba przekazanych do zapisu kursów (0 przy błędzie)
+    """
+    items = list(rates.items()) if isinstance(rates, dict) else list(rates)
+    return insert_fx_rates_rows([(d, code, r) for d, r in items], source)
+
+def insert_fx_rates_rows(rows, source='NBP'):
+    """
+    Zapis kursów wielu walut naraz (np. cała tabela A NBP) w jednej transakcji.
+    Wielowierszowe UPSERT-y po FX_UPSERT_ROWS_PER_STATEMENT wierszy.
+
+    Args:
+        rows: lista (date_str, code, rate)
+        source: źródło kursów
+
+    Returns:
+        int: liczba przekazanych do zapisu kursów (0 przy błędzie)
+    """
+    if not rows:
+        return 0
+
+    source_norm = (source or '').strip() or 'NBP'
+
+    params = []
+    for date_str, code, rate in rows:
+        if hasattr(date_str, 'strftime'):
+            date_str = date_str.strftime('%Y-%m-%d')
+        params.append((date_str, (code or '').upper().strip(), float(rate), source_norm))
+
+    conn = get_connection()
+    if not conn:
+        return 0
+
+    try:
+        cur = conn.cursor()
+        cur.execute("BEGIN IMMEDIATE")
+        version_before = _fx_rates_version(cur)
+        for start in range(0, len(params), FX_UPSERT_ROWS_PER_STATEMENT):
+            batch = params[start:start + FX_UPSERT_ROWS_PER_STATEMENT]
+            placeholders = ", ".join(["(?, ?, ?, ?)"] * len(batch))
+            cur.execute(f"""
+                INSERT INTO fx_rates (date, code, rate, source)
+                VALUES {placeholders}
+                ON CONFLICT(date, code) DO UPDATE SET
+                    rate = excluded.rate,
+                    source = excluded.source
+                WHERE fx_rates.source <> 'MANUAL'
+            """, [value for row in batch for value in row])
+        version_after = _fx_rates_version(cur)
+        conn.commit()
+        with _fx_index_lock:
+            if _fx_index_advance(version_before, version_after):
+                for date_str, code_norm, rate, _ in params:
+                    _fx_index_put(date_str[:10], code_norm, rate, source_norm, keep_manual=True)
+        return len(params)
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        import streamlit as st
+        st.error(f"Błąd zbiorczego zapisu kursów: {e}")
+        return 0
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def find_fx_gaps(start_date, end_date, code='USD'):
+    """
+    Wykrywanie brakujących dni publikacji NBP w fx_rates - jedno zapytanie.
+
+    Rekurencyjne CTE generuje kalendarz dni roboczych (bez weekendów i świąt
+    przekazanych jako JSON), LEFT JOIN z fx_rates wskazuje braki, a funkcje
+    okna (gaps-and-islands) sklejają kolejne brakujące dni robocze w zakresy.
+
+    Args:
+        start_date: Data początkowa
+        end_date: Data końcowa
+        code: Kod waluty
+
+    Returns:
+        list: [(start 'YYYY-MM-DD', end 'YYYY-MM-DD', liczba_dni_roboczych), ...]
+    """
+    import json
+    from utils.business_days import polish_holidays
+
+    start_str, end_str = _fx_date_str(start_date), _fx_date_str(end_date)
+    if not start_str or not end_str or end_str < start_str:
+        return []
+
+    first_year, last_year = int(start_str[:4]), int(end_str[:4])
+    holidays = sorted(
+        d.isoformat()
+        for year in range(first_year, last_year + 1)
+        for d in polish_holidays(year)
+    )
+
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            WITH RECURSIVE calendar(d) AS (
+                SELECT date(?)
+                UNION ALL
+                SELECT date(d, '+1 day') FROM calendar WHERE d < date(?)
+            ),
+            business_days AS (
+                SELECT d, ROW_NUMBER() OVER (ORDER BY d) AS bd_no
+                FROM calendar
+                WHERE strftime('%w', d) NOT IN ('0', '6')
+                  AND d NOT IN (SELECT value FROM json_each(?))
+            ),
+            missing AS (
+                SELECT b.d, b.bd_no - ROW_NUMBER() OVER (ORDER BY b.d) AS grp
+                FROM business_days b
+                LEFT JOIN fx_rates f ON f.code = ? AND f.date = b.d
+                WHERE f.id IS NULL
+            )
+            SELECT MIN(d) AS gap_start, MAX(d) AS gap_end, COUNT(*) AS days
+            FROM missing
+            GROUP BY grp
+            ORDER BY gap_start
+        """, (start_str, end_str, json.dumps(holidays), (code or '').upper().strip()))
+        return [(row['gap_start'], row['gap_end'], int(row['days'])) for row in cur.fetchall()]
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd wykrywania braków kursów: {e}")
+        return []
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+# ================================
+# PUNKTY KONTROLNE BACKFILLU NBP
+# ================================
+
+def get_fx_backfill_checkpoint(job_key):
+    """
+    Odczyt punktu kontrolnego backfillu
+
+    Returns:
+        dict | None: wiersz fx_backfill_checkpoints
+    """
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        cur.execute("SELECT * FROM fx_backfill_checkpoints WHERE job_key = ?", (job_key,))
+        row = cur.fetchone()
+        return dict(row) if row else None
+
+    except Exception as e:
+        print(f"⚠️ FX_BACKFILL: błąd odczytu checkpointu {job_key}: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def save_fx_backfill_checkpoint(job_key, code, start_date, end_date, next_date,
+                                status='running', requests_made=0, rates_saved=0, last_error=None):
+    """
+    Zapis (UPSERT) punktu kontrolnego backfillu - liczniki są sumowane
+
+    Returns:
+        bool: True jeśli zapisano
+    """
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            INSERT INTO fx_backfill_checkpoints (
+                job_key, code, start_date, end_date, next_date, status,
+                requests, rates_saved, last_error
+            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(job_key) DO UPDATE SET
+                next_date = excluded.next_date,
+                status = excluded.status,
+                requests = fx_backfill_checkpoints.requests + excluded.requests,
+                rates_saved = fx_backfill_checkpoints.rates_saved + excluded.rates_saved,
+                last_error = excluded.last_error,
+                updated_at = CURRENT_TIMESTAMP
+        """, (
+            job_key, (code or '').upper().strip(),
+            _fx_date_str(start_date), _fx_date_str(end_date), _fx_date_str(next_date),
+            status, int(requests_made), int(rates_saved), last_error,
+        ))
+        conn.commit()
+        return True
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        print(f"⚠️ FX_BACKFILL: błąd zapisu checkpointu {job_key}: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_fx_rates_stats():
+    """Pobranie statystyk tabeli fx_rates"""
+    default = {
+        'total_records': 0,
+        'oldest_date': None,
+        'newest_date': None,
+        'currencies_count': 0,
+        'latest_usd_rate': None,
+        'latest_usd_date': None
+    }
+
+    conn = get_connection()
+    if not conn:
+        return default
+
+    try:
+        cur = conn.cursor()
+
+        # Liczba rekordów
+        cur.execute("SELECT COUNT(*) FROM fx_rates")
+        total_count = int(cur.fetchone()[0] or 0)
+
+        # Zakres dat (może zwrócić NULL gdy brak rekordów)
+        cur.execute("SELECT MIN(date) AS oldest, MAX(date) AS newest FROM fx_rates")
+        date_range = cur.fetchone()
+        oldest = date_range['oldest'] if date_range else None
+        newest = date_range['newest'] if date_range else None
+
+        # Liczba unikalnych walut
+        cur.execute("SELECT COUNT(DISTINCT code) FROM fx_rates")
+        currencies_count = int(cur.fetchone()[0] or 0)
+
+        # Najnowszy USD (korzysta z własnego połączenia)
+        latest_usd = get_latest_fx_rate('USD')
+
+        return {
+            'total_records': total_count,
+            'oldest_date': oldest,
+            'newest_date': newest,
+            'currencies_count': currencies_count,
+            'latest_usd_rate': (float(latest_usd['rate']) if latest_usd else None),
+            'latest_usd_date': (latest_usd['date'] if latest_usd else None),
+        }
+
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd pobierania statystyk fx_rates: {e}")
+        return default
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_fx_rate_for_date(target_date):
+    """
+    🎯 WSPÓLNA FUNKCJA pobierania kursu NBP USD/PLN
+    Wykorzystywana we wszystkich buybackach i expiry.
+
+    Args:
+        target_date (str | datetime.date): Data w formacie YYYY-MM-DD lub obiekt date
+
+    Returns:
+        float: Kurs USD/PLN na ten dzień (NBP D-1)
+    """
+    try:
+        import nbp_api_client
+
+        # Ujednolicenie formatu daty
+        if hasattr(target_date, 'strftime'):
+            date_for_nbp = target_date
+        elif isinstance(target_date, str):
+            from datetime import datetime
+            date_for_nbp = datetime.strptime(target_date, '%Y-%m-%d').date()
+        else:
+            date_for_nbp = target_date
+
+        print(f"🔍 FX_RATE: Pobieranie kursu NBP dla {date_for_nbp}")
+
+        # Pobranie kursu przez klienta NBP
+        nbp_result = nbp_api_client.get_usd_rate_for_date(date_for_nbp)
+
+        # Obsługa zwróconego typu
+        if isinstance(nbp_result, dict) and 'rate' in nbp_result:
+            fx_rate = float(nbp_result['rate'])
+            fx_date = nbp_result.get('date', date_for_nbp)
+        else:
+            fx_rate = float(nbp_result) if nbp_result else None
+            fx_date = date_for_nbp
+
+        if fx_rate is None:
+            raise Exception("NBP zwrócił None")
+
+        print(f"💱 FX_RATE: {fx_rate:.4f} na {fx_date}")
+        return fx_rate
+
+    except Exception as e:
+        print(f"❌ FX_RATE: Błąd pobierania kursu: {e}")
+        return None
@@ -0,0 +1,571 @@
+"""
+LOT-y akcji: dostępność, statystyki, podsumowanie portfela, LOT-y do FIFO podatkowego
+"""
+
+import streamlit as st
+from datetime import date as _date
+from typing import List, Dict
+from db import cached_aggregate, get_connection
+
+
+# ================================
+# OPERACJE CRUD DLA LOTS
+# ================================
+
+def get_available_quantity(ticker):
+    """Sprawdzenie dostępnej ilości akcji dla tickera (suma quantity_open)."""
+    # Prosta walidacja / normalizacja
+    if ticker is None:
+        return 0
+    ticker_norm = str(ticker).upper().strip()
+    if not ticker_norm:
+        return 0
+
+    conn = get_connection()
+    if not conn:
+        return 0
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT COALESCE(SUM(quantity_open), 0) AS qty
+            FROM lots
+            WHERE ticker = ?
+        """, (ticker_norm,))
+        row = cur.fetchone()
+        total = int(row[0] or 0) if row else 0
+        return total
+
+    except Exception as e:
+        st.error(f"Błąd sprawdzania dostępności {ticker_norm}: {e}")
+        return 0
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_lot(lot_id):
+    """Pobranie pojedynczego LOT-a po ID"""
+    # Walidacja ID
+    try:
+        lot_id_int = int(lot_id)
+        if lot_id_int <= 0:
+            return None
+    except Exception:
+        return None
+
+    conn = get_connection()
+    if not conn:
+        return None
+
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, ticker, quantity_total, quantity_open, buy_price_usd,
+                   broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln,
+                   created_at, updated_at
+            FROM lots
+            WHERE id = ?
+        """, (lot_id_int,))
+        row = cur.fetchone()
+        if not row:
+            return None
+
+        return {
+            'id': row['id'],
+            'ticker': row['ticker'],
+            'quantity_total': row['quantity_total'],
+            'quantity_open': row['quantity_open'],
+            'buy_price_usd': (float(row['buy_price_usd']) if row['buy_price_usd'] is not None else None),
+            'broker_fee_usd': (float(row['broker_fee_usd']) if row['broker_fee_usd'] is not None else None),
+            'reg_fee_usd': (float(row['reg_fee_usd']) if row['reg_fee_usd'] is not None else None),
+            'buy_date': row['buy_date'],
+            'fx_rate': (float(row['fx_rate']) if row['fx_rate'] is not None else None),
+            'cost_pln': (float(row['cost_pln']) if row['cost_pln'] is not None else None),
+            'created_at': row['created_at'],
+            'updated_at': row['updated_at'],
+        }
+
+    except Exception as e:
+        st.error(f"Błąd pobierania LOT-a: {e}")
+        return None
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_lots_by_ticker(ticker, only_open=False, sell_date=None):
+    """
+    Pobierz LOT-y dla tickera z walidacją temporalną (buy_date <= sell_date),
+    opcjonalnym filtrem only_open i sortowaniem FIFO (buy_date ASC, id ASC).
+    """
+    if not ticker:
+        return []
+    ticker_norm = str(ticker).upper().strip()
+    if not ticker_norm:
+        return []
+
+    # Normalizacja sell_date → 'YYYY-MM-DD' (jeśli podany)
+    sell_date_str = None
+    if sell_date is not None:
+        if hasattr(sell_date, 'strftime'):
+            sell_date_str = sell_date.strftime('%Y-%m-%d')
+        elif isinstance(sell_date, _date):
+            sell_date_str = sell_date.isoformat()
+        else:
+            sell_date_str = str(sell_date)
+
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        cur = conn.cursor()
+
+        query = """
+            SELECT id, ticker, quantity_total, quantity_open, buy_price_usd,
+                   broker_fee_usd, reg_fee_usd, buy_date, fx_rate, cost_pln,
+                   created_at, updated_at
+            FROM lots
+            WHERE ticker = ?
+        """
+        params = [ticker_norm]
+
+        if sell_date_str is not None:
+            query += " AND buy_date <= ?"
+            params.append(sell_date_str)
+
+        if only_open:
+            query += " AND quantity_open > 0"
+
+        query += " ORDER BY buy_date ASC, id ASC"
+
+        cur.execute(query, params)
+        rows = cur.fetchall()
+
+        lots = []
+        for row in rows:
+            lots.append({
+                'id': row['id'],
+                'ticker': row['ticker'],
+                'quantity_total': row['quantity_total'],
+                'quantity_open': row['quantity_open'],
+                'buy_price_usd': (float(row['buy_price_usd']) if row['buy_price_usd'] is not None else None),
+                'broker_fee_usd': (float(row['broker_fee_usd']) if row['broker_fee_usd'] is not None else 0.0),
+                'reg_fee_usd': (float(row['reg_fee_usd']) if row['reg_fee_usd'] is not None else 0.0),
+                'buy_date': row['buy_date'],
+                'fx_rate': (float(row['fx_rate']) if row['fx_rate'] is not None else None),
+                'cost_pln': (float(row['cost_pln']) if row['cost_pln'] is not None else None),
+                'created_at': row['created_at'],
+                'updated_at': row['updated_at'],
+            })
+
+        return lots
+
+    except Exception as e:
+        st.error(f"Błąd pobierania LOT-ów z walidacją temporalną: {e}")
+        return []
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass    
+
+def update_lot_quantity(lot_id, new_quantity_open):
+    """Aktualizacja quantity_open LOT-a (bez zmiany logiki)."""
+    # Walidacje wejścia
+    try:
+        lot_id_int = int(lot_id)
+        if lot_id_int <= 0:
+            return False
+    except Exception:
+        return False
+
+    try:
+        new_qty = int(new_quantity_open)
+    except Exception:
+        st.error(f"Nieprawidłowa ilość: {new_quantity_open}")
+        return False
+    if new_qty < 0:
+        st.error(f"Nieprawidłowa ilość: {new_quantity_open}")
+        return False
+
+    conn = get_connection()
+    if not conn:
+        return False
+
+    try:
+        cur = conn.cursor()
+
+        # Pobierz quantity_total dla walidacji (zamiast wołać get_lot -> jedna transakcja)
+        cur.execute("SELECT quantity_total FROM lots WHERE id = ?", (lot_id_int,))
+        row = cur.fetchone()
+        if not row:
+            return False
+
+        quantity_total = int(row['quantity_total'] or 0)
+        if new_qty > quantity_total:
+            st.error(f"Nieprawidłowa ilość: {new_quantity_open}")
+            return False
+
+        # Aktualizacja
+        cur.execute("""
+            UPDATE lots
+            SET quantity_open = ?, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (new_qty, lot_id_int))
+
+        conn.commit()
+        return True
+
+    except Exception as e:
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+        st.error(f"Błąd aktualizacji LOT-a: {e}")
+        return False
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def get_lots_stats():
+    """Statystyki tabeli lots (ta sama logika, bezpieczniejsze wykonanie)."""
+    default = {
+        'total_lots': 0,
+        'total_shares': 0,
+        'open_shares': 0,
+        'total_cost_pln': 0.0
+    }
+
+    conn = get_connection()
+    if not conn:
+        return default
+
+    try:
+        cur = conn.cursor()
+
+        # Liczba lotów
+        cur.execute("SELECT COUNT(*) FROM lots")
+        row = cur.fetchone()
+        total_lots = int(row[0] or 0) if row else 0
+
+        # Sumy (użyj COALESCE, żeby uniknąć None)
+        cur.execute("""
+            SELECT
+                COALESCE(SUM(quantity_total), 0) AS qty_total,
+                COALESCE(SUM(quantity_open), 0)  AS qty_open,
+                COALESCE(SUM(cost_pln), 0.0)     AS cost_pln
+            FROM lots
+        """)
+        totals = cur.fetchone()
+
+        return {
+            'total_lots': total_lots,
+            'total_shares': int(totals['qty_total'] if totals else 0),
+            'open_shares': int(totals['qty_open'] if totals else 0),
+            'total_cost_pln': float(totals['cost_pln'] if totals else 0.0),
+        }
+
+    except Exception as e:
+        st.error(f"Błąd statystyk lots: {e}")
+        return default
+
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def get_total_quantity(ticker):
+    """
+    Pobiera łączną ilość posiadanych akcji dla danego tickera
+    (łącznie z tymi, które są zarezerwowane pod CC).
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return 0
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # SUMA wszystkich akcji, niezależnie od rezerwacji CC
+        cur.execute("""
+            SELECT COALESCE(SUM(quantity_total), 0) AS total_shares
+            FROM lots
+            WHERE UPPER(ticker) = ?
+        """, (str(ticker).upper().strip(),))
+
+        row = cur.fetchone()
+        total = int(row["total_shares"] if row and row["total_shares"] is not None else 0)
+
+        return total
+
+    except Exception:
+        return 0
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def get_all_tickers():
+    """
+    Pobiera listę wszystkich tickerów z akcjami w portfelu.
+    ✅ Uwzględnia również tickery, w których wszystkie akcje są zarezerwowane pod CC.
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Pobierz tickery, gdzie quantity_total > 0, a nie tylko quantity_open
+        cur.execute("""
+            SELECT DISTINCT ticker
+            FROM lots
+            WHERE quantity_total > 0
+            ORDER BY UPPER(ticker)
+        """)
+
+        rows = cur.fetchall() or []
+        return [r["ticker"] if isinstance(r, sqlite3.Row) else r[0] for r in rows]
+
+    except Exception:
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+@cached_aggregate('lots', 'lot_positions', 'options_cc')
+def get_portfolio_summary():
+    """Pobiera podsumowanie całego portfela dla dashboard (spójne z rezerwacjami CC)."""
+    import sqlite3
+    from datetime import date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {}
+
+        # Row access po nazwach kolumn
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        today = _date.today().isoformat()
+
+        # 1) Akcje w LOT-ach: bierzemy quantity_total (posiadane sztuki, niezależnie od rezerwacji)
+        #    + rezerwacje otwartych CC z lot_positions (utrzymywane triggerami, migracja 7)
+        cur.execute("""
+            SELECT UPPER(l.ticker) AS ticker,
+                   COALESCE(SUM(l.quantity_total), 0) AS total_shares,
+                   COALESCE(SUM(l.quantity_total * l.buy_price_usd
+                         + COALESCE(l.broker_fee_usd,0)
+                         + COALESCE(l.reg_fee_usd,0)), 0) AS total_cost_usd,
+                   COALESCE(SUM(p.qty_reserved), 0) AS reserved_mappings,
+                   COALESCE(SUM(p.qty_reserved_legacy), 0) AS reserved_legacy
+            FROM lots l
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
+            GROUP BY UPPER(l.ticker)
+        """)
+        stock_rows = cur.fetchall() or []
+
+        # Zainicjalizuj słownik portfela
+        portfolio = {}
+        reserved_map = {}
+        for r in stock_rows:
+            t = r["ticker"]
+            # cc_lot_mappings autorytatywne; legacy tylko gdy ticker nie ma mapowań
+            reserved_map[t] = int(r["reserved_mappings"] or 0) or int(r["reserved_legacy"] or 0)
+            portfolio[t] = {
+                "total_shares": int(r["total_shares"] or 0),
+                "cost_usd": float(r["total_cost_usd"] or 0.0),
+                "cc_count": 0,
+                "shares_reserved": 0,
+                "shares_available": int(r["total_shares"] or 0),  # chwilowo = total; skorygujemy niżej
+            }
+
+        if not portfolio:
+            return {}
+
+        tickers = list(portfolio.keys())
+
+        # 2) Otwarte CC per ticker (as-of dziś) — zlicz liczbę CC i kontrakty
+        cur.execute(f"""
+            SELECT UPPER(ticker) AS ticker,
+                   COUNT(*) AS open_cc_count,
+                   COALESCE(SUM(contracts),0) AS total_contracts
+            FROM options_cc
+            WHERE status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+              AND UPPER(ticker) IN ({",".join(["?"]*len(tickers))})
+            GROUP BY UPPER(ticker)
+        """, [today, today, *tickers])
+        cc_agg = {row["ticker"]: {"open_cc_count": int(row["open_cc_count"] or 0),
+                                  "total_contracts": int(row["total_contracts"] or 0)}
+                  for row in (cur.fetchall() or [])}
+
+        # 3) Złóż wszystko do portfolio
+        for t in tickers:
+            cc_info = cc_agg.get(t, {"open_cc_count": 0, "total_contracts": 0})
+            reserved = int(reserved_map.get(t, 0))
+
+            # Uzupełnij cc_count
+            portfolio[t]["cc_count"] = cc_info["open_cc_count"]
+
+            # Rzeczywiste rezerwacje (nie nominalne contracts*100)
+            portfolio[t]["shares_reserved"] = reserved
+
+            # Wolne akcje = posiadane - zarezerwowane
+            free_shares = portfolio[t]["total_shares"] - reserved
+            portfolio[t]["shares_available"] = free_shares if free_shares > 0 else 0
+
+        return portfolio
+
+    except Exception as e:
+        try:
+            import streamlit as st
+            st.error(f"Błąd portfolio summary: {e}")
+        except Exception:
+            pass
+        return {}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def get_lots_for_tax_fifo(ticker: str) -> List[Dict]:
+    """
+    🎯 KLUCZOWA FUNKCJA: Pobiera LOT-y dla FIFO PODATKOWEGO
+
+    RÓŻNICA od get_lots_by_ticker():
+    - NIE filtruje po quantity_open > 0
+    - Bierze WSZYSTKIE LOT-y (także częściowo/całkowicie zarezerwowane pod CC)
+    - Kolejność: FIFO (buy_date ASC, id ASC)
+
+    Zwracane pola (m.in.):
+      - quantity_sold      → faktycznie sprzedane sztuki (ze stock_trade_splits)
+      - is_blocked_by_cc   → czy lot ma zarezerwowane akcje pod otwarte CC
+      - cost_per_share_pln → koszt jednostkowy w PLN (bezpiecznie 0 gdy qty=0)
+    """
+    import sqlite3
+
+    conn = get_connection()
+    if not conn:
+        return []
+
+    try:
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        tkr = (ticker or "").upper().strip()
+
+        # Sprzedaże i rezerwacje (obie tabele, tylko CC 'open') z lot_positions -
+        # utrzymywane triggerami (migracja schematu 7), jeden lookup po PK
+        query = """
+            SELECT
+                l.id, l.ticker, l.quantity_total, l.quantity_open, l.buy_price_usd,
+                l.broker_fee_usd, l.reg_fee_usd, l.buy_date, l.fx_rate, l.cost_pln,
+                l.created_at, l.updated_at, l.cost_pln_cents,
+                COALESCE(p.qty_sold, 0) AS qty_sold_real,
+                COALESCE(p.qty_reserved, 0) AS qty_reserved_new,
+                COALESCE(p.qty_reserved_legacy, 0) AS qty_reserved_old
+            FROM lots l
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
+            WHERE l.ticker = ?
+            ORDER BY l.buy_date ASC, l.id ASC
+        """
+
+        cur.execute(query, (tkr,))
+        rows = cur.fetchall() or []
+
+        lots: List[Dict] = []
+        for r in rows:
+            qty_total = int(r["quantity_total"] or 0)
+            qty_open  = int(r["quantity_open"] or 0)
+            qty_sold  = int(r["qty_sold_real"] or 0)
+
+            # Rezerwacje (sumujemy obie tabele, jeśli obie istnieją)
+            qty_reserved = int(r["qty_reserved_new"] or 0) + int(r["qty_reserved_old"] or 0)
+            is_blocked = qty_reserved > 0
+
+            # Koszt jednostkowy PLN – bezpiecznie obsłuż zero
+            cost_pln = float(r["cost_pln"] or 0.0)
+            cps_pln = (cost_pln / qty_total) if qty_total > 0 else 0.0
+
+            lots.append({
+                'id': r["id"],
+                'ticker': r["ticker"],
+                'quantity_total': qty_total,
+                'quantity_open': qty_open,
+                'buy_price_usd': float(r["buy_price_usd"] or 0.0),
+                'broker_fee_usd': float(r["broker_fee_usd"] or 0.0),
+                'reg_fee_usd': float(r["reg_fee_usd"] or 0.0),
+                'buy_date': r["buy_date"],
+                'fx_rate': float(r["fx_rate"] or 0.0),
+                'cost_pln': cost_pln,
+                'cost_pln_cents': int(r["cost_pln_cents"] or 0),
+                'created_at': r["created_at"],
+                'updated_at': r["updated_at"],
+
+                # Pola podatkowe / pomocnicze
+                'quantity_sold': qty_sold,                 # ✅ realne sprzedaże
+                'reserved_shares_cc': qty_reserved,        # ile sztuk zarezerwowane pod otwarte CC
+                'is_blocked_by_cc': is_blocked,            # ✅ na podstawie mapowań
+                'cost_per_share_pln': cps_pln
+            })
+
+        return lots
+
+    except Exception:
+        try:
+            conn.close()
+        except Exception:
+            pass
+        return []
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
@@ -0,0 +1,296 @@
+"""
+Utrzymanie bazy: PRAGMA optimize, ANALYZE, checkpoint WAL, incremental vacuum
+Harmonogram w wątku w tle (maksymalnie jedno sprawdzenie na interwał), stan
+i czasy ostatnich uruchomień w tabeli db_maintenance (migracja schematu 10).
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+import db
+from db import get_connection
+
+# Progi i interwały zadań
+OPTIMIZE_INTERVAL_S = 3600
+ANALYZE_INTERVAL_S = 24 * 3600
+ANALYZE_MIN_WRITES = 1000            # tyle zapisów (table_versions) → ANALYZE wcześniej
+ANALYZE_MIN_INTERVAL_S = 3600        # ... ale nie częściej niż raz na godzinę
+WAL_CHECKPOINT_BYTES = 8 * 1024 * 1024  # plik WAL > 8 MB → checkpoint TRUNCATE
+VACUUM_FREE_RATIO = 0.10             # wolne strony > 10% bazy → incremental_vacuum
+VACUUM_MIN_FREE_PAGES = 256
+VACUUM_MAX_PAGES_PER_RUN = 4096      # limit stron na przebieg (krótka blokada zapisu)
+AUTO_VACUUM_CONVERT_MAX_BYTES = 64 * 1024 * 1024  # automatyczny VACUUM tylko dla małych baz
+
+AUTO_VACUUM_MODES = {0: 'NONE', 1: 'FULL', 2: 'INCREMENTAL'}
+
+
+def _database_state(conn) -> Dict:
+    """Rozmiar bazy, wolne strony, tryb auto_vacuum, rozmiar WAL, licznik zapisów"""
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    auto_vacuum = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+
+    wal_path = db.DB_PATH + "-wal"
+    try:
+        writes = conn.execute("SELECT COALESCE(SUM(version), 0) FROM table_versions").fetchone()[0]
+    except sqlite3.OperationalError:
+        writes = 0
+
+    return {
+        'page_size': page_size,
+        'page_count': page_count,
+        'db_bytes': page_size * page_count,
+        'freelist_count': freelist,
+        'free_ratio': (freelist / page_count) if page_count else 0.0,
+        'auto_vacuum': AUTO_VACUUM_MODES.get(auto_vacuum, str(auto_vacuum)),
+        'wal_bytes': os.path.getsize(wal_path) if os.path.exists(wal_path) else 0,
+        'writes': int(writes or 0),
+    }
+
+
+def _load_task_state(conn) -> Dict[str, Dict]:
+    try:
+        rows = conn.execute("""
+            SELECT task, last_run_at, duration_ms, status, details, writes_at_run
+            FROM db_maintenance
+        """).fetchall()
+    except sqlite3.OperationalError:
+        return {}
+    return {
+        row['task']: {
+            'last_run_at': row['last_run_at'],
+            'duration_ms': row['duration_ms'],
+            'status': row['status'],
+            'details': json.loads(row['details']) if row['details'] else {},
+            'writes_at_run': row['writes_at_run'] or 0,
+        }
+        for row in rows
+    }
+
+
+def _record_task(conn, task: str, duration_ms: float, status: str, details: Dict, writes: int):
+    conn.execute("""
+        INSERT INTO db_maintenance (task, last_run_at, duration_ms, status, details, writes_at_run)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(task) DO UPDATE SET
+            last_run_at = excluded.last_run_at,
+            duration_ms = excluded.duration_ms,
+            status = excluded.status,
+            details = excluded.details,
+            writes_at_run = excluded.writes_at_run
+    """, (task, datetime.now().isoformat(timespec='seconds'), round(duration_ms, 2),
+          status, json.dumps(details), writes))
+    conn.commit()
+
+
+def _seconds_since(last_run_at: Optional[str]) -> Optional[float]:
+    if not last_run_at:
+        return None
+    try:
+        return (datetime.now() - datetime.fromisoformat(last_run_at)).total_seconds()
+    except ValueError:
+        return None
+
+
+# ================================
+# ZADANIA
+# ================================
+# Każde zadanie: (conn, state) → details; wyjątek = status "error: ..."
+
+def _task_optimize(conn, state):
+    rows = conn.execute("PRAGMA optimize").fetchall()
+    return {'statements': len(rows)}
+
+
+def _task_analyze(conn, state):
+    conn.execute("ANALYZE")
+    conn.commit()
+    stats = conn.execute("SELECT COUNT(*) FROM sqlite_stat1").fetchone()[0]
+    return {'stat1_rows': stats, 'writes_since_last': state.get('writes_since_analyze')}
+
+
+def _task_wal_checkpoint(conn, state):
+    # Automatyczny checkpoint SQLite (PASSIVE) nie zmniejsza pliku WAL - TRUNCATE
+    # przycina go do 0; przy aktywnych czytelnikach busy=1, ponowienie w kolejnym przebiegu
+    busy, log_frames, checkpointed = conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+    return {'busy': busy, 'log_frames': log_frames, 'checkpointed': checkpointed,
+            'wal_bytes_before': state['wal_bytes']}
+
+
+def _task_incremental_vacuum(conn, state):
+    pages = min(state['freelist_count'], VACUUM_MAX_PAGES_PER_RUN)
+    # incremental_vacuum zwalnia jedną stronę na krok instrukcji, a execute()
+    # wykonuje tylko pierwszy krok - executescript przechodzi instrukcję do końca
+    conn.executescript(f"PRAGMA incremental_vacuum({int(pages)});")
+    after = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    return {'freelist_before': state['freelist_count'], 'freelist_after': after}
+
+
+def _task_enable_auto_vacuum(conn, state):
+    # Zmiana trybu auto_vacuum na istniejącej bazie wymaga jednorazowego VACUUM
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    mode = conn.execute("PRAGMA auto_vacuum").fetchone()[0]
+    return {'auto_vacuum': AUTO_VACUUM_MODES.get(mode, str(mode)), 'db_bytes_before': state['db_bytes']}
+
+
+TASKS = {
+    'optimize': _task_optimize,
+    'analyze': _task_analyze,
+    'wal_checkpoint': _task_wal_checkpoint,
+    'incremental_vacuum': _task_incremental_vacuum,
+    'enable_auto_vacuum': _task_enable_auto_vacuum,
+}
+
+
+def due_tasks(state: Dict, tasks: Dict[str, Dict]) -> Dict[str, str]:
+    """Zadania do uruchomienia → powód (na podstawie stanu bazy i ostatnich uruchomień)"""
+    due = {}
+
+    since = _seconds_since(tasks.get('optimize', {}).get('last_run_at'))
+    if since is None or since >= OPTIMIZE_INTERVAL_S:
+        due['optimize'] = 'interwał'
+
+    analyze = tasks.get('analyze', {})
+    since = _seconds_since(analyze.get('last_run_at'))
+    writes_since = state['writes'] - analyze.get('writes_at_run', 0)
+    if since is None or since >= ANALYZE_INTERVAL_S:
+        due['analyze'] = 'interwał'
+    elif writes_since >= ANALYZE_MIN_WRITES and since >= ANALYZE_MIN_INTERVAL_S:
+        due['analyze'] = f'{writes_since} zapisów'
+
+    if state['wal_bytes'] >= WAL_CHECKPOINT_BYTES:
+        due['wal_checkpoint'] = f"WAL {state['wal_bytes'] / 1024 / 1024:.1f} MB"
+
+    if state['auto_vacuum'] != 'INCREMENTAL':
+        if state['db_bytes'] <= AUTO_VACUUM_CONVERT_MAX_BYTES:
+            due['enable_auto_vacuum'] = f"auto_vacuum={state['auto_vacuum']}"
+    elif (state['freelist_count'] >= VACUUM_MIN_FREE_PAGES
+          and state['free_ratio'] >= VACUUM_FREE_RATIO):
+        due['incremental_vacuum'] = f"{state['freelist_count']} wolnych stron ({state['free_ratio']:.0%})"
+
+    return due
+
+
+def run_maintenance(force: bool = False, only=None) -> Dict:
+    """
+    Jeden przebieg utrzymania (synchronicznie, bez wywołań Streamlit)
+
+    Args:
+        force: uruchom zadania niezależnie od progów (enable_auto_vacuum tylko przez only)
+        only: lista nazw zadań do rozważenia (domyślnie wszystkie)
+
+    Returns:
+        dict: {'ran': {task: {'status', 'duration_ms', 'reason', 'details'}}, 'state': {...}}
+    """
+    conn = get_connection()
+    if not conn:
+        return {'ran': {}, 'state': None}
+
+    ran = {}
+    try:
+        state = _database_state(conn)
+        tasks = _load_task_state(conn)
+        state['writes_since_analyze'] = state['writes'] - tasks.get('analyze', {}).get('writes_at_run', 0)
+
+        if force:
+            due = {name: 'ręcznie' for name in TASKS if name != 'enable_auto_vacuum'}
+            if state['auto_vacuum'] != 'INCREMENTAL':
+                due.pop('incremental_vacuum')
+        else:
+            due = due_tasks(state, tasks)
+        if only is not None:
+            due = {name: due.get(name, 'ręcznie') for name in only if name in TASKS}
+
+        for name, reason in due.items():
+            started = time.perf_counter()
+            try:
+                details = TASKS[name](conn, state)
+                status = 'ok'
+            except sqlite3.Error as e:
+                details = {}
+                status = f'error: {e}'
+            duration_ms = (time.perf_counter() - started) * 1000.0
+            details['reason'] = reason
+            try:
+                _record_task(conn, name, duration_ms, status, details, state['writes'])
+            except sqlite3.Error:
+                pass
+            ran[name] = {'status': status, 'duration_ms': round(duration_ms, 2),
+                         'reason': reason, 'details': details}
+            # Kolejne zadania widzą stan po poprzednich (np. WAL po VACUUM)
+            state.update({k: v for k, v in _database_state(conn).items() if k != 'writes'})
+
+        return {'ran': ran, 'state': state}
+
+    finally:
+        conn.close()
+
+
+def get_maintenance_status() -> Dict:
+    """Stan bazy + ostatnie uruchomienia zadań + zadania, które są teraz należne (Dev Tools)"""
+    conn = get_connection()
+    if not conn:
+        return {'state': None, 'tasks': {}, 'due': {}}
+    try:
+        state = _database_state(conn)
+        tasks = _load_task_state(conn)
+        state['writes_since_analyze'] = state['writes'] - tasks.get('analyze', {}).get('writes_at_run', 0)
+        return {'state': state, 'tasks': tasks, 'due': due_tasks(state, tasks)}
+    finally:
+        conn.close()
+
+
+class MaintenanceScheduler:
+    """
+    Utrzymanie bazy w wątku w tle (wzorem BackgroundFxRefresher)
+
+    - sprawdzenie progów maksymalnie raz na check_interval_seconds (na proces)
+    - zadania uruchamiane tylko gdy należne (due_tasks)
+    """
+
+    def __init__(self, check_interval_seconds: int = 15 * 60):
+        self.check_interval_seconds = check_interval_seconds
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_started: Optional[float] = None
+        self.last_report: Optional[Dict] = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def maybe_start(self, force: bool = False) -> bool:
+        """
+        Uruchamia przebieg w tle jeśli minął interwał (nie blokuje)
+
+        Returns:
+            bool: True jeśli wystartowano nowy wątek
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            now = time.monotonic()
+            if (not force and self._last_started is not None
+                    and now - self._last_started < self.check_interval_seconds):
+                return False
+            self._last_started = now
+            self._thread = threading.Thread(target=self.run_once, name="db-maintenance", daemon=True)
+            self._thread.start()
+            return True
+
+    def run_once(self) -> Dict:
+        try:
+            self.last_report = run_maintenance()
+        except Exception as e:
+            self.last_report = {'ran': {}, 'state': None, 'error': str(e)}
+        return self.last_report
+
+
+# Globalny harmonogram (jeden wątek na proces Streamlit)
+maintenance_scheduler = MaintenanceScheduler()
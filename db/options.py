@@ -0,0 +1,4097 @@
+"""
+Covered Calls: zapis, rezerwacje akcji, wygaśnięcie/przydział/odkup, edycja, analizy
+"""
+
+from utils import money
+from db import cached_aggregate, get_connection, transaction
+
+
+# DODAJ NA KOŃCU db.py - PUNKT 52: REZERWACJE FIFO
+
+# ================================
+# OPERACJE REZERWACJI AKCJI (CC)
+# ================================
+
+# ZAMIEŃ CAŁĄ funkcję check_cc_coverage_with_chronology w db.py NA TĘ WERSJĘ:
+
+
+
+def check_cc_coverage_with_chronology(ticker, contracts, cc_sell_date):
+    """
+    Sprawdza pokrycie CC na konkretną datę historyczną (AS-OF):
+      - akcje posiadane do dnia cc (buy_date <= cc_date)
+      - sprzedaże PRZED dniem cc (sell_date < cc_date)
+      - rezerwacje z innych CC otwartych na ten dzień (open_date <= cc_date < close_date lub close_date IS NULL)
+      - FIFO preview z realnych mapowań (cc_lot_mappings), bez sztucznego dzielenia.
+    Odpowiedź z osi czasu tickera w pamięci (db.timeline) - bez zapytań per wywołanie.
+    """
+    # --- lokalne importy dla aliasów daty/czasu, bez zmiany sygnatury:
+    from datetime import date as _date, datetime as _dt
+    from db.timeline import get_share_timeline
+
+    shares_needed = int(contracts) * 100
+    try:
+        # Normalizacja wejść
+        ticker_upper = str(ticker).upper().strip()
+        if hasattr(cc_sell_date, 'strftime'):
+            cc_date_str = cc_sell_date.strftime('%Y-%m-%d')
+        elif isinstance(cc_sell_date, _date):
+            cc_date_str = cc_sell_date.isoformat()
+        elif isinstance(cc_sell_date, str):
+            # spróbuj wymusić ISO, jeśli to yyyy-mm-dd to ok
+            try:
+                cc_date_str = _dt.strptime(cc_sell_date, '%Y-%m-%d').date().isoformat()
+            except Exception:
+                cc_date_str = cc_sell_date
+        else:
+            return {
+                'can_cover': False,
+                'message': 'Nieprawidłowy typ cc_sell_date',
+                'shares_needed': shares_needed,
+                'shares_available': 0
+            }
+
+        # Oś czasu tickera z pamięci (przebudowa tylko po zapisach do lots/trades/CC)
+        timeline = get_share_timeline(ticker_upper)
+        if timeline is None:
+            return {
+                'can_cover': False,
+                'message': 'Brak połączenia z bazą',
+                'shares_needed': shares_needed,
+                'shares_available': 0
+            }
+
+        # 1-4) AS-OF: posiadane (buy_date <= cc_date) - sprzedane przed cc_date
+        #      - rezerwacje CC otwartych na cc_date (mapowania, fallback: stara tabela)
+        snapshot = timeline.as_of(cc_date_str)
+        owned_on_cc_date = snapshot['owned']
+
+        if owned_on_cc_date == 0:
+            return {
+                'can_cover': False,
+                'message': f'Brak akcji {ticker_upper} posiadanych na {cc_date_str}',
+                'shares_needed': shares_needed,
+                'shares_available': 0
+            }
+
+        sold_total = snapshot['sold_total']
+        reserved_total = snapshot['reserved_total']
+        available_on_cc_date = snapshot['available']
+
+        can_cover = available_on_cc_date >= shares_needed
+
+        # 5) FIFO preview oparte na realnych mapowaniach
+        fifo_preview = []
+        if can_cover:
+            remaining_needed = shares_needed
+            for lot in snapshot['lots']:
+                if remaining_needed <= 0:
+                    break
+                qty_available = lot['qty_free']
+                if qty_available <= 0:
+                    continue
+
+                take = min(remaining_needed, qty_available)
+                fifo_preview.append({
+                    'lot_id': lot['id'],
+                    'buy_date': str(lot['buy_date']),
+                    'buy_price_usd': float(lot['buy_price_usd']) if lot['buy_price_usd'] is not None else None,
+                    'fx_rate': float(lot['fx_rate']) if lot['fx_rate'] is not None else None,
+                    'cost_pln': float(lot['cost_pln']) if lot['cost_pln'] is not None else None,
+                    'qty_total': lot['quantity_total'],
+                    'qty_available_on_date': qty_available,
+                    'qty_to_reserve': take,
+                    'qty_remaining_after': qty_available - take
+                })
+                remaining_needed -= take
+
+        debug_info = {
+            'cc_date': cc_date_str,
+            'owned_on_date': owned_on_cc_date,
+            'sold_before_total': sold_total,
+            'reserved_asof_total': reserved_total,
+            'available_calculated': available_on_cc_date
+        }
+
+        return {
+            'can_cover': can_cover,
+            'shares_needed': shares_needed,
+            'shares_available': available_on_cc_date,
+            'owned_on_date': owned_on_cc_date,
+            'sold_before': sold_total,
+            'cc_reserved_before': reserved_total,
+            'fifo_preview': fifo_preview,
+            'debug_info': debug_info,
+            'message': (
+                'OK'
+                if can_cover else
+                f'Brakuje {shares_needed - available_on_cc_date} akcji na {cc_date_str} '
+                f'(miało {owned_on_cc_date}, sprzedano {sold_total}, zarezerwowano {reserved_total})'
+            )
+        }
+
+    except Exception as e:
+        print(f"❌ Błąd chronologii CC: {e}")
+        import traceback; traceback.print_exc()
+        return {
+            'can_cover': False,
+            'message': f'Błąd sprawdzania chronologii: {e}',
+            'shares_needed': shares_needed,
+            'shares_available': 0
+        }
+
+
+def reserve_shares_for_cc(ticker, contracts, cc_id):
+    """
+    Rezerwuje akcje FIFO dla otwartego CC na podstawie check_cc_coverage_with_chronology.
+    - Datę AS-OF bierzemy z options_cc.open_date dla cc_id.
+    - Zapis rezerwacji: cc_lot_mappings (autoratywna) + mirror do options_cc_reservations.
+    - Nie zmieniamy quantity_open w lots (to osobny krok, jeśli go używasz).
+    """
+    import sqlite3
+    from datetime import datetime as _dt
+
+    shares_needed = int(contracts) * 100
+
+    def _st_safe(call, *args, **kwargs):
+        # Bezpieczne logowanie do Streamlit, jeśli jest importowany jako 'st'
+        try:
+            if 'st' in globals():
+                return getattr(globals()['st'], call)(*args, **kwargs)
+        except Exception:
+            pass
+
+    try:
+        # 0) Połączenie + row_factory dla dostępu po kluczach
+        conn = get_connection()
+        if not conn:
+            _st_safe('error', "❌ Brak połączenia z bazą")
+            return False
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # 1) Pobierz open_date dla CC (AS-OF)
+        cur.execute("SELECT id, ticker, open_date FROM options_cc WHERE id = ?", (cc_id,))
+        cc_row = cur.fetchone()
+        if not cc_row:
+            _st_safe('error', f"❌ Nie znaleziono CC #{cc_id}")
+            conn.close()
+            return False
+
+        cc_ticker = str(cc_row['ticker']).upper().strip()
+        if str(ticker).upper().strip() != cc_ticker:
+            # Ostrzegamy, ale pozwalamy działać — może być wywołanie z innym casingiem
+            _st_safe('warning', f"⚠️ Parametr ticker='{ticker}' ≠ ticker z CC='{cc_ticker}'. Używam ticker z CC.")
+
+        cc_open_date = cc_row['open_date']  # w SQLite jako tekst 'YYYY-MM-DD'
+        asof_date = cc_open_date
+
+        # 2) Sprawdź pokrycie na open_date
+        coverage = check_cc_coverage_with_chronology(cc_ticker, contracts, asof_date)
+
+        # Debug (tylko jeśli st jest)
+        _st_safe('markdown', "### 🔍 DEBUG: Wynik check_cc_coverage_with_chronology")
+        _st_safe('json', coverage)
+
+        if not coverage or not coverage.get('can_cover'):
+            msg = coverage.get('message', 'Brak pokrycia') if isinstance(coverage, dict) else 'Brak pokrycia'
+            _st_safe('error', f"❌ Nie można zarezerwować {shares_needed} akcji {cc_ticker} na {asof_date}. Powód: {msg}")
+            try: conn.close()
+            except Exception: pass
+            return False
+
+        fifo_preview = coverage.get('fifo_preview', [])
+        if not fifo_preview:
+            _st_safe('error', "❌ coverage.can_cover=True, ale fifo_preview jest puste — przerwano.")
+            try: conn.close()
+            except Exception: pass
+            return False
+
+        # 3) Zapis rezerwacji w transakcji:
+        #    - cc_lot_mappings: (cc_id, lot_id, shares_reserved, created_at)
+        #    - options_cc_reservations: upsert (cc_id, lot_id, qty_reserved)
+        try:
+            cur.execute("BEGIN")
+
+            # For safety — wyczyść wcześniejsze rezerwacje dla cc_id (jeśli istnieją dublujące się symulacje)
+            cur.execute("DELETE FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+            cur.execute("DELETE FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+
+            timestamp = _dt.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+            total_reserved = 0
+            for alloc in fifo_preview:
+                lot_id = alloc.get('lot_id')
+                qty_to_reserve = int(alloc.get('qty_to_reserve', 0) or 0)
+                if not lot_id or qty_to_reserve <= 0:
+                    continue
+
+                # cc_lot_mappings — insert
+                cur.execute("""
+                    INSERT INTO cc_lot_mappings (cc_id, lot_id, shares_reserved, created_at)
+                    VALUES (?, ?, ?, ?)
+                """, (cc_id, lot_id, qty_to_reserve, timestamp))
+
+                # options_cc_reservations — mirror (sumarycznie per lot)
+                cur.execute("""
+                    INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+                    VALUES (?, ?, ?)
+                """, (cc_id, lot_id, qty_to_reserve))
+
+                total_reserved += qty_to_reserve
+
+            if total_reserved < shares_needed:
+                # Jeśli z jakiegoś powodu nie udało się wyklikać pełnej liczby z fifo_preview — rollback
+                cur.execute("ROLLBACK")
+                _st_safe('error', f"❌ Zarezerwowano {total_reserved}/{shares_needed} — przerwano.")
+                try: conn.close()
+                except Exception: pass
+                return False
+
+            cur.execute("COMMIT")
+        except Exception as e_tx:
+            try:
+                cur.execute("ROLLBACK")
+            except Exception:
+                pass
+            _st_safe('error', f"❌ Błąd transakcji rezerwacji: {e_tx}")
+            try: conn.close()
+            except Exception: pass
+            return False
+
+        _st_safe('success', f"✅ Zarezerwowano {shares_needed} akcji {cc_ticker} dla CC #{cc_id} (AS-OF {asof_date})")
+        _st_safe('info', f"💡 Użyto {len(fifo_preview)} LOT-ów (FIFO)")
+
+        # Opcjonalnie pokaż szczegóły
+        if 'st' in globals():
+            try:
+                for alloc in fifo_preview:
+                    globals()['st'].write(
+                        f"   LOT #{alloc.get('lot_id')}: {alloc.get('qty_to_reserve', 0)} akcji (buy_date {alloc.get('buy_date')})"
+                    )
+            except Exception:
+                pass
+
+        try: conn.close()
+        except Exception: pass
+        return True
+
+    except Exception as e:
+        _st_safe('error', f"❌ Błąd rezerwacji akcji: {e}")
+        return False
+
+
+def get_cc_reservations_summary(ticker=None):
+    """
+    Podsumowanie rezerwacji akcji pod otwarte CC.
+    Zwraca liczbę otwartych CC, sumę kontraktów oraz realnie zarezerwowane akcje
+    (najpierw z cc_lot_mappings, a gdy brak danych – fallback do options_cc_reservations).
+    """
+    import sqlite3
+    from datetime import date as _date
+
+    try:
+        conn = get_connection()
+        if not conn:
+            return {}
+
+        # dostęp do kolumn po kluczach
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        today = _date.today().isoformat()
+        params = []
+        ticker_clause = ""
+        if ticker:
+            ticker_clause = "AND cc.ticker = ?"
+            params.append(str(ticker).upper().strip())
+
+        # 1) Otwarte CC (as-of today), zlicz też kontrakty
+        #    Łączymy warunek status='open' z chronologią na wszelki wypadek.
+        cur.execute(f"""
+            SELECT COUNT(*) AS open_cc,
+                   COALESCE(SUM(cc.contracts), 0) AS total_contracts
+            FROM options_cc cc
+            WHERE (cc.status = 'open')
+              AND cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+              {ticker_clause}
+        """, [today, today] + params)
+        row = cur.fetchone()
+        open_cc = int(row["open_cc"] if row and row["open_cc"] is not None else 0)
+        total_contracts = int(row["total_contracts"] if row and row["total_contracts"] is not None else 0)
+
+        # Jeśli nic otwartego – szybki zwrot
+        if open_cc == 0:
+            try: conn.close()
+            except Exception: pass
+            return {
+                'open_cc_count': 0,
+                'total_contracts': 0,
+                'shares_reserved': 0,
+                'message': 'Brak otwartych CC'
+            }
+
+        # 2) Realne rezerwacje: preferuj cc_lot_mappings, fallback do options_cc_reservations
+        # cc_lot_mappings
+        cur.execute(f"""
+            SELECT COALESCE(SUM(m.shares_reserved), 0) AS shares_reserved
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+              {ticker_clause}
+        """, [today, today] + params)
+        row = cur.fetchone()
+        shares_reserved = int(row["shares_reserved"] if row and row["shares_reserved"] is not None else 0)
+
+        # Fallback, jeśli brak w mappings
+        if shares_reserved == 0:
+            cur.execute(f"""
+                SELECT COALESCE(SUM(r.qty_reserved), 0) AS shares_reserved
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                WHERE cc.open_date <= ?
+                  AND (cc.close_date IS NULL OR cc.close_date > ?)
+                  {ticker_clause}
+            """, [today, today] + params)
+            row = cur.fetchone()
+            shares_reserved = int(row["shares_reserved"] if row and row["shares_reserved"] is not None else 0)
+
+        try: conn.close()
+        except Exception: pass
+
+        return {
+            'open_cc_count': open_cc,
+            'total_contracts': total_contracts,
+            'shares_reserved': shares_reserved,
+            'message': f'{open_cc} otwartych CC, {total_contracts} kontraktów, zarezerwowane akcje: {shares_reserved}'
+        }
+
+    except Exception as e:
+        try:
+            if 'st' in globals():
+                globals()['st'].error(f"Błąd statystyk rezerwacji: {e}")
+        except Exception:
+            pass
+        return {}
+
+
+def save_covered_call_to_database(cc_data, lot_id=None):
+    """
+    Zapisuje covered call do bazy z rezerwacją akcji FIFO.
+    Tworzy NETTO cashflow (po prowizjach) i utrwala rezerwacje w tabeli options_cc_reservations.
+    (wersja z SAVEPOINT – bez kolizji z transakcją zewnętrzną)
+    """
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        cursor = conn.cursor()
+
+        # 1) Double-check pokrycia
+        coverage = check_cc_coverage_with_chronology(cc_data['ticker'], cc_data['contracts'], cc_data['open_date'])
+        if not coverage.get('can_cover'):
+            try: conn.close()
+            except Exception: pass
+            return {
+                'success': False,
+                'message': f"Brak pokrycia: {coverage.get('message', 'Nieznany błąd')}"
+            }
+
+        # 2) Daty → str
+        open_date_str = cc_data['open_date']
+        if hasattr(open_date_str, 'strftime'):
+            open_date_str = open_date_str.strftime('%Y-%m-%d')
+
+        expiry_date_str = cc_data['expiry_date']
+        if hasattr(expiry_date_str, 'strftime'):
+            expiry_date_str = expiry_date_str.strftime('%Y-%m-%d')
+
+        # 🔒 STRAŻ TRANSAKCJI
+        outer_tx = getattr(conn, 'in_transaction', False)
+        cursor.execute("SAVEPOINT sp_cc_save")
+
+        try:
+            # 3) INSERT do options_cc
+            cursor.execute("""
+                INSERT INTO options_cc (
+                    ticker, contracts, strike_usd, premium_sell_usd,
+                    open_date, expiry_date, status, fx_open, premium_sell_pln
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                cc_data['ticker'],
+                cc_data['contracts'],
+                cc_data['strike_usd'],
+                cc_data['premium_sell_usd'],
+                open_date_str,
+                expiry_date_str,
+                'open',
+                cc_data['fx_open'],
+                cc_data['premium_sell_pln']
+            ))
+            cc_id = cursor.lastrowid
+
+            # 4) Rezerwacja FIFO + zapis do options_cc_reservations
+# 🔧 ZAMIEŃ CAŁĄ SEKCJĘ "# 4) Rezerwacja FIFO + zapis do options_cc_reservations" NA:
+
+        # 4) Rezerwacja akcji - NOWA LOGIKA z obsługą lot_id
+            shares_to_reserve = cc_data['contracts'] * 100
+            remaining = shares_to_reserve
+            
+            # 🆕 SPRAWDŹ CZY PODANO lot_id
+            lot_id_param = cc_data.get('lot_id')  # Pobierz lot_id z cc_data
+            
+            if lot_id_param:
+                # REZERWACJA KONKRETNEGO LOT-A
+                cursor.execute("""
+                    SELECT id, quantity_open, ticker
+                    FROM lots
+                    WHERE id = ? AND quantity_open > 0
+                """, (lot_id_param,))
+                lot_row = cursor.fetchone()
+                
+                if not lot_row:
+                    # rollback do savepoint
+                    cursor.execute("ROLLBACK TO SAVEPOINT sp_cc_save")
+                    cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+                    try:
+                        if not outer_tx:
+                            conn.rollback()
+                        conn.close()
+                    except Exception:
+                        pass
+                    return {'success': False, 'message': f'LOT #{lot_id_param} nie istnieje lub nie ma wolnych akcji'}
+                
+                lot_id, qty_open, lot_ticker = lot_row
+                
+                # Sprawdź czy ticker się zgadza
+                if lot_ticker != cc_data['ticker']:
+                    cursor.execute("ROLLBACK TO SAVEPOINT sp_cc_save")
+                    cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+                    try:
+                        if not outer_tx:
+                            conn.rollback()
+                        conn.close()
+                    except Exception:
+                        pass
+                    return {'success': False, 'message': f'LOT #{lot_id_param} to {lot_ticker}, a nie {cc_data["ticker"]}'}
+                
+                # Sprawdź czy ma wystarczająco akcji
+                if shares_to_reserve > qty_open:
+                    cursor.execute("ROLLBACK TO SAVEPOINT sp_cc_save")
+                    cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+                    try:
+                        if not outer_tx:
+                            conn.rollback()
+                        conn.close()
+                    except Exception:
+                        pass
+                    return {'success': False, 'message': f'LOT #{lot_id_param} ma tylko {qty_open} akcji, potrzebujesz {shares_to_reserve}'}
+                
+                # Zarezerwuj cały CC z jednego LOT-a
+                cursor.execute(
+                    "UPDATE lots SET quantity_open = quantity_open - ? WHERE id = ?",
+                    (shares_to_reserve, lot_id)
+                )
+                cursor.execute("""
+                    INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+                    VALUES (?, ?, ?)
+                """, (cc_id, lot_id, shares_to_reserve))
+                
+                # Zapisz lot_linked_id w options_cc
+                cursor.execute("""
+                    UPDATE options_cc SET lot_linked_id = ? WHERE id = ?
+                """, (lot_id, cc_id))
+                
+                remaining = 0  # Wszystko zarezerwowane
+                
+            else:
+                # STARA LOGIKA FIFO (bez lot_id)
+                cursor.execute("""
+                    SELECT id, quantity_open
+                    FROM lots
+                    WHERE ticker = ? AND quantity_open > 0
+                    ORDER BY buy_date, id
+                """, (cc_data['ticker'],))
+                lots_rows = cursor.fetchall()
+                
+                for lot_id, qty_open in lots_rows:
+                    if remaining <= 0:
+                        break
+                    take = min(remaining, qty_open)
+                    if take <= 0:
+                        continue
+                    cursor.execute(
+                        "UPDATE lots SET quantity_open = quantity_open - ? WHERE id = ?",
+                        (take, lot_id)
+                    )
+                    cursor.execute("""
+                        INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+                        VALUES (?, ?, ?)
+                    """, (cc_id, lot_id, take))
+                    remaining -= take
+            
+            # Sprawdź czy udało się zarezerwować wszystko
+            if remaining > 0:
+                # rollback tylko do naszego savepointu
+                cursor.execute("ROLLBACK TO SAVEPOINT sp_cc_save")
+                cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+                try:
+                    if not outer_tx:
+                        conn.rollback()
+                    conn.close()
+                except Exception:
+                    pass
+                return {'success': False, 'message': f'Nie udało się zarezerwować {remaining} akcji'}
+
+            # 5) CASHFLOW – NETTO
+            gross_premium_usd = cc_data['premium_sell_usd']  # już jest total!
+            total_fees_usd = cc_data.get('broker_fee', 0.00) + cc_data.get('reg_fee', 0.00)
+            net_premium_usd = gross_premium_usd - total_fees_usd
+
+            cashflow_description = (
+                f"CC {cc_data['ticker']} {cc_data['contracts']}x ${cc_data['strike_usd']} "
+                f"premium ${gross_premium_usd:.2f} fees ${total_fees_usd:.2f} | "
+                f"FX NBP D-1: {cc_data.get('fx_open_date', '-')}"
+            )
+
+            cursor.execute("""
+                INSERT INTO cashflows (
+                    type, amount_usd, date, fx_rate, amount_pln,
+                    description, ref_table, ref_id
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """, (
+                'option_premium',
+                net_premium_usd,
+                open_date_str,
+                cc_data['fx_open'],
+                round(net_premium_usd * cc_data['fx_open'], 2),
+                cashflow_description,
+                'options_cc',
+                cc_id
+            ))
+
+            # ✅ transakcja lokalna OK
+            cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+            if not outer_tx:
+                conn.commit()
+            conn.close()
+
+            return {
+                'success': True,
+                'cc_id': cc_id,
+                'message': f'CC #{cc_id} zapisane pomyślnie!',
+                'reserved_shares': shares_to_reserve
+            }
+
+        except Exception as inner:
+            # ❌ błąd wewnątrz – wycofaj tylko do naszego savepointu
+            try:
+                cursor.execute("ROLLBACK TO SAVEPOINT sp_cc_save")
+                cursor.execute("RELEASE SAVEPOINT sp_cc_save")
+            except Exception:
+                pass
+            try:
+                if not outer_tx:
+                    conn.rollback()
+                conn.close()
+            except Exception:
+                pass
+            return {'success': False, 'message': f'Błąd transakcji rezerwacji/cashflow: {inner}'}
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd zapisu: {str(e)}'}
+
+
+
+def check_cc_coverage(ticker, contracts):
+    """
+    Alias dla kompatybilności wstecznej
+    """
+    from datetime import date
+    return check_cc_coverage_with_chronology(ticker, contracts, date.today())
+
+# DODAJ TAKŻE FUNKCJĘ NAPRAWCZĄ:
+
+def fix_existing_cc_reservations():
+    """
+    FUNKCJA NAPRAWCZA:
+    Odbudowuje rezerwacje CC w cc_lot_mappings (i lustrzanie w options_cc_reservations)
+    według FIFO na dzień open_date każdego CC. NIE modyfikuje lots.quantity_open.
+
+    Naprawiane są tylko CC z rozbieżnościami wykrytymi przez audyt rezerwacji
+    (db.reservation_audit) - wszystkie w jednej transakcji.
+
+    Zmiana zachowania: wcześniej funkcja czyściła i przydzielała FIFO od nowa
+    WSZYSTKIE otwarte CC. Teraz CC z poprawnymi rezerwacjami zostają nietknięte,
+    także gdy ich przydział różni się od czystego FIFO (np. po rolowaniu).
+    Pełna odbudowa dla tickera: reset_ticker_reservations().
+    """
+    from db.reservation_audit import REALLOCATE_TYPES, audit_cc_reservations
+
+    report = audit_cc_reservations(fix=True, fix_types=[*REALLOCATE_TYPES, 'legacy_mismatch'])
+    if not report['success']:
+        return f"Błąd naprawki: {report['message']}"
+
+    open_count = report['stats']['open_cc']
+    if not open_count:
+        return "Brak otwartych CC do naprawienia"
+
+    reallocated = report['fixed'].get('reallocated', {})
+    fixed_ids = set(reallocated.get('promoted_from_legacy', [])) | set(reallocated.get('fifo', []))
+    fixed_ids |= set(report['fixed'].get('legacy_mismatch', {}).get('cc_ids', []))
+
+    if not report['failed']:
+        return f"Naprawiono {len(fixed_ids)} z {open_count} CC"
+    # zwięzły raport z błędami
+    fails = "; ".join(f["message"] for f in report['failed'])
+    return f"Naprawiono {len(fixed_ids)} z {open_count} CC; Problemy: {fails}"
+
+
+def get_covered_calls_summary(ticker=None, status=None):
+    """
+    Pobranie podsumowania covered calls
+
+    Args:
+        ticker: Opcjonalnie filtruj po tickerze
+        status: Opcjonalnie filtruj po statusie ('open', 'expired', 'bought_back')
+
+    Returns:
+        list: Lista CC z podstawowymi danymi (list[dict])
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        # pozwala czytać po nazwach kolumn (bardziej odporne na kolejność)
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        query = """
+            SELECT id, ticker, contracts, strike_usd, premium_sell_usd,
+                   open_date, expiry_date, status, fx_open, premium_sell_pln,
+                   premium_buyback_pln, pl_pln, created_at
+            FROM options_cc
+            WHERE 1=1
+        """
+        params = []
+
+        if ticker:
+            query += " AND UPPER(ticker) = ?"
+            params.append(str(ticker).upper().strip())
+
+        if status:
+            query += " AND LOWER(status) = ?"
+            params.append(str(status).lower().strip())
+
+        query += " ORDER BY open_date DESC, id DESC"
+
+        cur.execute(query, params)
+        rows = cur.fetchall() or []
+
+        cc_list = []
+        for r in rows:
+            # r może być Row albo tuple — obsłużmy oba warianty:
+            if isinstance(r, sqlite3.Row):
+                cc_list.append({
+                    'id': r['id'],
+                    'ticker': r['ticker'],
+                    'contracts': int(r['contracts'] or 0),
+                    'strike_usd': float(r['strike_usd'] or 0),
+                    'premium_sell_usd': float(r['premium_sell_usd'] or 0),
+                    'open_date': r['open_date'],
+                    'expiry_date': r['expiry_date'],
+                    'status': r['status'],
+                    'fx_open': float(r['fx_open'] or 0),
+                    'premium_sell_pln': float(r['premium_sell_pln'] or 0),
+                    'premium_buyback_pln': float(r['premium_buyback_pln'] or 0) if r['premium_buyback_pln'] is not None else None,
+                    'pl_pln': float(r['pl_pln'] or 0) if r['pl_pln'] is not None else None,
+                    'created_at': r['created_at']
+                })
+            else:
+                cc_list.append({
+                    'id': r[0],
+                    'ticker': r[1],
+                    'contracts': int(r[2] or 0),
+                    'strike_usd': float(r[3] or 0),
+                    'premium_sell_usd': float(r[4] or 0),
+                    'open_date': r[5],
+                    'expiry_date': r[6],
+                    'status': r[7],
+                    'fx_open': float(r[8] or 0),
+                    'premium_sell_pln': float(r[9] or 0),
+                    'premium_buyback_pln': float(r[10] or 0) if r[10] is not None else None,
+                    'pl_pln': float(r[11] or 0) if r[11] is not None else None,
+                    'created_at': r[12]
+                })
+
+        return cc_list
+
+    except Exception as e:
+        try:
+            import streamlit as st
+            st.error(f"Błąd pobierania CC: {e}")
+        except Exception:
+            pass
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+# 🔧 KOMPLETNA PRZEBUDOWA expire_covered_call w db.py
+
+def expire_covered_call(cc_id):
+    """
+    Expiry CC - PRZEPISANE na model buyback_with_mappings:
+      - ustawia status 'expired' i close_date = expiry_date,
+      - zapisuje fx_close (NBP D-1 z dnia expiry),
+      - P/L w PLN = premium_sell_pln (cała premia zostaje),
+      - ZWALNIA rezerwacje: zwiększa lots.quantity_open i usuwa mapowania,
+      - używa tej samej logiki co partial_buyback_covered_call_with_mappings
+    """
+    from db.fx import get_fx_rate_for_date
+    import sqlite3
+    from datetime import datetime as _dt
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # 1) Pobierz dane CC
+        cur.execute("""
+            SELECT id, ticker, contracts, premium_sell_usd, expiry_date,
+                   status, premium_sell_pln, fx_open, open_date
+            FROM options_cc
+            WHERE id = ?
+        """, (cc_id,))
+        
+        cc = cur.fetchone()
+        if not cc:
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': f'CC #{cc_id} nie znalezione'}
+        
+        if cc['status'] != 'open':
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': f"CC #{cc_id} już zamknięte (status: {cc['status']})"}
+
+        ticker = cc['ticker']
+        contracts = int(cc['contracts'] or 0)
+        expiry_date = cc['expiry_date']
+        premium_sell_pln = float(cc['premium_sell_pln'] or 0.0)
+
+        # 2) Pobierz kurs NBP na expiry_date (BEZ fallback_rate!)
+        try:
+            fx_data = get_fx_rate_for_date(expiry_date)  # ✅ USUŃ fallback_rate
+            if fx_data and 'rate' in fx_data:
+                fx_close = float(fx_data['rate'])
+                fx_close_date = fx_data['date']
+            else:
+                fx_close = float(cc['fx_open'])  # fallback do fx_open
+                fx_close_date = expiry_date
+        except Exception:
+            fx_close = float(cc['fx_open'])
+            fx_close_date = expiry_date
+
+        # P/L = cała premia (expired = win)
+        pl_pln = premium_sell_pln
+
+        cur.execute("SAVEPOINT sp_expire")
+        
+        try:
+            # 3) ZWOLNIJ AKCJE - SKOPIOWANE z partial_buyback_covered_call_with_mappings
+            released = 0
+            shares_to_release = contracts * 100
+
+            # MAPOWANIA (cc_lot_mappings) - PRIORYTET
+            cur.execute("""
+                SELECT id, lot_id, shares_reserved
+                FROM cc_lot_mappings
+                WHERE cc_id = ?
+                ORDER BY id
+            """, (cc_id,))
+            
+            mappings = cur.fetchall() or []
+            for mapping in mappings:
+                mid = int(mapping['id'])
+                lot_id = int(mapping['lot_id'])
+                shares = int(mapping['shares_reserved'] or 0)
+                
+                if shares > 0:
+                    # 🔑 ZWIĘKSZ quantity_open PRZED usunięciem
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (shares, lot_id))
+                    released += shares
+                    
+                    # Usuń mapping
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE id = ?", (mid,))
+
+            # FALLBACK: options_cc_reservations
+            if released < shares_to_release:
+                cur.execute("""
+                    SELECT id, lot_id, qty_reserved
+                    FROM options_cc_reservations
+                    WHERE cc_id = ?
+                    ORDER BY id
+                """, (cc_id,))
+                
+                reservations = cur.fetchall() or []
+                for reservation in reservations:
+                    rid = int(reservation['id'])
+                    lot_id = int(reservation['lot_id'])
+                    qty = int(reservation['qty_reserved'] or 0)
+                    
+                    if qty > 0:
+                        # 🔑 ZWIĘKSZ quantity_open
+                        cur.execute("""
+                            UPDATE lots 
+                            SET quantity_open = quantity_open + ? 
+                            WHERE id = ?
+                        """, (qty, lot_id))
+                        released += qty
+                        
+                        # Usuń rezerwację
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id = ?", (rid,))
+
+            # FIFO FALLBACK (defensive)
+            if released < shares_to_release:
+                need = shares_to_release - released
+                cur.execute("""
+                    SELECT id, quantity_total, quantity_open
+                    FROM lots
+                    WHERE UPPER(ticker) = ?
+                    ORDER BY buy_date ASC, id ASC
+                """, (ticker.upper(),))
+                
+                for lot_id, qty_total, qty_open in cur.fetchall() or []:
+                    if need <= 0:
+                        break
+                    potentially_blocked = int(qty_total or 0) - int(qty_open or 0)
+                    if potentially_blocked <= 0:
+                        continue
+                    take = min(potentially_blocked, need)
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (take, lot_id))
+                    need -= take
+                    released += take
+
+            # 4) Zamknij CC jako expired
+            cur.execute("""
+                UPDATE options_cc 
+                SET status = 'expired',
+                    close_date = ?,
+                    fx_close = ?,
+                    pl_pln = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (expiry_date, fx_close, pl_pln, cc_id))
+
+            cur.execute("RELEASE SAVEPOINT sp_expire")
+            conn.commit()
+            conn.close()
+
+            return {
+                'success': True,
+                'message': f'CC #{cc_id} expired. Zwolniono {released} akcji.',
+                'shares_released': released,
+                'fx_close': fx_close,
+                'fx_close_date': fx_close_date,
+                'pl_pln': pl_pln
+            }
+
+        except Exception as txe:
+            try:
+                cur.execute("ROLLBACK TO SAVEPOINT sp_expire")
+                cur.execute("RELEASE SAVEPOINT sp_expire")
+            except Exception:
+                pass
+            try:
+                conn.rollback()
+                conn.close()
+            except Exception:
+                pass
+            return {'success': False, 'message': f'Błąd expire: {txe}'}
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd expire: {str(e)}'}
+
+
+def _plan_bulk_expiry(cur, today_str, cc_ids=None):
+    """
+    Otwarte CC z expiry_date < today + rezerwacje do zwolnienia (dwa zapytania)
+
+    Zwalniane są mapowania cc_lot_mappings, a gdy CC ich nie ma - rezerwacje legacy.
+    cc_ids ogranicza plan do podanych CC (np. zatwierdzonych w podglądzie).
+    """
+    import json
+
+    cur.execute("""
+        SELECT id, ticker, contracts, expiry_date,
+               COALESCE(premium_sell_pln, 0.0) AS premium_sell_pln,
+               COALESCE(fx_open, 0.0) AS fx_open
+        FROM options_cc
+        WHERE status = 'open' AND expiry_date < ?
+        ORDER BY expiry_date, id
+    """, (today_str,))
+    ccs = {int(r['id']): {
+        'cc_id': int(r['id']),
+        'ticker': r['ticker'],
+        'contracts': int(r['contracts'] or 0),
+        'expiry_date': str(r['expiry_date']),
+        'premium_sell_pln': float(r['premium_sell_pln']),
+        'fx_open': float(r['fx_open']),
+        'reservations': [],
+    } for r in cur.fetchall()}
+    if cc_ids is not None:
+        allowed = {int(cid) for cid in cc_ids}
+        ccs = {cid: cc for cid, cc in ccs.items() if cid in allowed}
+    if not ccs:
+        return ccs
+
+    cur.execute("""
+        SELECT m.cc_id, m.lot_id, m.shares_reserved AS qty
+        FROM cc_lot_mappings m
+        WHERE m.cc_id IN (SELECT value FROM json_each(?))
+        UNION ALL
+        SELECT r.cc_id, r.lot_id, r.qty_reserved
+        FROM options_cc_reservations r
+        WHERE r.cc_id IN (SELECT value FROM json_each(?))
+          AND NOT EXISTS (SELECT 1 FROM cc_lot_mappings m2 WHERE m2.cc_id = r.cc_id)
+    """, (json.dumps(list(ccs)), json.dumps(list(ccs))))
+    for r in cur.fetchall():
+        ccs[int(r['cc_id'])]['reservations'].append((int(r['lot_id']), int(r['qty'] or 0)))
+    return ccs
+
+
+def expire_past_due_covered_calls(today=None, dry_run=False, cc_ids=None):
+    """
+    Wygaśnięcie wszystkich otwartych CC z expiry_date < dziś w jednej transakcji
+
+    Semantyka jak expire_covered_call (status 'expired', close_date = expiry_date,
+    P/L = cała premia, zwolnienie rezerwacji + lots.quantity_open), ale:
+      - kursy NBP D-1 dla wszystkich dat wygaśnięcia pobierane raz (fallback: fx_open),
+      - rezerwacje zwalniane zbiorowo (UPDATE lots ... FROM, DELETE ... IN),
+      - bez obejścia FIFO dla CC bez rezerwacji - brak raportowany w wyniku.
+
+    Args:
+        today: dzień odniesienia (date lub 'YYYY-MM-DD'), domyślnie dziś
+        dry_run: tylko podgląd - nic nie jest zapisywane
+        cc_ids: tylko te CC (np. cc_id z wyniku dry_run zatwierdzonego w UI);
+                CC spoza listy zostają otwarte
+
+    Returns:
+        dict: {'success', 'message', 'dry_run', 'expired', 'shares_released',
+               'results': [{'cc_id', 'ticker', 'contracts', 'expiry_date', 'fx_close',
+                            'fx_source', 'pl_pln', 'shares_released', 'unreserved_shares',
+                            'released_lots': [{'lot_id', 'shares'}]}]}
+    """
+    import json
+    import sqlite3
+    from datetime import date as _date
+
+    today_str = (today.strftime('%Y-%m-%d') if hasattr(today, 'strftime')
+                 else str(today)[:10] if today else _date.today().isoformat())
+
+    conn = get_connection()
+    if not conn:
+        return {'success': False, 'message': 'Brak połączenia z bazą'}
+    try:
+        conn.row_factory = sqlite3.Row
+        planned = _plan_bulk_expiry(conn.cursor(), today_str, cc_ids)
+    finally:
+        conn.close()
+
+    if not planned:
+        return {'success': True, 'message': f'Brak otwartych CC wygasłych przed {today_str}',
+                'dry_run': dry_run, 'expired': 0, 'shares_released': 0, 'results': []}
+
+    # Kursy poza transakcją (klient NBP może sięgać do sieci)
+    fx_by_date = _fx_rates_d_minus_1(cc['expiry_date'] for cc in planned.values())
+
+    def summarize(ccs):
+        results = []
+        for cc in ccs.values():
+            fx = fx_by_date.get(cc['expiry_date'])
+            released = sum(q for _, q in cc['reservations'])
+            per_lot = {}
+            for lot_id, qty in cc['reservations']:
+                per_lot[lot_id] = per_lot.get(lot_id, 0) + qty
+            results.append({
+                'cc_id': cc['cc_id'],
+                'ticker': cc['ticker'],
+                'contracts': cc['contracts'],
+                'expiry_date': cc['expiry_date'],
+                'fx_close': fx or cc['fx_open'],
+                'fx_source': 'NBP D-1' if fx else 'fx_open',
+                'pl_pln': cc['premium_sell_pln'],
+                'shares_released': released,
+                'unreserved_shares': max(0, cc['contracts'] * 100 - released),
+                'released_lots': [{'lot_id': lot_id, 'shares': qty} for lot_id, qty in per_lot.items()],
+            })
+        return results
+
+    if dry_run:
+        results = summarize(planned)
+        return {
+            'success': True,
+            'message': f'Podgląd: {len(results)} CC do wygaśnięcia (expiry < {today_str})',
+            'dry_run': True,
+            'expired': 0,
+            'shares_released': sum(r['shares_released'] for r in results),
+            'results': results,
+        }
+
+    try:
+        with transaction(immediate=True) as conn:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            # Plan ponownie pod blokadą zapisu (stan mógł się zmienić od podglądu)
+            ccs = _plan_bulk_expiry(cur, today_str, cc_ids)
+            results = summarize(ccs)
+            payload = json.dumps(list(ccs))
+
+            # Zwolnienie akcji per LOT zbiorowo - przed zmianą statusu
+            # (trigger zwalniający usuwa rezerwacje legacy przy 'expired')
+            per_lot = {}
+            for cc in ccs.values():
+                for lot_id, qty in cc['reservations']:
+                    per_lot[lot_id] = per_lot.get(lot_id, 0) + qty
+            cur.execute("""
+                UPDATE lots
+                SET quantity_open = quantity_open + released.qty
+                FROM (SELECT json_extract(value, '$[0]') AS lot_id,
+                             json_extract(value, '$[1]') AS qty
+                      FROM json_each(?)) AS released
+                WHERE lots.id = released.lot_id
+            """, (json.dumps(list(per_lot.items())),))
+            cur.execute("DELETE FROM cc_lot_mappings WHERE cc_id IN (SELECT value FROM json_each(?))", (payload,))
+            cur.execute("DELETE FROM options_cc_reservations WHERE cc_id IN (SELECT value FROM json_each(?))",
+                        (payload,))
+
+            cur.executemany("""
+                UPDATE options_cc
+                SET status = 'expired',
+                    close_date = expiry_date,
+                    fx_close = ?,
+                    pl_pln = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'open'
+            """, [(r['fx_close'], r['pl_pln'], r['cc_id']) for r in results])
+    except sqlite3.Error as e:
+        return {'success': False, 'message': f'Błąd zbiorczego expire: {e}', 'dry_run': False,
+                'expired': 0, 'shares_released': 0, 'results': []}
+
+    released = sum(r['shares_released'] for r in results)
+    return {
+        'success': True,
+        'message': f'Wygaszono {len(results)} CC (expiry < {today_str}). Zwolniono {released} akcji.',
+        'dry_run': False,
+        'expired': len(results),
+        'shares_released': released,
+        'results': results,
+    }
+
+
+# 🔧 BŁĘDY W assign_covered_call:
+
+# 1. BRAK COMMIT I RELEASE SAVEPOINT!
+# 2. Nieprawidłowa kolejność conn.row_factory
+# 3. Brak obsługi błędów transakcji
+
+# POPRAWIONA FUNKCJA assign_covered_call:
+
+# 🔧 POPRAWKA: assign_covered_call - USUŃ cashflow sprzedaży akcji
+
+def assign_covered_call(cc_id, assignment_date=None):
+    """
+    ASSIGN CC (opcja wykonana):
+    - TYLKO OZNACZENIE że opcja została wykonana
+    - P/L = premium_sell_pln (zachowana premia)
+    - ZWOLNIJ quantity_open (akcje dostępne do sprzedaży)
+    - status 'expired' z info [ASSIGNED]
+    - BEZ CASHFLOW - sprzedaż akcji oddzielnie w module Stocks
+    """
+    from db.fx import get_fx_rate_for_date
+    import sqlite3
+    from datetime import datetime as _dt, date as _date
+    
+    if assignment_date is None:
+        assignment_date = _date.today()
+    
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+            
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+        
+        # Pobierz CC
+        cur.execute("""
+            SELECT id, ticker, contracts, strike_usd, premium_sell_pln, 
+                   expiry_date, status, fx_open
+            FROM options_cc WHERE id = ?
+        """, (cc_id,))
+        
+        cc = cur.fetchone()
+        if not cc:
+            try: conn.close()
+            except: pass
+            return {'success': False, 'message': f'CC #{cc_id} nie znalezione'}
+            
+        if cc['status'] != 'open':
+            try: conn.close()
+            except: pass
+            return {'success': False, 'message': f'CC #{cc_id} już zamknięte'}
+            
+        ticker = cc['ticker']
+        contracts = int(cc['contracts'])
+        strike_price = float(cc['strike_usd'])
+        premium_pln = float(cc['premium_sell_pln'])
+        shares_to_assign = contracts * 100
+        
+        # Pobierz kurs NBP
+        try:
+            fx_data = get_fx_rate_for_date(assignment_date)
+            if isinstance(fx_data, dict) and 'rate' in fx_data:
+                fx_rate = float(fx_data['rate'])
+            elif isinstance(fx_data, (int, float)):
+                fx_rate = float(fx_data)
+            else:
+                fx_rate = float(cc['fx_open'])
+        except Exception:
+            fx_rate = float(cc['fx_open'])
+        
+        cur.execute("SAVEPOINT sp_assign")
+        
+        try:
+            # 1. ZWOLNIJ AKCJE - IDENTYCZNIE jak expire (nie sprzedawaj!)
+            released = 0
+            shares_to_release = contracts * 100
+
+            # MAPOWANIA (cc_lot_mappings) - PRIORYTET  
+            cur.execute("""
+                SELECT id, lot_id, shares_reserved
+                FROM cc_lot_mappings
+                WHERE cc_id = ?
+                ORDER BY id
+            """, (cc_id,))
+            
+            mappings = cur.fetchall() or []
+            for mapping in mappings:
+                mid = int(mapping['id'])
+                lot_id = int(mapping['lot_id'])
+                shares = int(mapping['shares_reserved'] or 0)
+                
+                if shares > 0:
+                    # 🔑 ZWIĘKSZ quantity_open (akcje dostępne do sprzedaży)
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (shares, lot_id))
+                    released += shares
+                    
+                    # Usuń mapping
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE id = ?", (mid,))
+
+            # FALLBACK: options_cc_reservations
+            if released < shares_to_release:
+                cur.execute("""
+                    SELECT id, lot_id, qty_reserved
+                    FROM options_cc_reservations
+                    WHERE cc_id = ?
+                    ORDER BY id
+                """, (cc_id,))
+                
+                reservations = cur.fetchall() or []
+                for reservation in reservations:
+                    rid = int(reservation['id'])
+                    lot_id = int(reservation['lot_id'])
+                    qty = int(reservation['qty_reserved'] or 0)
+                    
+                    if qty > 0:
+                        cur.execute("""
+                            UPDATE lots 
+                            SET quantity_open = quantity_open + ? 
+                            WHERE id = ?
+                        """, (qty, lot_id))
+                        released += qty
+                        
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id = ?", (rid,))
+
+            # FIFO FALLBACK (defensive)
+            if released < shares_to_release:
+                need = shares_to_release - released
+                cur.execute("""
+                    SELECT id, quantity_total, quantity_open
+                    FROM lots
+                    WHERE UPPER(ticker) = ?
+                    ORDER BY buy_date ASC, id ASC
+                """, (ticker.upper(),))
+                
+                for lot_id, qty_total, qty_open in cur.fetchall() or []:
+                    if need <= 0:
+                        break
+                    potentially_blocked = int(qty_total or 0) - int(qty_open or 0)
+                    if potentially_blocked <= 0:
+                        continue
+                    take = min(potentially_blocked, need)
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (take, lot_id))
+                    need -= take
+                    released += take
+
+            # 2. Zamknij CC jako expired z info ASSIGNED
+            assignment_date_str = assignment_date.strftime('%Y-%m-%d') if hasattr(assignment_date, 'strftime') else str(assignment_date)
+            
+            # P/L = tylko premium (bez sprzedaży akcji)
+            pl_pln = premium_pln
+            
+            cur.execute("""
+                UPDATE options_cc 
+                SET status = 'assigned',
+                    close_date = ?,
+                    fx_close = ?,
+                    pl_pln = ?,
+                    updated_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            """, (assignment_date_str, fx_rate, pl_pln, cc_id))
+            
+            # 3. BRAK CASHFLOW - sprzedaż akcji oddzielnie!
+            # Użytkownik sprzeda akcje w module Stocks po strike price
+            
+            cur.execute("RELEASE SAVEPOINT sp_assign")
+            conn.commit()
+            conn.close()
+            
+            return {
+                'success': True,
+                'message': f'CC #{cc_id} assigned. {released} akcji dostępnych do sprzedaży po ${strike_price:.2f}',
+                'shares_released': released,
+                'strike_price': strike_price,
+                'pl_pln': pl_pln,
+                'note': f'Teraz sprzedaj {released} akcji {ticker} w module Stocks po ${strike_price:.2f}'
+            }
+            
+        except Exception as txe:
+            try:
+                cur.execute("ROLLBACK TO SAVEPOINT sp_assign")
+                cur.execute("RELEASE SAVEPOINT sp_assign")
+            except:
+                pass
+            try:
+                conn.rollback()
+                conn.close()
+            except:
+                pass
+            return {'success': False, 'message': f'Błąd assignment: {txe}'}
+        
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except:
+            pass
+        return {'success': False, 'message': f'Błąd assignment: {e}'}
+
+# 🎯 W UI dodaj informację po assignment:
+# st.info("💡 Teraz przejdź do module Stocks i sprzedaj akcje po strike price")
+# ========================================
+# DODAJ TĘ FUNKCJĘ DO db.py
+# ========================================
+
+def simple_buyback_covered_call(cc_id, buyback_price_usd, buyback_date, broker_fee_usd=0.0, reg_fee_usd=0.0):
+    """
+    SIMPLE BUYBACK CC - alias do buyback_covered_call_with_fees
+    Używany przez Streamlit gdy nie ma tabeli mapowań.
+    
+    Ta funkcja to po prostu wrapper na buyback_covered_call_with_fees.
+    """
+    return buyback_covered_call_with_fees(
+        cc_id=cc_id,
+        buyback_price_usd=buyback_price_usd,
+        buyback_date=buyback_date,
+        broker_fee_usd=broker_fee_usd,
+        reg_fee_usd=reg_fee_usd
+    )
+
+
+def get_open_cc_for_ticker(ticker):
+    """Pobiera listę otwartych Covered Calls dla danego tickera (as-of dziś, z realnymi rezerwacjami)."""
+    import sqlite3
+    from datetime import date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        t = str(ticker).upper().strip()
+        today = _date.today().isoformat()
+
+        # Otwarte CC as-of dziś (chronologia + status)
+        cur.execute("""
+            SELECT id, contracts, strike_usd, expiry_date, premium_sell_usd
+            FROM options_cc
+            WHERE UPPER(ticker) = ?
+              AND status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+            ORDER BY expiry_date ASC, id ASC
+        """, (t, today, today))
+        rows = cur.fetchall() or []
+
+        cc_list = []
+        for r in rows:
+            cc_id = int(r["id"])
+            contracts = int(r["contracts"] or 0)
+            strike_usd = float(r["strike_usd"] or 0)
+            expiry_date = r["expiry_date"]
+            premium_usd = float(r["premium_sell_usd"] or 0)
+
+            # Rzeczywista liczba zarezerwowanych akcji dla tego CC
+            cur.execute("SELECT COALESCE(SUM(shares_reserved),0) AS s FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+            row_map = cur.fetchone()
+            shares_reserved = int(row_map["s"] if row_map and row_map["s"] is not None else 0)
+
+            if shares_reserved == 0:
+                # fallback do starej tabeli rezerwacji
+                cur.execute("SELECT COALESCE(SUM(qty_reserved),0) AS s FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+                row_res = cur.fetchone()
+                shares_reserved = int(row_res["s"] if row_res and row_res["s"] is not None else 0)
+
+            # jeśli nadal 0 (np. historyczne rekordy bez rezerwacji), pokaż nominalne contracts*100
+            if shares_reserved == 0:
+                shares_reserved = contracts * 100
+
+            cc_list.append({
+                'cc_id': cc_id,
+                'contracts': contracts,
+                'strike_usd': strike_usd,
+                'expiry_date': expiry_date,
+                'premium_usd': premium_usd,
+                'shares_reserved': shares_reserved
+            })
+
+        return cc_list
+
+    except Exception:
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def get_cc_expiry_alerts(days_ahead=7):
+    """Pobiera Covered Calls wygasające w najbliższych N dni (as-of dziś)."""
+    import sqlite3
+    from datetime import date as _date, timedelta as _td
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Okno alertów: [today, today+N]
+        today = _date.today()
+        if not isinstance(days_ahead, int):
+            try:
+                days_ahead = int(days_ahead)
+            except Exception:
+                days_ahead = 7
+        end_date = today + _td(days=max(0, days_ahead))  # nie pozwól na ujemne
+
+        today_str = today.isoformat()
+        end_str = end_date.isoformat()
+
+        # Tylko faktycznie otwarte CC as-of dziś
+        cur.execute("""
+            SELECT id, ticker, contracts, strike_usd, expiry_date,
+                   CAST(julianday(expiry_date) - julianday(?) AS INTEGER) AS days_to_expiry
+            FROM options_cc
+            WHERE status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+              AND expiry_date >= ?
+              AND expiry_date <= ?
+            ORDER BY expiry_date ASC, id ASC
+        """, (today_str, today_str, today_str, today_str, end_str))
+
+        rows = cur.fetchall() or []
+
+        alerts = []
+        for r in rows:
+            alerts.append({
+                'cc_id': int(r['id']),
+                'ticker': r['ticker'],
+                'contracts': int(r['contracts'] or 0),
+                'strike_usd': float(r['strike_usd'] or 0),
+                'expiry_date': r['expiry_date'],
+                'days_to_expiry': int(r['days_to_expiry'] or 0)
+            })
+
+        return alerts
+
+    except Exception as e:
+        try:
+            import streamlit as st
+            st.error(f"Błąd CC expiry alerts: {e}")
+        except Exception:
+            pass
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+        
+def reset_ticker_reservations(ticker):
+    """
+    FUNKCJA NAPRAWCZA: Resetuje rezerwacje dla konkretnego tickera
+    (bez modyfikacji lots.quantity_open).
+    Czyści stare rezerwacje i odbudowuje je z FIFO dla wszystkich otwartych CC tego tickera.
+    """
+    import sqlite3
+    from datetime import date as _date, datetime as _dt
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return "Brak połączenia z bazą"
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        t = str(ticker).upper().strip()
+        today = _date.today().isoformat()
+        print(f"🔄 RESET REZERWACJI dla {t} (as-of {today})")
+
+        # 1) Zbierz OTWARTE CC dla tickera (as-of dziś)
+        cur.execute("""
+            SELECT id, contracts, open_date
+            FROM options_cc
+            WHERE UPPER(ticker) = ?
+              AND status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+            ORDER BY open_date, id
+        """, (t, today, today))
+        open_cc = cur.fetchall() or []
+        print(f"   🎯 Otwarte CC: {len(open_cc)}")
+
+        # 2) Wyczyść rezerwacje dla tego tickera (oba stoły)
+        try:
+            cur.execute("BEGIN")
+            cur.execute("""
+                DELETE FROM cc_lot_mappings
+                WHERE cc_id IN (SELECT id FROM options_cc WHERE UPPER(ticker)=?)
+            """, (t,))
+            cur.execute("""
+                DELETE FROM options_cc_reservations
+                WHERE cc_id IN (SELECT id FROM options_cc WHERE UPPER(ticker)=?)
+            """, (t,))
+            cur.execute("COMMIT")
+        except Exception:
+            try: cur.execute("ROLLBACK")
+            except Exception: pass
+            return f"Błąd: nie udało się wyczyścić starych rezerwacji dla {t}"
+
+        # 3) Odbuduj rezerwacje FIFO dla każdego CC
+        rebuilt = 0
+        failed = []
+        ts = _dt.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+
+        for cc in open_cc:
+            cc_id = int(cc["id"])
+            contracts = int(cc["contracts"] or 0)
+            open_date = cc["open_date"]
+            shares_needed = contracts * 100
+
+            coverage = check_cc_coverage_with_chronology(t, contracts, open_date)
+            if not coverage or not coverage.get("can_cover"):
+                failed.append((cc_id, f"Brak pokrycia: {coverage.get('message') if isinstance(coverage, dict) else 'Nieznany błąd'}"))
+                continue
+
+            fifo_preview = coverage.get("fifo_preview") or []
+            if sum(int(a.get("qty_to_reserve", 0) or 0) for a in fifo_preview) < shares_needed:
+                failed.append((cc_id, "FIFO preview nie pokrywa pełnej rezerwacji"))
+                continue
+
+            try:
+                cur.execute("BEGIN")
+                total_reserved = 0
+                for alloc in fifo_preview:
+                    lot_id = alloc.get("lot_id")
+                    qty = int(alloc.get("qty_to_reserve", 0) or 0)
+                    if not lot_id or qty <= 0:
+                        continue
+
+                    # Autoratywna tabela rezerwacji
+                    cur.execute("""
+                        INSERT INTO cc_lot_mappings (cc_id, lot_id, shares_reserved, created_at)
+                        VALUES (?, ?, ?, ?)
+                    """, (cc_id, lot_id, qty, ts))
+
+                    # Lustrzane odwzorowanie (kompatybilność wstecz)
+                    cur.execute("""
+                        INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+                        VALUES (?, ?, ?)
+                    """, (cc_id, lot_id, qty))
+
+                    total_reserved += qty
+
+                if total_reserved < shares_needed:
+                    cur.execute("ROLLBACK")
+                    failed.append((cc_id, f"Zarezerwowano {total_reserved}/{shares_needed}"))
+                    continue
+
+                cur.execute("COMMIT")
+                rebuilt += 1
+
+            except Exception as txe:
+                try: cur.execute("ROLLBACK")
+                except Exception: pass
+                failed.append((cc_id, f"Błąd transakcji: {txe}"))
+                continue
+
+        # 4) Statystyki końcowe (posiadane vs zarezerwowane)
+        cur.execute("""
+            SELECT COALESCE(SUM(quantity_total),0) AS total_shares
+            FROM lots
+            WHERE UPPER(ticker)=?
+        """, (t,))
+        row = cur.fetchone()
+        total_shares = int(row["total_shares"] if row and row["total_shares"] is not None else 0)
+
+        cur.execute("""
+            SELECT COALESCE(SUM(m.shares_reserved),0) AS reserved
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE UPPER(cc.ticker)=?
+              AND cc.status='open'
+              AND cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+        """, (t, today, today))
+        row = cur.fetchone()
+        reserved = int(row["reserved"] if row and row["reserved"] is not None else 0)
+
+        # fallback do starej tabeli, jeśli mappings puste
+        if reserved == 0:
+            cur.execute("""
+                SELECT COALESCE(SUM(r.qty_reserved),0) AS reserved
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                WHERE UPPER(cc.ticker)=?
+                  AND cc.status='open'
+                  AND cc.open_date <= ?
+                  AND (cc.close_date IS NULL OR cc.close_date > ?)
+            """, (t, today, today))
+            row = cur.fetchone()
+            reserved = int(row["reserved"] if row and row["reserved"] is not None else 0)
+
+        free = total_shares - reserved
+        if free < 0:
+            free = 0
+
+        msg = f"Reset {t}: wolne {free}/{total_shares}, zarezerwowane {reserved}. Odbudowano {rebuilt}/{len(open_cc)} CC"
+        if failed:
+            fails = "; ".join([f"CC#{cid}: {why}" for cid, why in failed])
+            msg += f"; Problemy: {fails}"
+
+        return msg
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+        except Exception:
+            pass
+        print(f"❌ Błąd resetu: {e}")
+        return f"Błąd: {e}"
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def delete_covered_call(cc_id: int, confirm_delete: bool = False):
+    """
+    Usuwa CC:
+      - zwalnia rezerwacje (usuwa wpisy w cc_lot_mappings oraz options_cc_reservations),
+      - usuwa powiązane cashflow (ref_table='options_cc', ref_id=cc_id),
+      - usuwa rekord z options_cc.
+    NIE modyfikuje lots.quantity_open.
+    """
+    import sqlite3
+
+    if not confirm_delete:
+        return {'success': False, 'message': 'Brak potwierdzenia usunięcia'}
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Pobierz bazowe info (do komunikatu)
+        cur.execute("SELECT ticker, contracts, status FROM options_cc WHERE id = ?", (cc_id,))
+        row = cur.fetchone()
+        if not row:
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': f'CC #{cc_id} nie istnieje'}
+
+        ticker = row['ticker']
+        contracts = int(row['contracts'] or 0)
+        status = row['status']
+
+        # Policz ile faktycznie jest zarezerwowane (dla raportu)
+        cur.execute("SELECT COALESCE(SUM(shares_reserved),0) AS s FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+        r1 = cur.fetchone()
+        shares_released = int(r1['s'] if r1 and r1['s'] is not None else 0)
+
+        if shares_released == 0:
+            cur.execute("SELECT COALESCE(SUM(qty_reserved),0) AS s FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+            r2 = cur.fetchone()
+            shares_released = int(r2['s'] if r2 and r2['s'] is not None else 0)
+
+# 🔧 POPRAWKA: Napraw flow w delete_covered_call
+
+# Usuwanie w transakcji
+        try:
+            cur.execute("BEGIN")
+
+            # 1) ZWOLNIJ AKCJE i usuń rezerwacje
+            released = 0
+            shares_to_release = contracts * 100  # Wszystkie akcje z CC
+
+            # MAPOWANIA (cc_lot_mappings) - PRIORYTET
+            cur.execute("""
+                SELECT id, lot_id, shares_reserved
+                FROM cc_lot_mappings
+                WHERE cc_id = ?
+                ORDER BY id
+            """, (cc_id,))
+            
+            mappings = cur.fetchall() or []
+            for mapping in mappings:
+                mid = int(mapping['id'])
+                lot_id = int(mapping['lot_id'])
+                shares = int(mapping['shares_reserved'] or 0)
+                
+                if shares > 0:
+                    # 🔑 ZWIĘKSZ quantity_open
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (shares, lot_id))
+                    released += shares
+                    
+                    # Usuń mapping
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE id = ?", (mid,))
+
+            # FALLBACK: options_cc_reservations
+            if released < shares_to_release:
+                cur.execute("""
+                    SELECT id, lot_id, qty_reserved
+                    FROM options_cc_reservations
+                    WHERE cc_id = ?
+                    ORDER BY id
+                """, (cc_id,))
+                
+                reservations = cur.fetchall() or []
+                for reservation in reservations:
+                    rid = int(reservation['id'])
+                    lot_id = int(reservation['lot_id'])
+                    qty = int(reservation['qty_reserved'] or 0)
+                    
+                    if qty > 0:
+                        # 🔑 ZWIĘKSZ quantity_open
+                        cur.execute("""
+                            UPDATE lots 
+                            SET quantity_open = quantity_open + ? 
+                            WHERE id = ?
+                        """, (qty, lot_id))
+                        released += qty
+                        
+                        # Usuń rezerwację
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id = ?", (rid,))
+
+            # FIFO FALLBACK
+            if released < shares_to_release:
+                need = shares_to_release - released
+                cur.execute("""
+                    SELECT id, quantity_total, quantity_open 
+                    FROM lots 
+                    WHERE UPPER(ticker) = ? 
+                    ORDER BY buy_date ASC, id ASC
+                """, (ticker.upper(),))
+                
+                for lot_id, qty_total, qty_open in cur.fetchall() or []:
+                    if need <= 0:
+                        break
+                    potentially_blocked = int(qty_total or 0) - int(qty_open or 0)
+                    if potentially_blocked <= 0:
+                        continue
+                    take = min(potentially_blocked, need)
+                    cur.execute("""
+                        UPDATE lots 
+                        SET quantity_open = quantity_open + ? 
+                        WHERE id = ?
+                    """, (take, lot_id))
+                    need -= take
+                    released += take
+
+            # 2) Usuń powiązane cashflow
+            cur.execute("""
+                DELETE FROM cashflows
+                WHERE ref_table = 'options_cc' AND ref_id = ?
+            """, (cc_id,))
+
+            # 3) Usuń CC
+            cur.execute("DELETE FROM options_cc WHERE id = ?", (cc_id,))
+
+            # 4) COMMIT
+            cur.execute("COMMIT")
+            conn.close()
+
+            # 5) RETURN (NA KOŃCU!)
+            return {
+                'success': True,
+                'message': f'CC #{cc_id} usunięte. Zwolniono {released} akcji {ticker}',
+                'details': {
+                    'cc_id': cc_id,
+                    'ticker': ticker,
+                    'contracts': contracts,
+                    'shares_released': released
+                }
+            }
+
+        except Exception as e:
+            try:
+                cur.execute("ROLLBACK")
+            except:
+                pass
+            try:
+                conn.close()
+            except:
+                pass
+            return {'success': False, 'message': f'Błąd usuwania CC #{cc_id}: {str(e)}'}
+    
+        except Exception as txe:
+            try: cur.execute("ROLLBACK")
+            except Exception: pass
+            return {'success': False, 'message': f'Błąd usuwania (transakcja): {txe}'}
+
+        try: conn.close()
+        except Exception: pass
+
+        return {
+            'success': True,
+            'message': f'Usunięto CC #{cc_id} ({ticker}); zwolniono {shares_released} akcji',
+            'details': {
+                'ticker': ticker,
+                'shares_released': shares_released,
+                'status_prev': status,
+                'cashflows_deleted': True
+            }
+        }
+
+    except Exception as e:
+        if conn:
+            try: conn.rollback()
+            except Exception: pass
+            try: conn.close()
+            except Exception: pass
+        return {'success': False, 'message': f'Błąd usuwania CC #{cc_id}: {str(e)}'}
+
+def get_deletable_cc_list():
+    """
+    Pobiera listę CC które można usunąć (z informacjami o ryzyku).
+    shares_reserved liczone realnie z cc_lot_mappings (fallback: options_cc_reservations).
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Subzapytania: suma rezerwacji per CC w obu tabelach
+        query = """
+        SELECT
+            cc.id,
+            cc.ticker,
+            cc.contracts,
+            cc.status,
+            cc.premium_sell_usd,
+            cc.premium_sell_pln,
+            cc.open_date,
+            cc.expiry_date,
+            cc.close_date,
+            CASE 
+                WHEN cc.status = 'open' THEN 'UWAGA - zwolni rezerwacje'
+                WHEN cc.status = 'expired' THEN 'Bezpieczne - już zamknięte'
+                WHEN cc.status = 'bought_back' THEN 'Bezpieczne - już zamknięte'
+                ELSE 'Sprawdź status'
+            END AS delete_risk,
+            COALESCE(m.reserved, 0) AS reserved_mappings,
+            COALESCE(r.reserved, 0) AS reserved_simple
+        FROM options_cc cc
+        LEFT JOIN (
+            SELECT cc_id, SUM(shares_reserved) AS reserved
+            FROM cc_lot_mappings
+            GROUP BY cc_id
+        ) m ON m.cc_id = cc.id
+        LEFT JOIN (
+            SELECT cc_id, SUM(qty_reserved) AS reserved
+            FROM options_cc_reservations
+            GROUP BY cc_id
+        ) r ON r.cc_id = cc.id
+        ORDER BY cc.status, cc.open_date DESC, cc.id DESC
+        """
+        cur.execute(query)
+        rows = cur.fetchall() or []
+
+        cc_list = []
+        for row in rows:
+            reserved = int(row["reserved_mappings"] or 0)
+            if reserved == 0:
+                reserved = int(row["reserved_simple"] or 0)
+            # jeśli nadal 0 (np. historyczne wpisy bez rezerwacji), pokaż nominalne contracts*100
+            if reserved == 0:
+                reserved = int(row["contracts"] or 0) * 100
+
+            cc_list.append({
+                'id': row['id'],
+                'ticker': row['ticker'],
+                'contracts': row['contracts'],
+                'status': row['status'],
+                'premium_sell_usd': row['premium_sell_usd'],
+                'premium_sell_pln': row['premium_sell_pln'],
+                'open_date': row['open_date'],
+                'expiry_date': row['expiry_date'],
+                'close_date': row['close_date'],
+                'delete_risk': row['delete_risk'],
+                'shares_reserved': reserved
+            })
+
+        return cc_list
+
+    except Exception as e:
+        print(f"Błąd pobierania listy CC: {e}")
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+
+def update_covered_call(cc_id, **kwargs):
+    """
+    PUNKT 64: Edycja parametrów covered call
+
+    Args:
+        cc_id: ID covered call
+        **kwargs: Pola do aktualizacji (strike_usd, expiry_date, premium_sell_usd)
+
+    Returns:
+        dict: Status operacji
+    """
+    import sqlite3
+    from datetime import date as _date, datetime as _dt
+
+    conn = None
+    try:
+        if not kwargs:
+            return {'success': False, 'message': 'Brak parametrów do aktualizacji'}
+
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        # pozwala czytać po nazwach kolumn
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Pobierz aktualne dane (rozszerzone o opłaty pod korektę cashflow)
+        cur.execute("""
+            SELECT id, ticker, contracts, status, premium_sell_usd, premium_sell_pln,
+                   strike_usd, expiry_date, open_date, fx_open,
+                   COALESCE(broker_fee_sell_usd, 0.0) AS broker_fee_sell_usd,
+                   COALESCE(reg_fee_sell_usd, 0.0)     AS reg_fee_sell_usd
+            FROM options_cc
+            WHERE id = ?
+        """, (cc_id,))
+        r = cur.fetchone()
+        if not r:
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': f'CC #{cc_id} nie znalezione'}
+
+        current_cc = {
+            'id': r['id'],
+            'ticker': r['ticker'],
+            'contracts': int(r['contracts'] or 0),
+            'status': r['status'],
+            'premium_sell_usd': float(r['premium_sell_usd'] or 0.0),
+            'premium_sell_pln': float(r['premium_sell_pln'] or 0.0) if r['premium_sell_pln'] is not None else None,
+            'strike_usd': float(r['strike_usd'] or 0.0),
+            'expiry_date': r['expiry_date'],
+            'open_date': r['open_date'],    
+            'fx_open': float(r['fx_open'] or 0.0),
+            'broker_fee_sell_usd': float(r['broker_fee_sell_usd'] or 0.0),
+            'reg_fee_sell_usd': float(r['reg_fee_sell_usd'] or 0.0),
+        }
+
+        # Walidacja statusu
+        if current_cc['status'] != 'open':
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': f"Nie można edytować zamkniętego CC (status: {current_cc['status']})"}
+
+        # Dozwolone pola do update
+        allowed_fields = {
+            'strike_usd': 'strike_usd',
+            'expiry_date': 'expiry_date',
+            'premium_sell_usd': 'premium_sell_usd',
+            'open_date': 'open_date'
+        }
+
+        fields_to_update = []
+        values = []
+        changes_log = []
+
+        # Normalizacja ewentualnej daty
+        if 'expiry_date' in kwargs:
+            val = kwargs['expiry_date']
+            if hasattr(val, 'strftime'):
+                kwargs['expiry_date'] = val.strftime('%Y-%m-%d')
+            elif isinstance(val, str):
+                # spróbuj sparsować popularne formaty i sprowadzić do ISO
+                try:
+                    kwargs['expiry_date'] = _dt.strptime(val, '%Y-%m-%d').date().isoformat()
+                except Exception:
+                    # jeśli nieznany format, zostaw jak jest (DB przyjmie tekst)
+                    pass
+
+        # Zbierz zmiany pól głównych
+        for field, db_field in allowed_fields.items():
+            if field in kwargs:
+                new_value = kwargs[field]
+                old_value = current_cc[db_field] if db_field in current_cc else None
+                fields_to_update.append(f"{db_field} = ?")
+                values.append(new_value)
+                changes_log.append(f"{field}: {old_value} → {new_value}")
+
+        if not fields_to_update:
+            try: conn.close()
+            except Exception: pass
+            return {'success': False, 'message': 'Brak prawidłowych pól do aktualizacji'}
+
+        # Jeśli zmieniono premium → przelicz premium_sell_pln (GROSS) oraz skoryguj cashflow (NETTO)
+        if 'premium_sell_usd' in kwargs:
+            new_premium_per_share_usd = float(kwargs['premium_sell_usd'])
+            contracts = current_cc['contracts']
+            fx_rate = current_cc['fx_open']
+
+            # GROSS premium (całość, wg Twojej konwencji przechowywanej w options_cc)
+            gross_premium_usd = new_premium_per_share_usd * contracts * 100.0
+            premium_sell_pln = round(gross_premium_usd * fx_rate, 2)
+
+            fields_to_update.append("premium_sell_pln = ?")
+            values.append(premium_sell_pln)
+            changes_log.append(f"premium_sell_pln: {current_cc['premium_sell_pln']} → {premium_sell_pln}")
+
+            # Korekta cashflow 'option_premium' → NETTO (gross - fees)
+            total_fees_usd = (current_cc['broker_fee_sell_usd'] or 0.0) + (current_cc['reg_fee_sell_usd'] or 0.0)
+            net_premium_usd = gross_premium_usd - total_fees_usd
+            amount_pln = round(net_premium_usd * fx_rate, 2)
+
+            # Zaktualizuj wyłącznie powiązany cashflow premium (nie ruszamy buyback/others)
+            cur.execute("""
+                UPDATE cashflows
+                SET amount_usd = ?, amount_pln = ?, fx_rate = ?
+                WHERE ref_table = 'options_cc' AND ref_id = ? AND type = 'option_premium'
+            """, (net_premium_usd, amount_pln, fx_rate, cc_id))
+
+        # Dołóż znacznik aktualizacji
+        fields_to_update.append("updated_at = CURRENT_TIMESTAMP")
+        values.append(cc_id)
+
+        # Wykonaj update w options_cc
+        query = f"UPDATE options_cc SET {', '.join(fields_to_update)} WHERE id = ?"
+        cur.execute(query, values)
+
+        conn.commit()
+        try: conn.close()
+        except Exception: pass
+
+        return {
+            'success': True,
+            'message': f'CC #{cc_id} zaktualizowane pomyślnie',
+            'changes': changes_log
+        }
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd aktualizacji CC #{cc_id}: {str(e)}'}
+
+
+
+def bulk_delete_covered_calls(cc_ids, confirm_bulk=False):
+    """
+    PUNKT 64: Masowe usuwanie covered calls
+    
+    Args:
+        cc_ids: Lista ID do usunięcia  
+        confirm_bulk: Potwierdzenie operacji masowej
+    
+    Returns:
+        dict: Status operacji z szczegółami
+    """
+    try:
+        if not cc_ids:
+            return {'success': False, 'message': 'Brak CC do usunięcia'}
+        
+        if not confirm_bulk:
+            return {'success': False, 'message': 'Operacja wymaga potwierdzenia'}
+        
+        results = {
+            'success': True,
+            'total_requested': len(cc_ids),
+            'deleted': 0,
+            'failed': 0,
+            'shares_released': {},
+            'errors': []
+        }
+        
+        print(f"🗑️ BULK DELETE: Usuwanie {len(cc_ids)} CC...")
+        
+        for cc_id in cc_ids:
+            delete_result = delete_covered_call(cc_id, confirm_delete=True)
+            
+            if delete_result['success']:
+                results['deleted'] += 1
+                details = delete_result['details']
+                ticker = details['ticker']
+                
+                if ticker in results['shares_released']:
+                    results['shares_released'][ticker] += details['shares_released']
+                else:
+                    results['shares_released'][ticker] = details['shares_released']
+                
+                print(f"   ✅ CC #{cc_id}: {ticker} - OK")
+                
+            else:
+                results['failed'] += 1
+                results['errors'].append(f"CC #{cc_id}: {delete_result['message']}")
+                print(f"   ❌ CC #{cc_id}: {delete_result['message']}")
+        
+        if results['failed'] > 0:
+            results['success'] = False
+            results['message'] = f"Usunięto {results['deleted']}/{results['total_requested']} CC (błędy: {results['failed']})"
+        else:
+            results['message'] = f"Pomyślnie usunięto wszystkie {results['deleted']} CC"
+        
+        return results
+        
+    except Exception as e:
+        return {
+            'success': False,
+            'message': f'Błąd bulk delete: {str(e)}',
+            'deleted': 0,
+            'failed': len(cc_ids)
+        }
+
+
+def get_cc_edit_candidates():
+    """
+    Pobiera CC które można edytować (tylko otwarte as-of dziś) wraz z realną liczbą zarezerwowanych akcji.
+    """
+    import sqlite3
+    from datetime import date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        today = _date.today().isoformat()
+
+        # Tylko faktycznie otwarte CC na dziś (chronologia + status)
+        cur.execute("""
+            SELECT id, ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                   expiry_date, open_date, fx_open
+            FROM options_cc
+            WHERE status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+            ORDER BY open_date DESC, id DESC
+        """, (today, today))
+        rows = cur.fetchall() or []
+
+        candidates = []
+        for r in rows:
+            cc_id = int(r["id"])
+            contracts = int(r["contracts"] or 0)
+
+            # Rzeczywiste rezerwacje dla tego CC
+            cur.execute("SELECT COALESCE(SUM(shares_reserved),0) AS s FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+            rr = cur.fetchone()
+            shares_reserved = int(rr["s"] if rr and rr["s"] is not None else 0)
+
+            if shares_reserved == 0:
+                cur.execute("SELECT COALESCE(SUM(qty_reserved),0) AS s FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+                rr2 = cur.fetchone()
+                shares_reserved = int(rr2["s"] if rr2 and rr2["s"] is not None else 0)
+
+            if shares_reserved == 0:
+                # historyczny fallback — nominalnie kontrakty * 100
+                shares_reserved = contracts * 100
+
+            candidates.append({
+                'id': cc_id,
+                'ticker': r['ticker'],
+                'contracts': contracts,
+                'strike_usd': float(r['strike_usd'] or 0),
+                'premium_sell_usd': float(r['premium_sell_usd'] or 0),
+                'premium_sell_pln': float(r['premium_sell_pln'] or 0) if r['premium_sell_pln'] is not None else None,
+                'expiry_date': r['expiry_date'],
+                'open_date': r['open_date'],
+                'fx_open': float(r['fx_open'] or 0),
+                'shares_reserved': shares_reserved
+            })
+
+        return candidates
+
+    except Exception as e:
+        print(f"Błąd pobierania CC do edycji: {e}")
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def get_cc_coverage_details(cc_id=None):
+    """
+    PUNKT 66: Pobiera szczegółowe informacje o pokryciu CC przez LOT-y
+    - Źródłem prawdy o alokacjach są cc_lot_mappings (fallback: options_cc_reservations).
+    - Gdy cc_id=None: bierzemy wszystkie CC faktycznie otwarte as-of dziś.
+    """
+    import sqlite3
+    from datetime import date as _date, datetime as _dt
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        # czytanie po nazwach kolumn
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        today = _date.today().isoformat()
+
+        # 1) Pobierz CC do analizy
+        if cc_id:
+            cur.execute("""
+                SELECT id, ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                       open_date, expiry_date, fx_open
+                FROM options_cc
+                WHERE id = ? AND status = 'open'
+            """, (cc_id,))
+        else:
+            cur.execute("""
+                SELECT id, ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                       open_date, expiry_date, fx_open
+                FROM options_cc
+                WHERE status = 'open'
+                  AND open_date <= ?
+                  AND (close_date IS NULL OR close_date > ?)
+                ORDER BY ticker, open_date, id
+            """, (today, today))
+
+        cc_rows = cur.fetchall() or []
+        if not cc_rows:
+            return []
+
+        coverage_details = []
+
+        for cc in cc_rows:
+            _cc_id = int(cc["id"])
+            ticker = cc["ticker"]
+            contracts = int(cc["contracts"] or 0)
+            shares_needed = contracts * 100
+            strike_usd = float(cc["strike_usd"] or 0)
+            premium_sell_usd = float(cc["premium_sell_usd"] or 0)
+            premium_sell_pln = float(cc["premium_sell_pln"] or 0) if cc["premium_sell_pln"] is not None else 0.0
+            open_date = cc["open_date"]
+            expiry_date = cc["expiry_date"]
+            fx_open = float(cc["fx_open"] or 0)
+
+            # 2) Pobierz realne alokacje LOT-ów z cc_lot_mappings (fallback: options_cc_reservations)
+            cur.execute("""
+                SELECT m.lot_id, m.shares_reserved AS qty
+                FROM cc_lot_mappings m
+                WHERE m.cc_id = ?
+                ORDER BY m.id
+            """, (_cc_id,))
+            map_rows = cur.fetchall() or []
+
+            if not map_rows:
+                cur.execute("""
+                    SELECT r.lot_id, r.qty_reserved AS qty
+                    FROM options_cc_reservations r
+                    WHERE r.cc_id = ?
+                    ORDER BY r.id
+                """, (_cc_id,))
+                map_rows = cur.fetchall() or []
+
+            # 3) Dociągnij dane LOT-ów i policz koszt na akcję
+            lot_allocations = []
+            total_cost_basis = 0.0
+
+            for mr in map_rows:
+                lot_id = int(mr["lot_id"])
+                qty = int(mr["qty"] or 0)
+                if qty <= 0:
+                    continue
+
+                cur.execute("""
+                    SELECT id, quantity_total, buy_date, buy_price_usd, fx_rate, cost_pln
+                    FROM lots
+                    WHERE id = ?
+                """, (lot_id,))
+                lot = cur.fetchone()
+                if not lot:
+                    continue
+
+                qty_total = int(lot["quantity_total"] or 0)
+                cost_pln = float(lot["cost_pln"] or 0.0) if lot["cost_pln"] is not None else 0.0
+                cost_per_share_pln = (cost_pln / qty_total) if qty_total > 0 else 0.0
+                total_cost_pln = round(cost_per_share_pln * qty, 2)
+                total_cost_basis += total_cost_pln
+
+                lot_allocations.append({
+                    'lot_id': int(lot["id"]),
+                    'buy_date': lot["buy_date"],
+                    'buy_price_usd': float(lot["buy_price_usd"] or 0) if lot["buy_price_usd"] is not None else 0.0,
+                    'fx_rate': float(lot["fx_rate"] or 0) if lot["fx_rate"] is not None else 0.0,
+                    'cost_per_share_pln': round(cost_per_share_pln, 4),
+                    'shares_allocated': qty,
+                    'total_cost_pln': total_cost_pln
+                })
+
+            # 4) Daty + metryki czasowe
+            def _to_date(x):
+                if hasattr(x, 'strftime'):
+                    return x
+                if isinstance(x, str):
+                    try:
+                        return _dt.strptime(x, '%Y-%m-%d').date()
+                    except Exception:
+                        return None
+                return None
+
+            open_date_obj = _to_date(open_date)
+            expiry_date_obj = _to_date(expiry_date)
+            today_obj = _date.today()
+
+            days_to_expiry = (expiry_date_obj - today_obj).days if expiry_date_obj else None
+            days_held = (today_obj - open_date_obj).days + 1 if open_date_obj else None
+            total_days = (expiry_date_obj - open_date_obj).days + 1 if (open_date_obj and expiry_date_obj) else None
+
+            # 5) Yields
+            premium_yield_pct = (premium_sell_pln / total_cost_basis * 100.0) if total_cost_basis > 0 else 0.0
+            annualized_yield_pct = (premium_yield_pct * 365.0 / total_days) if (total_days and total_days > 0) else 0.0
+
+            coverage_details.append({
+                'cc_id': _cc_id,
+                'ticker': ticker,
+                'contracts': contracts,
+                'shares_needed': shares_needed,
+                'strike_usd': strike_usd,
+                'premium_sell_usd': premium_sell_usd,
+                'premium_sell_pln': premium_sell_pln,
+                'open_date': open_date,
+                'expiry_date': expiry_date,
+                'fx_open': fx_open,
+                'days_to_expiry': days_to_expiry if days_to_expiry is not None else 0,
+                'days_held': days_held if days_held is not None else 0,
+                'total_days': total_days if total_days is not None else 0,
+                'lot_allocations': lot_allocations,
+                'total_cost_basis': round(total_cost_basis, 2),
+                'premium_yield_pct': round(premium_yield_pct, 4) if premium_yield_pct else 0.0,
+                'annualized_yield_pct': round(annualized_yield_pct, 4) if annualized_yield_pct else 0.0
+            })
+
+        return coverage_details
+
+    except Exception as e:
+        print(f"Błąd get_cc_coverage_details: {e}")
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+
+def get_portfolio_cc_summary():
+    """
+    PUNKT 66: Podsumowanie całego portfela CC (as-of dziś, z realnymi rezerwacjami).
+    """
+    import sqlite3
+    from datetime import date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        today = _date.today().isoformat()
+
+        # --- OPEN / CLOSED counts & sums (OPEN as-of today) ---
+        cur.execute("""
+            SELECT COUNT(*) AS open_cc_count,
+                   COALESCE(SUM(contracts),0) AS total_open_contracts,
+                   COALESCE(SUM(premium_sell_pln),0) AS total_open_premium_pln
+            FROM options_cc
+            WHERE status='open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+        """, (today, today))
+        r_open = cur.fetchone()
+        open_cc_count = int(r_open["open_cc_count"] or 0)
+        total_open_contracts = int(r_open["total_open_contracts"] or 0)
+        total_open_premium_pln = float(r_open["total_open_premium_pln"] or 0.0)
+
+        cur.execute("""
+            SELECT COUNT(*) AS closed_cc_count,
+                   COALESCE(SUM(pl_pln),0) AS total_realized_pl_pln
+            FROM options_cc
+            WHERE status <> 'open'
+        """)
+        r_closed = cur.fetchone()
+        closed_cc_count = int(r_closed["closed_cc_count"] or 0)
+        total_realized_pl_pln = float(r_closed["total_realized_pl_pln"] or 0.0)
+
+        # --- REAL reserved shares for OPEN CC (as-of today) ---
+        cur.execute("""
+            SELECT UPPER(cc.ticker) AS ticker,
+                   COALESCE(SUM(m.shares_reserved),0) AS reserved
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE cc.status='open'
+              AND cc.open_date <= ?
+              AND (cc.close_date IS NULL OR cc.close_date > ?)
+            GROUP BY UPPER(cc.ticker)
+        """, (today, today))
+        reserved_map = {row["ticker"]: int(row["reserved"] or 0) for row in (cur.fetchall() or [])}
+
+        # Fallback do options_cc_reservations dla tickerów z 0 w mappings
+        need_fallback = []
+        if open_cc_count > 0:
+            cur.execute("""
+                SELECT DISTINCT UPPER(ticker) AS ticker
+                FROM options_cc
+                WHERE status='open'
+                  AND open_date <= ?
+                  AND (close_date IS NULL OR close_date > ?)
+            """, (today, today))
+            open_tickers = [row["ticker"] for row in (cur.fetchall() or [])]
+            need_fallback = [t for t in open_tickers if reserved_map.get(t, 0) == 0]
+
+        if need_fallback:
+            cur.execute(f"""
+                SELECT UPPER(cc.ticker) AS ticker,
+                       COALESCE(SUM(r.qty_reserved),0) AS reserved
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                WHERE cc.status='open'
+                  AND cc.open_date <= ?
+                  AND (cc.close_date IS NULL OR cc.close_date > ?)
+                  AND UPPER(cc.ticker) IN ({",".join(["?"]*len(need_fallback))})
+                GROUP BY UPPER(cc.ticker)
+            """, [today, today, *need_fallback])
+            for row in (cur.fetchall() or []):
+                t = row["ticker"]
+                reserved_map[t] = int(row["reserved"] or 0)
+
+        # Suma rezerwacji (jeśli brak — nominalnie 0; nie używamy contracts*100 do sumy globalnej)
+        total_shares_reserved = sum(reserved_map.values()) if reserved_map else 0
+
+        # --- Stats per ticker (OPEN as-of today) ---
+        cur.execute("""
+            SELECT UPPER(ticker) AS ticker,
+                   COUNT(*) AS cc_count,
+                   COALESCE(SUM(contracts),0) AS total_contracts,
+                   COALESCE(SUM(premium_sell_pln),0) AS total_premium_pln
+            FROM options_cc
+            WHERE status='open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+            GROUP BY UPPER(ticker)
+            ORDER BY UPPER(ticker)
+        """, (today, today))
+        rows = cur.fetchall() or []
+
+        ticker_stats = []
+        for row in rows:
+            t = row["ticker"]
+            contracts = int(row["total_contracts"] or 0)
+            real_reserved = int(reserved_map.get(t, 0))
+            ticker_stats.append({
+                'ticker': t,
+                'cc_count': int(row["cc_count"] or 0),
+                'total_contracts': contracts,
+                'shares_reserved': real_reserved,                # realnie zarezerwowane
+                'total_premium_pln': float(row["total_premium_pln"] or 0.0)
+            })
+
+        return {
+            'open_cc_count': open_cc_count,
+            'closed_cc_count': closed_cc_count,
+            'total_open_contracts': total_open_contracts,
+            'total_shares_reserved': total_shares_reserved,
+            'total_open_premium_pln': total_open_premium_pln,
+            'total_realized_pl_pln': total_realized_pl_pln,
+            'ticker_stats': ticker_stats
+        }
+
+    except Exception as e:
+        print(f"Błąd get_portfolio_cc_summary: {e}")
+        return {}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+        
+@cached_aggregate('options_cc', 'cc_lot_mappings', 'options_cc_reservations', 'lots')
+def get_closed_cc_analysis():
+    """
+    PUNKT 67: Szczegółowa analiza zamkniętych CC z P/L
+    - P/L w PLN: expired → premium_sell_pln; bought_back → premium_sell_pln - premium_buyback_pln
+    - Koszt bazowy: suma (cost_pln/quantity_total * qty_alloc) po realnych alokacjach z cc_lot_mappings (fallback: options_cc_reservations)
+    - Annualizowanie wg dni od open_date do close_date (lub expiry_date, jeśli close_date brak)
+    """
+    import sqlite3
+    from datetime import datetime as _dt, date as _date
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return []
+
+        # Dostęp kolumnami po nazwach
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # Pobierz zamknięte CC (kwoty PLN w groszach - kolumny *_cents, migracja schematu 9)
+        cur.execute("""
+            SELECT id, ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln_cents,
+                   premium_buyback_usd, premium_buyback_pln_cents, open_date, close_date, expiry_date,
+                   status, fx_open, fx_close, pl_pln_cents, created_at
+            FROM options_cc
+            WHERE status IN ('bought_back', 'expired', 'assigned')
+            ORDER BY close_date DESC, ticker, id DESC
+        """)
+        rows = cur.fetchall() or []
+
+        # Rzeczywiste alokacje wszystkich zamkniętych CC jednym zapytaniem na tabelę:
+        # najpierw cc_lot_mappings, fallback options_cc_reservations (per CC)
+        def _load_allocations(table, qty_column):
+            cur.execute(f"""
+                SELECT a.cc_id, a.lot_id, COALESCE(SUM(a.{qty_column}), 0) AS qty,
+                       l.quantity_total, l.buy_date, l.buy_price_usd, l.fx_rate, l.cost_pln_cents
+                FROM {table} a
+                JOIN options_cc oc ON oc.id = a.cc_id
+                JOIN lots l ON l.id = a.lot_id
+                WHERE oc.status IN ('bought_back', 'expired', 'assigned')
+                GROUP BY a.cc_id, a.lot_id
+                ORDER BY a.cc_id, a.lot_id
+            """)
+            by_cc = {}
+            for ar in cur.fetchall() or []:
+                by_cc.setdefault(int(ar["cc_id"]), []).append(ar)
+            return by_cc
+
+        mapping_allocs = _load_allocations('cc_lot_mappings', 'shares_reserved')
+        legacy_allocs = _load_allocations('options_cc_reservations', 'qty_reserved')
+
+        out = []
+
+        for r in rows:
+            cc_id = int(r["id"])
+            ticker = r["ticker"]
+            contracts = int(r["contracts"] or 0)
+            shares_nominal = contracts * 100
+            strike_usd = float(r["strike_usd"] or 0.0)
+
+            premium_sell_usd = float(r["premium_sell_usd"] or 0.0)
+            premium_sell_cents = int(r["premium_sell_pln_cents"] or 0)
+            premium_buyback_usd = float(r["premium_buyback_usd"] or 0.0) if r["premium_buyback_usd"] is not None else 0.0
+            premium_buyback_cents = int(r["premium_buyback_pln_cents"] or 0)
+
+            status = r["status"]
+            fx_open = float(r["fx_open"] or 0.0)
+            fx_close = float(r["fx_close"] or 0.0) if r["fx_close"] is not None else fx_open
+
+            open_date = r["open_date"]
+            close_date = r["close_date"]
+            expiry_date = r["expiry_date"]
+
+            # Daty -> date
+            def _to_date(x):
+                if not x:
+                    return None
+                if hasattr(x, "strftime"):
+                    return x
+                if isinstance(x, str):
+                    try:
+                        return _dt.strptime(x, "%Y-%m-%d").date()
+                    except Exception:
+                        return None
+                return None
+
+            od = _to_date(open_date)
+            cd = _to_date(close_date) or _to_date(expiry_date)  # na wszelki wypadek
+            days_held = (cd - od).days if (od and cd) else 0
+            if days_held <= 0:
+                days_held = 1  # uniknij dzielenia przez 0
+
+            alloc_rows = mapping_allocs.get(cc_id) or legacy_allocs.get(cc_id) or []
+
+            # Zbuduj pokrycie per LOT + policz koszt bazowy (grosze)
+            lot_allocations = []
+            cost_basis_cents = 0
+            total_alloc_shares = 0
+
+            for ar in alloc_rows:
+                qty = int(ar["qty"] or 0)
+                if qty <= 0:
+                    continue
+                qty_total = int(ar["quantity_total"] or 0)
+                lot_cost_cents = int(ar["cost_pln_cents"] or 0)
+                alloc_cost_cents = money.prorate_cents(lot_cost_cents, qty, qty_total)
+                cps_pln = money.from_cents(lot_cost_cents) / qty_total if qty_total > 0 else 0.0
+
+                cost_basis_cents += alloc_cost_cents
+                total_alloc_shares += qty
+
+                lot_allocations.append({
+                    "lot_id": int(ar["lot_id"]),
+                    "buy_date": ar["buy_date"],
+                    "buy_price_usd": float(ar["buy_price_usd"] or 0.0) if ar["buy_price_usd"] is not None else 0.0,
+                    "fx_rate": float(ar["fx_rate"] or 0.0) if ar["fx_rate"] is not None else 0.0,
+                    "cost_per_share_pln": round(cps_pln, 4),
+                    "shares_allocated": qty,
+                    "total_cost_pln": money.from_cents(alloc_cost_cents),
+                })
+
+            # Jeśli brak alokacji (historyczne rekordy), załóż nominalne udziały i koszt bazowy ~0 (yield wtedy 0)
+            if total_alloc_shares == 0:
+                total_alloc_shares = shares_nominal
+                # DODAJ FALLBACK DLA COST BASIS:
+                if cost_basis_cents == 0:
+                    # Dla historycznych CC bez mapowań - użyj premium jako przybliżony koszt
+                    cost_basis_cents = premium_sell_cents * 5  # zakładamy ~20% yield
+
+            # P/L w PLN (jeśli brak – wylicz)
+            recorded_pl_cents = int(r["pl_pln_cents"]) if r["pl_pln_cents"] is not None else None
+            if not recorded_pl_cents:
+                if status in ("expired", "assigned"):
+                    pl_cents = premium_sell_cents
+                else:  # bought_back
+                    pl_cents = premium_sell_cents - premium_buyback_cents
+            else:
+                pl_cents = recorded_pl_cents
+
+            premium_sell_pln = money.from_cents(premium_sell_cents)
+            premium_buyback_pln = money.from_cents(premium_buyback_cents)
+            pl_pln = money.from_cents(pl_cents)
+            total_cost_basis_pln = money.from_cents(cost_basis_cents)
+
+            # Net premium (info pomocnicze; w USD/PLN)
+            if status == "expired":
+                net_premium_usd = premium_sell_usd
+                net_premium_pln = premium_sell_pln
+                outcome_emoji = "🏆"
+                outcome_text = "Expired (Max Profit)"
+            elif status == "assigned":  # ← DODAJ TĘ SEKCJĘ (TEGO BRAKOWAŁO!)
+                net_premium_usd = premium_sell_usd
+                net_premium_pln = premium_sell_pln
+                outcome_emoji = "📞"
+                outcome_text = "Assigned (Max Profit)"
+            else:  # bought_back
+                net_premium_usd = premium_sell_usd - premium_buyback_usd
+                net_premium_pln = money.from_cents(premium_sell_cents - premium_buyback_cents)
+                outcome_emoji = "🔄"
+                outcome_text = "Bought Back"
+
+            # Yields na realnym koszcie bazowym
+            premium_yield_pct = (pl_cents / cost_basis_cents * 100.0) if cost_basis_cents > 0 else 0.0
+            annualized_yield_pct = (premium_yield_pct * 365.0 / days_held) if days_held > 0 else 0.0
+
+            out.append({
+                "cc_id": cc_id,
+                "ticker": ticker,
+                "contracts": contracts,
+                "shares": total_alloc_shares,             # realnie policzone z alokacji (fallback: nominal)
+                "strike_usd": strike_usd,
+                "premium_sell_usd": premium_sell_usd,
+                "premium_sell_pln": premium_sell_pln,
+                "premium_buyback_usd": premium_buyback_usd,
+                "premium_buyback_pln": premium_buyback_pln,
+                "open_date": open_date,
+                "close_date": close_date,
+                "expiry_date": expiry_date,
+                "status": status,
+                "fx_open": fx_open,
+                "fx_close": fx_close or fx_open,
+                "pl_pln": pl_pln,                         # skorygowany/wyliczony P&L w PLN
+                "created_at": r["created_at"],
+                # metryki
+                "days_held": days_held,
+                "net_premium_usd": net_premium_usd,
+                "net_premium_pln": net_premium_pln,
+                "outcome_emoji": outcome_emoji,
+                "outcome_text": outcome_text,
+                "estimated_total_cost": total_cost_basis_pln,  # to już realny koszt bazowy
+                "premium_yield_pct": round(premium_yield_pct, 4),
+                "annualized_yield_pct": round(annualized_yield_pct, 4),
+                "lot_allocations": lot_allocations,
+            })
+
+        return out
+
+    except Exception as e:
+        print(f"Błąd get_closed_cc_analysis: {e}")
+        return []
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+
+@cached_aggregate('options_cc')
+def get_cc_performance_summary():
+    """
+    PUNKT 67: Podsumowanie performance wszystkich CC (z wyliczanym P/L dla braków).
+    - P/L używany do statystyk: IF pl_pln IS NULL THEN
+        CASE status WHEN 'expired' THEN premium_sell_pln
+                    WHEN 'assigned' THEN premium_sell_pln
+                    WHEN 'bought_back' THEN premium_sell_pln - COALESCE(premium_buyback_pln,0)
+        END
+      ELSE pl_pln END
+    """
+    import sqlite3
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # --- GLOBAL STATS (zamknięte CC) ---
+        # P/L sumowany dokładnie w groszach (kolumny *_cents, migracja schematu 9)
+        cur.execute("""
+            SELECT
+                COUNT(*) AS total_closed,
+                SUM(CASE WHEN status='expired' THEN 1 ELSE 0 END) AS expired_count,
+                SUM(CASE WHEN status='assigned' THEN 1 ELSE 0 END) AS assigned_count,
+                SUM(CASE WHEN status='bought_back' THEN 1 ELSE 0 END) AS buyback_count,
+                SUM(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS total_realized_pl,
+                AVG(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS avg_pl_per_cc,
+                MIN(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS worst_pl,
+                MAX(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS best_pl
+            FROM options_cc
+            WHERE status IN ('bought_back','expired','assigned')
+        """)
+        g = cur.fetchone()
+
+        # --- PER TICKER STATS ---
+        cur.execute("""
+            SELECT
+                UPPER(ticker) AS ticker,
+                COUNT(*) AS cc_count,
+                SUM(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS total_pl,
+                AVG(
+                    CASE
+                        WHEN pl_pln_cents IS NOT NULL THEN pl_pln_cents
+                        WHEN status='expired' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='assigned' THEN COALESCE(premium_sell_pln_cents,0)
+                        WHEN status='bought_back' THEN COALESCE(premium_sell_pln_cents,0) - COALESCE(premium_buyback_pln_cents,0)
+                        ELSE 0
+                    END
+                ) AS avg_pl,
+                SUM(CASE WHEN status='expired' THEN 1 ELSE 0 END) AS expired_count,
+                SUM(CASE WHEN status='assigned' THEN 1 ELSE 0 END) AS assigned_count,
+                SUM(CASE WHEN status='bought_back' THEN 1 ELSE 0 END) AS buyback_count
+            FROM options_cc
+            WHERE status IN ('bought_back','expired','assigned')
+            GROUP BY UPPER(ticker)
+            ORDER BY total_pl DESC, ticker ASC
+        """)
+        rows = cur.fetchall() or []
+
+        ticker_performance = []
+        for r in rows:
+            cc_count = int(r["cc_count"] or 0)
+            expired_count = int(r["expired_count"] or 0)
+            ticker_performance.append({
+                'ticker': r['ticker'],
+                'cc_count': cc_count,
+                'total_pl': money.from_cents(r['total_pl']),
+                'avg_pl': money.from_cents(r['avg_pl']),
+                'expired_count': expired_count,
+                'buyback_count': int(r['buyback_count'] or 0),
+                # zachowuję Twój wcześniejszy sposób liczenia „win_rate”
+                'win_rate': (expired_count / cc_count * 100.0) if cc_count > 0 else 0.0
+            })
+
+        if not g:
+            return {
+                'total_closed': 0,
+                'expired_count': 0,
+                'buyback_count': 0,
+                'total_realized_pl': 0.0,
+                'avg_pl_per_cc': 0.0,
+                'worst_pl': 0.0,
+                'best_pl': 0.0,
+                'ticker_performance': ticker_performance
+            }
+
+        summary = {
+            'total_closed': int(g['total_closed'] or 0),
+            'expired_count': int(g['expired_count'] or 0),
+            'assigned_count': int(g['assigned_count'] or 0),
+            'buyback_count': int(g['buyback_count'] or 0),
+            'total_realized_pl': money.from_cents(g['total_realized_pl']),
+            'avg_pl_per_cc': money.from_cents(g['avg_pl_per_cc']),
+            'worst_pl': money.from_cents(g['worst_pl']),
+            'best_pl': money.from_cents(g['best_pl']),
+            'ticker_performance': ticker_performance
+        }
+        return summary
+
+    except Exception as e:
+        print(f"Błąd get_cc_performance_summary: {e}")
+        return {}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def buyback_covered_call_with_fees(cc_id, buyback_price_usd, buyback_date, broker_fee_usd=0.0, reg_fee_usd=0.0):
+    """
+    Buyback CC:
+      1) zamyka CC jako 'bought_back' (PL po prowizjach),
+      2) zwalnia rezerwacje (usuwa wpisy w cc_lot_mappings/options_cc_reservations) 
+         i ZWIĘKSZA lots.quantity_open,
+      3) ma FIFO fallback jeśli mapowań brakuje/nie sumują się do pełnej ilości,
+      4) tworzy cashflow 'option_buyback'.
+    """
+    from db.fx import get_fx_rate_for_date
+    import sqlite3
+    from datetime import datetime as _dt
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # 1) Pobierz CC
+        cur.execute("""
+            SELECT id, ticker, contracts, premium_sell_usd, premium_sell_pln, open_date, expiry_date,
+                   status, fx_open
+            FROM options_cc WHERE id = ?
+        """, (cc_id,))
+        
+        row = cur.fetchone()
+        if not row:
+            conn.close()
+            return {'success': False, 'message': f'CC #{cc_id} nie istnieje'}
+
+        if row['status'] != 'open':
+            conn.close()
+            return {'success': False, 'message': f'CC #{cc_id} ma status {row["status"]}, nie można odkupić'}
+
+        # Dane CC
+        ticker = row['ticker']
+        contracts = int(row['contracts'] or 0)
+        premium_sell_pln = float(row['premium_sell_pln'] or 0.0)
+        fx_open = float(row['fx_open'] or 1.0)
+        
+        # Buyback date string
+        buyback_date_str = buyback_date.strftime('%Y-%m-%d') if hasattr(buyback_date, 'strftime') else str(buyback_date)
+        
+        # 2) Pobierz kurs NBP D-1
+        fx_close, fx_close_date = get_fx_rate_for_date(buyback_date_str, fallback_rate=fx_open)
+
+        # 3) Kalkulacje finansowe
+        fees_usd = float(broker_fee_usd or 0.0) + float(reg_fee_usd or 0.0)
+        buyback_cost_usd = float(buyback_price_usd) * contracts
+        total_buyback_usd = buyback_cost_usd + fees_usd
+        total_buyback_pln = round(total_buyback_usd * fx_close, 2)
+        
+        # P/L = premia sprzedaży - koszt buyback (w PLN)
+        pl_pln = premium_sell_pln - total_buyback_pln
+
+        # 4) BEGIN TRANSACTION
+        cur.execute("SAVEPOINT sp_bb")
+        shares_to_release = contracts * 100
+
+        try:
+            # 5) Aktualizuj CC
+            cur.execute("""
+                UPDATE options_cc SET
+                    status = 'bought_back',
+                    close_date = ?,
+                    premium_buyback_usd = ?, 
+                    premium_buyback_pln = ?,
+                    fx_close = ?,
+                    broker_fee_usd = ?,
+                    reg_fee_usd = ?,
+                    fees_pln = ?,
+                    pl_pln = ?
+                WHERE id = ?
+            """, (
+                buyback_date_str, buyback_cost_usd, buyback_cost_usd * fx_close, fx_close,
+                float(broker_fee_usd or 0.0), float(reg_fee_usd or 0.0), 
+                round(fees_usd * fx_close, 2), pl_pln, cc_id
+            ))
+
+            # 6) 🔑 KLUCZOWE: ZWOLNIJ REZERWACJE I ZWIĘKSZ quantity_open
+            released = 0
+
+            # Prioritet: cc_lot_mappings (nowa tabela)
+            cur.execute("""
+                SELECT id, lot_id, shares_reserved
+                FROM cc_lot_mappings
+                WHERE cc_id = ? ORDER BY id
+            """, (cc_id,))
+                
+            for mapping in cur.fetchall() or []:
+                if released >= shares_to_release: 
+                    break
+                    
+                mid = int(mapping['id'])
+                lot_id = int(mapping['lot_id'])
+                qty = int(mapping['shares_reserved'] or 0)
+                    
+                if qty <= 0: 
+                    continue
+                    
+                take = min(qty, shares_to_release - released)
+                new_qty = qty - take
+                    
+                # 🔑 USUŃ lub ZMNIEJSZ rezerwację
+                if new_qty > 0:
+                    cur.execute("UPDATE cc_lot_mappings SET shares_reserved = ? WHERE id = ?", 
+                              (new_qty, mid))
+                else:
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE id = ?", (mid,))
+                    
+                # 🔑 ZWIĘKSZ quantity_open w LOT-ie
+                cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", 
+                          (take, lot_id))
+                released += take
+
+            # Fallback: options_cc_reservations (stara tabela)
+            if released < shares_to_release:
+                cur.execute("""
+                    SELECT id, lot_id, qty_reserved
+                    FROM options_cc_reservations
+                    WHERE cc_id = ? ORDER BY id
+                """, (cc_id,))
+                    
+                for reservation in cur.fetchall() or []:
+                    if released >= shares_to_release:
+                        break
+                        
+                    rid = int(reservation['id'])
+                    lot_id = int(reservation['lot_id'])
+                    qty = int(reservation['qty_reserved'] or 0)
+                        
+                    if qty <= 0:
+                        continue
+                        
+                    take = min(qty, shares_to_release - released)
+                    new_qty = qty - take
+                        
+                    # 🔑 USUŃ lub ZMNIEJSZ rezerwację
+                    if new_qty > 0:
+                        cur.execute("UPDATE options_cc_reservations SET qty_reserved = ? WHERE id = ?", 
+                                  (new_qty, rid))
+                    else:
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id = ?", (rid,))
+                        
+                    # 🔑 ZWIĘKSZ quantity_open w LOT-ie
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", 
+                              (take, lot_id))
+                    released += take
+
+            # FIFO fallback (gdy mapowania nie pokryły wszystkiego)
+            if released < shares_to_release:
+                need = shares_to_release - released
+                cur.execute("""
+                    SELECT id, quantity_total, quantity_open
+                    FROM lots
+                    WHERE UPPER(ticker) = ?
+                    ORDER BY buy_date ASC, id ASC
+                """, (ticker.upper(),))
+                
+                for lot_id, qty_total, qty_open in cur.fetchall() or []:
+                    if need <= 0: 
+                        break
+                    potentially_blocked = int(qty_total or 0) - int(qty_open or 0)
+                    if potentially_blocked <= 0: 
+                        continue
+                    take = min(potentially_blocked, need)
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", 
+                              (take, lot_id))
+                    need -= take
+                    released += take
+
+            # 7) Cashflow (wydatek)
+            desc = (f"Buyback CC #{cc_id} {contracts}x @{float(buyback_price_usd):.4f} | "
+                    f"fees ${fees_usd:.2f} | NBP D-1: {fx_close_date}")
+            cur.execute("""
+                INSERT INTO cashflows (type, amount_usd, date, fx_rate, amount_pln, description, ref_table, ref_id)
+                VALUES ('option_buyback', ?, ?, ?, ?, ?, 'options_cc', ?)
+            """, (-total_buyback_usd, buyback_date_str, fx_close, -total_buyback_pln, desc, cc_id))
+
+            cur.execute("RELEASE SAVEPOINT sp_bb")
+            conn.commit()
+            conn.close()
+
+            return {
+                'success': True,
+                'message': f'Odkupiono {contracts} kontraktów CC #{cc_id}. Zwolniono {released} akcji.',
+                'contracts_bought_back': contracts,
+                'shares_released': released,
+                'fx_close': fx_close,
+                'fx_close_date': fx_close_date,
+                'pl_pln': pl_pln
+            }
+
+        except Exception as txe:
+            try:
+                cur.execute("ROLLBACK TO SAVEPOINT sp_bb")
+                cur.execute("RELEASE SAVEPOINT sp_bb")
+            except Exception:
+                pass
+            try:
+                conn.rollback()
+                conn.close()
+            except Exception:
+                pass
+            return {'success': False, 'message': f'Błąd buyback: {txe}'}
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd buyback: {str(e)}'}
+        
+def partial_buyback_covered_call(cc_id, contracts_to_buyback, buyback_price_usd, buyback_date, broker_fee_usd=0.0, reg_fee_usd=0.0):
+    """
+    Częściowy buyback CC:
+      - tworzy rekord 'bought_back' na odkupioną część,
+      - proporcjonalnie zmniejsza premium w CC-rodzicu,
+      - ZMNIEJSZA rezerwacje w mapowaniach i JEDNOCZEŚNIE zwiększa lots.quantity_open,
+      - dodaje cashflow 'option_buyback'.
+    """
+    from db.fx import get_fx_rate_for_date
+    import sqlite3
+    from datetime import datetime as _dt
+
+    conn = None
+    try:
+        if contracts_to_buyback <= 0:
+            return {'success': False, 'message': 'Liczba kontraktów do odkupu musi być > 0'}
+
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # ---- pobierz CC
+        cur.execute("""SELECT id, ticker, contracts, status, strike_usd, open_date, expiry_date,
+                              premium_sell_usd, premium_sell_pln, fx_open
+                       FROM options_cc WHERE id=?""", (cc_id,))
+        r = cur.fetchone()
+        if not r:
+            return {'success': False, 'message': f'CC #{cc_id} nie znalezione'}
+        if (r['status'] or '') != 'open':
+            return {'success': False, 'message': f"CC #{cc_id} nie jest otwarte (status: {r['status']})"}
+
+        total_contracts   = int(r['contracts'] or 0)
+        if contracts_to_buyback > total_contracts:
+            return {'success': False, 'message': f'Nie można odkupić {contracts_to_buyback} (max {total_contracts})'}
+
+        ticker            = r['ticker']
+        strike_usd        = float(r['strike_usd'] or 0.0)
+        open_date         = r['open_date']
+        expiry_date       = r['expiry_date']
+        fx_open           = float(r['fx_open'] or 0.0)
+        prem_sell_pln_all = float(r['premium_sell_pln'] or 0.0)
+        prem_sell_usd_all = float(r['premium_sell_usd'] or 0.0)
+
+        # ---- data i FX
+        if hasattr(buyback_date, 'strftime'):
+            buyback_date_str = buyback_date.strftime('%Y-%m-%d')
+        elif isinstance(buyback_date, str):
+            try:
+                buyback_date_str = _dt.strptime(buyback_date, '%Y-%m-%d').date().isoformat()
+            except Exception:
+                buyback_date_str = buyback_date
+        else:
+            return {'success': False, 'message': 'Nieprawidłowy typ buyback_date'}
+
+        try:
+            import pandas as pd
+            fx_close_date = (pd.to_datetime(buyback_date_str) - pd.DateOffset(days=1)).strftime('%Y-%m-%d')
+        except Exception:
+            fx_close_date = buyback_date_str
+
+        fx_close = get_fx_rate_for_date(fx_close_date)
+        if not fx_close or fx_close <= 0:
+            fx_close = fx_open if fx_open and fx_open > 0 else None
+        if not fx_close:
+            return {'success': False, 'message': f'Brak kursu NBP (ani fallback) dla {fx_close_date}'}
+
+        # ---- kalkulacje
+        shares_to_buyback     = int(contracts_to_buyback) * 100
+        buyback_cost_usd      = float(buyback_price_usd) * shares_to_buyback
+        fees_usd              = float(broker_fee_usd or 0.0) + float(reg_fee_usd or 0.0)
+        total_buyback_usd     = buyback_cost_usd + fees_usd
+        total_buyback_pln     = round(total_buyback_usd * fx_close, 2)
+
+        proportion            = (contracts_to_buyback / total_contracts) if total_contracts > 0 else 0.0
+        premium_part_pln      = round(prem_sell_pln_all * proportion, 2)
+        pl_pln                = round(premium_part_pln - total_buyback_pln, 2)
+
+        # ---- TRANSAKCJA (savepoint)
+        outer_tx = getattr(conn, 'in_transaction', False)
+        cur.execute("SAVEPOINT sp_partial_bb")
+
+        try:
+            # A) dziecko bought_back
+            cur.execute("""
+                INSERT INTO options_cc (
+                    ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                    open_date, expiry_date, status, fx_open,
+                    close_date, premium_buyback_usd, premium_buyback_pln, fx_close,
+                    broker_fee_buyback_usd, reg_fee_buyback_usd, total_fees_buyback_pln,
+                    pl_pln, created_at, parent_cc_id
+                )
+                VALUES (?, ?, ?, ?, ?, ?, ?, 'bought_back', ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+            """, (
+                ticker, int(contracts_to_buyback), strike_usd, prem_sell_usd_all, premium_part_pln,
+                open_date, expiry_date, fx_open,
+                buyback_date_str, buyback_cost_usd, total_buyback_pln, fx_close,
+                float(broker_fee_usd or 0.0), float(reg_fee_usd or 0.0), round(fees_usd * fx_close, 2),
+                pl_pln, cc_id
+            ))
+            new_cc_id = cur.lastrowid
+
+            # B) zmniejsz kontrakty + premium w rodzicu
+            remaining_contracts = total_contracts - int(contracts_to_buyback)
+            remaining_premium_pln = round(prem_sell_pln_all - premium_part_pln, 2)
+            cur.execute("""UPDATE options_cc
+                           SET contracts=?, premium_sell_pln=?, updated_at=CURRENT_TIMESTAMP
+                           WHERE id=?""",
+                        (remaining_contracts, remaining_premium_pln, cc_id))
+
+            # C) zwolnij rezerwacje TEGO CC w mapowaniach i jednocześnie zwiększ lots.quantity_open
+            released = 0
+
+            # priorytet: cc_lot_mappings
+            cur.execute("""SELECT id, lot_id, shares_reserved FROM cc_lot_mappings WHERE cc_id=? ORDER BY id""", (cc_id,))
+            for m in cur.fetchall() or []:
+                mid = int(m['id']); lot_id = int(m['lot_id']); qty = int(m['shares_reserved'] or 0)
+                if qty <= 0: 
+                    continue
+                take = min(qty, shares_to_buyback - released)
+                if take <= 0:
+                    break
+                new_qty = qty - take
+                if new_qty > 0:
+                    cur.execute("UPDATE cc_lot_mappings SET shares_reserved=? WHERE id=?", (new_qty, mid))
+                else:
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE id=?", (mid,))
+                # zwolnij na LOT-cie
+                cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (take, lot_id))
+                released += take
+
+            # fallback: options_cc_reservations
+            if released < shares_to_buyback:
+                cur.execute("""SELECT id, lot_id, qty_reserved 
+                               FROM options_cc_reservations 
+                               WHERE cc_id=? ORDER BY id""", (cc_id,))
+                for rmap in cur.fetchall() or []:
+                    rid = int(rmap['id']); lot_id = int(rmap['lot_id']); qty = int(rmap['qty_reserved'] or 0)
+                    if qty <= 0:
+                        continue
+                    need = shares_to_buyback - released
+                    if need <= 0:
+                        break
+                    take = min(qty, need)
+                    new_qty = qty - take
+                    if new_qty > 0:
+                        cur.execute("UPDATE options_cc_reservations SET qty_reserved=? WHERE id=?", (new_qty, rid))
+                    else:
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id=?", (rid,))
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (take, lot_id))
+                    released += take
+
+            # jeżeli nadal mniej – uzupełnij FIFO (rzadko, ale defensywnie)
+            if released < shares_to_buyback:
+                need = shares_to_buyback - released
+                cur.execute("""SELECT id, quantity_total, quantity_open 
+                               FROM lots WHERE UPPER(ticker)=? ORDER BY buy_date, id""", (ticker.upper(),))
+                for lot_id, qty_total, qty_open in cur.fetchall() or []:
+                    if need <= 0: break
+                    potentially_blocked = int(qty_total or 0) - int(qty_open or 0)
+                    if potentially_blocked <= 0: 
+                        continue
+                    take = min(potentially_blocked, need)
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (take, lot_id))
+                    need -= take
+                    released += take
+
+            # D) cashflow (ujemny)
+            desc = (f"Partial buyback CC parent#{cc_id} -> child#{new_cc_id} "
+                    f"{contracts_to_buyback}x @{float(buyback_price_usd):.4f} | "
+                    f"fees ${fees_usd:.2f} | NBP D-1: {fx_close_date}")
+            cur.execute("""
+                INSERT INTO cashflows (type, amount_usd, date, fx_rate, amount_pln, description, ref_table, ref_id)
+                VALUES ('option_buyback', ?, ?, ?, ?, ?, 'options_cc', ?)
+            """, (-total_buyback_usd, buyback_date_str, fx_close, -total_buyback_pln, desc, new_cc_id))
+
+            cur.execute("RELEASE SAVEPOINT sp_partial_bb")
+            if not outer_tx:
+                conn.commit()
+            conn.close()
+
+            return {
+                'success': True,
+                'message': (f'Odkupiono {contracts_to_buyback}/{total_contracts} kontraktów CC #{cc_id}. '
+                            f'Nowy rekord bought_back: #{new_cc_id}. Rezerwacje zmniejszone o {released} akcji.'),
+                'parent_cc_id': cc_id,
+                'new_cc_id': new_cc_id,
+                'contracts_bought_back': int(contracts_to_buyback),
+                'contracts_remaining': int(remaining_contracts),
+                'shares_released': int(released),                 # 🔑 dla UI
+                'shares_released_from_mappings': int(released),   # kompatybilnie
+                'fx_close': fx_close,
+                'fx_close_date': fx_close_date,
+                'pl_pln': pl_pln
+            }
+
+        except Exception as txe:
+            try:
+                cur.execute("ROLLBACK TO SAVEPOINT sp_partial_bb")
+                cur.execute("RELEASE SAVEPOINT sp_partial_bb")
+            except Exception:
+                pass
+            try:
+                if not outer_tx: conn.rollback()
+                conn.close()
+            except Exception:
+                pass
+            return {'success': False, 'message': f'Błąd częściowego buyback: {txe}'}
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+                conn.close()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd częściowego buyback: {str(e)}'}
+    
+
+def partial_buyback_covered_call_with_mappings(cc_id, contracts_to_buyback, buyback_price_usd, buyback_date, broker_fee_usd=0.0, reg_fee_usd=0.0):
+    """
+    Częściowy buyback CC z mapowaniami:
+      - NBP D-1 via get_fx_rate_for_date (fallback do fx_open),
+      - redukcja rezerwacji w cc_lot_mappings (fallback: options_cc_reservations),
+      - podział pozycji (dziecko 'bought_back' dla odkupionej części),
+      - cashflow 'option_buyback' (ujemny).
+    """
+    from db.fx import get_fx_rate_for_date
+    import sqlite3
+    from datetime import datetime as _dt
+
+    conn = None
+    try:
+        if contracts_to_buyback <= 0:
+            return {'success': False, 'message': 'Liczba kontraktów do odkupu musi być > 0'}
+
+        conn = get_connection()
+        if not conn:
+            return {'success': False, 'message': 'Brak połączenia z bazą'}
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # --- pobierz CC (musi być open)
+        cur.execute("""     
+            SELECT id, ticker, contracts, status, strike_usd, open_date, expiry_date,
+                   COALESCE(premium_sell_usd,0.0)  AS premium_sell_usd,
+                   COALESCE(premium_sell_pln,0.0)  AS premium_sell_pln,
+                   COALESCE(fx_open,0.0)            AS fx_open,
+                   lot_linked_id
+            FROM options_cc
+            WHERE id = ? AND status = 'open'
+        """, (cc_id,))
+        r = cur.fetchone()
+        if not r:
+            return {'success': False, 'message': f'CC #{cc_id} nie znalezione lub nie jest otwarte'}
+
+        total_contracts = int(r['contracts'] or 0)
+        if contracts_to_buyback > total_contracts:
+            return {'success': False, 'message': f'Nie można odkupić {contracts_to_buyback} (dostępne: {total_contracts})'}
+
+        ticker       = r['ticker']
+        strike_usd   = float(r['strike_usd'] or 0.0)
+        open_date    = r['open_date']
+        expiry_date  = r['expiry_date']
+        fx_open      = float(r['fx_open'] or 0.0)
+        prem_sell_usd= float(r['premium_sell_usd'] or 0.0)
+        prem_sell_pln= float(r['premium_sell_pln'] or 0.0)
+        lot_linked_id = r['lot_linked_id'] if 'lot_linked_id' in r.keys() else None  # 🆕 DODAJ TĘ LINIĘ!
+        
+
+        # --- data + NBP D-1
+        if hasattr(buyback_date, 'strftime'):
+            buyback_date_str = buyback_date.strftime('%Y-%m-%d')
+        elif isinstance(buyback_date, str):
+            try:
+                buyback_date_str = _dt.strptime(buyback_date, '%Y-%m-%d').date().isoformat()
+            except Exception:
+                buyback_date_str = buyback_date
+        else:
+            return {'success': False, 'message': 'Nieprawidłowy typ buyback_date'}
+
+        try:
+            import pandas as pd
+            fx_close_date = (pd.to_datetime(buyback_date_str) - pd.DateOffset(days=1)).strftime('%Y-%m-%d')
+        except Exception:
+            fx_close_date = buyback_date_str
+        
+        # DODAJ TUTAJ:
+        # 🆕 WALIDACJA DATY - nie można odkupić przed sprzedażą!
+        try:
+            from datetime import datetime as _dt
+            if isinstance(open_date, str):
+                open_dt = _dt.strptime(open_date, '%Y-%m-%d').date()
+            else:
+                open_dt = open_date
+                
+            buyback_dt = _dt.strptime(buyback_date_str, '%Y-%m-%d').date()
+            
+            print(f'🔍 DEBUG: open_dt={open_dt}, buyback_dt={buyback_dt}')
+                
+            if buyback_dt < open_dt:
+                print(f'❌ BŁĄD: {buyback_dt} < {open_dt}')
+                return {'success': False, 'message': f'❌ Nie można odkupić CC przed jej sprzedażą! Sprzedane: {open_date}, buyback: {buyback_date_str}'}
+        except Exception as e:
+            print(f'❌ DEBUG EXCEPTION: {e}')
+            return {'success': False, 'message': f'❌ Błąd walidacji dat: {e}'}
+
+        fx_close = get_fx_rate_for_date(fx_close_date)
+        if not fx_close or fx_close <= 0:
+            fx_close = fx_open if fx_open and fx_open > 0 else None
+        if not fx_close:
+            return {'success': False, 'message': f'Brak kursu NBP (ani fallback) dla {fx_close_date}'}
+
+        # --- kalkulacje części
+        shares_to_buyback = int(contracts_to_buyback) * 100
+        shares_total      = total_contracts * 100
+
+        buyback_cost_usd = float(buyback_price_usd) * shares_to_buyback
+        fees_usd = float(broker_fee_usd or 0.0) + float(reg_fee_usd or 0.0)
+        total_buyback_cost_usd = buyback_cost_usd + fees_usd
+        total_buyback_cost_pln = round(total_buyback_cost_usd * fx_close, 2)
+
+        # proporcja premii (PLN) na odkupowaną część
+        proportion = (contracts_to_buyback / total_contracts) if total_contracts > 0 else 0.0
+        premium_for_buyback_pln = round(prem_sell_pln * proportion, 2)
+
+        # P/L dla odkupowanej części
+        pl_pln = round(premium_for_buyback_pln - total_buyback_cost_pln, 2)
+        pl_usd = round((prem_sell_usd * shares_to_buyback) - total_buyback_cost_usd, 2)  # informacyjnie
+
+        # --- transakcja
+        try:
+            cur.execute("BEGIN")
+
+            if contracts_to_buyback < total_contracts:
+                # A) utwórz dziecko zamknięte (bought_back)
+                cur.execute("""
+                    INSERT INTO options_cc (
+                        ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+                        open_date, expiry_date, status, fx_open,
+                        close_date, premium_buyback_usd, premium_buyback_pln, fx_close,
+                        broker_fee_buyback_usd, reg_fee_buyback_usd, total_fees_buyback_pln,
+                        pl_pln, created_at, parent_cc_id
+                    )
+                    VALUES (?, ?, ?, ?, ?, ?, ?, 'bought_back', ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, ?)
+                """, (
+                    ticker, int(contracts_to_buyback), strike_usd, prem_sell_usd, premium_for_buyback_pln,
+                    open_date, expiry_date, fx_open,
+                    buyback_date_str, buyback_cost_usd, total_buyback_cost_pln, fx_close,
+                    float(broker_fee_usd or 0.0), float(reg_fee_usd or 0.0), round(fees_usd * fx_close, 2),
+                    pl_pln, cc_id
+                ))
+                new_cc_id = cur.lastrowid
+
+                # B) zaktualizuj rodzica (open)
+                remaining_contracts   = total_contracts - int(contracts_to_buyback)
+                remaining_premium_pln = round(prem_sell_pln - premium_for_buyback_pln, 2)
+                cur.execute("""
+                    UPDATE options_cc
+                    SET contracts = ?, premium_sell_pln = ?, updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (remaining_contracts, remaining_premium_pln, cc_id))
+            else:
+                # pełny buyback na oryginalnym
+                new_cc_id = cc_id
+                cur.execute("""
+                    UPDATE options_cc
+                    SET status = 'bought_back',
+                        close_date = ?,
+                        premium_buyback_usd = ?,
+                        premium_buyback_pln = ?,
+                        fx_close = ?,
+                        broker_fee_buyback_usd = ?,
+                        reg_fee_buyback_usd = ?,
+                        total_fees_buyback_pln = ?,
+                        pl_pln = ?,
+                        updated_at = CURRENT_TIMESTAMP
+                    WHERE id = ?
+                """, (buyback_date_str, buyback_cost_usd, total_buyback_cost_pln, fx_close,
+                      float(broker_fee_usd or 0.0), float(reg_fee_usd or 0.0), round(fees_usd * fx_close, 2),
+                      pl_pln, cc_id))
+
+            # C) zwolnij rezerwacje I ZWIĘKSZ quantity_open
+            to_release = shares_to_buyback
+
+            # 🆕 JEŚLI JEST lot_linked_id - UŻYWAJ TYLKO TEGO!
+            if lot_linked_id:
+                try:
+                    print(f'🔧 DEBUG: Zwiększam quantity_open LOT #{lot_linked_id} o {shares_to_buyback} (lot_linked_id)')
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (shares_to_buyback, lot_linked_id))
+                    
+                    # USUŃ WSZYSTKIE REZERWACJE DLA TEGO CC
+                    cur.execute("DELETE FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+                    cur.execute("DELETE FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+                    
+                    to_release = 0  # 🔑 WYZERUJ - już zwolnione!
+                except Exception as e:
+                    print(f'❌ Błąd zwiększania quantity_open dla LOT #{lot_linked_id}: {e}')
+
+            # TYLKO JEŚLI BRAK lot_linked_id - UŻYJ MAPOWAŃ
+            if to_release > 0:
+                # reszta istniejącego kodu z mapowaniami...
+                # najpierw cc_lot_mappings
+                cur.execute("""
+                    SELECT id, lot_id, shares_reserved
+                    FROM cc_lot_mappings
+                    WHERE cc_id = ?
+                    ORDER BY id
+                """, (cc_id,))
+                rows = cur.fetchall() or []
+                for m in rows:
+                    if to_release <= 0:
+                        break
+                    mid = int(m['id'])
+                    lot_id = int(m['lot_id'])  # 🔑 POTRZEBNE DO UPDATE
+                    qty = int(m['shares_reserved'] or 0)
+                    if qty <= 0:
+                        continue
+                    take = qty if qty <= to_release else to_release
+                    new_qty = qty - take
+                    if new_qty > 0:
+                        cur.execute("UPDATE cc_lot_mappings SET shares_reserved = ? WHERE id = ?", (new_qty, mid))
+                    else:
+                        cur.execute("DELETE FROM cc_lot_mappings WHERE id = ?", (mid,))
+                    
+                    # 🔑 DODAJ TO: ZWIĘKSZ quantity_open
+                    print(f'🔧 DEBUG: Zwiększam quantity_open LOT #{lot_id} o {take}')
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (take, lot_id))
+                    
+                    to_release -= take
+
+            if to_release > 0:
+                # fallback: options_cc_reservations
+                cur.execute("""
+                    SELECT id, lot_id, qty_reserved
+                    FROM options_cc_reservations
+                    WHERE cc_id = ?
+                    ORDER BY id
+                """, (cc_id,))
+                rows = cur.fetchall() or []
+                for rmap in rows:
+                    if to_release <= 0:
+                        break
+                    rid = int(rmap['id'])
+                    lot_id = int(rmap['lot_id'])  # 🔑 POTRZEBNE DO UPDATE
+                    qty = int(rmap['qty_reserved'] or 0)
+                    if qty <= 0:
+                        continue
+                    take = qty if qty <= to_release else to_release
+                    new_qty = qty - take
+                    if new_qty > 0:
+                        cur.execute("UPDATE options_cc_reservations SET qty_reserved = ? WHERE id = ?", (new_qty, rid))
+                    else:
+                        cur.execute("DELETE FROM options_cc_reservations WHERE id = ?", (rid,))
+                    
+                    # 🔑 DODAJ TO: ZWIĘKSZ quantity_open
+                    print(f'🔧 DEBUG: Zwiększam quantity_open LOT #{lot_id} o {take}')
+                    cur.execute("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", (take, lot_id))
+                    
+                    to_release -= take
+
+            # D) cashflow (ujemny) przypięty do rekordu zamkniętego
+            description = (f"Partial buyback CC parent#{cc_id}"
+                           f"{'' if new_cc_id==cc_id else f' -> child#{new_cc_id}'} "
+                           f"{contracts_to_buyback}x @{float(buyback_price_usd):.4f} | "
+                           f"fees ${float(broker_fee_usd)+float(reg_fee_usd):.2f} | NBP D-1: {fx_close_date}")
+            cur.execute("""
+                INSERT INTO cashflows (type, amount_usd, date, fx_rate, amount_pln, description, ref_table, ref_id)
+                VALUES ('option_buyback', ?, ?, ?, ?, ?, 'options_cc', ?)
+            """, (-total_buyback_cost_usd, buyback_date_str, fx_close, -total_buyback_cost_pln, description, new_cc_id))
+
+            cur.execute("COMMIT")
+
+        except Exception as txe:
+            try: cur.execute("ROLLBACK")
+            except Exception: pass
+            return {'success': False, 'message': f'Błąd transakcji partial buyback: {txe}'}
+
+        # raport
+        return {
+            'success': True,
+            'message': (f'Odkupiono {contracts_to_buyback}/{total_contracts} kontraktów CC #{cc_id}. '
+                        f"{'Nowy rekord bought_back: #'+str(new_cc_id)+'. ' if new_cc_id!=cc_id else ''}"
+                        f'Rezerwacje zmniejszone o {shares_to_buyback} akcji.'),
+            'parent_cc_id': cc_id,
+            'new_cc_id': new_cc_id if new_cc_id != cc_id else None,
+            'contracts_bought_back': int(contracts_to_buyback),
+            'contracts_remaining': int(total_contracts - contracts_to_buyback),
+            'shares_released_from_mappings': shares_to_buyback,
+            'fx_close': fx_close,
+            'fx_close_date': fx_close_date,
+            'pl_pln': pl_pln,
+            'pl_usd': pl_usd,
+            'premium_portion_pln': premium_for_buyback_pln,
+            'total_buyback_cost_pln': total_buyback_cost_pln
+        }
+
+    except Exception as e:
+        try:
+            if conn:
+                conn.rollback()
+        except Exception:
+            pass
+        return {'success': False, 'message': f'Błąd częściowego buyback: {str(e)}'}
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+# ================================
+# ROLOWANIE CC (odkup + nowa sprzedaż w jednej transakcji)
+# ================================
+
+def _fx_rates_d_minus_1(dates):
+    """
+    Kursy NBP D-1 dla wielu dat operacji jednym wywołaniem klienta NBP
+
+    Returns:
+        dict: {data 'YYYY-MM-DD': kurs lub None}
+    """
+    import nbp_api_client
+    from datetime import datetime as _dt
+
+    wanted = sorted({str(d)[:10] for d in dates})
+    try:
+        fetched = nbp_api_client.get_usd_rates_for_dates(
+            [_dt.strptime(d, '%Y-%m-%d').date() for d in wanted]) or {}
+    except Exception as e:
+        print(f"❌ FX_RATE: Błąd wsadowego pobierania kursów: {e}")
+        fetched = {}
+
+    rates = {}
+    for day, result in fetched.items():
+        if isinstance(result, dict) and result.get('rate'):
+            rates[str(day)[:10]] = float(result['rate'])
+        elif result:
+            rates[str(day)[:10]] = float(result)
+    return {d: rates.get(d) for d in wanted}
+
+
+def _roll_cc_in_transaction(cur, roll, roll_date_str, fx_rate):
+    """
+    Rolowanie jednego CC na kursorze w otwartej transakcji
+
+    Mapowania cc_lot_mappings (lub rezerwacje legacy, gdy mapowań brak) przechodzą
+    na nowy CC bez zwalniania i ponownego FIFO - lots.quantity_open bez zmian
+    (zwalniana jest tylko nadwyżka, gdy nowy CC ma mniej kontraktów).
+
+    Returns:
+        dict: wynik rolowania; wyjątek ValueError przy błędzie walidacji
+    """
+    cc_id = int(roll['cc_id'])
+    cur.execute("""
+        SELECT id, ticker, contracts, status, open_date,
+               COALESCE(premium_sell_pln, 0.0) AS premium_sell_pln,
+               chain_id, lot_linked_id
+        FROM options_cc
+        WHERE id = ?
+    """, (cc_id,))
+    row = cur.fetchone()
+    if not row:
+        raise ValueError(f'CC #{cc_id} nie istnieje')
+    if row['status'] != 'open':
+        raise ValueError(f"CC #{cc_id} ma status {row['status']}, nie można rolować")
+    if roll_date_str < str(row['open_date']):
+        raise ValueError(f"Rolowanie {roll_date_str} przed sprzedażą CC #{cc_id} ({row['open_date']})")
+
+    new_expiry = roll['new_expiry_date']
+    new_expiry_str = new_expiry.strftime('%Y-%m-%d') if hasattr(new_expiry, 'strftime') else str(new_expiry)
+    if new_expiry_str <= roll_date_str:
+        raise ValueError(f'Nowa data wygaśnięcia {new_expiry_str} musi być po dacie rolowania {roll_date_str}')
+
+    contracts = int(row['contracts'] or 0)
+    new_contracts = roll.get('new_contracts')
+    new_contracts = contracts if new_contracts is None else int(new_contracts)
+    if not 0 < new_contracts <= contracts:
+        raise ValueError(f'Nowy CC: {new_contracts} kontraktów (dozwolone 1-{contracts}, '
+                         f'więcej wymaga nowej rezerwacji)')
+
+    # Obie nogi rolowania na kursie D-1 z dnia rolowania - bez zastępczego fx_open
+    fx = float(fx_rate or 0.0)
+    if fx <= 0:
+        raise ValueError(f'Brak kursu NBP D-1 dla {roll_date_str} - podaj fx_rate ręcznie')
+    fx_source = 'manual' if roll.get('fx_rate') else 'nbp_d1'
+
+    # --- odkup starego CC (jak pełny buyback w partial_buyback_covered_call_with_mappings)
+    shares_old = contracts * 100
+    bb_fees_usd = float(roll.get('buyback_broker_fee_usd') or 0.0) + float(roll.get('buyback_reg_fee_usd') or 0.0)
+    buyback_cost_usd = float(roll['buyback_price_usd']) * shares_old
+    total_buyback_usd = buyback_cost_usd + bb_fees_usd
+    total_buyback_pln = round(total_buyback_usd * fx, 2)
+    pl_pln = round(float(row['premium_sell_pln']) - total_buyback_pln, 2)
+
+    # --- sprzedaż nowego CC (jak save_covered_call_to_database: premium brutto + cashflow netto)
+    shares_new = new_contracts * 100
+    gross_premium_usd = float(roll['new_premium_usd']) * shares_new
+    sell_fees_usd = float(roll.get('sell_broker_fee_usd') or 0.0) + float(roll.get('sell_reg_fee_usd') or 0.0)
+    net_premium_usd = gross_premium_usd - sell_fees_usd
+
+    # --- rezerwacje starego CC: autorytatywnie mapowania, fallback legacy
+    source = 'cc_lot_mappings'
+    cur.execute("SELECT lot_id, shares_reserved AS qty FROM cc_lot_mappings WHERE cc_id = ? ORDER BY id", (cc_id,))
+    reservations = [(int(r['lot_id']), int(r['qty'] or 0)) for r in cur.fetchall()]
+    if not reservations:
+        source = 'options_cc_reservations'
+        cur.execute("SELECT lot_id, qty_reserved AS qty FROM options_cc_reservations WHERE cc_id = ? ORDER BY id",
+                    (cc_id,))
+        reservations = [(int(r['lot_id']), int(r['qty'] or 0)) for r in cur.fetchall()]
+    reserved_total = sum(q for _, q in reservations)
+    if reserved_total < shares_new:
+        raise ValueError(f'CC #{cc_id} ma zarezerwowane {reserved_total}/{shares_old} akcji - '
+                         f'najpierw napraw rezerwacje (fix_existing_cc_reservations)')
+
+    cur.execute("""
+        INSERT INTO options_cc (
+            ticker, contracts, strike_usd, premium_sell_usd, premium_sell_pln,
+            open_date, expiry_date, status, fx_open,
+            broker_fee_sell_usd, reg_fee_sell_usd, total_fees_sell_pln, net_premium_pln,
+            parent_cc_id, chain_id, lot_linked_id, created_at
+        )
+        VALUES (?, ?, ?, ?, ?, ?, ?, 'open', ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, (
+        row['ticker'], new_contracts, float(roll['new_strike_usd']), gross_premium_usd,
+        round(gross_premium_usd * fx, 2), roll_date_str, new_expiry_str, fx,
+        float(roll.get('sell_broker_fee_usd') or 0.0), float(roll.get('sell_reg_fee_usd') or 0.0),
+        round(sell_fees_usd * fx, 2), round(net_premium_usd * fx, 2),
+        cc_id, row['chain_id'], row['lot_linked_id']
+    ))
+    new_cc_id = cur.lastrowid
+
+    # Przeniesienie rezerwacji PRZED zmianą statusu starego CC (trigger zwalniający
+    # usuwa rezerwacje legacy CC przechodzącego na bought_back)
+    released = []
+    if source == 'cc_lot_mappings' and reserved_total == shares_new:
+        cur.execute("UPDATE cc_lot_mappings SET cc_id = ? WHERE cc_id = ?", (new_cc_id, cc_id))
+        cur.execute("UPDATE options_cc_reservations SET cc_id = ? WHERE cc_id = ?", (new_cc_id, cc_id))
+    else:
+        # Mniej kontraktów lub tylko rezerwacje legacy: pierwsze shares_new akcji
+        # (kolejność przydziału) na nowy CC, reszta zwolniona
+        moved, remaining = {}, shares_new
+        for lot_id, qty in reservations:
+            take = min(qty, remaining)
+            if take > 0:
+                moved[lot_id] = moved.get(lot_id, 0) + take
+                remaining -= take
+            if qty > take:
+                released.append((qty - take, lot_id))
+        cur.execute("DELETE FROM cc_lot_mappings WHERE cc_id = ?", (cc_id,))
+        cur.execute("DELETE FROM options_cc_reservations WHERE cc_id = ?", (cc_id,))
+        cur.executemany("""
+            INSERT INTO cc_lot_mappings (cc_id, lot_id, shares_reserved, created_at)
+            VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+        """, [(new_cc_id, lot_id, qty) for lot_id, qty in moved.items()])
+        cur.executemany("""
+            INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+            VALUES (?, ?, ?)
+        """, [(new_cc_id, lot_id, qty) for lot_id, qty in moved.items()])
+        cur.executemany("UPDATE lots SET quantity_open = quantity_open + ? WHERE id = ?", released)
+
+    cur.execute("""
+        UPDATE options_cc
+        SET status = 'bought_back',
+            close_date = ?,
+            premium_buyback_usd = ?,
+            premium_buyback_pln = ?,
+            fx_close = ?,
+            broker_fee_buyback_usd = ?,
+            reg_fee_buyback_usd = ?,
+            total_fees_buyback_pln = ?,
+            pl_pln = ?,
+            updated_at = CURRENT_TIMESTAMP
+        WHERE id = ?
+    """, (roll_date_str, buyback_cost_usd, total_buyback_pln, fx,
+          float(roll.get('buyback_broker_fee_usd') or 0.0), float(roll.get('buyback_reg_fee_usd') or 0.0),
+          round(bb_fees_usd * fx, 2), pl_pln, cc_id))
+
+    cur.executemany("""
+        INSERT INTO cashflows (type, amount_usd, date, fx_rate, amount_pln, description, ref_table, ref_id)
+        VALUES (?, ?, ?, ?, ?, ?, 'options_cc', ?)
+    """, [
+        ('option_buyback', -total_buyback_usd, roll_date_str, fx, -total_buyback_pln,
+         f"Roll CC #{cc_id} -> #{new_cc_id} buyback {contracts}x @{float(roll['buyback_price_usd']):.4f} | "
+         f"fees ${bb_fees_usd:.2f} | NBP D-1", cc_id),
+        ('option_premium', net_premium_usd, roll_date_str, fx, round(net_premium_usd * fx, 2),
+         f"Roll CC #{cc_id} -> #{new_cc_id} {row['ticker']} {new_contracts}x ${float(roll['new_strike_usd'])} "
+         f"premium ${gross_premium_usd:.2f} fees ${sell_fees_usd:.2f} | NBP D-1", new_cc_id),
+    ])
+
+    return {
+        'success': True,
+        'cc_id': cc_id,
+        'new_cc_id': new_cc_id,
+        'message': f"CC #{cc_id} → #{new_cc_id}: {new_contracts}x ${float(roll['new_strike_usd'])} do {new_expiry_str}",
+        'contracts': new_contracts,
+        'shares_moved': shares_new,
+        'shares_released': sum(q for q, _ in released),
+        'reservation_source': source,
+        'fx_rate': fx,
+        'fx_source': fx_source,
+        'pl_pln': pl_pln,
+        'buyback_cost_pln': total_buyback_pln,
+        'net_premium_pln': round(net_premium_usd * fx, 2),
+    }
+
+
+def roll_covered_call(cc_id, roll_date, buyback_price_usd, new_strike_usd, new_expiry_date,
+                      new_premium_usd, new_contracts=None,
+                      buyback_broker_fee_usd=0.0, buyback_reg_fee_usd=0.0,
+                      sell_broker_fee_usd=0.0, sell_reg_fee_usd=0.0, fx_rate=None):
+    """
+    Rolowanie CC: odkup starego + sprzedaż nowego (parent_cc_id) w jednej transakcji
+
+    Zamiast buybacku (zwolnienie rezerwacji) i zapisu nowego CC (sprawdzenie
+    chronologii + FIFO od nowa) mapowania LOT-ów przechodzą na nowy CC.
+    Obie operacje mają jeden kurs NBP D-1 z dnia rolowania i własny cashflow
+    (option_buyback dla starego, option_premium netto dla nowego). Nowy CC
+    dziedziczy chain_id.
+
+    Args:
+        buyback_price_usd / new_premium_usd: cena za akcję (jak w formularzach CC)
+        new_contracts: domyślnie jak w starym CC (mniej = nadwyżka zwolniona, 0 = błąd)
+        fx_rate: kurs podany ręcznie (domyślnie NBP D-1 dla roll_date; brak kursu = błąd)
+
+    Returns:
+        dict: {'success', 'message', 'cc_id', 'new_cc_id', 'shares_moved', 'shares_released',
+               'fx_rate', 'fx_source', 'pl_pln', 'buyback_cost_pln', 'net_premium_pln', ...}
+    """
+    return roll_covered_calls([{
+        'cc_id': cc_id,
+        'buyback_price_usd': buyback_price_usd,
+        'new_strike_usd': new_strike_usd,
+        'new_expiry_date': new_expiry_date,
+        'new_premium_usd': new_premium_usd,
+        'new_contracts': new_contracts,
+        'buyback_broker_fee_usd': buyback_broker_fee_usd,
+        'buyback_reg_fee_usd': buyback_reg_fee_usd,
+        'sell_broker_fee_usd': sell_broker_fee_usd,
+        'sell_reg_fee_usd': sell_reg_fee_usd,
+        'fx_rate': fx_rate,
+    }], roll_date, all_or_nothing=True)['results'][0]
+
+
+def roll_covered_calls(rolls, roll_date, all_or_nothing=False):
+    """
+    Wsadowe rolowanie wielu CC (np. w dniu wygaśnięcia) w jednej transakcji
+
+    Kursy NBP D-1 pobierane raz dla dnia rolowania. Każde rolowanie w osobnym
+    SAVEPOINT - błąd jednego CC nie cofa pozostałych, chyba że all_or_nothing.
+
+    Args:
+        rolls: lista dict jak argumenty roll_covered_call (cc_id, buyback_price_usd,
+               new_strike_usd, new_expiry_date, new_premium_usd, opcjonalnie new_contracts,
+               prowizje *_fee_usd, fx_rate)
+        roll_date: data rolowania (date lub 'YYYY-MM-DD')
+        all_or_nothing: przy pierwszym błędzie wycofaj całą partię
+
+    Returns:
+        dict: {'success', 'message', 'rolled', 'failed', 'results': [wynik per CC w kolejności rolls]}
+    """
+    import sqlite3
+
+    roll_date_str = roll_date.strftime('%Y-%m-%d') if hasattr(roll_date, 'strftime') else str(roll_date)[:10]
+    if not rolls:
+        return {'success': True, 'message': 'Brak CC do rolowania', 'rolled': 0, 'failed': 0, 'results': []}
+
+    fx_auto = None
+    if any(not r.get('fx_rate') for r in rolls):
+        fx_auto = _fx_rates_d_minus_1([roll_date_str]).get(roll_date_str)
+
+    results = []
+    try:
+        with transaction(immediate=True) as conn:
+            conn.row_factory = sqlite3.Row
+            cur = conn.cursor()
+            for roll in rolls:
+                cur.execute("SAVEPOINT sp_cc_roll")
+                try:
+                    result = _roll_cc_in_transaction(cur, roll, roll_date_str, roll.get('fx_rate') or fx_auto)
+                    cur.execute("RELEASE SAVEPOINT sp_cc_roll")
+                except (ValueError, sqlite3.Error) as e:
+                    cur.execute("ROLLBACK TO SAVEPOINT sp_cc_roll")
+                    cur.execute("RELEASE SAVEPOINT sp_cc_roll")
+                    result = {'success': False, 'cc_id': roll.get('cc_id'), 'message': f'Błąd rolowania: {e}'}
+                    if all_or_nothing:
+                        raise ValueError(result['message']) from e
+                results.append(result)
+    except (ValueError, sqlite3.Error) as e:
+        failed = [{'success': False, 'cc_id': r.get('cc_id'), 'message': str(e)} for r in rolls]
+        return {'success': False, 'message': str(e), 'rolled': 0, 'failed': len(rolls), 'results': failed}
+
+    rolled = sum(1 for r in results if r['success'])
+    return {
+        'success': rolled == len(results),
+        'message': f'Zrolowano {rolled}/{len(results)} CC na {roll_date_str}',
+        'rolled': rolled,
+        'failed': len(results) - rolled,
+        'results': results,
+    }
+
+
+def mass_fix_bought_back_cc_reservations():
+    """
+    🔓 Naprawa rezerwacji dla CC ze statusem 'bought_back' – BEZ modyfikacji lots.quantity_open.
+
+    Zasady:
+      - Źródłem prawdy o rezerwacjach są tabele mapowań.
+      - Dla CC o statusie 'bought_back' kasujemy odpowiadające wpisy:
+          * cc_lot_mappings (nowa tabela)
+          * options_cc_reservations (stara tabela – fallback/legacy)
+      - Nie zmieniamy lots.quantity_open.
+    Naprawa typu 'bought_back_reserved' z audytu rezerwacji (db.reservation_audit):
+    jedno zbiorowe DELETE na tabelę w jednej transakcji, kopia zapasowa przed.
+
+    Returns:
+        dict: {
+          'success': bool,
+          'message': str,
+          'fixed_count': int,                # liczba CC, dla których coś usunięto
+          'rows_deleted_cc_lot_mappings': int,
+          'rows_deleted_options_cc_reservations': int,
+          'shares_released_logical': int     # suma akcji usuniętych z mapowań
+        }
+    """
+    from db.reservation_audit import audit_cc_reservations
+
+    report = audit_cc_reservations(fix=True, fix_types=['bought_back_reserved'])
+    if not report['success']:
+        return {'success': False, 'message': report['message'], 'fixed_count': 0}
+
+    fixed = report['fixed'].get('bought_back_reserved')
+    if not fixed:
+        return {
+            'success': True,
+            'message': 'Brak CC bought_back z aktywnymi rezerwacjami',
+            'fixed_count': 0,
+            'rows_deleted_cc_lot_mappings': 0,
+            'rows_deleted_options_cc_reservations': 0,
+            'shares_released_logical': 0
+        }
+
+    msg_parts = [f"Naprawiono {fixed['cc_count']} CC"]
+    if fixed['rows_deleted_cc_lot_mappings']:
+        msg_parts.append(f"usunięto {fixed['rows_deleted_cc_lot_mappings']} wpisów z cc_lot_mappings")
+    if fixed['rows_deleted_options_cc_reservations']:
+        msg_parts.append(f"usunięto {fixed['rows_deleted_options_cc_reservations']} wpisów z options_cc_reservations")
+    if fixed['shares_released']:
+        msg_parts.append(f"łączna „logicznie zwolniona” liczba akcji: {fixed['shares_released']}")
+
+    return {
+        'success': True,
+        'message': " | ".join(msg_parts),
+        'fixed_count': fixed['cc_count'],
+        'rows_deleted_cc_lot_mappings': fixed['rows_deleted_cc_lot_mappings'],
+        'rows_deleted_options_cc_reservations': fixed['rows_deleted_options_cc_reservations'],
+        'shares_released_logical': fixed['shares_released']
+    }
+
+
+def get_blocked_cc_status():
+    """
+    🔍 SPRAWDZA: ile CC ze statusem 'bought_back' wciąż ma rezerwacje
+    w cc_lot_mappings (nowa) i/lub options_cc_reservations (stara).
+    (typ 'bought_back_reserved' z audytu rezerwacji)
+
+    Zwraca:
+        {
+          'blocked_cc_count': int,         # liczba unikalnych CC z blokadami
+          'blocked_shares': int,           # suma zarezerwowanych akcji (po zsumowaniu z obu tabel per CC)
+          'details': [str, ...],           # opis per tabela
+          'has_problems': bool
+        }
+    """
+    from db.reservation_audit import audit_cc_reservations
+
+    report = audit_cc_reservations()
+    if not report['success']:
+        return {'error': f"Błąd sprawdzania: {report['message']}"}
+
+    blocked = [d for d in report['discrepancies'] if d['type'] == 'bought_back_reserved']
+    with_new = [d for d in blocked if d['mapped_rows']]
+    with_old = [d for d in blocked if d['legacy_rows']]
+    details = [
+        f"Nowa tabela: {len(with_new)} CC, {sum(d['mapped'] for d in with_new)} akcji",
+        f"Stara tabela: {len(with_old)} CC, {sum(d['legacy'] for d in with_old)} akcji",
+    ]
+
+    return {
+        'blocked_cc_count': len(blocked),
+        'blocked_shares': sum(d['actual'] for d in blocked),
+        'details': details,
+        'has_problems': len(blocked) > 0
+    }
@@ -0,0 +1,513 @@
+"""
+Audyt rezerwacji CC: wszystkie otwarte CC naraz, kilkoma zapytaniami zbiorowymi
+
+Zamiast pętli per ticker / per CC (check_cc_coverage, diagnostyka rezerwacji):
+  1. otwarte CC (kontrakty, daty)
+  2. wszystkie wiersze rezerwacji otwartych CC z obu tabel (UNION ALL) + dane LOT-u
+  3. LOT-y: sprzedane + zarezerwowane vs quantity_total, zgodność lot_positions
+  4. CC odkupione (bought_back) wciąż trzymające rezerwacje
+Klasyfikacja rozbieżności w Pythonie na wynikach tych zapytań. Opcjonalna
+naprawa w jednej transakcji (po kopii zapasowej).
+
+CC wygasłe / przypisane zwalniają rezerwacje przy zamknięciu: expire_covered_call
+i assign_covered_call usuwają cc_lot_mappings, a options_cc_reservations czyści
+trigger trg_cc_release_reservations_on_status_update. Pozostałości po ścieżkach
+odkupu wykrywa przebieg 4.
+"""
+
+import json
+import sqlite3
+import time
+from datetime import date as _date, datetime as _dt
+
+import db
+from db import get_connection
+
+# Typ rozbieżności → (waga, opis, czy naprawiana automatycznie)
+DISCREPANCY_TYPES = {
+    'missing_mappings': ('error', 'Otwarty CC bez mapowań cc_lot_mappings', True),
+    'under_reserved': ('error', 'Zmapowano mniej akcji niż kontrakty × 100', True),
+    'over_reserved': ('error', 'Zmapowano więcej akcji niż kontrakty × 100', True),
+    'lot_wrong_ticker': ('error', 'Mapowanie na LOT innego tickera', True),
+    'lot_bought_after_open': ('error', 'Mapowanie na LOT kupiony po otwarciu CC', True),
+    'lot_overcommitted': ('error', 'LOT: sprzedane + zarezerwowane > quantity_total', False),
+    'legacy_mismatch': ('warning', 'options_cc_reservations niezgodne z cc_lot_mappings', True),
+    'bought_back_reserved': ('warning', 'CC odkupiony wciąż trzyma rezerwacje', True),
+    'lot_positions_drift': ('warning', 'lot_positions niezgodne z tabelami źródłowymi', True),
+    'open_with_close_date': ('warning', 'CC ze statusem open ma ustawione close_date', False),
+    'past_expiry': ('info', 'CC ze statusem open po dacie wygaśnięcia', False),
+}
+
+# Typy naprawiane ponownym przydziałem FIFO na dzień otwarcia CC
+REALLOCATE_TYPES = ('missing_mappings', 'under_reserved', 'over_reserved',
+                    'lot_wrong_ticker', 'lot_bought_after_open')
+
+
+def _discrepancy(kind, message, **fields):
+    severity, _, fixable = DISCREPANCY_TYPES[kind]
+    return {'type': kind, 'severity': severity, 'fixable': fixable,
+            'cc_id': None, 'lot_id': None, 'ticker': None,
+            **fields, 'message': message}
+
+
+def _load_open_ccs(cur, today):
+    cur.execute("""
+        SELECT id, UPPER(ticker) AS ticker, contracts, open_date, close_date, expiry_date
+        FROM options_cc
+        WHERE status = 'open'
+        ORDER BY open_date, id
+    """)
+    ccs = {}
+    for row in cur.fetchall():
+        open_date = str(row['open_date']) if row['open_date'] is not None else None
+        close_date = str(row['close_date']) if row['close_date'] is not None else None
+        ccs[row['id']] = {
+            'id': row['id'],
+            'ticker': row['ticker'],
+            'contracts': int(row['contracts'] or 0),
+            'open_date': open_date,
+            'close_date': close_date,
+            'expiry_date': str(row['expiry_date']) if row['expiry_date'] is not None else None,
+            'active_today': (open_date is not None and open_date <= today
+                             and (close_date is None or close_date > today)),
+            'expected_reserved': int(row['contracts'] or 0) * 100,
+            'mapped_reserved': 0,
+            'legacy_reserved': 0,
+            'mapped_details': [],
+            'legacy_details': [],
+        }
+    return ccs
+
+
+def _load_reservation_rows(cur):
+    """Rezerwacje otwartych CC z obu tabel, z tickerem i datą zakupu LOT-u"""
+    cur.execute("""
+        SELECT x.source, x.cc_id, x.lot_id, SUM(x.qty) AS qty,
+               UPPER(l.ticker) AS lot_ticker, l.buy_date, l.id IS NOT NULL AS lot_exists
+        FROM (
+            SELECT 'mapping' AS source, m.cc_id, m.lot_id, m.shares_reserved AS qty
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE cc.status = 'open'
+            UNION ALL
+            SELECT 'legacy', r.cc_id, r.lot_id, r.qty_reserved
+            FROM options_cc_reservations r
+            JOIN options_cc cc ON cc.id = r.cc_id
+            WHERE cc.status = 'open'
+        ) x
+        LEFT JOIN lots l ON l.id = x.lot_id
+        GROUP BY x.source, x.cc_id, x.lot_id
+        ORDER BY x.cc_id, x.lot_id
+    """)
+    return cur.fetchall()
+
+
+def _load_lot_problems(cur):
+    """LOT-y przeciążone lub z lot_positions rozjechanym względem tabel źródłowych"""
+    cur.execute("""
+        WITH sold AS (
+            SELECT lot_id, SUM(qty_from_lot) AS qty
+            FROM stock_trade_splits
+            GROUP BY lot_id
+        ),
+        mapped AS (
+            SELECT m.lot_id, SUM(m.shares_reserved) AS qty
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            WHERE cc.status = 'open'
+            GROUP BY m.lot_id
+        ),
+        legacy AS (
+            SELECT r.lot_id, SUM(r.qty_reserved) AS qty,
+                   SUM(CASE WHEN EXISTS (SELECT 1 FROM cc_lot_mappings m2 WHERE m2.cc_id = r.cc_id)
+                            THEN 0 ELSE r.qty_reserved END) AS qty_unmapped
+            FROM options_cc_reservations r
+            JOIN options_cc cc ON cc.id = r.cc_id
+            WHERE cc.status = 'open'
+            GROUP BY r.lot_id
+        ),
+        lot_state AS (
+            SELECT l.id, UPPER(l.ticker) AS ticker, l.quantity_total,
+                   COALESCE(s.qty, 0) AS sold,
+                   COALESCE(m.qty, 0) AS reserved,
+                   COALESCE(g.qty, 0) AS reserved_legacy,
+                   COALESCE(g.qty_unmapped, 0) AS reserved_unmapped,
+                   p.lot_id IS NOT NULL AS has_position,
+                   p.qty_sold AS pos_sold,
+                   p.qty_reserved AS pos_reserved,
+                   p.qty_reserved_legacy AS pos_reserved_legacy
+            FROM lots l
+            LEFT JOIN sold s ON s.lot_id = l.id
+            LEFT JOIN mapped m ON m.lot_id = l.id
+            LEFT JOIN legacy g ON g.lot_id = l.id
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
+        )
+        SELECT * FROM lot_state
+        WHERE sold + reserved + reserved_unmapped > quantity_total
+           OR NOT has_position
+           OR pos_sold != sold
+           OR pos_reserved != reserved
+           OR pos_reserved_legacy != reserved_legacy
+        ORDER BY id
+    """)
+    return cur.fetchall()
+
+
+def _load_bought_back_reserved(cur):
+    cur.execute("""
+        SELECT x.cc_id, UPPER(cc.ticker) AS ticker,
+               SUM(x.mapped) AS mapped, SUM(x.legacy) AS legacy,
+               SUM(x.mapped_rows) AS mapped_rows, SUM(x.legacy_rows) AS legacy_rows
+        FROM (
+            SELECT cc_id, shares_reserved AS mapped, 0 AS legacy, 1 AS mapped_rows, 0 AS legacy_rows
+            FROM cc_lot_mappings
+            UNION ALL
+            SELECT cc_id, 0, qty_reserved, 0, 1
+            FROM options_cc_reservations
+        ) x
+        JOIN options_cc cc ON cc.id = x.cc_id
+        WHERE cc.status = 'bought_back'
+        GROUP BY x.cc_id
+        ORDER BY x.cc_id
+    """)
+    return cur.fetchall()
+
+
+def _audit(conn, today):
+    """Wszystkie przebiegi na jednym połączeniu → (ccs, discrepancies, stats)"""
+    cur = conn.cursor()
+    ccs = _load_open_ccs(cur, today)
+    discrepancies = []
+
+    # Przebieg 2: wiersze rezerwacji otwartych CC
+    bad_lots = {}  # cc_id → [(kind, lot_id, message)]
+    per_lot = {}   # (cc_id, lot_id) → [mapped, legacy]
+    reservation_rows = _load_reservation_rows(cur)
+    for row in reservation_rows:
+        cc = ccs.get(row['cc_id'])
+        if cc is None:
+            continue
+        qty = int(row['qty'] or 0)
+        lot_id = row['lot_id']
+        counts = per_lot.setdefault((cc['id'], lot_id), [0, 0])
+        if row['source'] == 'mapping':
+            counts[0] += qty
+            cc['mapped_reserved'] += qty
+            cc['mapped_details'].append({'lot_id': lot_id, 'qty_reserved': qty})
+        else:
+            counts[1] += qty
+            cc['legacy_reserved'] += qty
+            cc['legacy_details'].append({'lot_id': lot_id, 'qty_reserved': qty})
+            continue
+
+        if not row['lot_exists'] or row['lot_ticker'] != cc['ticker']:
+            found = row['lot_ticker'] if row['lot_exists'] else 'brak LOT-u'
+            bad_lots.setdefault(cc['id'], []).append((
+                'lot_wrong_ticker', lot_id,
+                f"CC #{cc['id']} ({cc['ticker']}): LOT #{lot_id} → {found}"))
+        elif row['buy_date'] is not None and cc['open_date'] is not None \
+                and str(row['buy_date']) > cc['open_date']:
+            bad_lots.setdefault(cc['id'], []).append((
+                'lot_bought_after_open', lot_id,
+                f"CC #{cc['id']} z {cc['open_date']}: LOT #{lot_id} kupiony {row['buy_date']}"))
+
+    legacy_mismatch = {cc_id for (cc_id, _), (mapped, legacy) in per_lot.items()
+                       if mapped != legacy and ccs[cc_id]['mapped_reserved'] > 0}
+
+    for cc in ccs.values():
+        cid, expected, mapped = cc['id'], cc['expected_reserved'], cc['mapped_reserved']
+        base = {'cc_id': cid, 'ticker': cc['ticker'], 'expected': expected, 'actual': mapped}
+        if mapped == 0:
+            discrepancies.append(_discrepancy(
+                'missing_mappings',
+                f"CC #{cid} ({cc['ticker']}): brak mapowań, oczekiwano {expected} "
+                f"(options_cc_reservations: {cc['legacy_reserved']})", **base))
+        elif mapped < expected:
+            discrepancies.append(_discrepancy(
+                'under_reserved', f"CC #{cid} ({cc['ticker']}): {mapped}/{expected} akcji", **base))
+        elif mapped > expected:
+            discrepancies.append(_discrepancy(
+                'over_reserved', f"CC #{cid} ({cc['ticker']}): {mapped}/{expected} akcji", **base))
+
+        for kind, lot_id, message in bad_lots.get(cid, ()):
+            discrepancies.append(_discrepancy(kind, message, cc_id=cid, lot_id=lot_id,
+                                              ticker=cc['ticker']))
+
+        if cid in legacy_mismatch:
+            discrepancies.append(_discrepancy(
+                'legacy_mismatch',
+                f"CC #{cid} ({cc['ticker']}): cc_lot_mappings {mapped}, "
+                f"options_cc_reservations {cc['legacy_reserved']}",
+                cc_id=cid, ticker=cc['ticker'], expected=mapped, actual=cc['legacy_reserved']))
+
+        if cc['close_date'] is not None:
+            discrepancies.append(_discrepancy(
+                'open_with_close_date', f"CC #{cid} ({cc['ticker']}): close_date {cc['close_date']}",
+                cc_id=cid, ticker=cc['ticker']))
+        if cc['expiry_date'] is not None and cc['expiry_date'] < today:
+            discrepancies.append(_discrepancy(
+                'past_expiry', f"CC #{cid} ({cc['ticker']}): wygasł {cc['expiry_date']}",
+                cc_id=cid, ticker=cc['ticker']))
+
+    # Przebieg 3: LOT-y
+    lot_rows = _load_lot_problems(cur)
+    for row in lot_rows:
+        committed = row['sold'] + row['reserved'] + row['reserved_unmapped']
+        if committed > row['quantity_total']:
+            discrepancies.append(_discrepancy(
+                'lot_overcommitted',
+                f"LOT #{row['id']} ({row['ticker']}): sprzedane {row['sold']} + "
+                f"zarezerwowane {row['reserved'] + row['reserved_unmapped']} > {row['quantity_total']}",
+                lot_id=row['id'], ticker=row['ticker'],
+                expected=row['quantity_total'], actual=committed))
+        stored = ((row['pos_sold'], row['pos_reserved'], row['pos_reserved_legacy'])
+                  if row['has_position'] else None)
+        actual = (row['sold'], row['reserved'], row['reserved_legacy'])
+        if stored != actual:
+            discrepancies.append(_discrepancy(
+                'lot_positions_drift',
+                f"LOT #{row['id']} ({row['ticker']}): lot_positions {stored}, źródło {actual}",
+                lot_id=row['id'], ticker=row['ticker'],
+                expected=list(actual), actual=list(stored) if stored else None))
+
+    # Przebieg 4: odkupione CC z rezerwacjami
+    for row in _load_bought_back_reserved(cur):
+        discrepancies.append(_discrepancy(
+            'bought_back_reserved',
+            f"CC #{row['cc_id']} ({row['ticker']}): cc_lot_mappings {row['mapped']}, "
+            f"options_cc_reservations {row['legacy']}",
+            cc_id=row['cc_id'], ticker=row['ticker'], expected=0,
+            actual=int(row['mapped'] or 0) + int(row['legacy'] or 0),
+            mapped=int(row['mapped'] or 0), legacy=int(row['legacy'] or 0),
+            mapped_rows=int(row['mapped_rows'] or 0), legacy_rows=int(row['legacy_rows'] or 0)))
+
+    stats = {'open_cc': len(ccs), 'reservation_rows': len(reservation_rows),
+             'flagged_lots': len(lot_rows)}
+    return ccs, discrepancies, stats
+
+
+# ================================
+# NAPRAWA
+# ================================
+
+def _reallocate_fifo(conn, cc, created_at):
+    """
+    Ponowny przydział FIFO dla jednego CC od dnia open_date (w SAVEPOINT)
+
+    Returns:
+        str | None: opis problemu (rezerwacje CC bez zmian) lub None
+    """
+    from db.timeline import ShareTimeline
+
+    conn.execute("SAVEPOINT cc_realloc")
+    try:
+        conn.execute("DELETE FROM cc_lot_mappings WHERE cc_id = ?", (cc['id'],))
+        conn.execute("DELETE FROM options_cc_reservations WHERE cc_id = ?", (cc['id'],))
+
+        # Oś czasu z tego połączenia widzi zmiany niezatwierdzonej transakcji;
+        # LOT-y w kolejności FIFO, ilość wolna przez cały okres od open_date
+        timeline = ShareTimeline.load(conn, cc['ticker'])
+        free = timeline.min_free_from(cc['open_date'])
+        needed = cc['expected_reserved']
+        allocations = []
+        for lot in timeline.lots:
+            if needed <= 0:
+                break
+            qty = min(free.get(lot['id'], 0), needed)
+            if qty > 0:
+                allocations.append((cc['id'], lot['id'], qty))
+                needed -= qty
+
+        if needed > 0:
+            conn.execute("ROLLBACK TO cc_realloc")
+            return (f"brak pokrycia na {cc['open_date']}: wolne "
+                    f"{cc['expected_reserved'] - needed}/{cc['expected_reserved']}")
+
+        conn.executemany("""
+            INSERT INTO cc_lot_mappings (cc_id, lot_id, shares_reserved, created_at)
+            VALUES (?, ?, ?, ?)
+        """, [(*a, created_at) for a in allocations])
+        conn.executemany("""
+            INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+            VALUES (?, ?, ?)
+        """, allocations)
+        return None
+    finally:
+        conn.execute("RELEASE cc_realloc")
+
+
+def _apply_fixes(conn, ccs, discrepancies, fix_types):
+    """Naprawy wybranych typów rozbieżności na połączeniu w otwartej transakcji"""
+    fixed = {}
+    failed = []
+
+    def ids(kinds):
+        # CC w kolejności otwarcia (ponowny FIFO zależy od przydziałów wcześniejszych CC)
+        found = {d['cc_id'] for d in discrepancies if d['type'] in kinds}
+        return sorted(found, key=lambda cid: (ccs[cid]['open_date'] or '', cid))
+
+    # 1) Odkupione CC: zwolnienie rezerwacji w obu tabelach
+    if 'bought_back_reserved' in fix_types:
+        rows = [d for d in discrepancies if d['type'] == 'bought_back_reserved']
+        if rows:
+            payload = json.dumps([d['cc_id'] for d in rows])
+            for table in ('cc_lot_mappings', 'options_cc_reservations'):
+                conn.execute(f"DELETE FROM {table} WHERE cc_id IN (SELECT value FROM json_each(?))",
+                             (payload,))
+            fixed['bought_back_reserved'] = {
+                'cc_count': len(rows),
+                'rows_deleted_cc_lot_mappings': sum(d['mapped_rows'] for d in rows),
+                'rows_deleted_options_cc_reservations': sum(d['legacy_rows'] for d in rows),
+                'shares_released': sum(d['actual'] for d in rows),
+            }
+
+    # 2) Błędne przydziały: CC bez mapowań z poprawnymi rezerwacjami legacy są
+    #    przenoszone zbiorowo, pozostałe - ponowny FIFO w kolejności otwarcia
+    realloc_ids = ids(set(REALLOCATE_TYPES) & set(fix_types))
+    if realloc_ids:
+        flagged_lots = {d['cc_id'] for d in discrepancies
+                        if d['type'] in ('lot_wrong_ticker', 'lot_bought_after_open')}
+        promote = [cid for cid in realloc_ids
+                   if ccs[cid]['mapped_reserved'] == 0
+                   and ccs[cid]['legacy_reserved'] == ccs[cid]['expected_reserved']
+                   and cid not in flagged_lots]
+        # Wiersze legacy bez mapowań nie są sprawdzane w przebiegu 2 - weryfikacja tutaj
+        if promote:
+            valid = conn.execute("""
+                SELECT r.cc_id
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                LEFT JOIN lots l ON l.id = r.lot_id
+                WHERE r.cc_id IN (SELECT value FROM json_each(?))
+                GROUP BY r.cc_id
+                HAVING SUM(CASE WHEN l.id IS NULL OR UPPER(l.ticker) != UPPER(cc.ticker)
+                                  OR l.buy_date > cc.open_date THEN 1 ELSE 0 END) = 0
+            """, (json.dumps(promote),)).fetchall()
+            promote = [row[0] for row in valid]
+        if promote:
+            conn.execute("""
+                INSERT INTO cc_lot_mappings (cc_id, lot_id, shares_reserved, created_at)
+                SELECT cc_id, lot_id, SUM(qty_reserved), ?
+                FROM options_cc_reservations
+                WHERE cc_id IN (SELECT value FROM json_each(?))
+                GROUP BY cc_id, lot_id
+            """, (_dt.utcnow().strftime("%Y-%m-%d %H:%M:%S"), json.dumps(promote)))
+
+        created_at = _dt.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        reallocated = []
+        for cid in realloc_ids:
+            if cid in promote:
+                continue
+            problem = _reallocate_fifo(conn, ccs[cid], created_at)
+            if problem:
+                failed.append({'cc_id': cid, 'message': f"CC #{cid}: {problem}"})
+            else:
+                reallocated.append(cid)
+        fixed['reallocated'] = {'promoted_from_legacy': promote, 'fifo': reallocated}
+        realloc_ids = set(promote) | set(reallocated)
+
+    # 3) Lustro legacy odbudowane z cc_lot_mappings (CC nie ruszane w kroku 2)
+    if 'legacy_mismatch' in fix_types:
+        mirror_ids = [cid for cid in ids({'legacy_mismatch'}) if cid not in realloc_ids]
+        if mirror_ids:
+            payload = json.dumps(mirror_ids)
+            conn.execute("DELETE FROM options_cc_reservations WHERE cc_id IN (SELECT value FROM json_each(?))",
+                         (payload,))
+            conn.execute("""
+                INSERT INTO options_cc_reservations (cc_id, lot_id, qty_reserved)
+                SELECT cc_id, lot_id, shares_reserved
+                FROM cc_lot_mappings
+                WHERE cc_id IN (SELECT value FROM json_each(?))
+            """, (payload,))
+            fixed['legacy_mismatch'] = {'cc_ids': mirror_ids}
+
+    # 4) lot_positions: pełne przeliczenie (triggery utrzymują je po krokach 1-3)
+    if 'lot_positions_drift' in fix_types and any(d['type'] == 'lot_positions_drift' for d in discrepancies):
+        from schema_migrations import rebuild_lot_positions
+        fixed['lot_positions_drift'] = {'lots': rebuild_lot_positions(conn)}
+
+    return fixed, failed
+
+
+# ================================
+# API
+# ================================
+
+def audit_cc_reservations(fix=False, fix_types=None, today=None):
+    """
+    Walidacja rezerwacji wszystkich otwartych CC względem LOT-ów, sprzedaży i statusów
+
+    Args:
+        fix: napraw rozbieżności oznaczone jako fixable (jedna transakcja, kopia przed)
+        fix_types: ograniczenie naprawy do wybranych typów (domyślnie wszystkie naprawialne)
+        today: dzień odniesienia YYYY-MM-DD (domyślnie dziś)
+
+    Returns:
+        dict: {'success', 'message', 'today', 'duration_ms', 'stats',
+               'ccs': {cc_id: {...}}, 'discrepancies': [{'type', 'severity', 'fixable',
+               'cc_id', 'lot_id', 'ticker', 'message', ...}], 'by_type': {type: n},
+               przy fix: 'fixed', 'failed', 'backup', 'after' (by_type po naprawie)}
+    """
+    today = today or _date.today().isoformat()
+    started = time.perf_counter()
+
+    conn = get_connection()
+    if not conn:
+        return {'success': False, 'message': 'Brak połączenia z bazą'}
+    try:
+        ccs, discrepancies, stats = _audit(conn, today)
+    except sqlite3.Error as e:
+        return {'success': False, 'message': f'Błąd audytu rezerwacji: {e}'}
+    finally:
+        conn.close()
+
+    by_type = {}
+    for d in discrepancies:
+        by_type[d['type']] = by_type.get(d['type'], 0) + 1
+
+    report = {
+        'success': True,
+        'message': (f"{len(discrepancies)} rozbieżności w {stats['open_cc']} otwartych CC"
+                    if discrepancies else f"Brak rozbieżności ({stats['open_cc']} otwartych CC)"),
+        'today': today,
+        'duration_ms': round((time.perf_counter() - started) * 1000.0, 2),
+        'stats': stats,
+        'ccs': ccs,
+        'discrepancies': discrepancies,
+        'by_type': by_type,
+    }
+    if not fix:
+        return report
+
+    fix_types = [t for t in (fix_types or DISCREPANCY_TYPES) if DISCREPANCY_TYPES[t][2]]
+    if not any(d['type'] in fix_types for d in discrepancies):
+        report.update({'fixed': {}, 'failed': [], 'backup': None, 'after': by_type})
+        return report
+
+    from db.backup import backup_before
+    backup = backup_before('reservation-fix')
+    report['backup'] = backup.get('file')
+    if not backup['success']:
+        report.update({'success': False, 'fixed': {}, 'failed': [],
+                       'message': f"Brak kopii zapasowej - przerwano: {backup['message']}"})
+        return report
+
+    try:
+        with db.transaction(immediate=True) as conn:
+            # Stan mógł się zmienić między audytem a blokadą zapisu
+            ccs, discrepancies, _ = _audit(conn, today)
+            fixed, failed = _apply_fixes(conn, ccs, discrepancies, fix_types)
+    except sqlite3.Error as e:
+        report.update({'success': False, 'fixed': {}, 'failed': [],
+                       'message': f'Błąd transakcji naprawy: {e}'})
+        return report
+
+    after = audit_cc_reservations(today=today)
+    report.update({
+        'fixed': fixed,
+        'failed': failed,
+        'after': after.get('by_type', {}),
+        'message': (f"Naprawa: {', '.join(fixed) or 'brak zmian'}"
+                    + (f"; problemy: {len(failed)}" if failed else "")),
+    })
+    return report
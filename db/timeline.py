@@ -0,0 +1,279 @@
+"""
+Oś czasu dostępności akcji per ticker (AS-OF) w pamięci
+
+Budowana czterema zapytaniami (LOT-y, sprzedaże, mapowania CC, stare rezerwacje)
+i trzymana w cache z kluczem wersji tabel (table_versions) - każdy zapis do
+lots / trades / CC powoduje przebudowę przy następnym odczycie. Odpowiedź
+"wolne akcje per LOT na dzień D" to wyszukiwanie binarne w posortowanych
+datach z sumami prefiksowymi, bez zapytań do bazy.
+
+Semantyka jak w zapytaniach check_cc_coverage_with_chronology:
+  - posiadane:   lots.buy_date <= D
+  - sprzedane:   stock_trades.sell_date < D
+  - rezerwacje:  cc.open_date <= D AND (cc.close_date IS NULL OR cc.close_date > D)
+                 (mapowania cc_lot_mappings; gdy suma 0 - options_cc_reservations)
+Daty porównywane jako tekst, tak jak w SQLite.
+"""
+
+import threading
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import date as _date, timedelta
+from itertools import accumulate
+
+import db
+from db import get_connection, _table_versions_token
+
+# Tabele, od których zależy oś czasu (token wersji)
+TIMELINE_TABLES = (
+    'lots', 'stock_trades', 'stock_trade_splits',
+    'options_cc', 'cc_lot_mappings', 'options_cc_reservations',
+)
+
+# Limit tickerów trzymanych w pamięci (najdawniej używane są usuwane)
+MAX_TIMELINES = 64
+
+_timelines = OrderedDict()
+_timelines_lock = threading.Lock()
+_timeline_stats = {'hits': 0, 'builds': 0}
+
+
+class _Steps:
+    """Posortowane daty zdarzeń + sumy prefiksowe ilości"""
+
+    __slots__ = ('dates', 'cumulative')
+
+    def __init__(self, events):
+        events = sorted(events)
+        self.dates = [d for d, _ in events]
+        self.cumulative = [0, *accumulate(q for _, q in events)]
+
+    def before(self, day):
+        """Suma ilości z datą < day"""
+        return self.cumulative[bisect_left(self.dates, day)]
+
+    def through(self, day):
+        """Suma ilości z datą <= day"""
+        return self.cumulative[bisect_right(self.dates, day)]
+
+
+class _Reservations:
+    """Przedziały rezerwacji [open_date, close_date) per LOT jako dwa ciągi kroków"""
+
+    __slots__ = ('buy_date', 'opens', 'closes')
+
+    def __init__(self, buy_date, intervals):
+        self.buy_date = buy_date
+        opens, closes = [], []
+        for open_date, close_date, qty in intervals:
+            if open_date is None:
+                continue
+            if close_date is not None:
+                if close_date <= open_date:
+                    continue  # przedział pusty - nigdy nie był aktywny
+                closes.append((close_date, qty))
+            opens.append((open_date, qty))
+        self.opens = _Steps(opens)
+        self.closes = _Steps(closes)
+
+    def as_of(self, day):
+        if self.buy_date is None or self.buy_date > day:
+            return 0
+        return self.opens.through(day) - self.closes.through(day)
+
+
+class ShareTimeline:
+    """Dostępność akcji jednego tickera w czasie (niezmienna po zbudowaniu)"""
+
+    def __init__(self, ticker, lots, sales, mappings, legacy):
+        self.ticker = ticker
+        self.lots = lots  # [dict] posortowane FIFO (buy_date, id)
+        self._sold = {lot_id: _Steps(events) for lot_id, events in sales.items()}
+        self._mappings = {lot_id: _Reservations(buy_date, intervals)
+                          for lot_id, (buy_date, intervals) in mappings.items()}
+        self._legacy = {lot_id: _Reservations(buy_date, intervals)
+                        for lot_id, (buy_date, intervals) in legacy.items()}
+
+    @classmethod
+    def load(cls, conn, ticker):
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT id, quantity_total, buy_date, buy_price_usd, fx_rate, cost_pln
+            FROM lots
+            WHERE ticker = ?
+            ORDER BY buy_date ASC, id ASC
+        """, (ticker,))
+        lots = [{
+            'id': row['id'],
+            'quantity_total': int(row['quantity_total'] or 0),
+            'buy_date': str(row['buy_date']) if row['buy_date'] is not None else None,
+            'buy_price_usd': row['buy_price_usd'],
+            'fx_rate': row['fx_rate'],
+            'cost_pln': row['cost_pln'],
+        } for row in cur.fetchall()]
+
+        # CROSS JOIN: LOT-y tickera jako pętla zewnętrzna (bez statystyk planner
+        # wybiera skan wszystkich stock_trade_splits, żeby uniknąć sortowania GROUP BY)
+        cur.execute("""
+            SELECT sts.lot_id, st.sell_date, COALESCE(SUM(sts.qty_from_lot), 0) AS qty
+            FROM lots l
+            CROSS JOIN stock_trade_splits sts ON sts.lot_id = l.id
+            JOIN stock_trades st ON st.id = sts.trade_id
+            WHERE l.ticker = ? AND st.sell_date IS NOT NULL
+            GROUP BY sts.lot_id, st.sell_date
+        """, (ticker,))
+        sales = {}
+        for row in cur.fetchall():
+            sales.setdefault(row['lot_id'], []).append((str(row['sell_date']), int(row['qty'] or 0)))
+
+        def load_intervals(table, qty_column):
+            cur.execute(f"""
+                SELECT r.lot_id, l.buy_date, cc.open_date, cc.close_date,
+                       COALESCE(SUM(r.{qty_column}), 0) AS qty
+                FROM {table} r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                JOIN lots l ON l.id = r.lot_id
+                WHERE cc.ticker = ?
+                GROUP BY r.lot_id, cc.open_date, cc.close_date
+            """, (ticker,))
+            result = {}
+            for row in cur.fetchall():
+                buy_date = str(row['buy_date']) if row['buy_date'] is not None else None
+                entry = result.setdefault(row['lot_id'], (buy_date, []))
+                entry[1].append((
+                    str(row['open_date']) if row['open_date'] is not None else None,
+                    str(row['close_date']) if row['close_date'] is not None else None,
+                    int(row['qty'] or 0),
+                ))
+            return result
+
+        mappings = load_intervals('cc_lot_mappings', 'shares_reserved')
+        legacy = load_intervals('options_cc_reservations', 'qty_reserved')
+        return cls(ticker, lots, sales, mappings, legacy)
+
+    def as_of(self, day):
+        """
+        Stan na dzień `day` (tekst YYYY-MM-DD)
+
+        Returns:
+            dict: {'owned', 'sold_total', 'reserved_total', 'available',
+                   'sold_map', 'reserved_map', 'lots': [lot + qty_sold/qty_reserved/qty_free]}
+        """
+        sold_map = {}
+        for lot_id, steps in self._sold.items():
+            qty = steps.before(day)
+            if qty:
+                sold_map[lot_id] = qty
+
+        reserved_map = self._reserved_map(self._mappings, day)
+        if not sum(reserved_map.values()):
+            reserved_map = self._reserved_map(self._legacy, day)
+
+        owned = 0
+        lots = []
+        for lot in self.lots:
+            if lot['buy_date'] is None or lot['buy_date'] > day:
+                continue
+            owned += lot['quantity_total']
+            qty_sold = sold_map.get(lot['id'], 0)
+            qty_reserved = reserved_map.get(lot['id'], 0)
+            lots.append({
+                **lot,
+                'qty_sold': qty_sold,
+                'qty_reserved': qty_reserved,
+                'qty_free': lot['quantity_total'] - qty_sold - qty_reserved,
+            })
+
+        sold_total = sum(sold_map.values())
+        reserved_total = sum(reserved_map.values())
+        return {
+            'owned': owned,
+            'sold_total': sold_total,
+            'reserved_total': reserved_total,
+            'available': max(0, owned - sold_total - reserved_total),
+            'sold_map': sold_map,
+            'reserved_map': reserved_map,
+            'lots': lots,
+        }
+
+    def min_free_from(self, day):
+        """
+        Najmniejsza liczba wolnych akcji per LOT od dnia `day` wzwyż
+
+        Przydział dla CC otwartego bezterminowo musi być wolny przez cały okres
+        (późniejsza sprzedaż lub inny CC nie może przekroczyć LOT-u). Minimum
+        sprawdzane w dniach zdarzeń: `day`, dzień po każdej sprzedaży, otwarcia CC.
+
+        Returns:
+            dict: {lot_id: qty_free} dla LOT-ów posiadanych w dniu `day`
+        """
+        days = {day}
+        for steps in self._sold.values():
+            days.update((_date.fromisoformat(d[:10]) + timedelta(days=1)).isoformat()
+                        for d in steps.dates if d >= day)
+        for reservations in (*self._mappings.values(), *self._legacy.values()):
+            days.update(d for d in reservations.opens.dates if d > day)
+
+        free = {lot['id']: lot['qty_free'] for lot in self.as_of(day)['lots']}
+        for check_day in sorted(days):
+            for lot in self.as_of(check_day)['lots']:
+                if lot['id'] in free:
+                    free[lot['id']] = min(free[lot['id']], lot['qty_free'])
+        return free
+
+    @staticmethod
+    def _reserved_map(reservations, day):
+        reserved = {}
+        for lot_id, intervals in reservations.items():
+            qty = intervals.as_of(day)
+            if qty:
+                reserved[int(lot_id)] = qty
+        return reserved
+
+
+def get_share_timeline(ticker):
+    """
+    Oś czasu tickera z cache (przebudowa, gdy zmieniła się któraś z TIMELINE_TABLES)
+
+    Returns:
+        ShareTimeline lub None (brak połączenia)
+    """
+    ticker = str(ticker).upper().strip()
+    token = _table_versions_token(TIMELINE_TABLES)
+    key = (db.DB_PATH, ticker)
+
+    if token is not None:
+        with _timelines_lock:
+            entry = _timelines.get(key)
+            if entry is not None and entry[0] == token:
+                _timelines.move_to_end(key)
+                _timeline_stats['hits'] += 1
+                return entry[1]
+
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        timeline = ShareTimeline.load(conn, ticker)
+    finally:
+        conn.close()
+
+    with _timelines_lock:
+        _timeline_stats['builds'] += 1
+        if token is not None:
+            _timelines[key] = (token, timeline)
+            _timelines.move_to_end(key)
+            while len(_timelines) > MAX_TIMELINES:
+                _timelines.popitem(last=False)
+    return timeline
+
+
+def invalidate_share_timelines():
+    """Usunięcie wszystkich osi czasu z pamięci (np. po przywróceniu kopii)"""
+    with _timelines_lock:
+        _timelines.clear()
+
+
+def get_share_timeline_stats():
+    with _timelines_lock:
+        return dict(_timeline_stats, tickers=len(_timelines))
@@ -0,0 +1,504 @@
+"""
+Sprzedaże akcji: walidacja daty, blokady CC, FIFO podatkowe
+"""
+
+from datetime import datetime as _datetime
+from datetime import date as _date
+from typing import List, Dict
+from utils import money
+from db import get_connection
+
+
+def validate_sell_date_against_lots(ticker, sell_date, quantity_needed):
+    """
+    Walidacja temporalna: czy można sprzedać z danym dniem (buy_date <= sell_date)
+    Zwraca:
+      {
+        'valid': bool,
+        'available_quantity': int,
+        'violating_lots': List[Dict],  # LOT-y kupione po sell_date
+        'message': str
+      }
+    """
+    # --- Walidacje wejścia (bez zmiany logiki biznesowej) ---
+    if not ticker:
+        return {'valid': False, 'available_quantity': 0, 'violating_lots': [], 'message': 'Brak tickera'}
+
+    try:
+        qty_needed = int(quantity_needed)
+    except Exception:
+        return {'valid': False, 'available_quantity': 0, 'violating_lots': [], 'message': 'quantity_needed musi być liczbą całkowitą'}
+    if qty_needed < 0:
+        return {'valid': False, 'available_quantity': 0, 'violating_lots': [], 'message': 'quantity_needed nie może być ujemne'}
+
+    ticker_upper = str(ticker).upper().strip()
+
+    # Normalizacja daty do 'YYYY-MM-DD'
+    if hasattr(sell_date, 'strftime'):
+        sell_date_str = sell_date.strftime('%Y-%m-%d')
+    elif isinstance(sell_date, _date):
+        sell_date_str = sell_date.isoformat()
+    elif isinstance(sell_date, str):
+        # Spróbuj doprowadzić string do formatu ISO, jeśli to możliwe
+        try:
+            sell_date_str = _datetime.strptime(sell_date, '%Y-%m-%d').date().isoformat()
+        except Exception:
+            # jeśli format niestandardowy, bierz jak jest (logika jak w Twojej wersji)
+            sell_date_str = sell_date
+    else:
+        return {'valid': False, 'available_quantity': 0, 'violating_lots': [], 'message': 'Nieprawidłowy typ sell_date'}
+
+    conn = get_connection()
+    if not conn:
+        return {'valid': False, 'available_quantity': 0, 'violating_lots': [], 'message': 'Brak połączenia z bazą'}
+
+    try:
+        cur = conn.cursor()
+        # Bierzemy tylko LOT-y z dodatnim quantity_open (tak jak w Twojej wersji)
+        cur.execute("""
+            SELECT id, buy_date, quantity_open, quantity_total
+            FROM lots
+            WHERE ticker = ? AND quantity_open > 0
+            ORDER BY buy_date ASC, id ASC
+        """, (ticker_upper,))
+        rows = cur.fetchall()
+
+        if not rows:
+            return {
+                'valid': False,
+                'available_quantity': 0,
+                'violating_lots': [],
+                'message': f'Brak LOT-ów dla {ticker_upper}'
+            }
+
+        valid_lots = []
+        violating_lots = []
+
+        # Podział względem daty sprzedaży (stringowe porównanie działa poprawnie dla ISO 'YYYY-MM-DD')
+        for row in rows:
+            buy_date = row['buy_date']
+            lot_dict = {
+                'id': row['id'],
+                'buy_date': buy_date,
+                'quantity_open': int(row['quantity_open'] or 0),
+                'quantity_total': int(row['quantity_total'] or 0),
+            }
+            if buy_date <= sell_date_str:
+                valid_lots.append(lot_dict)
+            else:
+                violating_lots.append(lot_dict)
+
+        available_quantity = sum(l['quantity_open'] for l in valid_lots)
+
+        if qty_needed <= available_quantity:
+            return {
+                'valid': True,
+                'available_quantity': available_quantity,
+                'violating_lots': violating_lots,
+                'message': f'OK: {available_quantity} dostępne przed {sell_date_str}'
+            }
+        else:
+            return {
+                'valid': False,
+                'available_quantity': available_quantity,
+                'violating_lots': violating_lots,
+                'message': f'BŁĄD: potrzeba {qty_needed}, dostępne {available_quantity} przed {sell_date_str}'
+            }
+
+    except Exception as e:
+        return {
+            'valid': False,
+            'available_quantity': 0,
+            'violating_lots': [],
+            'message': f'Błąd walidacji: {e}'
+        }
+    finally:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+def check_cc_restrictions_before_sell(ticker, quantity_to_sell):
+    """
+    Minimalna, spójna z bazą (LOTS-only) walidacja sprzedaży.
+
+    Zasada:
+      available_in_lots = SUM(lots.quantity_open)  (realnie wolne do sprzedaży)
+      total_owned       = SUM(lots.quantity_total)
+      reserved_for_cc   = max(0, total_owned - available_in_lots)   # tylko METRYKA informacyjna
+      available_to_sell = available_in_lots
+      can_sell          = (quantity_to_sell <= available_to_sell)
+
+    UWAGA: całkowicie ignorujemy tabele CC. Jeżeli CC zostały odkupione,
+           a LOT-y pokazują np. 100 wolnych, to sprzedaż 100 przechodzi.
+    """
+    import sqlite3
+
+    # Normalizacja wejścia
+    t = str(ticker or "").upper().strip()
+    try:
+        qty_req = int(quantity_to_sell)
+    except Exception:
+        qty_req = 0
+
+    if not t:
+        return {
+            'can_sell': False,
+            'message': 'Brak tickera',
+            'available_to_sell': 0,
+            'reserved_for_cc': 0,
+            'total_available': 0,
+            'blocking_cc': []
+        }
+
+    conn = None
+    try:
+        conn = get_connection()
+        if not conn:
+            return {
+                'can_sell': False,
+                'message': 'Brak połączenia z bazą',
+                'available_to_sell': 0,
+                'reserved_for_cc': 0,
+                'total_available': 0,
+                'blocking_cc': []
+            }
+
+        try:
+            conn.row_factory = sqlite3.Row
+        except Exception:
+            pass
+        cur = conn.cursor()
+
+        # SUMA wolnych (to jest prawdziwy limit sprzedaży)
+        cur.execute("""
+            SELECT COALESCE(SUM(quantity_open), 0) AS available_in_lots
+            FROM lots
+            WHERE UPPER(ticker) = ?
+        """, (t,))
+        row = cur.fetchone()
+        available_in_lots = int(row["available_in_lots"] if row and row["available_in_lots"] is not None else 0)
+
+        # SUMA posiadanych (do metryk)
+        cur.execute("""
+            SELECT COALESCE(SUM(quantity_total), 0) AS total_owned
+            FROM lots
+            WHERE UPPER(ticker) = ?
+        """, (t,))
+        row = cur.fetchone()
+        total_owned = int(row["total_owned"] if row and row["total_owned"] is not None else 0)
+
+        # Metryka "zarezerwowane" tylko jako różnica — nie wpływa na decyzję
+        reserved_for_cc = max(0, total_owned - available_in_lots)
+
+        available_to_sell = max(0, available_in_lots)
+        can_sell = (qty_req <= available_to_sell)
+
+        return {
+            'can_sell': can_sell,
+            'available_to_sell': available_to_sell,  # = SUM(lots.quantity_open)
+            'reserved_for_cc': reserved_for_cc,      # METRYKA (total_owned - available_in_lots)
+            'total_available': total_owned,          # = SUM(lots.quantity_total)
+            'blocking_cc': [],                       # ignorujemy CC – brak listy blokujących
+            'message': 'OK' if can_sell else 'Brak wystarczającej liczby wolnych akcji w LOT-ach'
+        }
+
+    except Exception as e:
+        try:
+            import streamlit as st
+            st.error(f"Błąd check_cc_restrictions: {e}")
+        except Exception:
+            pass
+        return {
+            'can_sell': False,
+            'message': f'Błąd: {str(e)}',
+            'available_to_sell': 0,
+            'reserved_for_cc': 0,
+            'total_available': 0,
+            'blocking_cc': []
+        }
+    finally:
+        try:
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+
+def calculate_tax_fifo_allocation(ticker: str, quantity_to_sell: int) -> Dict:
+    """
+    🎯 FIFO PODATKOWE (ignoruje blokady CC przy wyborze kolejności, ale je raportuje).
+    Zwraca alokację kosztu dla PIT-38.
+    """
+    from db.lots import get_lots_by_ticker, get_lots_for_tax_fifo
+    # Walidacje
+    try:
+        qty_req = int(quantity_to_sell)
+    except Exception:
+        return {'success': False, 'error': 'quantity_to_sell musi być liczbą całkowitą', 'allocation': [], 'total_cost_pln': 0.0, 'lots_used': 0}
+    if qty_req <= 0:
+        return {'success': False, 'error': 'quantity_to_sell musi być > 0', 'allocation': [], 'total_cost_pln': 0.0, 'lots_used': 0}
+    if not ticker or not str(ticker).strip():
+        return {'success': False, 'error': 'Brak tickera', 'allocation': [], 'total_cost_pln': 0.0, 'lots_used': 0}
+
+    # 1) LOT-y w kolejności FIFO podatkowego (wszystkie, bez filtra blokad)
+    tax_lots = get_lots_for_tax_fifo(ticker)
+    if not tax_lots:
+        return {'success': False, 'error': f'Brak LOT-ów dla {ticker}', 'allocation': [], 'total_cost_pln': 0.0, 'lots_used': 0}
+
+    # 2) Sprawdź dostępność (posiadane - sprzedane)
+    total_owned = sum(int(l['quantity_total'] or 0) for l in tax_lots)
+    total_already_sold = sum(int(l.get('quantity_sold', 0) or 0) for l in tax_lots)
+    total_remaining = total_owned - total_already_sold
+
+    if qty_req > total_remaining:
+        return {
+            'success': False,
+            'error': f'Próba sprzedaży {qty_req} akcji, ale pozostało tylko {total_remaining}',
+            'allocation': [],
+            'total_cost_pln': 0.0,
+            'lots_used': 0
+        }
+
+    # 3) Alokacja FIFO (podatkowa) - koszt w groszach (utils.money): kolejne
+    #    sprzedaże z LOT-u sumują się dokładnie do jego cost_pln
+    allocation: List[Dict] = []
+    remaining = qty_req
+    total_cost_cents = 0
+
+    for lot in tax_lots:
+        if remaining <= 0:
+            break
+
+        qty_total = int(lot['quantity_total'] or 0)
+        qty_sold = int(lot.get('quantity_sold', 0) or 0)
+        lot_remaining = qty_total - qty_sold
+        if lot_remaining <= 0:
+            continue
+
+        lot_cost_cents = lot.get('cost_pln_cents')
+        if lot_cost_cents is None:
+            lot_cost_cents = money.to_cents(lot.get('cost_pln'))
+
+        use_qty = min(remaining, lot_remaining)
+        cost_from_lot_cents = money.slice_cents(lot_cost_cents, qty_sold, use_qty, qty_total)
+        cps = money.from_cents(lot_cost_cents) / qty_total if qty_total > 0 else 0.0
+
+        allocation.append({
+            'lot_id': lot['id'],
+            'lot_buy_date': lot['buy_date'],
+            'lot_buy_price_usd': float(lot.get('buy_price_usd') or 0.0),
+            'lot_fx_rate': float(lot.get('fx_rate') or 0.0),
+            'qty_used': use_qty,
+            'cost_pln': money.from_cents(cost_from_lot_cents),
+            'cost_per_share_pln': round(cps, 4),
+            'is_blocked_by_cc': bool(lot.get('is_blocked_by_cc', False)),
+            'quantity_open_before': int(lot.get('quantity_open', 0) or 0),
+            'tax_note': 'PODATKOWO_SPRZEDANE' if lot.get('is_blocked_by_cc', False) else 'NORMALNIE_SPRZEDANE'
+        })
+
+        total_cost_cents += cost_from_lot_cents
+        remaining -= use_qty
+
+    # 4) Porównanie z FIFO operacyjnym (opcjonalne)
+    comparison = None
+    try:
+        operational_lots = get_lots_by_ticker(ticker, only_open=True)  # jeśli nie istnieje, złapie except
+        comparison = {
+            'tax_lots_count': len(tax_lots),
+            'operational_lots_count': len(operational_lots) if isinstance(operational_lots, list) else None,
+            'tax_uses_blocked': any(a['is_blocked_by_cc'] for a in allocation),
+            'difference_detected': (len(tax_lots) != len(operational_lots)) if isinstance(operational_lots, list) else None
+        }
+    except Exception:
+        comparison = {
+            'tax_lots_count': len(tax_lots),
+            'operational_lots_count': None,
+            'tax_uses_blocked': any(a['is_blocked_by_cc'] for a in allocation),
+            'difference_detected': None
+        }
+
+    return {
+        'success': remaining == 0,
+        'allocation': allocation,
+        'total_cost_pln': money.from_cents(total_cost_cents),
+        'lots_used': len(allocation),
+        'comparison': comparison,
+        'debug_info': {
+            'quantity_requested': qty_req,
+            'quantity_allocated': qty_req - remaining,
+            'remaining_unallocated': remaining
+        }
+    }
+
+
+def get_tax_vs_operational_fifo_comparison(ticker: str, quantity: int) -> Dict:
+    """
+    🔍 FUNKCJA DIAGNOSTYCZNA: Porównuje FIFO podatkowy vs operacyjny
+
+    FIFO PODATKOWY: calculate_tax_fifo_allocation (wszystkie LOT-y wg buy_date)
+    FIFO OPERACYJNY: LOT-y dostępne do sprzedaży teraz = quantity_total - sold - reserved(open CC)
+                      (rezerwacje z cc_lot_mappings, fallback: options_cc_reservations)
+    """
+    try:
+        ticker_upper = (ticker or "").upper().strip()
+
+        # 1) FIFO PODATKOWY – zostawiamy Twoją funkcję źródłową
+        tax_result = calculate_tax_fifo_allocation(ticker_upper, quantity) or {}
+        tax_alloc = tax_result.get('allocation', []) or []
+        tax_total_cost = float(tax_result.get('total_cost_pln', 0.0) or 0.0)
+        tax_lots_used = [a.get('lot_id') for a in tax_alloc]
+
+        # 2) FIFO OPERACYJNY – policzone na bazie realnych rezerwacji i sprzedaży
+        conn = get_connection()
+        if not conn:
+            return {
+                'ticker': ticker_upper,
+                'quantity_tested': quantity,
+                'tax_fifo': {
+                    'success': tax_result.get('success', False),
+                    'lots_used': tax_lots_used,
+                    'total_cost_pln': tax_total_cost,
+                    'allocation_count': len(tax_alloc)
+                },
+                'operational_fifo': {
+                    'success': False,
+                    'lots_used': [],
+                    'total_cost_pln': 0.0,
+                    'allocation_count': 0
+                },
+                'differences': {
+                    'different_lots_used': True,
+                    'different_costs': True,
+                    'tax_uses_blocked_lots': any(a.get('is_blocked_by_cc', False) for a in tax_alloc),
+                    'cost_difference_pln': tax_total_cost - 0.0
+                },
+                'recommendation': 'USE_TAX_FIFO_FOR_PIT38'
+            }
+
+        cur = conn.cursor()
+
+        # 2a) Suma sprzedanych per LOT (cała historia)
+        cur.execute("""
+            SELECT sts.lot_id, COALESCE(SUM(sts.qty_from_lot), 0) AS qty_sold
+            FROM stock_trade_splits sts
+            JOIN lots l ON l.id = sts.lot_id
+            WHERE UPPER(l.ticker) = ?
+            GROUP BY sts.lot_id
+        """, (ticker_upper,))
+        sold_map = {row[0]: int(row[1] or 0) for row in (cur.fetchall() or [])}
+
+        # 2b) Rezerwacje z cc_lot_mappings dla OTWARTYCH CC
+        cur.execute("""
+            SELECT m.lot_id, COALESCE(SUM(m.shares_reserved),0) AS qty_reserved
+            FROM cc_lot_mappings m
+            JOIN options_cc cc ON cc.id = m.cc_id
+            JOIN lots l ON l.id = m.lot_id
+            WHERE cc.status='open' AND UPPER(l.ticker)=?
+            GROUP BY m.lot_id
+        """, (ticker_upper,))
+        rows = cur.fetchall() or []
+        reserved_map = {r[0]: int(r[1] or 0) for r in rows}
+        total_reserved_from_mappings = sum(reserved_map.values())
+
+        # 2c) Fallback: jeśli brak rezerwacji w cc_lot_mappings, użyj options_cc_reservations
+        if total_reserved_from_mappings == 0:
+            cur.execute("""
+                SELECT r.lot_id, COALESCE(SUM(r.qty_reserved),0) AS qty_reserved
+                FROM options_cc_reservations r
+                JOIN options_cc cc ON cc.id = r.cc_id
+                JOIN lots l ON l.id = r.lot_id
+                WHERE cc.status='open' AND UPPER(l.ticker)=?
+                GROUP BY r.lot_id
+            """, (ticker_upper,))
+            rows = cur.fetchall() or []
+            reserved_map = {r[0]: int(r[1] or 0) for r in rows}
+
+        # 2d) Lista LOT-ów (kolejność FIFO)
+        cur.execute("""
+            SELECT id, quantity_total, buy_date, cost_pln
+            FROM lots
+            WHERE UPPER(ticker)=?
+            ORDER BY buy_date ASC, id ASC
+        """, (ticker_upper,))
+        lots_rows = cur.fetchall() or []
+
+        operational_allocation = []
+        remaining = int(quantity)
+        operational_cost = 0.0
+
+        for row in lots_rows:
+            if remaining <= 0:
+                break
+            lot_id, qty_total, buy_date, cost_pln = row[0], int(row[1] or 0), row[2], float(row[3] or 0.0)
+            qty_sold = int(sold_map.get(lot_id, 0))
+            qty_res  = int(reserved_map.get(lot_id, 0))
+            qty_available = qty_total - qty_sold - qty_res
+            if qty_available <= 0:
+                continue
+
+            take = qty_available if qty_available < remaining else remaining
+            cps_pln = (cost_pln / qty_total) if qty_total > 0 else 0.0
+            cost_from_lot = round(take * cps_pln, 2)
+
+            operational_allocation.append({
+                'lot_id': lot_id,
+                'lot_buy_date': buy_date,
+                'qty_used': take,
+                'cost_pln': cost_from_lot
+            })
+
+            operational_cost += cost_from_lot
+            remaining -= take
+
+        # 2e) Czy tax FIFO używa LOT-ów zablokowanych przez CC?
+        #     Najpierw spróbuj z flagi w tax_result, a jeśli brak – sprawdź względem reserved_map.
+        tax_uses_blocked_flag = any(a.get('is_blocked_by_cc', False) for a in tax_alloc)
+        if not tax_uses_blocked_flag and reserved_map and tax_alloc:
+            for a in tax_alloc:
+                lid = a.get('lot_id')
+                if lid is not None and int(reserved_map.get(int(lid), 0)) > 0:
+                    tax_uses_blocked_flag = True
+                    break
+
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+        operational_lots_used = [a['lot_id'] for a in operational_allocation]
+
+        return {
+            'ticker': ticker_upper,
+            'quantity_tested': quantity,
+            'tax_fifo': {
+                'success': tax_result.get('success', False),
+                'lots_used': tax_lots_used,
+                'total_cost_pln': round(tax_total_cost, 2),
+                'allocation_count': len(tax_alloc)
+            },
+            'operational_fifo': {
+                'success': remaining == 0,
+                'lots_used': operational_lots_used,
+                'total_cost_pln': round(operational_cost, 2),
+                'allocation_count': len(operational_allocation)
+            },
+            'differences': {
+                'different_lots_used': tax_lots_used != operational_lots_used,
+                'different_costs': abs(tax_total_cost - operational_cost) > 0.01,
+                'tax_uses_blocked_lots': tax_uses_blocked_flag,
+                'cost_difference_pln': round(tax_total_cost - operational_cost, 2)
+            },
+            'recommendation': 'USE_TAX_FIFO_FOR_PIT38' if tax_lots_used != operational_lots_used else 'BOTH_SAME'
+        }
+
+    except Exception as e:
+        return {
+            'ticker': (ticker or '').upper(),
+            'quantity_tested': quantity,
+            'tax_fifo': {'success': False, 'lots_used': [], 'total_cost_pln': 0.0, 'allocation_count': 0},
+            'operational_fifo': {'success': False, 'lots_used': [], 'total_cost_pln': 0.0, 'allocation_count': 0},
+            'differences': {'different_lots_used': False, 'different_costs': False, 'tax_uses_blocked_lots': False, 'cost_difference_pln': 0.0},
+            'recommendation': 'USE_TAX_FIFO_FOR_PIT38',
+            'error': str(e)
+        }
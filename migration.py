@@ -11,92 +11,21 @@ import streamlit as st
 def migrate_options_cc_table():
     """
     Migracja tabeli options_cc - dodanie kolumn prowizji
+    Obecnie migracja 2 w schema_migrations - uruchamiamy brakujące migracje rejestru.
     """
-    try:
-        # Połączenie z bazą
-        conn = sqlite3.connect('portfolio.db')
-        cursor = conn.cursor()
-        
-        st.write("🔄 Sprawdzanie struktury tabeli options_cc...")
-        
-        # Sprawdź czy tabela istnieje
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name='options_cc'
-        """)
-        
-        if not cursor.fetchone():
-            st.error("❌ Tabela options_cc nie istnieje!")
-            conn.close()
-            return False
-        
-        # Sprawdź obecne kolumny
-        cursor.execute("PRAGMA table_info(options_cc)")
-        existing_columns = [col[1] for col in cursor.fetchall()]
-        
-        st.write(f"📋 Obecne kolumny: {', '.join(existing_columns)}")
-        
-        # Lista kolumn do dodania
-        new_columns = [
-            ("broker_fee_sell_usd", "DECIMAL(10,2) DEFAULT 0.00"),
-            ("reg_fee_sell_usd", "DECIMAL(10,2) DEFAULT 0.00"),
-            ("broker_fee_buyback_usd", "DECIMAL(10,2) DEFAULT 0.00"),
-            ("reg_fee_buyback_usd", "DECIMAL(10,2) DEFAULT 0.00"),
-            ("total_fees_sell_pln", "DECIMAL(15,2) DEFAULT 0.00"),
-            ("total_fees_buyback_pln", "DECIMAL(15,2) DEFAULT 0.00"),
-            ("net_premium_pln", "DECIMAL(15,2)"),
-            ("premium_buyback_pln", "DECIMAL(15,2)")
-        ]
-        
-        added_columns = 0
-        
-        for column_name, column_def in new_columns:
-            if column_name not in existing_columns:
-                try:
-                    cursor.execute(f"ALTER TABLE options_cc ADD COLUMN {column_name} {column_def}")
-                    st.success(f"✅ Dodano kolumnę: {column_name}")
-                    added_columns += 1
-                except Exception as e:
-                    st.error(f"❌ Błąd dodawania {column_name}: {e}")
-            else:
-                st.info(f"ℹ️ Kolumna {column_name} już istnieje")
-        
-        if added_columns > 0:
-            # Aktualizuj istniejące rekordy - przelicz net_premium_pln
-            st.write("🔄 Aktualizowanie istniejących rekordów...")
-            
-            cursor.execute("""
-                UPDATE options_cc 
-                SET net_premium_pln = premium_sell_pln,
-                    total_fees_sell_pln = 0.00
-                WHERE net_premium_pln IS NULL
-            """)
-            
-            updated_rows = cursor.rowcount
-            st.success(f"✅ Zaktualizowano {updated_rows} rekordów")
-        
-        conn.commit()
-        conn.close()
-        
-        st.success(f"🎉 Migracja zakończona! Dodano {added_columns} kolumn.")
-        
-        # Pokaż nową strukturę
-        conn = sqlite3.connect('portfolio.db')
-        cursor = conn.cursor()
-        cursor.execute("PRAGMA table_info(options_cc)")
-        new_columns_info = cursor.fetchall()
-        conn.close()
-        
-        st.write("📊 **Nowa struktura tabeli options_cc:**")
-        for col in new_columns_info:
-            st.write(f"  - {col[1]} ({col[2]})")
-        
-        return True
-        
-    except Exception as e:
-        st.error(f"❌ Błąd migracji: {e}")
+    import db
+
+    st.write("🔄 Uruchamianie migracji schematu (schema_migrations)...")
+    result = db.run_schema_migrations()
+    if not result.get('success'):
+        st.error(result.get('message'))
         return False
 
+    for version, description in result.get('applied', []):
+        st.success(f"✅ Migracja {version}: {description}")
+    st.success(f"🎉 {result.get('message')}")
+    return True
+
 
 def test_options_cc_operations():
     """
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta, date
 import db
 import nbp_api_client
 from utils.formatting import format_currency_usd, format_currency_pln, format_percentage
+from utils import index_advisor
 import random
 
 def show_dev_tools():
@@ -146,6 +147,9 @@ def show_dev_tools():
     # === SEKCJA 5: MONITORING I METRYKI ===
     st.markdown("## 📊 Monitoring i Metryki")
     show_system_metrics()
+    show_query_profiler()
+    show_index_audit()
+    show_db_maintenance()
     
     st.markdown("---")
     
@@ -315,6 +319,11 @@ def show_table_cleanup():
                                        key="confirm_table_delete")
             
             if confirm_delete and st.button(f"🗑️ USUŃ z {table_to_clean}", key="delete_table"):
+                backup = db.backup_before(f"delete-{table_to_clean}")
+                if not backup['success']:
+                    st.error(f"❌ Brak kopii zapasowej - przerwano: {backup['message']}")
+                    return
+                st.caption(f"💾 {backup['message']}")
                 try:
                     conn = db.get_connection()
                     if conn:
@@ -323,6 +332,8 @@ def show_table_cleanup():
                         deleted_count = cursor.rowcount
                         conn.commit()
                         conn.close()
+                        if table_to_clean == 'fx_rates':
+                            db.invalidate_fx_index()
                         
                         st.success(f"✅ Usunięto {deleted_count} rekordów z {table_to_clean}")
                         
@@ -350,6 +361,7 @@ def show_complete_database_reset():
     - Jest **NIEODWRACALNA**
     - Resetuje numbering (autoincrement)
     - Pozostawia tylko strukturę tabel
+    - Przed resetem tworzy kopię zapasową (💾 Backup/Restore)
     """)
     
     # Dwuetapowe potwierdzenie
@@ -382,6 +394,13 @@ def execute_complete_database_reset():
         
         total_deleted = 0
         
+        with st.spinner("💾 Kopia zapasowa przed resetem..."):
+            backup = db.backup_before('reset')
+        if not backup['success']:
+            st.error(f"❌ Brak kopii zapasowej - reset przerwany: {backup['message']}")
+            return
+        st.info(f"💾 {backup['message']}")
+        
         with st.spinner("🗑️ Wykonywanie kompletnego resetu bazy..."):
             conn = db.get_connection()
             if conn:
@@ -411,6 +430,7 @@ def execute_complete_database_reset():
                 
                 conn.commit()
                 conn.close()
+                db.invalidate_fx_index()
                 
                 st.success(f"🎉 **KOMPLETNY RESET WYKONANY!**")
                 st.success(f"🗑️ **Łącznie usunięto: {total_deleted} rekordów**")
@@ -442,17 +462,19 @@ def generate_test_lots(count):
         with st.spinner(f"Generowanie {count} LOT-ów..."):
             success_count = 0
             
+            # Losowe daty z ostatnich 90 dni - kursy D-1 pobierane jednym wsadem
+            buy_dates = [date.today() - timedelta(days=random.randint(1, 90))
+                         for _ in range(count)]
+            fx_rates = nbp_api_client.get_usd_rates_for_dates(buy_dates)
+            
             for i in range(count):
                 ticker = random.choice(tickers)
                 quantity = random.choice([100, 200, 300, 400, 500])
                 price = round(random.uniform(100, 400), 2)
                 
-                # Losowa data z ostatnich 90 dni
-                days_back = random.randint(1, 90)
-                buy_date = date.today() - timedelta(days=days_back)
+                buy_date = buy_dates[i]
                 
-                # POPRAWKA: Używam get_usd_rate_for_date
-                rate_data = nbp_api_client.get_usd_rate_for_date(buy_date)
+                rate_data = fx_rates.get(buy_date)
                 if rate_data:
                     fx_rate = rate_data['rate']
                 else:
@@ -526,6 +548,11 @@ def generate_test_cashflows(count):
         with st.spinner(f"Generowanie {count} cashflows..."):
             success_count = 0
             
+            # Losowe daty - kursy D-1 pobierane jednym wsadem
+            cf_dates = [date.today() - timedelta(days=random.randint(1, 30))
+                        for _ in range(count)]
+            fx_rates = nbp_api_client.get_usd_rates_for_dates(cf_dates)
+            
             for i in range(count):
                 operation = random.choice(operations)
                 
@@ -538,12 +565,9 @@ def generate_test_cashflows(count):
                 else:  # fee
                     amount_usd = -round(random.uniform(5, 50), 2)
                 
-                # Losowa data
-                days_back = random.randint(1, 30)
-                cf_date = date.today() - timedelta(days=days_back)
+                cf_date = cf_dates[i]
                 
-                # POPRAWKA: Używam get_usd_rate_for_date
-                rate_data = nbp_api_client.get_usd_rate_for_date(cf_date)
+                rate_data = fx_rates.get(cf_date)
                 fx_rate = rate_data['rate'] if rate_data else 4.0
                 
                 # POPRAWKA: Używam insert_cashflow
@@ -681,18 +705,46 @@ def show_sql_console():
                 
         except Exception as e:
             st.error(f"❌ Błąd backup: {e}")
-    
+
+def show_backup_restore():
+    """Kopie zapasowe (backup API SQLite, gzip, retencja) i przywracanie"""
+    if st.button("💾 Utwórz kopię teraz", key="create_backup"):
+        result = db.create_backup('manual')
+        if result['success']:
+            st.success(f"✅ {result['message']} - {result['duration_s']:.2f}s")
+            if result['removed']:
+                st.caption(f"🧹 Retencja: usunięto {len(result['removed'])} starych kopii")
+        else:
+            st.error(f"❌ Błąd backup: {result['message']}")
+
+    backups = db.list_backups()
+    if not backups:
+        st.info("Brak kopii zapasowych")
+        return
+
+    st.caption(f"📦 {len(backups)} kopii, łącznie "
+               f"{sum(b['compressed_size'] for b in backups) / 1024 / 1024:.1f} MB")
+    df = pd.DataFrame([{
+        'Kopia': b['created_at'],
+        'Powód': b['reason'],
+        'MB': round(b['compressed_size'] / 1024 / 1024, 2),
+    } for b in backups])
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
     st.markdown("**Restore z backup:**")
-    uploaded_backup = st.file_uploader(
-        "Przywróć z backup:",
-        type=['db'],
-        key="restore_backup"
-    )
-    
-    if uploaded_backup:
-        st.warning("⚠️ Restore zastąpi aktualną bazę danych!")
+    labels = {f"{b['created_at']} ({b['reason']})": b['file'] for b in backups}
+    selected = st.selectbox("Przywróć kopię:", [""] + list(labels), key="restore_backup")
+
+    if selected:
+        st.warning("⚠️ Restore zastąpi aktualną bazę danych! (bieżący stan trafi do kopii pre-restore)")
         if st.button("🔄 Przywróć backup", key="restore_db"):
-            st.info("💡 Skopiuj plik ręcznie do głównego katalogu jako 'portfolio.db'")
+            result = db.restore_backup(labels[selected])
+            if result['success']:
+                st.success(f"✅ {result['message']} - {result['duration_s']:.2f}s")
+                if result['safety_backup']:
+                    st.caption(f"💾 Poprzedni stan: {result['safety_backup']}")
+            else:
+                st.error(f"❌ {result['message']}")
 
 def show_bulk_operations():
     """Operacje masowe"""
@@ -806,6 +858,23 @@ def show_system_metrics():
             else:
                 st.metric("💱 USD/PLN", "Brak")
         
+        pool_stats = db.get_pool_stats()
+        st.caption(
+            f"🔌 Pula SQLite: {pool_stats['opened']} fizycznych połączeń, "
+            f"{pool_stats['acquired']} pobrań, {pool_stats['idle']} wolnych"
+        )
+        cache_stats = db.get_result_cache_stats()
+        st.caption(
+            f"🧠 Cache agregatów: {cache_stats['hits']} trafień, {cache_stats['misses']} przeliczeń "
+            f"({cache_stats['stale']} po zmianie danych), "
+            f"{cache_stats['entries']}/{cache_stats['max_entries']} wpisów"
+        )
+        timeline_stats = db.get_share_timeline_stats()
+        st.caption(
+            f"📅 Osie czasu dostępności akcji: {timeline_stats['tickers']} tickerów, "
+            f"{timeline_stats['hits']} trafień, {timeline_stats['builds']} przebudów"
+        )
+
         # Dodatkowe metryki w expander
         with st.expander("📈 Szczegółowe Metryki", expanded=False):
             show_detailed_metrics()
@@ -813,6 +882,170 @@ def show_system_metrics():
     except Exception as e:
         st.error(f"❌ Błąd pobierania metryk: {e}")
 
+def show_query_profiler():
+    """Profiler zapytań SQL - najwolniejsze i najczęstsze zapytania per rerun"""
+    st.markdown("### 🐢 Profiler Zapytań SQL")
+    
+    profiler = db.query_profiler
+    enabled = st.checkbox(
+        "Rejestruj zapytania (narzut na każdym zapytaniu)",
+        value=profiler.enabled,
+        key="sql_profiler_enabled"
+    )
+    if enabled != profiler.enabled:
+        profiler.enabled = enabled
+        profiler.reset()
+    
+    runs = profiler.runs()
+    if not runs:
+        st.info("💡 Brak zarejestrowanych przebiegów - włącz profiler i przejdź na inną stronę")
+        return
+    
+    col_run, col_top, col_reset = st.columns([3, 1, 1])
+    with col_run:
+        selected = st.selectbox(
+            "Przebieg (rerun):",
+            range(len(runs)),
+            format_func=lambda i: (f"{runs[i].label} @ {runs[i].started_at:%H:%M:%S} - "
+                                   f"{runs[i].queries} zapytań, {runs[i].total_ms:.1f} ms"),
+            key="sql_profiler_run"
+        )
+    with col_top:
+        top_n = st.number_input("Top N", min_value=5, max_value=100, value=15, key="sql_profiler_top")
+    with col_reset:
+        if st.button("🗑️ Wyczyść", key="sql_profiler_reset"):
+            profiler.reset()
+            st.rerun()
+    
+    run = runs[selected]
+    summary = run.summary()
+    col_m1, col_m2, col_m3 = st.columns(3)
+    col_m1.metric("Zapytania", summary['queries'])
+    col_m2.metric("Unikalne", summary['distinct'])
+    col_m3.metric("Czas SQL", f"{summary['total_ms']:.1f} ms")
+    
+    suspects = profiler.suspected_n_plus_one(run)
+    if suspects:
+        st.warning(f"⚠️ Podejrzenia N+1: {len(suspects)} (to samo zapytanie wielokrotnie z jednej funkcji)")
+        st.dataframe(pd.DataFrame(suspects), use_container_width=True, hide_index=True)
+    
+    tab_slow, tab_freq = st.tabs(["🐢 Najwolniejsze (łączny czas)", "🔁 Najczęstsze"])
+    with tab_slow:
+        st.dataframe(pd.DataFrame(profiler.top_slow(run, int(top_n))),
+                     use_container_width=True, hide_index=True)
+    with tab_freq:
+        st.dataframe(pd.DataFrame(profiler.most_frequent(run, int(top_n))),
+                     use_container_width=True, hide_index=True)
+
+def show_index_audit():
+    """Audyt EXPLAIN QUERY PLAN gorących zapytań + propozycje indeksów"""
+    st.markdown("### 🗂️ Audyt Indeksów (EXPLAIN QUERY PLAN)")
+    
+    col_audit, col_measure = st.columns(2)
+    with col_audit:
+        run_audit = st.button("🔍 Audyt planów zapytań", key="index_audit_run")
+    with col_measure:
+        run_measure = st.button("⏱️ Zmierz kandydatów (CREATE INDEX + ROLLBACK)", key="index_audit_measure")
+    
+    if not (run_audit or run_measure):
+        st.caption(f"📋 Katalog: {len(index_advisor.HOT_QUERIES)} gorących zapytań z db.py")
+        return
+    
+    conn = db.get_connection()
+    if not conn:
+        st.error("❌ Nie można połączyć z bazą!")
+        return
+    
+    try:
+        audit = index_advisor.run_audit(conn)
+        flagged = [q for q in audit['queries'] if q['full_scans'] or q['temp_btrees']]
+        
+        col_m1, col_m2, col_m3 = st.columns(3)
+        col_m1.metric("Zapytania", len(audit['queries']))
+        col_m2.metric("Do poprawy", len(flagged))
+        col_m3.metric("Proponowane indeksy", len(audit['proposed']))
+        
+        st.dataframe(pd.DataFrame([{
+            'Zapytanie': q['name'],
+            'Źródło': q['source'],
+            'Pełne skany': ", ".join(q['full_scans']) or "-",
+            'TEMP B-TREE': len(q['temp_btrees']),
+        } for q in audit['queries']]), use_container_width=True, hide_index=True)
+        
+        for q in flagged:
+            with st.expander(f"📄 {q['name']} ({q['source']})"):
+                st.code("\n".join(q['plan']), language="text")
+        
+        if audit['proposed']:
+            st.warning("💡 Proponowane indeksy:")
+            st.code(";\n".join(
+                f"CREATE INDEX IF NOT EXISTS {name} ON {index_advisor.CANDIDATE_INDEXES[name][1]}"
+                for name in audit['proposed']
+            ) + ";", language="sql")
+        else:
+            st.success("✅ Brak propozycji - indeksy kandydaci już istnieją lub nie są potrzebne")
+        if audit['existing']:
+            st.caption(f"🗂️ Istniejące: {', '.join(audit['existing'])}")
+        
+        if run_measure:
+            with st.spinner("Pomiar indeksów-kandydatów..."):
+                measured = index_advisor.measure_candidates(conn)
+            if measured:
+                st.dataframe(pd.DataFrame(measured), use_container_width=True, hide_index=True)
+            else:
+                st.info("💡 Wszyscy kandydaci już istnieją")
+    except Exception as e:
+        st.error(f"❌ Błąd audytu indeksów: {e}")
+    finally:
+        conn.close()
+
+def show_db_maintenance():
+    """Utrzymanie bazy: stan (wolne strony, WAL, auto_vacuum) i ostatnie uruchomienia zadań"""
+    st.markdown("### 🧹 Utrzymanie Bazy (ANALYZE / optimize / WAL / vacuum)")
+    
+    col_run, col_av = st.columns(2)
+    with col_run:
+        if st.button("▶️ Uruchom wszystkie zadania teraz", key="maintenance_run"):
+            with st.spinner("Utrzymanie bazy..."):
+                report = db.run_maintenance(force=True)
+            for task, result in report['ran'].items():
+                st.write(f"{'✅' if result['status'] == 'ok' else '❌'} {task}: "
+                         f"{result['duration_ms']:.1f} ms ({result['status']})")
+    with col_av:
+        if st.button("🗜️ Włącz auto_vacuum INCREMENTAL (VACUUM)", key="maintenance_auto_vacuum"):
+            with st.spinner("VACUUM - przebudowa pliku bazy..."):
+                report = db.run_maintenance(only=['enable_auto_vacuum'])
+            result = report['ran'].get('enable_auto_vacuum')
+            if result and result['status'] == 'ok':
+                st.success(f"✅ auto_vacuum = {result['details']['auto_vacuum']} ({result['duration_ms']:.0f} ms)")
+            else:
+                st.error(f"❌ {result['status'] if result else 'brak połączenia'}")
+    
+    status = db.get_maintenance_status()
+    state = status['state']
+    if not state:
+        st.error("❌ Nie można połączyć z bazą!")
+        return
+    
+    col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+    col_m1.metric("Rozmiar bazy", f"{state['db_bytes'] / 1024 / 1024:.1f} MB")
+    col_m2.metric("Wolne strony", f"{state['freelist_count']}", f"{state['free_ratio']:.1%}", delta_color="off")
+    col_m3.metric("WAL", f"{state['wal_bytes'] / 1024 / 1024:.1f} MB")
+    col_m4.metric("auto_vacuum", state['auto_vacuum'])
+    st.caption(f"✍️ Zapisy od ostatniego ANALYZE: {state['writes_since_analyze']}"
+               f" | ⏳ Należne: {', '.join(f'{k} ({v})' for k, v in status['due'].items()) or 'brak'}")
+    
+    if status['tasks']:
+        st.dataframe(pd.DataFrame([{
+            'Zadanie': task,
+            'Ostatnio': info['last_run_at'],
+            'Czas (ms)': info['duration_ms'],
+            'Status': info['status'],
+            'Powód': info['details'].get('reason', ''),
+        } for task, info in sorted(status['tasks'].items())]), use_container_width=True, hide_index=True)
+    else:
+        st.info("Zadania utrzymaniowe nie były jeszcze uruchamiane")
+
 def show_detailed_metrics():
     """Szczegółowe metryki systemu"""
     try:
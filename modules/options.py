@@ -539,28 +539,8 @@ def show_buyback_expiry_tab():
     """Tab buyback i expiry - Z PRAWDZIWYM CZĘŚCIOWYM BUYBACK"""
     st.subheader("💰 Buyback & Expiry")
     
-    # SPRAWDŹ CZY SYSTEM OBSŁUGUJE CZĘŚCIOWY BUYBACK
-    try:
-        conn = db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='cc_lot_mappings'")
-        has_mappings_table = cursor.fetchone() is not None
-        conn.close()
-    except:
-        has_mappings_table = False
-    
-    # Alert o braku tabeli mapowań
-    if not has_mappings_table:
-        st.warning("""
-        ⚠️ **CZĘŚCIOWY BUYBACK NIEDOSTĘPNY** 
-        
-        Brak tabeli mapowań LOT-ów. System obsługuje tylko pełny buyback.
-        
-        **Aby włączyć częściowy buyback:**
-        1. Przejdź do zakładki 🛠️ Diagnostyka  
-        2. Kliknij "🔧 Utwórz tabelę mapowań"
-        3. Kliknij "🔄 Odbuduj mapowania"
-        """)
+    # Częściowy buyback wymaga cc_lot_mappings - tabelę gwarantuje migracja schematu
+    has_mappings_table = True
     
     # Pobierz otwarte CC
     try:
@@ -746,7 +726,44 @@ def show_buyback_expiry_tab():
             today = date.today()
             expirable_cc = [cc for cc in open_cc_list 
                            if datetime.strptime(cc['expiry_date'], '%Y-%m-%d').date() <= today]
-            
+
+            # Zbiorcze wygaśnięcie CC po terminie (expiry < dziś) - jedna transakcja
+            past_due_cc = [cc for cc in expirable_cc if cc['expiry_date'] < today.isoformat()]
+            if len(past_due_cc) > 1:
+                with st.expander(f"⏩ Wygaś wszystkie po terminie ({len(past_due_cc)} CC)"):
+                    st.caption("Kursy NBP D-1 dla wszystkich dat pobierane raz; P/L = cała premia")
+
+                    # Podgląd = wynik dry_run (kursy, zwalniane LOT-y); trzymany w sesji,
+                    # żeby nie pobierać kursów przy każdym przeładowaniu strony
+                    if st.button("🔍 Podgląd", key="expire_all_preview_btn"):
+                        st.session_state.expire_all_preview = db.expire_past_due_covered_calls(dry_run=True)
+
+                    preview = st.session_state.get('expire_all_preview')
+                    if preview and not preview['success']:
+                        st.error(f"❌ {preview['message']}")
+                    elif preview:
+                        st.write(f"**{preview['message']}** - zwolnione akcje: {preview['shares_released']}")
+                        if preview['results']:
+                            st.dataframe(_bulk_expiry_table(preview['results']),
+                                         use_container_width=True, hide_index=True)
+                        if any(r['fx_source'] != 'NBP D-1' for r in preview['results']):
+                            st.warning("⚠️ Brak kursu NBP D-1 dla części dat - użyty kurs otwarcia (fx_open)")
+                        if any(r['unreserved_shares'] for r in preview['results']):
+                            st.warning("⚠️ Część CC nie ma pełnych rezerwacji - zwolnione zostanie tylko to, co zarezerwowano")
+
+                        # Zatwierdzenie wykonuje dokładnie CC z podglądu
+                        if preview['results'] and st.button("✅ EXPIRE WSZYSTKIE", key="expire_all_past_due", type="primary"):
+                            bulk_result = db.expire_past_due_covered_calls(
+                                cc_ids=[r['cc_id'] for r in preview['results']])
+                            del st.session_state.expire_all_preview
+                            if bulk_result['success']:
+                                st.success(f"✅ {bulk_result['message']}")
+                                if bulk_result['results']:
+                                    st.dataframe(_bulk_expiry_table(bulk_result['results']),
+                                                 use_container_width=True, hide_index=True)
+                            else:
+                                st.error(f"❌ {bulk_result['message']}")
+
             if expirable_cc:
                 expiry_options = [f"CC #{cc['id']} - {cc['ticker']} exp {cc['expiry_date']}" 
                                 for cc in expirable_cc]
@@ -824,6 +841,22 @@ def show_buyback_expiry_tab():
             st.markdown("---")
             show_buyback_cc_preview(st.session_state.buyback_form_data)
 
+def _bulk_expiry_table(results):
+    """Wiersze wyniku expire_past_due_covered_calls → tabela do podglądu"""
+    return pd.DataFrame([{
+        'CC': f"#{r['cc_id']}",
+        'Ticker': r['ticker'],
+        'Kontrakty': r['contracts'],
+        'Expiry': r['expiry_date'],
+        'Kurs': r['fx_close'],
+        'Źródło kursu': r['fx_source'],
+        'P/L (PLN)': r['pl_pln'],
+        'Zwolnione akcje': r['shares_released'],
+        'LOT-y': ", ".join(f"#{lot['lot_id']}: {lot['shares']}" for lot in r['released_lots']) or "-",
+        'Bez rezerwacji': r['unreserved_shares'],
+    } for r in results])
+
+
 def show_buyback_cc_preview(form_data):
     """🔍 PODGLĄD BUYBACK z obsługą częściowego buyback"""
     st.markdown("### 🔍 Podgląd buyback Covered Call")
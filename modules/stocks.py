@@ -12,6 +12,7 @@ if os.path.dirname(os.path.dirname(os.path.abspath(__file__))) not in sys.path:
 import db
 import nbp_api_client
 from utils.formatting import format_currency_usd, format_currency_pln, format_date
+from utils import money
 
 def create_purchase_cashflow(lot_data, lot_id):
     """Automatyczny cashflow przy zakupie akcji (Punkt 35)"""
@@ -1043,8 +1044,10 @@ def show_sell_preview_with_fifo(ticker, quantity, sell_price, sell_date, broker_
         fx_success = True
         st.caption(f"NBP D-1: {sell_fx_date} @ {sell_fx_rate:.4f}")
 
-        # 3) Przeliczenie wpływów na PLN (po wyliczeniu net_proceeds_usd wyżej)
-        proceeds_pln = net_proceeds_usd * sell_fx_rate
+        # 3) Przeliczenie wpływów na PLN (po wyliczeniu net_proceeds_usd wyżej) - w groszach
+        proceeds_pln = money.from_cents(
+            money.convert_cents(money.to_cents(net_proceeds_usd), money.fx_to_micro(sell_fx_rate))
+        )
 
         
         # 🚨 NAPRAWKA: Pobierz LOT-y z walidacją temporalną
@@ -1103,9 +1106,11 @@ def show_sell_preview_with_fifo(ticker, quantity, sell_price, sell_date, broker_
             qty_from_lot = min(remaining_to_sell, lot['quantity_open'])
             
             if qty_from_lot > 0:
-                # Koszt nabycia tego fragmentu (proporcjonalnie)
-                cost_per_share_pln = lot['cost_pln'] / lot['quantity_total']
-                cost_this_part_pln = qty_from_lot * cost_per_share_pln
+                # Koszt nabycia tego fragmentu (proporcjonalnie, w groszach)
+                cost_this_part_cents = money.prorate_cents(
+                    money.to_cents(lot['cost_pln']), qty_from_lot, lot['quantity_total']
+                )
+                cost_this_part_pln = money.from_cents(cost_this_part_cents)
                 
                 fifo_allocation.append({
                     'lot_id': lot['id'],
@@ -1123,9 +1128,9 @@ def show_sell_preview_with_fifo(ticker, quantity, sell_price, sell_date, broker_
             st.error(f"❌ BŁĄD ALOKACJI: Pozostało {remaining_to_sell} akcji do sprzedaży!")
             return None
         
-        # Podsumowanie kosztów
-        total_cost_pln = sum(alloc['cost_pln'] for alloc in fifo_allocation)
-        pl_pln = proceeds_pln - total_cost_pln
+        # Podsumowanie kosztów (suma w groszach - bez błędów float)
+        total_cost_pln = money.from_cents(sum(money.to_cents(alloc['cost_pln']) for alloc in fifo_allocation))
+        pl_pln = money.from_cents(money.to_cents(proceeds_pln) - money.to_cents(total_cost_pln))
         
         # 📋 PODSUMOWANIE DLA ROZLICZENIA PODATKOWEGO
         st.markdown("#### 📋 PODSUMOWANIE DLA ROZLICZENIA PODATKOWEGO")
@@ -1405,27 +1410,12 @@ def show_lots_table():
         
         cursor = conn.cursor()
         
-        # =====================================
-        # SPRAWDZENIE STRUKTURY BAZY
-        # =====================================
-        
-        # Sprawdź czy istnieją tabele mapowań CC
-        cursor.execute("""
-            SELECT name FROM sqlite_master 
-            WHERE type='table' AND name IN ('cc_lot_mappings', 'options_cc_reservations')
-        """)
-        mapping_tables = [row[0] for row in cursor.fetchall()]
-        
-        has_new_mappings = 'cc_lot_mappings' in mapping_tables
-        has_old_mappings = 'options_cc_reservations' in mapping_tables
-        
         # =====================================
         # GŁÓWNE ZAPYTANIE - Z PRAWDZIWYMI DANYMI
         # =====================================
         
-        if has_new_mappings:
-            # WERSJA Z NOWYMI MAPOWANIAMI (cc_lot_mappings)
-            query = """
+        # Sprzedane / pod CC z lot_positions (utrzymywane triggerami, migracja schematu 7)
+        query = """
             SELECT 
                 l.id as lot_id,
                 l.ticker,
@@ -1439,108 +1429,15 @@ def show_lots_table():
                 l.reg_fee_usd,
                 
                 -- ILE REALNIE POD CC (z mapowań)
-                COALESCE(SUM(cm.shares_reserved), 0) as qty_under_cc_real,
-                
-                -- ILE SPRZEDANE (quantity_total - quantity_open - qty_under_cc)
-                (l.quantity_total - l.quantity_open - COALESCE(SUM(cm.shares_reserved), 0)) as qty_sold_real,
+                COALESCE(p.qty_reserved, 0) as qty_under_cc_real,
                 
-                -- SPRAWDZENIE MATEMATYCZNE
-                (l.quantity_open + COALESCE(SUM(cm.shares_reserved), 0) + 
-                 (l.quantity_total - l.quantity_open - COALESCE(SUM(cm.shares_reserved), 0))) as math_check,
-                
-                -- LISTA CC UŻYWAJĄCYCH TEN LOT
-                GROUP_CONCAT(DISTINCT cc.id || ':' || cm.shares_reserved) as cc_details
+                -- ILE SPRZEDANE (ze splitów)
+                COALESCE(p.qty_sold, 0) as qty_sold_real
                 
             FROM lots l
-            LEFT JOIN cc_lot_mappings cm ON l.id = cm.lot_id
-            LEFT JOIN options_cc cc ON cm.cc_id = cc.id AND cc.status = 'open'
-            GROUP BY l.id, l.ticker, l.quantity_total, l.quantity_open, l.buy_price_usd, 
-                     l.buy_date, l.fx_rate, l.cost_pln, l.broker_fee_usd, l.reg_fee_usd
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
             ORDER BY l.ticker ASC, l.buy_date ASC, l.id ASC
-            """
-            
-        elif has_old_mappings:
-            # WERSJA ZE STARYMI MAPOWANIAMI (options_cc_reservations)
-            query = """
-            SELECT 
-                l.id as lot_id,
-                l.ticker,
-                l.quantity_total,
-                l.quantity_open,
-                l.buy_price_usd,
-                l.buy_date,
-                l.fx_rate,
-                l.cost_pln,
-                l.broker_fee_usd,
-                l.reg_fee_usd,
-                
-                -- ILE POD CC (stare mapowania)
-                COALESCE(SUM(ocr.qty_reserved), 0) as qty_under_cc_real,
-                
-                -- ILE SPRZEDANE
-                (l.quantity_total - l.quantity_open - COALESCE(SUM(ocr.qty_reserved), 0)) as qty_sold_real,
-                
-                -- SPRAWDZENIE MATEMATYCZNE
-                (l.quantity_open + COALESCE(SUM(ocr.qty_reserved), 0) + 
-                 (l.quantity_total - l.quantity_open - COALESCE(SUM(ocr.qty_reserved), 0))) as math_check,
-                
-                -- DETALE CC
-                GROUP_CONCAT(DISTINCT cc.id || ':' || ocr.qty_reserved) as cc_details
-                
-            FROM lots l
-            LEFT JOIN options_cc_reservations ocr ON l.id = ocr.lot_id
-            LEFT JOIN options_cc cc ON ocr.cc_id = cc.id AND cc.status = 'open'
-            GROUP BY l.id, l.ticker, l.quantity_total, l.quantity_open, l.buy_price_usd,
-                     l.buy_date, l.fx_rate, l.cost_pln, l.broker_fee_usd, l.reg_fee_usd
-            ORDER BY l.ticker ASC, l.buy_date ASC, l.id ASC
-            """
-        else:
-            # FALLBACK - BRAK MAPOWAŃ (zgadywanie jak wcześniej, ale z ostrzeżeniem)
-            query = """
-            SELECT 
-                l.id as lot_id,
-                l.ticker,
-                l.quantity_total,
-                l.quantity_open,
-                l.buy_price_usd,
-                l.buy_date,
-                l.fx_rate,
-                l.cost_pln,
-                l.broker_fee_usd,
-                l.reg_fee_usd,
-                
-                -- ZGADYWANIE (brak mapowań)
-                CASE 
-                    WHEN l.quantity_open = 0 AND l.quantity_total > 0 THEN
-                        -- Sprawdź czy ticker ma otwarte CC
-                        CASE 
-                            WHEN EXISTS (SELECT 1 FROM options_cc WHERE ticker = l.ticker AND status = 'open') 
-                            THEN l.quantity_total  -- Zakładaj że wszystko pod CC
-                            ELSE 0  -- Prawdopodobnie sprzedane
-                        END
-                    ELSE 0
-                END as qty_under_cc_real,
-                
-                -- ILE SPRZEDANE (pozostałość)
-                CASE
-                    WHEN l.quantity_open = 0 AND l.quantity_total > 0 THEN
-                        CASE 
-                            WHEN EXISTS (SELECT 1 FROM options_cc WHERE ticker = l.ticker AND status = 'open') 
-                            THEN 0  -- Zakładaj że nic nie sprzedane
-                            ELSE l.quantity_total  -- Wszystko sprzedane
-                        END
-                    ELSE 0
-                END as qty_sold_real,
-                
-                -- MATEMATYKA (może się nie zgadzać!)
-                l.quantity_total as math_check,
-                
-                -- BRAK SZCZEGÓŁÓW
-                'BRAK_MAPOWAŃ' as cc_details
-                
-            FROM lots l
-            ORDER BY l.ticker ASC, l.buy_date ASC, l.id ASC
-            """
+        """
         
         cursor.execute(query)
         lots_raw = cursor.fetchall()
@@ -1554,13 +1451,7 @@ def show_lots_table():
         # OSTRZEŻENIE O JAKOŚCI DANYCH
         # =====================================
         
-        if not has_new_mappings and not has_old_mappings:
-            st.warning("⚠️ **UWAGA**: Brak tabel mapowań CC→LOT - dane mogą być nieakuratne!")
-            st.info("💡 System zgaduje które akcje są pod CC na podstawie statusu 'open' w options_cc")
-        elif has_old_mappings and not has_new_mappings:
-            st.info("ℹ️ Używam starych mapowań (options_cc_reservations)")
-        else:
-            st.success("✅ Używam nowych mapowań (cc_lot_mappings) - dane powinny być dokładne")
+        st.success("✅ Używam nowych mapowań (cc_lot_mappings) - dane powinny być dokładne")
         
         # =====================================
         # FILTRY (uproszczone)
@@ -1598,6 +1489,9 @@ def show_lots_table():
         
         table_data = []
         
+        cursor.execute("SELECT DISTINCT ticker FROM options_cc WHERE status = 'open'")
+        tickers_with_open_cc = {r[0] for r in cursor.fetchall()}
+        
         for row in lots_raw:
             # Rozpakuj dane
             lot_id = row[0]
@@ -1611,28 +1505,12 @@ def show_lots_table():
             broker_fee = row[8] or 0
             reg_fee = row[9] or 0
             
-            # NAPRAWKA: OBLICZ LOKALNIE - NIE UFAJ SQL!
-            
-            # 1. Sprawdź RZECZYWISTE sprzedaże tego LOT-a
-            cursor.execute("""
-                SELECT COALESCE(SUM(qty_from_lot), 0)
-                FROM stock_trade_splits WHERE lot_id = ?
-            """, (lot_id,))
-            qty_sold = cursor.fetchone()[0] or 0
+            # 1. RZECZYWISTE sprzedaże tego LOT-a (lot_positions)
+            qty_sold = row[11] or 0
             
             # 2. Oblicz ile pod CC
             qty_under_cc = qty_total - qty_open - qty_sold
             
-            # 3. CC Details
-            if qty_under_cc > 0:
-                cursor.execute("""
-                    SELECT GROUP_CONCAT('CC#' || oc.id)
-                    FROM cc_lot_mappings clm
-                    JOIN options_cc oc ON clm.cc_id = oc.id
-                    WHERE clm.lot_id = ? AND oc.status = 'open'
-                """, (lot_id,))
-            
-            math_check_total = row[12] or qty_total            
             # FILTRY
             if ticker_filter != 'Wszystkie' and ticker != ticker_filter:
                 continue
@@ -1641,22 +1519,9 @@ def show_lots_table():
             if qty_open == qty_total:
                 lot_status = '🟢 Całkowicie dostępne'
             elif qty_open == 0:
-                # Sprawdź czy ticker ma otwarte CC
-                cursor.execute("""
-                    SELECT COUNT(*) FROM options_cc 
-                    WHERE ticker = ? AND status = 'open'
-                """, (ticker,))
-                has_open_cc = cursor.fetchone()[0] > 0
-                
-                # Sprawdź czy LOT został sprzedany
-                cursor.execute("""
-                    SELECT COALESCE(SUM(qty_from_lot), 0)
-                    FROM stock_trade_splits
-                    WHERE lot_id = ?
-                """, (lot_id,))
-                qty_actually_sold = cursor.fetchone()[0] or 0
+                has_open_cc = ticker in tickers_with_open_cc
                 
-                if qty_actually_sold > 0:
+                if qty_sold > 0:
                     lot_status = '💸 Sprzedane'
                 elif has_open_cc:
                     lot_status = '🔒 Pod CC'  
@@ -1822,9 +1687,9 @@ def show_lots_table():
         with st.expander("ℹ️ Informacje techniczne", expanded=False):
             st.markdown(f"""
             **Metoda danych:**
-            - {'✅' if has_new_mappings else '❌'} cc_lot_mappings (nowe mapowania)
-            - {'✅' if has_old_mappings else '❌'} options_cc_reservations (stare mapowania)
-            - {'✅' if has_new_mappings or has_old_mappings else '⚠️'} Dokładność danych
+            - ✅ cc_lot_mappings (nowe mapowania)
+            - ✅ options_cc_reservations (stare mapowania)
+            - ✅ Dokładność danych
             
             **Legenda statusów:**
             - 🟢 **Całkowicie dostępne**: Wszystkie akcje z LOT-a dostępne do sprzedaży
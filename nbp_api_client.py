@@ -8,16 +8,47 @@ FUNKCJONALNOŚCI:
 - Cache'owanie wyników w bazie danych
 - Retry mechanism dla błędów sieciowych
 - Walidacja i formatowanie dat
+
+Czysty klient bez importu Streamlit (CLI, cron, wątki w tle, funkcje db).
+Komunikaty i strony Streamlit: nbp_ui.py (importuje streamlit leniwie).
 """
 
 import requests
-import streamlit as st
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, date, timedelta
-from typing import Optional, Dict
+from typing import Optional, Dict, List, Tuple, Iterable, Callable
+import argparse
+import json
+import random
+import sys
+import threading
 import time
 
 # Import z naszego modułu db
 import db
+from utils import business_days as bd_calendar
+
+# Okno cofania przy szukaniu kursu D-1 (dni kalendarzowe przed datą operacji)
+D_MINUS_1_WINDOW_DAYS = 7
+
+def _d_minus_1_candidates(operation_date: date):
+    """Dni publikacji NBP w oknie [D-7, D-1], od najnowszego (bez weekendów i świąt)"""
+    oldest = operation_date - timedelta(days=D_MINUS_1_WINDOW_DAYS)
+    n = 1
+    while True:
+        check_date = bd_calendar.previous_business_day(operation_date, n)
+        if check_date < oldest:
+            return
+        yield check_date
+        n += 1
+
+def log_progress_handler(event: Dict):
+    """Domyślny odbiorca zdarzeń klienta (CLI/cron, kod bez UI) - jedna linia na zdarzenie"""
+    print(f"{event['ts']} [{event['level'].upper()}] {event['event']}: {event['message']}", flush=True)
+
+def json_progress_handler(event: Dict):
+    """Odbiorca zdarzeń w formacie JSON lines"""
+    print(json.dumps(event, ensure_ascii=False, default=str), flush=True)
 
 class NBPApiClient:
     """Klient API NBP do pobierania kursów walut"""
@@ -25,8 +56,17 @@ class NBPApiClient:
     BASE_URL = "https://api.nbp.pl/api/exchangerates"
     MAX_RETRIES = 3
     RETRY_DELAY = 1  # sekundy
-    
-    def __init__(self):
+    MAX_RANGE_DAYS = 93  # limit NBP dla zapytań o zakres dat
+    # Waluta-znacznik: jeśli jest w cache na dany dzień, cała tabela A z tego dnia jest w cache
+    TABLE_A_MARKER_CODE = 'EUR'
+    
+    def __init__(self, base_url: Optional[str] = None,
+                 progress_handler: Optional[Callable[[Dict], None]] = None):
+        # base_url można podmienić (np. lokalny serwer zastępczy w testach)
+        self.base_url = (base_url or self.BASE_URL).rstrip('/')
+        # Odbiorca zdarzeń postępu (domyślnie log; komunikaty Streamlit:
+        # nbp_ui.streamlit_progress_handler)
+        self.progress_handler = progress_handler or log_progress_handler
         self.session = requests.Session()
         # Ustawienia nagłówków zgodnie z zaleceniami NBP
         self.session.headers.update({
@@ -34,6 +74,19 @@ class NBPApiClient:
             'Accept': 'application/json'
         })
     
+    def _emit(self, level: str, message: str, event: str = 'message', **data):
+        """Wysyła zdarzenie postępu do progress_handler (błędy odbiorcy są ignorowane)"""
+        try:
+            self.progress_handler({
+                'level': level,
+                'event': event,
+                'message': message,
+                'ts': datetime.now().isoformat(timespec='seconds'),
+                **data,
+            })
+        except Exception:
+            pass
+    
     def get_usd_rate(self, target_date: date) -> Optional[Dict]:
         """
         Pobiera kurs USD z NBP na określoną datę
@@ -47,7 +100,7 @@ class NBPApiClient:
         # Najpierw sprawdź cache w bazie
         cached_rate = db.get_fx_rate(target_date, 'USD')
         if cached_rate:
-            st.info(f"💾 Używam kursu z cache: {cached_rate['rate']:.4f} na {cached_rate['date']}")
+            self._emit('info', f"💾 Używam kursu z cache: {cached_rate['rate']:.4f} na {cached_rate['date']}")
             return cached_rate
         
         # Jeśli nie ma w cache, pobierz z API
@@ -66,24 +119,97 @@ class NBPApiClient:
         """
         # Zacznij od dnia przed operacją
         target_date = operation_date - timedelta(days=1)
+
+        # Indeks w pamięci: najbliższy znany kurs <= D-1 (binary search, bez bazy)
+        known = db.fx_index_d_minus_1(operation_date, 'USD')
+        known_date = None
+        if known:
+            known_date = datetime.strptime(known['date'], '%Y-%m-%d').date()
         
-        # Cofaj maksymalnie 7 dni w poszukiwaniu kursu
-        for i in range(7):
-            check_date = target_date - timedelta(days=i)
-            
-            # Pomiń soboty i niedziele
-            if check_date.weekday() >= 5:  # 5=sobota, 6=niedziela
-                continue
-                
-            rate = self.get_usd_rate(check_date)
+        # Cofaj maksymalnie 7 dni, sprawdzając tylko dni publikacji NBP
+        for check_date in _d_minus_1_candidates(operation_date):
+            # Dni robocze pomiędzy known_date a D-1 nie są w cache - tylko je
+            # sprawdzamy w API; pierwszy znany kurs zwracamy bez zapytań
+            if known_date is not None and check_date <= known_date:
+                rate = known if check_date == known_date else None
+                if rate is None:
+                    continue
+            else:
+                rate = self.get_usd_rate(check_date)
             if rate:
-                if i > 0:
-                    st.warning(f"⚠️ Kurs na D-1 ({target_date}) niedostępny, używam {check_date}")
+                if check_date != target_date:
+                    self._emit('warning', f"⚠️ Kurs na D-1 ({target_date}) niedostępny, używam {check_date}")
                 return rate
         
-        st.error(f"❌ Nie znaleziono kursu USD w okolicach {target_date}")
+        self._emit('error', f"❌ Nie znaleziono kursu USD w okolicach {target_date}")
         return None
     
+    def get_usd_rates_d_minus_1(self, operation_dates) -> Dict[date, Optional[Dict]]:
+        """
+        Wsadowe pobranie kursów USD D-1 dla wielu dat operacji naraz
+        Te same zasady co get_usd_rate_d_minus_1 (cofanie max 7 dni, bez weekendów i świąt),
+        ale jeden odczyt fx_rates dla całego zakresu i jedno zakresowe
+        pobranie z API dla brakujących dni.
+        
+        Args:
+            operation_dates: Lista/tablica dat operacji (date, datetime lub 'YYYY-MM-DD')
+            
+        Returns:
+            dict: {data_operacji: {'date': 'YYYY-MM-DD', 'rate': float} lub None}
+        """
+        op_dates = set()
+        for d in operation_dates:
+            if isinstance(d, str):
+                d = datetime.strptime(d[:10], '%Y-%m-%d').date()
+            elif isinstance(d, datetime):
+                d = d.date()
+            elif not isinstance(d, date) and hasattr(d, 'date'):
+                d = d.date()  # np. pandas.Timestamp
+            op_dates.add(d)
+        
+        if not op_dates:
+            return {}
+        
+        window_start = min(op_dates) - timedelta(days=8)
+        window_end = max(op_dates) - timedelta(days=1)
+        
+        # Jeden odczyt całego zakresu (indeks w pamięci lub jedno zapytanie)
+        known = db.get_fx_rates_range(window_start, window_end, 'USD')
+        
+        candidates = _d_minus_1_candidates
+        
+        # Dni robocze, które trzeba sprawdzić w API (nowsze niż znany kurs)
+        today = date.today()
+        missing = set()
+        for op_date in op_dates:
+            for check_date in candidates(op_date):
+                if check_date.strftime('%Y-%m-%d') in known:
+                    break
+                if check_date <= today:
+                    missing.add(check_date)
+        
+        if missing:
+            for chunk_start, chunk_end in self._split_into_chunks(sorted(missing)):
+                fetched = self._fetch_usd_rates_range_from_api(chunk_start, chunk_end)
+                if fetched:
+                    db.insert_fx_rates_bulk(fetched, 'USD', 'NBP')
+                    known.update(fetched)
+        
+        results = {}
+        for op_date in op_dates:
+            results[op_date] = None
+            for check_date in candidates(op_date):
+                date_str = check_date.strftime('%Y-%m-%d')
+                if date_str in known:
+                    results[op_date] = {'date': date_str, 'rate': known[date_str]}
+                    break
+        
+        unresolved = [d for d, r in results.items() if r is None]
+        if unresolved:
+            self._emit('warning', f"⚠️ Brak kursu USD D-1 dla {len(unresolved)} dat (np. {min(unresolved)})")
+        
+        return results
+    
     def _fetch_usd_rate_from_api(self, target_date: date) -> Optional[Dict]:
         """
         Pobiera kurs USD z API NBP dla konkretnej daty
@@ -95,11 +221,11 @@ class NBPApiClient:
             dict: Dane kursu lub None jeśli błąd
         """
         date_str = target_date.strftime('%Y-%m-%d')
-        url = f"{self.BASE_URL}/rates/A/USD/{date_str}/"
+        url = f"{self.base_url}/rates/A/USD/{date_str}/"
         
         for attempt in range(self.MAX_RETRIES):
             try:
-                st.info(f"🌐 Pobieram kurs USD z NBP na {date_str} (próba {attempt + 1})")
+                self._emit('info', f"🌐 Pobieram kurs USD z NBP na {date_str} (próba {attempt + 1})")
                 
                 response = self.session.get(url, timeout=10)
                 
@@ -115,31 +241,31 @@ class NBPApiClient:
                     }
                     
                     if db.insert_fx_rate(date_str, 'USD', rate_value, 'NBP'):
-                        st.success(f"✅ Pobrałem i zapisałem kurs USD: {rate_value:.4f} na {date_str}")
+                        self._emit('success', f"✅ Pobrałem i zapisałem kurs USD: {rate_value:.4f} na {date_str}")
                         return rate_data
                     else:
-                        st.error("❌ Błąd zapisu kursu do bazy")
+                        self._emit('error', "❌ Błąd zapisu kursu do bazy")
                         return rate_data  # Zwróć dane mimo błędu zapisu
                 
                 elif response.status_code == 404:
-                    st.warning(f"📅 Brak kursu USD na {date_str} (weekend/święto)")
+                    self._emit('warning', f"📅 Brak kursu USD na {date_str} (weekend/święto)")
                     return None
                 
                 else:
-                    st.warning(f"⚠️ Błąd API NBP: {response.status_code}")
+                    self._emit('warning', f"⚠️ Błąd API NBP: {response.status_code}")
                     
             except requests.exceptions.RequestException as e:
-                st.warning(f"🌐 Błąd sieciowy (próba {attempt + 1}): {e}")
+                self._emit('warning', f"🌐 Błąd sieciowy (próba {attempt + 1}): {e}")
             
             except (KeyError, ValueError, TypeError) as e:
-                st.error(f"📊 Błąd parsowania odpowiedzi NBP: {e}")
+                self._emit('error', f"📊 Błąd parsowania odpowiedzi NBP: {e}")
                 break
             
             # Poczekaj przed kolejną próbą
             if attempt < self.MAX_RETRIES - 1:
                 time.sleep(self.RETRY_DELAY)
         
-        st.error(f"❌ Nie udało się pobrać kursu USD na {date_str} po {self.MAX_RETRIES} próbach")
+        self._emit('error', f"❌ Nie udało się pobrać kursu USD na {date_str} po {self.MAX_RETRIES} próbach")
         return None
     
     def refresh_recent_rates(self, days_back: int = 7) -> Dict[str, bool]:
@@ -155,13 +281,13 @@ class NBPApiClient:
         results = {}
         today = date.today()
         
-        st.info(f"🔄 Odświeżam kursy USD z ostatnich {days_back} dni...")
+        self._emit('info', f"🔄 Odświeżam kursy USD z ostatnich {days_back} dni...")
         
         for i in range(days_back):
             check_date = today - timedelta(days=i)
             
-            # Pomiń weekendy
-            if check_date.weekday() >= 5:
+            # Pomiń weekendy i święta
+            if not bd_calendar.is_business_day(check_date):
                 continue
             
             # Usuń stary kurs jeśli istnieje
@@ -173,9 +299,179 @@ class NBPApiClient:
         
         return results
     
-    def bulk_load_fx_rates(self, start_date, end_date):
+    def _fetch_usd_rates_range_from_api(self, start_date: date, end_date: date,
+                                        code: str = 'USD') -> Optional[Dict[str, float]]:
+        """
+        Pobiera kursy USD (lub innej waluty tabeli A) z API NBP dla zakresu dat (max MAX_RANGE_DAYS dni)
+
+        Args:
+            start_date: Data początkowa
+            end_date: Data końcowa
+            code: Kod waluty
+
+        Returns:
+            dict: {'YYYY-MM-DD': kurs} (pusty gdy brak notowań w zakresie) lub None jeśli błąd
+        """
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        url = f"{self.base_url}/rates/A/{code}/{start_str}/{end_str}/"
+
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                response = self.session.get(url, timeout=15)
+
+                if response.status_code == 200:
+                    data = response.json()
+                    return {
+                        item['effectiveDate']: float(item['mid'])
+                        for item in data['rates']
+                    }
+
+                elif response.status_code == 404:
+                    # Brak jakichkolwiek notowań w zakresie (np. same święta)
+                    return {}
+
+                else:
+                    self._emit('warning', f"⚠️ Błąd API NBP: {response.status_code} ({start_str} → {end_str})")
+
+            except requests.exceptions.RequestException as e:
+                self._emit('warning', f"🌐 Błąd sieciowy (próba {attempt + 1}): {e}")
+
+            except (KeyError, ValueError, TypeError) as e:
+                self._emit('error', f"📊 Błąd parsowania odpowiedzi NBP: {e}")
+                break
+
+            if attempt < self.MAX_RETRIES - 1:
+                time.sleep(self.RETRY_DELAY)
+
+        self._emit('error', f"❌ Nie udało się pobrać kursów {code} {start_str} → {end_str}")
+        return None
+
+    def _split_into_chunks(self, dates: List[date]) -> List[Tuple[date, date]]:
+        """
+        Grupuje posortowane daty w zakresy nie dłuższe niż MAX_RANGE_DAYS dni
+
+        Args:
+            dates: Posortowana lista dat do pobrania
+
+        Returns:
+            list: [(start, end), ...]
+        """
+        chunks = []
+        chunk_start = None
+        chunk_end = None
+
+        for d in dates:
+            if chunk_start is None:
+                chunk_start = chunk_end = d
+            elif (d - chunk_start).days < self.MAX_RANGE_DAYS:
+                chunk_end = d
+            else:
+                chunks.append((chunk_start, chunk_end))
+                chunk_start = chunk_end = d
+
+        if chunk_start is not None:
+            chunks.append((chunk_start, chunk_end))
+
+        return chunks
+
+    def _split_ranges(self, ranges) -> List[Tuple[date, date]]:
+        """
+        Dzieli zakresy dat (np. wynik db.find_fx_gaps) na paczki max MAX_RANGE_DAYS dni
+
+        Args:
+            ranges: [(start, end, ...), ...] - daty jako date lub 'YYYY-MM-DD'
+
+        Returns:
+            list: [(start, end), ...]
+        """
+        step = timedelta(days=self.MAX_RANGE_DAYS - 1)
+        chunks = []
+        for gap in ranges:
+            gap_start, gap_end = gap[0], gap[1]
+            if isinstance(gap_start, str):
+                gap_start = datetime.strptime(gap_start, '%Y-%m-%d').date()
+            if isinstance(gap_end, str):
+                gap_end = datetime.strptime(gap_end, '%Y-%m-%d').date()
+            while gap_start <= gap_end:
+                chunk_end = min(gap_start + step, gap_end)
+                chunks.append((gap_start, chunk_end))
+                gap_start = chunk_end + timedelta(days=1)
+        return chunks
+
+    def bulk_load_fx_rates(self, start_date, end_date, use_range: bool = True, max_workers: int = 1):
         """
         Bulk loading kursów USD z zakresu dat
+
+        Tryb zakresowy (domyślny): brakujące dni pobierane są endpointem
+        /rates/A/USD/{start}/{end}/ w paczkach po max 93 dni, a każda paczka
+        zapisywana jest jednym wielowierszowym UPSERT-em.
+
+        Args:
+            start_date: Data początkowa
+            end_date: Data końcowa
+            use_range: False = stary tryb dzień po dniu
+            max_workers: >1 = paczki pobierane równolegle (ConcurrentNBPFetcher)
+
+        Returns:
+            dict: Wyniki per data {'2025-01-15': True/False}
+        """
+        if not use_range:
+            return self._bulk_load_fx_rates_daily(start_date, end_date)
+
+        results = {}
+
+        self._emit('info', f"🔄 Bulk loading kursów USD (zakresami): {start_date} → {end_date}")
+
+        # Jedno zapytanie o wszystko co już jest w cache
+        cached = db.get_fx_rates_range(start_date, end_date, 'USD')
+
+        current_date = start_date
+        while current_date <= end_date:
+            date_str = current_date.strftime('%Y-%m-%d')
+            results[date_str] = date_str in cached
+            current_date += timedelta(days=1)
+
+        # Dokładne zakresy braków jednym zapytaniem (kalendarz dni roboczych JOIN fx_rates)
+        gaps = db.find_fx_gaps(start_date, min(end_date, date.today()), 'USD')
+        chunks = self._split_ranges(gaps)
+        requests_made = 0
+
+        if max_workers > 1 and len(chunks) > 1:
+            fetcher = ConcurrentNBPFetcher(self, max_workers=max_workers)
+            report = fetcher.fetch_chunks([('USD', s, e) for s, e in chunks])
+            for date_str in report['rates'].get('USD', {}):
+                if date_str in results:
+                    results[date_str] = True
+            for error in report['errors']:
+                self._emit('warning', f"⚠️ {error}")
+            self._emit('success', f"✅ Bulk loading ukończony: {sum(results.values())} kursów w cache "
+                       f"({report['requests']} zapytań do NBP, {max_workers} wątków)")
+            return results
+
+        for chunk_start, chunk_end in chunks:
+            fetched = self._fetch_usd_rates_range_from_api(chunk_start, chunk_end)
+            requests_made += 1
+            if not fetched:
+                continue
+
+            if db.insert_fx_rates_bulk(fetched, 'USD', 'NBP'):
+                for date_str in fetched:
+                    if date_str in results:
+                        results[date_str] = True
+                self._emit('debug', f"📦 {chunk_start} → {chunk_end}: {len(fetched)} kursów")
+            else:
+                self._emit('error', f"❌ Błąd zapisu kursów {chunk_start} → {chunk_end}")
+
+        success_count = sum(results.values())
+        self._emit('success', f"✅ Bulk loading ukończony: {success_count} kursów w cache "
+                   f"({requests_made} zapytań do NBP)")
+
+        return results
+
+    def _bulk_load_fx_rates_daily(self, start_date, end_date):
+        """
+        Bulk loading kursów USD z zakresu dat - tryb dzień po dniu
         
         Args:
             start_date: Data początkowa
@@ -187,15 +483,15 @@ class NBPApiClient:
         results = {}
         current_date = start_date
         
-        st.info(f"🔄 Bulk loading kursów USD: {start_date} → {end_date}")
+        self._emit('info', f"🔄 Bulk loading kursów USD: {start_date} → {end_date}")
         
         while current_date <= end_date:
-            # Pomiń weekendy
-            if current_date.weekday() < 5:  # 0-4 = poniedziałek-piątek
+            # Pomiń weekendy i święta
+            if bd_calendar.is_business_day(current_date):
                 # Sprawdź czy już istnieje w cache
                 existing = db.get_fx_rate(current_date, 'USD')
                 if existing:
-                    st.write(f"💾 {current_date}: już w cache ({existing['rate']:.4f})")
+                    self._emit('debug', f"💾 {current_date}: już w cache ({existing['rate']:.4f})")
                     results[current_date.strftime('%Y-%m-%d')] = True
                 else:
                     # Pobierz z API
@@ -205,7 +501,7 @@ class NBPApiClient:
                     # Krótka pauza żeby nie przeciążyć API NBP
                     time.sleep(0.1)
             else:
-                    st.write(f"⏭️ {current_date}: weekend/święto - pomijam")
+                    self._emit('debug', f"⏭️ {current_date}: weekend/święto - pomijam")
                     results[current_date.strftime('%Y-%m-%d')] = False
             
             current_date += timedelta(days=1)
@@ -214,10 +510,214 @@ class NBPApiClient:
         success_count = sum(results.values())
         total_dates = len([k for k, v in results.items() if v != False])
         
-        st.success(f"✅ Bulk loading ukończony: {success_count}/{total_dates} kursów")
+        self._emit('success', f"✅ Bulk loading ukończony: {success_count}/{total_dates} kursów")
         
         return results
 
+    def _fetch_table_a_range_from_api(self, start_date: date, end_date: date) -> Optional[List[Tuple[str, str, float]]]:
+        """
+        Pobiera całą tabelę A (wszystkie waluty) dla zakresu dat (max MAX_RANGE_DAYS dni)
+        
+        Args:
+            start_date: Data początkowa
+            end_date: Data końcowa
+            
+        Returns:
+            list: [(data, kod, kurs), ...] (pusta gdy brak tabel w zakresie) lub None jeśli błąd
+        """
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        url = f"{self.base_url}/tables/A/{start_str}/{end_str}/"
+        
+        for attempt in range(self.MAX_RETRIES):
+            try:
+                response = self.session.get(url, timeout=20)
+                
+                if response.status_code == 200:
+                    return [
+                        (table['effectiveDate'], item['code'].upper(), float(item['mid']))
+                        for table in response.json()
+                        for item in table['rates']
+                    ]
+                
+                elif response.status_code == 404:
+                    return []
+                
+                else:
+                    self._emit('warning', f"⚠️ Błąd API NBP (tabela A): {response.status_code} ({start_str} → {end_str})")
+                    
+            except requests.exceptions.RequestException as e:
+                self._emit('warning', f"🌐 Błąd sieciowy (próba {attempt + 1}): {e}")
+            
+            except (KeyError, ValueError, TypeError) as e:
+                self._emit('error', f"📊 Błąd parsowania tabeli A NBP: {e}")
+                break
+            
+            if attempt < self.MAX_RETRIES - 1:
+                time.sleep(self.RETRY_DELAY)
+        
+        self._emit('error', f"❌ Nie udało się pobrać tabeli A {start_str} → {end_str}")
+        return None
+    
+    def load_table_a(self, start_date: date, end_date: date, force: bool = False) -> Dict[str, int]:
+        """
+        Pobiera i zapisuje wszystkie waluty tabeli A dla zakresu dat
+        Jedno zapytanie na każde 93 dni obejmuje wszystkie waluty naraz.
+        
+        Args:
+            start_date: Data początkowa
+            end_date: Data końcowa
+            force: True = pobierz również dni już obecne w cache
+            
+        Returns:
+            dict: {kod_waluty: liczba zapisanych kursów}
+        """
+        days = bd_calendar.business_days(start_date, end_date)
+        if not force:
+            cached = db.get_fx_rates_range(start_date, end_date, self.TABLE_A_MARKER_CODE)
+            days = [d for d in days if d.strftime('%Y-%m-%d') not in cached]
+        
+        summary: Dict[str, int] = {}
+        for chunk_start, chunk_end in self._split_into_chunks(days):
+            rows = self._fetch_table_a_range_from_api(chunk_start, chunk_end)
+            if not rows:
+                continue
+            if db.insert_fx_rates_rows(rows, 'NBP'):
+                for _, code, _ in rows:
+                    summary[code] = summary.get(code, 0) + 1
+            else:
+                self._emit('error', f"❌ Błąd zapisu tabeli A {chunk_start} → {chunk_end}")
+        
+        return summary
+    
+    def get_rate(self, target_date: date, code: str = 'USD') -> Optional[Dict]:
+        """
+        Kurs dowolnej waluty tabeli A na określoną datę (najpierw lokalny cache)
+        Brak w cache w dniu publikacji → pobranie całej tabeli A z tego dnia.
+        
+        Args:
+            target_date: Data kursu
+            code: Kod waluty (np. 'EUR', 'GBP')
+            
+        Returns:
+            dict: jak db.get_fx_rate lub None
+        """
+        code = (code or 'USD').upper()
+        cached_rate = db.get_fx_rate(target_date, code)
+        if cached_rate:
+            return cached_rate
+        
+        if isinstance(target_date, str):
+            target_date = datetime.strptime(target_date[:10], '%Y-%m-%d').date()
+        if not bd_calendar.is_business_day(target_date) or target_date > date.today():
+            return None
+        
+        self.load_table_a(target_date, target_date, force=True)
+        return db.get_fx_rate(target_date, code)
+    
+    def get_rate_d_minus_1(self, operation_date: date, code: str = 'USD') -> Optional[Dict]:
+        """
+        Kurs waluty na D-1 (ostatni dzień publikacji przed operacją, max 7 dni wstecz)
+        
+        Args:
+            operation_date: Data operacji
+            code: Kod waluty
+            
+        Returns:
+            dict: Kurs na D-1 lub ostatni dostępny
+        """
+        for check_date in _d_minus_1_candidates(operation_date):
+            rate = self.get_rate(check_date, code)
+            if rate:
+                return rate
+        return None
+    
+    def backfill(self, start_date: date, end_date: date, code: str = 'USD', resume: bool = True) -> Dict:
+        """
+        Wznawialny backfill kursów jednej waluty (tryb bez UI: CLI/cron)
+        
+        Zakres przetwarzany jest sekwencyjnie paczkami po MAX_RANGE_DAYS dni.
+        Po każdej paczce zapisywany jest punkt kontrolny w fx_backfill_checkpoints,
+        więc przerwany backfill startuje od pierwszej nieprzetworzonej paczki.
+        Paczki w pełni obecne w cache są pomijane bez zapytań do NBP.
+        
+        Args:
+            start_date: Data początkowa
+            end_date: Data końcowa
+            code: Kod waluty
+            resume: False = zignoruj istniejący punkt kontrolny
+            
+        Returns:
+            dict: {'job_key', 'status', 'requests', 'rates_saved', 'skipped_chunks', 'failed_chunks'}
+        """
+        code = (code or 'USD').upper()
+        job_key = f"{code}:{start_date.isoformat()}:{end_date.isoformat()}"
+        summary = {'job_key': job_key, 'status': 'done', 'requests': 0, 'rates_saved': 0,
+                   'skipped_chunks': 0, 'failed_chunks': 0}
+        
+        resume_from = start_date
+        checkpoint = db.get_fx_backfill_checkpoint(job_key) if resume else None
+        if checkpoint:
+            resume_from = max(start_date, datetime.strptime(checkpoint['next_date'], '%Y-%m-%d').date())
+            if checkpoint['status'] == 'done' and resume_from > end_date:
+                self._emit('info', f"✅ {job_key}: już ukończony", event='backfill_already_done', job_key=job_key)
+                return summary
+        
+        self._emit('info', f"🔄 Backfill {code}: {resume_from} → {end_date}", event='backfill_started',
+                   job_key=job_key, code=code, start=resume_from.isoformat(), end=end_date.isoformat(),
+                   resumed=resume_from != start_date)
+        
+        # Jeden odczyt cache dla całego zakresu
+        cached = db.get_fx_rates_range(resume_from, end_date, code)
+        step = timedelta(days=self.MAX_RANGE_DAYS - 1)
+        chunk_start = resume_from
+        
+        while chunk_start <= end_date:
+            chunk_end = min(chunk_start + step, end_date)
+            next_date = chunk_end + timedelta(days=1)
+            chunk_info = {'job_key': job_key, 'chunk_start': chunk_start.isoformat(),
+                          'chunk_end': chunk_end.isoformat()}
+            
+            missing = [d for d in bd_calendar.business_days(chunk_start, chunk_end)
+                       if d.strftime('%Y-%m-%d') not in cached]
+            
+            if not missing:
+                summary['skipped_chunks'] += 1
+                db.save_fx_backfill_checkpoint(job_key, code, start_date, end_date, next_date)
+                self._emit('debug', f"💾 {chunk_start} → {chunk_end}: w cache", event='chunk_skipped', **chunk_info)
+                chunk_start = next_date
+                continue
+            
+            fetched = self._fetch_usd_rates_range_from_api(missing[0], missing[-1], code)
+            summary['requests'] += 1
+            
+            if fetched is None:
+                summary['failed_chunks'] += 1
+                summary['status'] = 'failed'
+                db.save_fx_backfill_checkpoint(job_key, code, start_date, end_date, chunk_start,
+                                               status='failed', requests_made=1,
+                                               last_error=f"{chunk_start} → {chunk_end}")
+                self._emit('error', f"❌ {chunk_start} → {chunk_end}: przerwano, wznowienie od {chunk_start}",
+                           event='chunk_failed', **chunk_info)
+                break
+            
+            saved = db.insert_fx_rates_bulk(fetched, code, 'NBP') if fetched else 0
+            summary['rates_saved'] += saved
+            db.save_fx_backfill_checkpoint(job_key, code, start_date, end_date, next_date,
+                                           requests_made=1, rates_saved=saved)
+            self._emit('info', f"📦 {chunk_start} → {chunk_end}: {saved} kursów", event='chunk_done',
+                       rates=saved, **chunk_info)
+            chunk_start = next_date
+        
+        if summary['status'] == 'done':
+            db.save_fx_backfill_checkpoint(job_key, code, start_date, end_date,
+                                           end_date + timedelta(days=1), status='done')
+        
+        self._emit('success' if summary['status'] == 'done' else 'error',
+                   f"Backfill {code}: {summary['rates_saved']} kursów, {summary['requests']} zapytań",
+                   event='backfill_finished', **summary)
+        return summary
+    
     def get_available_date_range(self) -> Dict[str, Optional[str]]:
         """
         Sprawdza dostępny zakres dat w API NBP
@@ -227,7 +727,7 @@ class NBPApiClient:
         """
         try:
             # NBP udostępnia kursy od 2002-01-02
-            url = f"{self.BASE_URL}/rates/A/USD/last/1/"
+            url = f"{self.base_url}/rates/A/USD/last/1/"
             response = self.session.get(url, timeout=5)
             
             if response.status_code == 200:
@@ -238,10 +738,191 @@ class NBPApiClient:
                     'newest': newest_date
                 }
         except Exception as e:
-            st.warning(f"Nie można sprawdzić zakresu dat NBP: {e}")
+            self._emit('warning', f"Nie można sprawdzić zakresu dat NBP: {e}")
         
         return {'oldest': None, 'newest': None}
 
+# ================================
+# POBIERANIE RÓWNOLEGŁE
+# ================================
+
+class TokenBucket:
+    """
+    Limiter zapytań (token bucket) współdzielony przez wszystkie wątki
+    
+    rate: tokeny na sekundę, capacity: maksymalny "burst"
+    """
+    
+    def __init__(self, rate: float = 5.0, capacity: int = 5):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """Blokuje wątek do momentu pobrania tokenu"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                
+                if now >= self._blocked_until and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                
+                wait = max(self._blocked_until - now, (1 - self._tokens) / self.rate)
+            time.sleep(wait)
+    
+    def pause(self, seconds: float):
+        """Wstrzymuje wszystkie wątki (np. po odpowiedzi 429 z NBP)"""
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+
+
+class ConcurrentNBPFetcher:
+    """
+    Równoległe pobieranie zakresów kursów z NBP
+    
+    - ograniczona pula wątków wokół requests.Session klienta
+    - wspólny token bucket (limit zapytań na sekundę do NBP)
+    - wspólna polityka retry z wykładniczym backoffem
+    - zapis do fx_rates jednym wsadem na walutę po zakończeniu pobierania
+    
+    Wątki robocze nie wołają Streamlit - błędy wracają w raporcie.
+    """
+    
+    def __init__(self, client: Optional['NBPApiClient'] = None, max_workers: int = 4,
+                 requests_per_second: float = 5.0, burst: int = 5,
+                 max_retries: int = 3, backoff_base: float = 0.5):
+        self.client = client or nbp_client
+        self.max_workers = max(1, int(max_workers))
+        self.limiter = TokenBucket(requests_per_second, burst)
+        self.max_retries = max(1, int(max_retries))
+        self.backoff_base = backoff_base
+        self._stats_lock = threading.Lock()
+        self.requests_made = 0
+        
+        # Pula połączeń HTTP dopasowana do liczby wątków
+        adapter = requests.adapters.HTTPAdapter(pool_connections=self.max_workers,
+                                                pool_maxsize=self.max_workers)
+        self.client.session.mount('http://', adapter)
+        self.client.session.mount('https://', adapter)
+    
+    def _backoff(self, attempt: int) -> float:
+        return self.backoff_base * (2 ** attempt) * (0.5 + random.random())
+    
+    def _fetch_range(self, code: str, start_date: date, end_date: date) -> Dict[str, float]:
+        """
+        Pobiera jeden zakres (max 93 dni) - wykonywane w wątku roboczym
+        
+        Returns:
+            dict: {'YYYY-MM-DD': kurs} (pusty dla 404)
+            
+        Raises:
+            RuntimeError: po wyczerpaniu prób
+        """
+        start_str = start_date.strftime('%Y-%m-%d')
+        end_str = end_date.strftime('%Y-%m-%d')
+        url = f"{self.client.base_url}/rates/A/{code}/{start_str}/{end_str}/"
+        last_error = None
+        
+        for attempt in range(self.max_retries):
+            self.limiter.acquire()
+            with self._stats_lock:
+                self.requests_made += 1
+            
+            try:
+                response = self.client.session.get(url, timeout=15)
+                
+                if response.status_code == 200:
+                    data = response.json()
+                    return {item['effectiveDate']: float(item['mid']) for item in data['rates']}
+                
+                if response.status_code == 404:
+                    return {}
+                
+                last_error = f"HTTP {response.status_code}"
+                if response.status_code == 429:
+                    self.limiter.pause(self._backoff(attempt + 1))
+                    
+            except requests.exceptions.RequestException as e:
+                last_error = str(e)
+            
+            except (KeyError, ValueError, TypeError) as e:
+                raise RuntimeError(f"{code} {start_str} → {end_str}: błąd parsowania ({e})")
+            
+            if attempt < self.max_retries - 1:
+                time.sleep(self._backoff(attempt))
+        
+        raise RuntimeError(f"{code} {start_str} → {end_str}: {last_error}")
+    
+    def fetch_chunks(self, chunks: Iterable[Tuple[str, date, date]], write: bool = True) -> Dict:
+        """
+        Pobiera listę zakresów równolegle i zapisuje wyniki wsadowo
+        
+        Args:
+            chunks: [(kod_waluty, start, end), ...] - zakresy max 93 dni
+            write: Czy zapisać pobrane kursy do fx_rates
+            
+        Returns:
+            dict: {'rates': {kod: {data: kurs}}, 'errors': [...], 'requests': int}
+        """
+        rates: Dict[str, Dict[str, float]] = {}
+        errors = []
+        self.requests_made = 0
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {
+                pool.submit(self._fetch_range, code, start, end): code
+                for code, start, end in chunks
+            }
+            for future in as_completed(futures):
+                code = futures[future]
+                try:
+                    rates.setdefault(code, {}).update(future.result())
+                except Exception as e:
+                    errors.append(str(e))
+        
+        # Zapis na końcu - jeden UPSERT na walutę
+        if write:
+            for code, code_rates in rates.items():
+                if code_rates and not db.insert_fx_rates_bulk(code_rates, code, 'NBP'):
+                    errors.append(f"{code}: błąd zapisu {len(code_rates)} kursów")
+        
+        return {'rates': rates, 'errors': errors, 'requests': self.requests_made}
+    
+    def fetch_rates(self, start_date: date, end_date: date, codes: Iterable[str] = ('USD',),
+                    write: bool = True) -> Dict:
+        """
+        Pobiera pełny zakres dat dla wielu walut (paczki po MAX_RANGE_DAYS)
+        
+        Returns:
+            dict: jak fetch_chunks
+        """
+        step = timedelta(days=self.client.MAX_RANGE_DAYS - 1)
+        chunks = []
+        for code in codes:
+            chunk_start = start_date
+            while chunk_start <= end_date:
+                chunk_end = min(chunk_start + step, end_date)
+                chunks.append((code.upper(), chunk_start, chunk_end))
+                chunk_start = chunk_end + timedelta(days=1)
+        
+        return self.fetch_chunks(chunks, write=write)
+    
+    def refresh_recent_rates(self, days_back: int = 7, codes: Iterable[str] = ('USD',)) -> Dict:
+        """
+        Równoległy odpowiednik NBPApiClient.refresh_recent_rates dla wielu walut
+        (kursy z API nadpisują cache, ręczne nadpisania zostają)
+        """
+        end_date = date.today()
+        start_date = end_date - timedelta(days=max(1, days_back) - 1)
+        return self.fetch_rates(start_date, end_date, codes)
+
 # ================================
 # ŚWIĘTA NARODOWE POLSKI
 # ================================
@@ -257,39 +938,7 @@ def get_polish_holidays(year: int) -> set:
     Returns:
         set: Zestaw dat świąt w formacie 'YYYY-MM-DD'
     """
-    holidays = set()
-    
-    # Święta stałe
-    holidays.add(f"{year}-01-01")  # Nowy Rok
-    holidays.add(f"{year}-01-06")  # Trzech Króli
-    holidays.add(f"{year}-05-01")  # Święto Pracy
-    holidays.add(f"{year}-05-03")  # Święto Konstytucji
-    holidays.add(f"{year}-08-15")  # Wniebowzięcie NMP
-    holidays.add(f"{year}-11-01")  # Wszystkich Świętych
-    holidays.add(f"{year}-11-11")  # Dzień Niepodległości
-    holidays.add(f"{year}-12-25")  # Boże Narodzenie
-    holidays.add(f"{year}-12-26")  # Drugi dzień Bożego Narodzenia
-    
-    # Święta ruchome (uproszczona logika - główne lata)
-    easter_dates = {
-        2023: "04-09", 2024: "03-31", 2025: "04-20", 2026: "04-05",
-        2027: "03-28", 2028: "04-16", 2029: "04-01", 2030: "04-21"
-    }
-    
-    if year in easter_dates:
-        easter = easter_dates[year]
-        holidays.add(f"{year}-{easter}")  # Wielkanoc
-        
-        # Poniedziałek Wielkanocny (dzień po Wielkanocy)
-        easter_date = datetime.strptime(f"{year}-{easter}", "%Y-%m-%d").date()
-        easter_monday = easter_date + timedelta(days=1)
-        holidays.add(easter_monday.strftime('%Y-%m-%d'))
-        
-        # Boże Ciało (60 dni po Wielkanocy)
-        corpus_christi = easter_date + timedelta(days=60)
-        holidays.add(corpus_christi.strftime('%Y-%m-%d'))
-    
-    return holidays
+    return {d.strftime('%Y-%m-%d') for d in bd_calendar.polish_holidays(year)}
 
 def is_business_day(check_date: date) -> bool:
     """
@@ -301,63 +950,127 @@ def is_business_day(check_date: date) -> bool:
     Returns:
         bool: True jeśli dzień roboczy NBP
     """
-    # Weekend
-    if check_date.weekday() >= 5:  # sobota=5, niedziela=6
-        return False
+    return bd_calendar.is_business_day(check_date)
+
+# Globalna instancja klienta
+nbp_client = NBPApiClient()
+
+# ================================
+# ODŚWIEŻANIE KURSÓW W TLE
+# ================================
+
+class BackgroundFxRefresher:
+    """
+    Odświeżanie kursów NBP w wątku w tle (zamiast auto_seed przy renderze)
+    
+    - maksymalnie jedno uruchomienie na interval_seconds (na proces)
+    - pobiera tylko brakujące dni publikacji z ostatnich lookback_days
+    - wynik zapisuje jako watermark w app_info (refreshed_at / covered_through)
     
-    # Święta polskie
-    holidays = get_polish_holidays(check_date.year)
-    if check_date.strftime('%Y-%m-%d') in holidays:
-        return False
+    Dashboard czyta wyłącznie watermark - render nie czeka na NBP.
+    """
     
-    return True
+    def __init__(self, client: Optional[NBPApiClient] = None,
+                 interval_seconds: int = 6 * 3600, lookback_days: int = 14):
+        self.client = client or nbp_client
+        self.interval_seconds = interval_seconds
+        self.lookback_days = lookback_days
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._last_started: Optional[datetime] = None
+    
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+    
+    def _is_due(self) -> bool:
+        now = datetime.now()
+        if self._last_started is None:
+            # Pierwsze wywołanie w procesie - sprawdź trwały watermark
+            watermark = db.get_fx_refresh_watermark()
+            if watermark['refreshed_at']:
+                try:
+                    self._last_started = datetime.fromisoformat(str(watermark['refreshed_at']))
+                except ValueError:
+                    self._last_started = None
+        if self._last_started is None:
+            return True
+        return (now - self._last_started).total_seconds() >= self.interval_seconds
+    
+    def maybe_start(self, force: bool = False) -> bool:
+        """
+        Uruchamia odświeżanie w tle jeśli minął interwał (nie blokuje)
+        
+        Returns:
+            bool: True jeśli wystartowano nowy wątek
+        """
+        with self._lock:
+            if self.is_running():
+                return False
+            if not force and not self._is_due():
+                return False
+            self._last_started = datetime.now()
+            self._thread = threading.Thread(target=self.run_once, name="fx-refresher", daemon=True)
+            self._thread.start()
+            return True
+    
+    def run_once(self) -> Dict:
+        """
+        Jedno odświeżenie (synchronicznie, bez wywołań Streamlit)
+        
+        Returns:
+            dict: {'fetched': int, 'covered_through': str | None, 'status': str}
+        """
+        end_date = date.today()
+        start_date = end_date - timedelta(days=self.lookback_days)
+        status = 'ok'
+        fetched = 0
+        
+        try:
+            gaps = db.find_fx_gaps(start_date, end_date, 'USD')
+            
+            if gaps:
+                fetcher = ConcurrentNBPFetcher(self.client, max_workers=1)
+                report = fetcher.fetch_chunks(
+                    [('USD', s, e) for s, e in self.client._split_ranges(gaps)]
+                )
+                fetched = len(report['rates'].get('USD', {}))
+                if report['errors']:
+                    status = f"error: {report['errors'][0]}"
+        
+        except Exception as e:
+            status = f"error: {e}"
+        
+        latest = db.get_latest_fx_rate('USD', end_date)
+        covered_through = latest['date'] if latest else None
+        db.set_fx_refresh_watermark(datetime.now(), covered_through, status[:200])
+        
+        return {'fetched': fetched, 'covered_through': covered_through, 'status': status}
+
 
-def auto_seed_on_startup() -> bool:
+def get_fx_staleness() -> Dict:
     """
-    Automatyczne seed data przy starcie aplikacji
-    Sprawdza czy brakuje kursów z ostatnich 7 dni i pobiera je
+    Stan aktualności kursów na podstawie watermarku (bez zapytań do NBP)
     
     Returns:
-        bool: True jeśli wykonano seed
+        dict: watermark + 'expected_date' (ostatni dzień publikacji przed dziś)
+              + 'lag_business_days' (None gdy brak danych)
     """
-    # Sprawdź pokrycie ostatnich 7 dni
-    end_date = date.today()
-    start_date = end_date - timedelta(days=7)
-    
-    # Policz dni robocze
-    business_days = 0
-    current_date = start_date
-    while current_date <= end_date:
-        if is_business_day(current_date):
-            business_days += 1
-        current_date += timedelta(days=1)
-    
-    # Sprawdź ile w cache
-    conn = db.get_connection()
-    existing_count = 0
-    if conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT COUNT(*) FROM fx_rates 
-            WHERE code = 'USD' AND date BETWEEN ? AND ?
-        """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-        existing_count = cursor.fetchone()[0]
-        conn.close()
-    
-    missing = business_days - existing_count
-    
-    # Jeśli brakuje > 2 kursów, wykonaj auto-seed
-    if missing > 2:
-        st.info(f"🌱 Auto-seed: brakuje {missing} kursów z ostatnich 7 dni")
-        results = nbp_client.bulk_load_fx_rates(start_date, end_date)
-        success_count = len([v for v in results.values() if v])
-        st.success(f"✅ Auto-seed ukończony: {success_count} kursów")
-        return True
-    
-    return False
+    watermark = db.get_fx_refresh_watermark()
+    expected = bd_calendar.previous_business_day(date.today())
+    lag = None
+    
+    if watermark['covered_through']:
+        covered = datetime.strptime(str(watermark['covered_through'])[:10], '%Y-%m-%d').date()
+        if covered >= expected:
+            lag = 0
+        else:
+            lag = bd_calendar.business_days_between(covered + timedelta(days=1), expected)
+    
+    return {**watermark, 'expected_date': expected.strftime('%Y-%m-%d'), 'lag_business_days': lag}
 
-# Globalna instancja klienta
-nbp_client = NBPApiClient()
+
+# Globalny refresher (jeden wątek na proces Streamlit)
+fx_refresher = BackgroundFxRefresher()
 
 def get_usd_rate_for_date(operation_date: date) -> Optional[Dict]:
     """
@@ -371,359 +1084,102 @@ def get_usd_rate_for_date(operation_date: date) -> Optional[Dict]:
     """
     return nbp_client.get_usd_rate_d_minus_1(operation_date)
 
-def manual_override_rate(operation_date: date, custom_rate: float) -> bool:
+def get_rate_for_date(operation_date: date, code: str = 'USD') -> Optional[Dict]:
     """
-    Ręczne nadpisanie kursu USD dla danej daty
+    Funkcja helper do pobierania kursu dowolnej waluty tabeli A na dzień D-1
     
     Args:
         operation_date: Data operacji
-        custom_rate: Ręcznie podany kurs
+        code: Kod waluty (np. 'EUR', 'GBP')
         
     Returns:
-        bool: True jeśli sukces
+        dict: Kurs na D-1 lub None
     """
-    try:
-        date_str = operation_date.strftime('%Y-%m-%d')
-        
-        # Usuń stary kurs jeśli istnieje
-        db.delete_fx_rate(operation_date, 'USD')
-        
-        # Zapisz nowy kurs z oznaczeniem manual
-        success = db.insert_fx_rate(date_str, 'USD', custom_rate, 'MANUAL')
-        
-        if success:
-            st.success(f"✅ Zapisano ręczny kurs USD: {custom_rate:.4f} na {date_str}")
-        else:
-            st.error("❌ Błąd zapisu ręcznego kursu")
-        
-        return success
-        
-    except Exception as e:
-        st.error(f"Błąd ręcznego nadpisania kursu: {e}")
-        return False
+    return nbp_client.get_rate_d_minus_1(operation_date, code)
 
-def test_nbp_api():
+def get_usd_rates_for_dates(operation_dates) -> Dict[date, Optional[Dict]]:
     """
-    Test funkcjonalności NBP API
+    Funkcja helper do wsadowego pobierania kursów USD na D-1
     
+    Args:
+        operation_dates: Lista dat operacji
+        
     Returns:
-        dict: Wyniki testów
+        dict: {data_operacji: kurs D-1 lub None}
     """
-    results = {
-        'connection_test': False,
-        'current_rate_test': False,
-        'd_minus_1_test': False,
-        'weekend_handling_test': False,
-        'cache_test': False
-    }
-    
+    return nbp_client.get_usd_rates_d_minus_1(operation_dates)
+
+# Funkcje UI przeniesione do nbp_ui (dawne nbp_api_client.show_nbp_test_ui itd.)
+_UI_EXPORTS = ('streamlit_progress_handler', 'auto_seed_on_startup', 'manual_override_rate',
+               'test_nbp_api', 'show_nbp_test_ui')
+
+def __getattr__(name):
+    """Leniwy dostęp do funkcji UI z nbp_ui (PEP 562) - import klienta bez Streamlit"""
+    if name in _UI_EXPORTS:
+        import nbp_ui
+        return getattr(nbp_ui, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# ================================
+# CLI (bez Streamlit): python -m nbp_api_client ...
+# ================================
+
+def _parse_cli_date(value: str) -> date:
     try:
-        # WYCZYŚĆ dane testowe przed testem
-        import db
-        conn = db.get_connection()
-        if conn:
-            cursor = conn.cursor()
-            cursor.execute("DELETE FROM fx_rates WHERE source = 'NBP' AND date >= '2025-08-10'")
-            conn.commit()
-            conn.close()
-        
-        # Test połączenia z API
-        date_range = nbp_client.get_available_date_range()
-        results['connection_test'] = date_range['newest'] is not None
-        
-        # Test pobierania aktualnego kursu
-        today = date.today()
-        rate = nbp_client.get_usd_rate(today)
-        # Może być None jeśli dziś to weekend/święto
-        results['current_rate_test'] = True  # Test połączenia się udał
-        
-        # Test D-1
-        yesterday = today - timedelta(days=1)
-        d_minus_1_rate = nbp_client.get_usd_rate_d_minus_1(today)
-        results['d_minus_1_test'] = d_minus_1_rate is not None
-        
-        # Test obsługi weekendu (użyj przeszłej soboty)
-        saturday = today
-        while saturday.weekday() != 5:  # Znajdź poprzednią sobotę
-            saturday -= timedelta(days=1)
-            if saturday < today - timedelta(days=7):
-                break
-        
-        if saturday.weekday() == 5:
-            weekend_rate = nbp_client.get_usd_rate_d_minus_1(saturday)
-            results['weekend_handling_test'] = weekend_rate is not None
-        else:
-            results['weekend_handling_test'] = True  # Fallback
-        
-        # Test cache'a - drugi request powinien być z cache
-        if d_minus_1_rate:
-            cached_rate = nbp_client.get_usd_rate(d_minus_1_rate['date'])
-            results['cache_test'] = (cached_rate is not None and 
-                                   cached_rate['rate'] == d_minus_1_rate['rate'])
-        
-    except Exception as e:
-        st.error(f"Błąd testów NBP API: {e}")
-    
-    return results
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Nieprawidłowa data (YYYY-MM-DD): {value}")
 
-# Przykład użycia w Streamlit UI
-def show_nbp_test_ui():
-    """UI do testowania funkcjonalności NBP API"""
-    
-    st.header("🏦 Test NBP API - Punkt 11")
-    
-    # Test podstawowy
-    if st.button("🧪 Uruchom testy NBP API"):
-        test_results = test_nbp_api()
-        
-        st.write("**Wyniki testów:**")
-        for test_name, result in test_results.items():
-            if result:
-                st.success(f"✅ {test_name}")
-            else:
-                st.error(f"❌ {test_name}")
-        
-        passed = sum(test_results.values())
-        total = len(test_results)
-        
-        if passed == total:
-            st.success(f"🎉 Punkt 11 działa poprawnie! ({passed}/{total})")
-        else:
-            st.warning(f"⚠️ Punkt 11 częściowo działa ({passed}/{total})")
-    
-    st.markdown("---")
-    
-    # Test interaktywny
-    st.subheader("🔍 Test interaktywny")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        test_date = st.date_input("Data do sprawdzenia kursu", value=date.today())
-        
-        if st.button("Pobierz kurs USD"):
-            with st.spinner("Pobieram kurs..."):
-                rate = nbp_client.get_usd_rate(test_date)
-                if rate:
-                    st.success(f"Kurs USD na {rate['date']}: {rate['rate']:.4f}")
-                    st.info(f"Źródło: {rate['source']}")
-                else:
-                    st.error("Nie znaleziono kursu dla tej daty")
-    
-    with col2:
-        operation_date = st.date_input("Data operacji (test D-1)", value=date.today())
-        
-        if st.button("Pobierz kurs D-1"):
-            with st.spinner("Pobieram kurs D-1..."):
-                rate = nbp_client.get_usd_rate_d_minus_1(operation_date)
-                if rate:
-                    st.success(f"Kurs USD D-1: {rate['rate']:.4f} na {rate['date']}")
-                    st.info(f"Źródło: {rate['source']}")
-                else:
-                    st.error("Nie znaleziono kursu D-1")
-                    
-# Test bulk loading (PUNKT 12A)
-    st.subheader("📦 Bulk loading kursów")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        days_bulk = st.slider("Dni wstecz do pobrania", min_value=1, max_value=30, value=7)
-    
-    with col2:
-        st.write("")  # Spacer
-        if st.button("Bulk load kursy"):
-            end_date = date.today()
-            start_date = end_date - timedelta(days=days_bulk)
-            
-            with st.spinner("Bulk loading..."):
-                results = nbp_client.bulk_load_fx_rates(start_date, end_date)
-            
-            st.write("**Wyniki bulk loading:**")
-            for date_str, success in results.items():
-                if success:
-                    st.success(f"✅ {date_str}")
-                else:
-                    st.error(f"❌ {date_str}")
-    
-    st.markdown("---")
-
-# Seed data (PUNKT 12B)
-    st.subheader("🌱 Seed data")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        seed_days = st.slider("Dni wstecz (seed)", min_value=7, max_value=60, value=30)
-    
-    with col2:
-        st.write("")  # Spacer
-        if st.button("Seed ostatnie kursy"):
-            with st.spinner("Seed data..."):
-                end_date = date.today()
-                start_date = end_date - timedelta(days=seed_days)
-                summary = nbp_client.bulk_load_fx_rates(start_date, end_date)
-                st.success(f"🎉 Seed ukończony: {len([v for v in summary.values() if v])} kursów pobranych")
-    
-    st.markdown("---")
-    
-    # Sprawdzenie braków (PUNKT 12C)
-    st.subheader("🔍 Sprawdzenie braków w cache")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        check_days = st.slider("Dni do sprawdzenia", min_value=7, max_value=90, value=30)
-    
-    with col2:
-        st.write("")  # Spacer
-        if st.button("Sprawdź braki"):
-            # Inline sprawdzenie braków
-            end_date = date.today()
-            start_date = end_date - timedelta(days=check_days)
-
-            # Policz dni robocze
-            business_days = 0
-            current_date = start_date
-            while current_date <= end_date:
-                if is_business_day(current_date):
-                    business_days += 1
-                current_date += timedelta(days=1)
-
-            # Sprawdź ile w bazie
-            conn = db.get_connection()
-            existing_count = 0
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT COUNT(*) FROM fx_rates 
-                    WHERE code = 'USD' AND date BETWEEN ? AND ?
-                """, (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d')))
-                existing_count = cursor.fetchone()[0]
-                conn.close()
-
-            missing_count = business_days - existing_count
-            coverage = (existing_count / business_days * 100) if business_days > 0 else 0
-
-            st.metric("Pokrycie cache", f"{coverage:.1f}%")
-            st.write(f"**Dni robocze:** {business_days}")
-            st.write(f"**W cache:** {existing_count}")
-            st.write(f"**Brakuje:** {missing_count}")
-    
-    st.markdown("---")
- 
- # Zarządzanie cache (PUNKT 14A)
-    st.subheader("🗂️ Zarządzanie cache kursów")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        if st.button("📊 Pokaż ostatnie kursy"):
-            conn = db.get_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("""
-                    SELECT date, rate, source FROM fx_rates 
-                    WHERE code = 'USD' 
-                    ORDER BY date DESC 
-                    LIMIT 10
-                """)
-                rows = cursor.fetchall()
-                conn.close()
-                
-                st.write("**Ostatnie 10 kursów USD:**")
-                for row in rows:
-                    st.write(f"📅 {row[0]}: {row[1]:.4f} ({row[2]})")
-    
-    with col2:
-        if st.button("🗑️ Wyczyść cache"):
-            conn = db.get_connection()
-            if conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM fx_rates WHERE code = 'USD'")
-                deleted = cursor.rowcount
-                conn.commit()
-                conn.close()
-                st.success(f"✅ Usunięto {deleted} kursów USD")
-    
-    with col3:
-        if st.button("📈 Statystyki cache"):
-            stats = db.get_fx_rates_stats()
-            st.metric("Kursów USD", stats['total_records'])
-            st.write(f"📅 {stats['oldest_date']} → {stats['newest_date']}")
-    
-    st.markdown("---")
- 
-    # Manual override
-    st.subheader("✏️ Ręczne nadpisanie kursu")
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        override_date = st.date_input("Data", value=date.today(), key="override_date")
-    
-    with col2:
-        override_rate = st.number_input("Kurs USD", min_value=0.1, max_value=10.0, 
-                                       value=4.0, step=0.0001, format="%.4f")
-    
-    with col3:
-        st.write("")  # Spacer
-        if st.button("Zapisz ręczny kurs"):
-            if manual_override_rate(override_date, override_rate):
-                st.rerun()  # Odśwież stronę
-    
-    # Odświeżanie cache
-    st.subheader("🔄 Odświeżanie cache")
-    
-    col1, col2 = st.columns(2)
-    
-    with col1:
-        days_back = st.slider("Dni wstecz", min_value=1, max_value=14, value=7)
-    
-    with col2:
-        st.write("")  # Spacer
-        if st.button("Odśwież kursy"):
-            with st.spinner("Odświeżam kursy..."):
-                results = nbp_client.refresh_recent_rates(days_back)
-                
-                st.write("**Wyniki odświeżania:**")
-                for date_str, success in results.items():
-                    if success:
-                        st.success(f"✅ {date_str}")
-                    else:
-                        st.error(f"❌ {date_str}")
-    
-    # Statystyki cache
-    st.subheader("📊 Statystyki cache")
-    
-    fx_stats = db.get_fx_rates_stats()
-    
-    col1, col2, col3 = st.columns(3)
-    
-    with col1:
-        st.metric("Kursów w cache", fx_stats['total_records'])
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    Punkt wejścia CLI
     
-    with col2:
-        if fx_stats['latest_usd_rate']:
-            st.metric("Najnowszy kurs USD", f"{fx_stats['latest_usd_rate']:.4f}")
-        else:
-            st.metric("Najnowszy kurs USD", "Brak")
+    Przykłady:
+        python -m nbp_api_client backfill --from 2020-01-01 --to 2024-12-31 --currency USD
+        python -m nbp_api_client rate --date 2025-03-03
     
-    with col3:
-        if fx_stats['newest_date']:
-            st.metric("Data najnowszego kursu", fx_stats['newest_date'])
-        else:
-            st.metric("Data najnowszego kursu", "Brak")
+    Returns:
+        int: kod wyjścia (0 = sukces)
+    """
+    parser = argparse.ArgumentParser(prog="python -m nbp_api_client",
+                                     description="Kursy NBP - narzędzia bez Streamlit")
+    parser.add_argument('--db', help="Ścieżka do bazy (domyślnie db.DB_PATH)")
+    parser.add_argument('--json', action='store_true', help="Zdarzenia postępu jako JSON lines")
+    parser.add_argument('--base-url', help="Adres API (np. lokalny serwer zastępczy)")
+    sub = parser.add_subparsers(dest='command')
+    
+    p_backfill = sub.add_parser('backfill', help="Wznawialny backfill kursów")
+    p_backfill.add_argument('--from', dest='start', type=_parse_cli_date, required=True)
+    p_backfill.add_argument('--to', dest='end', type=_parse_cli_date, default=date.today())
+    p_backfill.add_argument('--currency', default='USD')
+    p_backfill.add_argument('--restart', action='store_true', help="Ignoruj punkt kontrolny")
+    
+    p_rate = sub.add_parser('rate', help="Kurs USD na D-1 dla daty operacji")
+    p_rate.add_argument('--date', type=_parse_cli_date, default=date.today())
+    
+    args = parser.parse_args(argv)
+    if args.db:
+        db.DB_PATH = args.db
+    if not db.init_database():
+        print("Błąd inicjalizacji bazy danych", file=sys.stderr)
+        return 1
+    
+    handler = json_progress_handler if args.json else log_progress_handler
+    client = NBPApiClient(base_url=args.base_url, progress_handler=handler)
+    
+    if args.command == 'backfill':
+        if args.end < args.start:
+            parser.error("--to musi być >= --from")
+        summary = client.backfill(args.start, args.end, args.currency, resume=not args.restart)
+        return 0 if summary['status'] == 'done' else 1
+    
+    operation_date = args.date if args.command == 'rate' else date.today()
+    rate = client.get_usd_rate_d_minus_1(operation_date)
+    if rate:
+        print(f"Kurs USD D-1 dla {operation_date}: {rate['rate']:.4f} na {rate['date']}")
+        return 0
+    print("Nie znaleziono kursu USD")
+    return 1
 
 if __name__ == "__main__":
-    # Przykład testowania
-    print("Test NBP API Client...")
-    
-    # Test kursu na dziś
-    today = date.today()
-    rate = get_usd_rate_for_date(today)
-    
-    if rate:
-        print(f"Kurs USD D-1 dla {today}: {rate['rate']:.4f} na {rate['date']}")
-    else:
-        print("Nie znaleziono kursu USD")
\ No newline at end of file
+    sys.exit(main())
@@ -0,0 +1,396 @@
+"""
+NBP API - część Streamlit: komunikaty postępu, auto-seed, ręczne nadpisanie
+kursu i strona testowa NBP API
+
+Czysty klient (HTTP, backfill, kursy D-1) jest w nbp_api_client.py i nie
+importuje Streamlit - tutaj streamlit ładowany dopiero w funkcjach UI.
+"""
+
+from datetime import date, timedelta
+from typing import Dict
+
+import db
+from nbp_api_client import NBPApiClient
+from utils import business_days as bd_calendar
+
+def streamlit_progress_handler(event: Dict):
+    """Odbiorca zdarzeń klienta - komunikaty Streamlit"""
+    import streamlit as st
+
+    show = {
+        'info': st.info,
+        'success': st.success,
+        'warning': st.warning,
+        'error': st.error,
+    }.get(event.get('level'), st.write)
+    show(event['message'])
+
+# Klient dla stron Streamlit - zdarzenia postępu jako komunikaty st.*
+ui_client = NBPApiClient(progress_handler=streamlit_progress_handler)
+
+def auto_seed_on_startup() -> bool:
+    """
+    Automatyczne seed data przy starcie aplikacji
+    Sprawdza czy brakuje kursów z ostatnich 7 dni i pobiera je
+    
+    Returns:
+        bool: True jeśli wykonano seed
+    """
+    import streamlit as st
+
+    # Sprawdź pokrycie ostatnich 7 dni
+    end_date = date.today()
+    start_date = end_date - timedelta(days=7)
+    
+    # Dni publikacji NBP bez kursu w cache (indeks dni roboczych + indeks kursów)
+    cached = db.get_fx_rates_range(start_date, end_date, 'USD')
+    missing = len([
+        d for d in bd_calendar.business_days(start_date, end_date)
+        if d.strftime('%Y-%m-%d') not in cached
+    ])
+    
+    # Jeśli brakuje > 2 kursów, wykonaj auto-seed
+    if missing > 2:
+        st.info(f"🌱 Auto-seed: brakuje {missing} kursów z ostatnich 7 dni")
+        results = ui_client.bulk_load_fx_rates(start_date, end_date)
+        success_count = len([v for v in results.values() if v])
+        st.success(f"✅ Auto-seed ukończony: {success_count} kursów")
+        return True
+    
+    return False
+
+def manual_override_rate(operation_date: date, custom_rate: float) -> bool:
+    """
+    Ręczne nadpisanie kursu USD dla danej daty
+    
+    Args:
+        operation_date: Data operacji
+        custom_rate: Ręcznie podany kurs
+        
+    Returns:
+        bool: True jeśli sukces
+    """
+    import streamlit as st
+
+    try:
+        date_str = operation_date.strftime('%Y-%m-%d')
+        
+        # Usuń stary kurs jeśli istnieje
+        db.delete_fx_rate(operation_date, 'USD')
+        
+        # Zapisz nowy kurs z oznaczeniem manual
+        success = db.insert_fx_rate(date_str, 'USD', custom_rate, 'MANUAL')
+        
+        if success:
+            st.success(f"✅ Zapisano ręczny kurs USD: {custom_rate:.4f} na {date_str}")
+        else:
+            st.error("❌ Błąd zapisu ręcznego kursu")
+        
+        return success
+        
+    except Exception as e:
+        st.error(f"Błąd ręcznego nadpisania kursu: {e}")
+        return False
+
+def test_nbp_api():
+    """
+    Test funkcjonalności NBP API
+    
+    Returns:
+        dict: Wyniki testów
+    """
+    import streamlit as st
+
+    results = {
+        'connection_test': False,
+        'current_rate_test': False,
+        'd_minus_1_test': False,
+        'weekend_handling_test': False,
+        'cache_test': False
+    }
+    
+    try:
+        # WYCZYŚĆ dane testowe przed testem
+        conn = db.get_connection()
+        if conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM fx_rates WHERE source = 'NBP' AND date >= '2025-08-10'")
+            conn.commit()
+            conn.close()
+            db.invalidate_fx_index()
+        
+        # Test połączenia z API
+        date_range = ui_client.get_available_date_range()
+        results['connection_test'] = date_range['newest'] is not None
+        
+        # Test pobierania aktualnego kursu
+        today = date.today()
+        rate = ui_client.get_usd_rate(today)
+        # Może być None jeśli dziś to weekend/święto
+        results['current_rate_test'] = True  # Test połączenia się udał
+        
+        # Test D-1
+        yesterday = today - timedelta(days=1)
+        d_minus_1_rate = ui_client.get_usd_rate_d_minus_1(today)
+        results['d_minus_1_test'] = d_minus_1_rate is not None
+        
+        # Test obsługi weekendu (użyj przeszłej soboty)
+        saturday = today
+        while saturday.weekday() != 5:  # Znajdź poprzednią sobotę
+            saturday -= timedelta(days=1)
+            if saturday < today - timedelta(days=7):
+                break
+        
+        if saturday.weekday() == 5:
+            weekend_rate = ui_client.get_usd_rate_d_minus_1(saturday)
+            results['weekend_handling_test'] = weekend_rate is not None
+        else:
+            results['weekend_handling_test'] = True  # Fallback
+        
+        # Test cache'a - drugi request powinien być z cache
+        if d_minus_1_rate:
+            cached_rate = ui_client.get_usd_rate(d_minus_1_rate['date'])
+            results['cache_test'] = (cached_rate is not None and 
+                                   cached_rate['rate'] == d_minus_1_rate['rate'])
+        
+    except Exception as e:
+        st.error(f"Błąd testów NBP API: {e}")
+    
+    return results
+
+# Przykład użycia w Streamlit UI
+def show_nbp_test_ui():
+    """UI do testowania funkcjonalności NBP API"""
+    import streamlit as st
+    
+    st.header("🏦 Test NBP API - Punkt 11")
+    
+    # Test podstawowy
+    if st.button("🧪 Uruchom testy NBP API"):
+        test_results = test_nbp_api()
+        
+        st.write("**Wyniki testów:**")
+        for test_name, result in test_results.items():
+            if result:
+                st.success(f"✅ {test_name}")
+            else:
+                st.error(f"❌ {test_name}")
+        
+        passed = sum(test_results.values())
+        total = len(test_results)
+        
+        if passed == total:
+            st.success(f"🎉 Punkt 11 działa poprawnie! ({passed}/{total})")
+        else:
+            st.warning(f"⚠️ Punkt 11 częściowo działa ({passed}/{total})")
+    
+    st.markdown("---")
+    
+    # Test interaktywny
+    st.subheader("🔍 Test interaktywny")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        test_date = st.date_input("Data do sprawdzenia kursu", value=date.today())
+        
+        if st.button("Pobierz kurs USD"):
+            with st.spinner("Pobieram kurs..."):
+                rate = ui_client.get_usd_rate(test_date)
+                if rate:
+                    st.success(f"Kurs USD na {rate['date']}: {rate['rate']:.4f}")
+                    st.info(f"Źródło: {rate['source']}")
+                else:
+                    st.error("Nie znaleziono kursu dla tej daty")
+    
+    with col2:
+        operation_date = st.date_input("Data operacji (test D-1)", value=date.today())
+        
+        if st.button("Pobierz kurs D-1"):
+            with st.spinner("Pobieram kurs D-1..."):
+                rate = ui_client.get_usd_rate_d_minus_1(operation_date)
+                if rate:
+                    st.success(f"Kurs USD D-1: {rate['rate']:.4f} na {rate['date']}")
+                    st.info(f"Źródło: {rate['source']}")
+                else:
+                    st.error("Nie znaleziono kursu D-1")
+                    
+# Test bulk loading (PUNKT 12A)
+    st.subheader("📦 Bulk loading kursów")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        days_bulk = st.slider("Dni wstecz do pobrania", min_value=1, max_value=30, value=7)
+    
+    with col2:
+        st.write("")  # Spacer
+        if st.button("Bulk load kursy"):
+            end_date = date.today()
+            start_date = end_date - timedelta(days=days_bulk)
+            
+            with st.spinner("Bulk loading..."):
+                results = ui_client.bulk_load_fx_rates(start_date, end_date)
+            
+            st.write("**Wyniki bulk loading:**")
+            for date_str, success in results.items():
+                if success:
+                    st.success(f"✅ {date_str}")
+                else:
+                    st.error(f"❌ {date_str}")
+    
+    st.markdown("---")
+
+# Seed data (PUNKT 12B)
+    st.subheader("🌱 Seed data")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        seed_days = st.slider("Dni wstecz (seed)", min_value=7, max_value=60, value=30)
+    
+    with col2:
+        st.write("")  # Spacer
+        if st.button("Seed ostatnie kursy"):
+            with st.spinner("Seed data..."):
+                end_date = date.today()
+                start_date = end_date - timedelta(days=seed_days)
+                summary = ui_client.bulk_load_fx_rates(start_date, end_date)
+                st.success(f"🎉 Seed ukończony: {len([v for v in summary.values() if v])} kursów pobranych")
+    
+    st.markdown("---")
+    
+    # Sprawdzenie braków (PUNKT 12C)
+    st.subheader("🔍 Sprawdzenie braków w cache")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        check_days = st.slider("Dni do sprawdzenia", min_value=7, max_value=90, value=30)
+    
+    with col2:
+        st.write("")  # Spacer
+        if st.button("Sprawdź braki"):
+            # Inline sprawdzenie braków
+            end_date = date.today()
+            start_date = end_date - timedelta(days=check_days)
+
+            # Policz dni robocze i braki (jedno zapytanie z kalendarzem dni roboczych)
+            business_days = bd_calendar.business_days_between(start_date, end_date)
+            gaps = db.find_fx_gaps(start_date, end_date, 'USD')
+            missing_count = sum(days for _, _, days in gaps)
+            existing_count = business_days - missing_count
+            coverage = (existing_count / business_days * 100) if business_days > 0 else 0
+
+            st.metric("Pokrycie cache", f"{coverage:.1f}%")
+            st.write(f"**Dni robocze:** {business_days}")
+            st.write(f"**W cache:** {existing_count}")
+            st.write(f"**Brakuje:** {missing_count}")
+            for gap_start, gap_end, days in gaps:
+                st.write(f"📅 {gap_start} → {gap_end} ({days} dni)")
+    
+    st.markdown("---")
+ 
+ # Zarządzanie cache (PUNKT 14A)
+    st.subheader("🗂️ Zarządzanie cache kursów")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        if st.button("📊 Pokaż ostatnie kursy"):
+            conn = db.get_connection()
+            if conn:
+                cursor = conn.cursor()
+                cursor.execute("""
+                    SELECT date, rate, source FROM fx_rates 
+                    WHERE code = 'USD' 
+                    ORDER BY date DESC 
+                    LIMIT 10
+                """)
+                rows = cursor.fetchall()
+                conn.close()
+                
+                st.write("**Ostatnie 10 kursów USD:**")
+                for row in rows:
+                    st.write(f"📅 {row[0]}: {row[1]:.4f} ({row[2]})")
+    
+    with col2:
+        if st.button("🗑️ Wyczyść cache"):
+            conn = db.get_connection()
+            if conn:
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM fx_rates WHERE code = 'USD'")
+                deleted = cursor.rowcount
+                conn.commit()
+                conn.close()
+                db.invalidate_fx_index()
+                st.success(f"✅ Usunięto {deleted} kursów USD")
+    
+    with col3:
+        if st.button("📈 Statystyki cache"):
+            stats = db.get_fx_rates_stats()
+            st.metric("Kursów USD", stats['total_records'])
+            st.write(f"📅 {stats['oldest_date']} → {stats['newest_date']}")
+    
+    st.markdown("---")
+ 
+    # Manual override
+    st.subheader("✏️ Ręczne nadpisanie kursu")
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        override_date = st.date_input("Data", value=date.today(), key="override_date")
+    
+    with col2:
+        override_rate = st.number_input("Kurs USD", min_value=0.1, max_value=10.0, 
+                                       value=4.0, step=0.0001, format="%.4f")
+    
+    with col3:
+        st.write("")  # Spacer
+        if st.button("Zapisz ręczny kurs"):
+            if manual_override_rate(override_date, override_rate):
+                st.rerun()  # Odśwież stronę
+    
+    # Odświeżanie cache
+    st.subheader("🔄 Odświeżanie cache")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        days_back = st.slider("Dni wstecz", min_value=1, max_value=14, value=7)
+    
+    with col2:
+        st.write("")  # Spacer
+        if st.button("Odśwież kursy"):
+            with st.spinner("Odświeżam kursy..."):
+                results = ui_client.refresh_recent_rates(days_back)
+                
+                st.write("**Wyniki odświeżania:**")
+                for date_str, success in results.items():
+                    if success:
+                        st.success(f"✅ {date_str}")
+                    else:
+                        st.error(f"❌ {date_str}")
+    
+    # Statystyki cache
+    st.subheader("📊 Statystyki cache")
+    
+    fx_stats = db.get_fx_rates_stats()
+    
+    col1, col2, col3 = st.columns(3)
+    
+    with col1:
+        st.metric("Kursów w cache", fx_stats['total_records'])
+    
+    with col2:
+        if fx_stats['latest_usd_rate']:
+            st.metric("Najnowszy kurs USD", f"{fx_stats['latest_usd_rate']:.4f}")
+        else:
+            st.metric("Najnowszy kurs USD", "Brak")
+    
+    with col3:
+        if fx_stats['newest_date']:
+            st.metric("Data najnowszego kursu", fx_stats['newest_date'])
+        else:
+            st.metric("Data najnowszego kursu", "Brak")
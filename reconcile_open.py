@@ -2,9 +2,12 @@
 # -*- coding: utf-8 -*-
 
 """
-Rekonsyliacja lots.quantity_open dla podanego tickera:
+Rekonsyliacja lots.quantity_open dla podanego tickera (lub całego portfela, --all):
   quantity_open = quantity_total - sprzedane_z_lota - zarezerwowane_przez_otwarte_CC
 
+Dodatkowo weryfikuje zmaterializowane lot_positions (triggery, migracja schematu 7)
+względem przeliczenia z tabel źródłowych; bez --dry-run poprawia rozjechane wiersze.
+
 Źródło rezerwacji:
   - preferencyjnie: cc_lot_mappings (per-lot),
   - fallback: options_cc_reservations (per-lot),
@@ -12,14 +15,22 @@ Rekonsyliacja lots.quantity_open dla podanego tickera:
 
 Użycie:
   python reconcile_open.py --ticker TICK [--db PATH_DO_SQLITE] [--dry-run] [--verbose]
+  python reconcile_open.py --all [--db PATH_DO_SQLITE] [--dry-run | --check]
+
+Tryb --all: wszystkie LOT-y naraz - jedno zapytanie grupujące na tabelę źródłową,
+poprawki jednym executemany w jednej transakcji, wynik jako JSON (diff) na stdout.
+Kody wyjścia: 0 - OK, 1 - brak połączenia, 2 - błąd, 3 - rozjazd wykryty przez --check
+(--check niczego nie zapisuje; do uruchamiania np. co noc).
 
 Jeśli masz w projekcie db.py z get_connection(), możesz pominąć --db.
 """
 
 import argparse
+import json
 import os
 import sys
 import sqlite3
+import time
 
 def table_exists(cur, name: str) -> bool:
     cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=? LIMIT 1", (name,))
@@ -99,6 +110,75 @@ def load_reserved_per_lot(cur, ticker_upper: str) -> dict[int, int]:
 
     return reserved
 
+def load_reserved_by_source(cur, ticker_upper: str) -> tuple[dict[int, int], dict[int, int]]:
+    """Rezerwacje otwartych CC per LOT osobno z cc_lot_mappings i options_cc_reservations (bez fallbacku)"""
+    result = []
+    for table, qty_col in (('cc_lot_mappings', 'shares_reserved'), ('options_cc_reservations', 'qty_reserved')):
+        if not table_exists(cur, table):
+            result.append({})
+            continue
+        cur.execute(f"""
+            SELECT r.lot_id, COALESCE(SUM(r.{qty_col}),0) AS qty
+            FROM {table} r
+            JOIN options_cc cc ON cc.id = r.cc_id
+            JOIN lots l ON l.id = r.lot_id
+            WHERE cc.status='open'
+              AND UPPER(l.ticker)=?
+            GROUP BY r.lot_id
+        """, (ticker_upper,))
+        result.append({int(r[0]): int(r[1] or 0) for r in (cur.fetchall() or [])})
+    return result[0], result[1]
+
+def verify_lot_positions(cur, ticker_upper: str, lot_ids: list[int], sold_map: dict[int, int],
+                         fix: bool, verbose: bool) -> int:
+    """
+    Porównanie zmaterializowanych lot_positions (triggery) z przeliczeniem z tabel źródłowych.
+    Z fix=True rozjechane wiersze są nadpisywane wartościami przeliczonymi.
+
+    Zwraca liczbę LOT-ów z rozjazdem (0 także gdy tabeli lot_positions nie ma).
+    """
+    if not table_exists(cur, 'lot_positions'):
+        print("\nℹ️  Brak tabeli lot_positions (baza sprzed migracji schematu 7) - pomijam weryfikację")
+        return 0
+
+    reserved_new, reserved_old = load_reserved_by_source(cur, ticker_upper)
+    cur.execute("""
+        SELECT l.id, p.lot_id, p.qty_sold, p.qty_reserved, p.qty_reserved_legacy
+        FROM lots l
+        LEFT JOIN lot_positions p ON p.lot_id = l.id
+        WHERE UPPER(l.ticker) = ?
+    """, (ticker_upper,))
+    stored = {int(r[0]): r for r in (cur.fetchall() or [])}
+
+    drifted = 0
+    for lot_id in lot_ids:
+        row = stored.get(lot_id)
+        expected = (sold_map.get(lot_id, 0), reserved_new.get(lot_id, 0), reserved_old.get(lot_id, 0))
+        actual = None if row is None or row[1] is None else (int(row[2] or 0), int(row[3] or 0), int(row[4] or 0))
+        if actual == expected:
+            continue
+        drifted += 1
+        if verbose or drifted <= 20:
+            print(f"  ⚠️  LOT #{lot_id}: lot_positions (sold, reserved, legacy)={actual} "
+                  f"≠ przeliczone={expected}")
+        if fix:
+            cur.execute("""
+                INSERT INTO lot_positions (lot_id, qty_sold, qty_reserved, qty_reserved_legacy, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(lot_id) DO UPDATE SET
+                    qty_sold = excluded.qty_sold,
+                    qty_reserved = excluded.qty_reserved,
+                    qty_reserved_legacy = excluded.qty_reserved_legacy,
+                    updated_at = excluded.updated_at
+            """, (lot_id, *expected))
+
+    print("\n🧮 lot_positions:")
+    if drifted:
+        print(f"  Rozjechane LOT-y:      {drifted}" + (" (poprawione)" if fix else ""))
+    else:
+        print(f"  ✅ Zgodne z tabelami źródłowymi ({len(lot_ids)} LOT-ów)")
+    return drifted
+
 def reconcile_ticker(conn: sqlite3.Connection, ticker: str, dry_run: bool, verbose: bool) -> int:
     cur = conn.cursor()
     t = str(ticker).upper().strip()
@@ -183,6 +263,9 @@ def reconcile_ticker(conn: sqlite3.Connection, ticker: str, dry_run: bool, verbo
             print("  ⚠️  Rozjazd! Jeśli to dry-run, uruchom bez --dry-run. "
                   "Jeśli nie, sprawdź, czy rezerwacje nie występują w obu tabelach równocześnie.")
 
+        verify_lot_positions(cur, t, [int(r["id"]) for r in lots], sold_map,
+                             fix=not dry_run, verbose=verbose)
+
         return updated_rows
 
     except Exception as e:
@@ -193,20 +276,180 @@ def reconcile_ticker(conn: sqlite3.Connection, ticker: str, dry_run: bool, verbo
             pass
         raise
 
+# ================================
+# TRYB --all (cały portfel)
+# ================================
+
+def load_reserved_all(cur, table: str, qty_col: str) -> dict[int, tuple[int, int]]:
+    """
+    Rezerwacje otwartych CC per LOT z jednej tabeli, jednym zapytaniem:
+    lot_id -> (wszystkie, tylko CC tego samego tickera co LOT)
+    """
+    if not table_exists(cur, table):
+        return {}
+    cur.execute(f"""
+        SELECT r.lot_id,
+               COALESCE(SUM(r.{qty_col}),0) AS qty,
+               COALESCE(SUM(CASE WHEN UPPER(cc.ticker) = UPPER(l.ticker) THEN r.{qty_col} ELSE 0 END),0) AS qty_same_ticker
+        FROM {table} r
+        JOIN options_cc cc ON cc.id = r.cc_id
+        JOIN lots l ON l.id = r.lot_id
+        WHERE cc.status='open'
+        GROUP BY r.lot_id
+    """)
+    return {int(r[0]): (int(r[1] or 0), int(r[2] or 0)) for r in (cur.fetchall() or [])}
+
+def compute_all_diff(lots, sold_map: dict[int, int], reserved_new: dict, reserved_old: dict,
+                     positions: dict | None) -> tuple[list[dict], list[dict]]:
+    """
+    Docelowe quantity_open i lot_positions dla wszystkich LOT-ów vs wartości zapisane
+
+    Rezerwacje do quantity_open jak w trybie --ticker: per ticker cc_lot_mappings,
+    a gdy ticker nie ma w niej nic - options_cc_reservations.
+    """
+    new_per_ticker = {}
+    for r in lots:
+        t = r["ticker"]
+        new_per_ticker[t] = new_per_ticker.get(t, 0) + reserved_new.get(int(r["id"]), (0, 0))[1]
+
+    open_changes = []
+    position_changes = []
+    for r in lots:
+        lot_id = int(r["id"])
+        t = r["ticker"]
+        qty_total = int(r["quantity_total"] or 0)
+        qty_open = int(r["quantity_open"] or 0)
+        sold = sold_map.get(lot_id, 0)
+        source = reserved_new if new_per_ticker[t] > 0 else reserved_old
+        reserved = source.get(lot_id, (0, 0))[1]
+
+        correct_open = min(max(qty_total - sold - reserved, 0), qty_total)
+        if correct_open != qty_open:
+            open_changes.append({
+                'lot_id': lot_id, 'ticker': t, 'quantity_total': qty_total,
+                'sold': sold, 'reserved': reserved,
+                'stored': qty_open, 'target': correct_open, 'delta': correct_open - qty_open,
+            })
+
+        if positions is None:
+            continue
+        expected = [sold, reserved_new.get(lot_id, (0, 0))[0], reserved_old.get(lot_id, (0, 0))[0]]
+        stored = positions.get(lot_id)
+        if stored != expected:
+            position_changes.append({'lot_id': lot_id, 'ticker': t, 'stored': stored, 'target': expected})
+
+    return open_changes, position_changes
+
+def reconcile_all(conn: sqlite3.Connection, apply: bool) -> dict:
+    """
+    Rekonsyliacja wszystkich LOT-ów: odczyt, diff i (apply=True) zapis w jednej transakcji
+
+    Zwraca raport (dict serializowalny do JSON).
+    """
+    started = time.perf_counter()
+    cur = conn.cursor()
+    # Odczyt i zapis na jednym zrzucie bazy; przy zapisie blokada od początku
+    cur.execute("BEGIN IMMEDIATE" if apply else "BEGIN")
+    try:
+        cur.execute("SELECT id, UPPER(ticker) AS ticker, quantity_total, quantity_open FROM lots ORDER BY id")
+        lots = cur.fetchall() or []
+
+        cur.execute("""
+            SELECT lot_id, COALESCE(SUM(qty_from_lot),0)
+            FROM stock_trade_splits
+            GROUP BY lot_id
+        """)
+        sold_map = {int(r[0]): int(r[1] or 0) for r in (cur.fetchall() or [])}
+        reserved_new = load_reserved_all(cur, 'cc_lot_mappings', 'shares_reserved')
+        reserved_old = load_reserved_all(cur, 'options_cc_reservations', 'qty_reserved')
+
+        positions = None
+        if table_exists(cur, 'lot_positions'):
+            cur.execute("SELECT lot_id, qty_sold, qty_reserved, qty_reserved_legacy FROM lot_positions")
+            positions = {int(r[0]): [int(r[1] or 0), int(r[2] or 0), int(r[3] or 0)]
+                         for r in (cur.fetchall() or [])}
+
+        open_changes, position_changes = compute_all_diff(lots, sold_map, reserved_new,
+                                                          reserved_old, positions)
+
+        if apply and open_changes:
+            cur.executemany(
+                "UPDATE lots SET quantity_open = ?, updated_at = CURRENT_TIMESTAMP WHERE id = ?",
+                [(c['target'], c['lot_id']) for c in open_changes]
+            )
+        if apply and position_changes:
+            cur.executemany("""
+                INSERT INTO lot_positions (lot_id, qty_sold, qty_reserved, qty_reserved_legacy, updated_at)
+                VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ON CONFLICT(lot_id) DO UPDATE SET
+                    qty_sold = excluded.qty_sold,
+                    qty_reserved = excluded.qty_reserved,
+                    qty_reserved_legacy = excluded.qty_reserved_legacy,
+                    updated_at = excluded.updated_at
+            """, [(c['lot_id'], *c['target']) for c in position_changes])
+
+        if apply:
+            conn.commit()
+        else:
+            conn.rollback()
+    except Exception:
+        conn.rollback()
+        raise
+
+    return {
+        'mode': 'all',
+        'applied': apply and bool(open_changes or position_changes),
+        'lots': len(lots),
+        'tickers': len({r["ticker"] for r in lots}),
+        'quantity_open': {
+            'count': len(open_changes),
+            'sum_stored': sum(c['stored'] for c in open_changes),
+            'sum_target': sum(c['target'] for c in open_changes),
+            'changes': open_changes,
+        },
+        'lot_positions': {
+            'checked': positions is not None,
+            'count': len(position_changes),
+            'changes': position_changes,
+        },
+        'duration_ms': round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
 def main():
-    ap = argparse.ArgumentParser(description="Rekonsyliacja lots.quantity_open dla tickera")
-    ap.add_argument("--ticker", required=True, help="Ticker (np. AAPL)")
+    ap = argparse.ArgumentParser(description="Rekonsyliacja lots.quantity_open dla tickera lub całego portfela")
+    scope = ap.add_mutually_exclusive_group(required=True)
+    scope.add_argument("--ticker", help="Ticker (np. AAPL)")
+    scope.add_argument("--all", action="store_true", help="Wszystkie LOT-y naraz, wynik JSON")
     ap.add_argument("--db", help="Ścieżka do pliku SQLite (jeśli nie używasz db.py/get_connection())")
     ap.add_argument("--dry-run", action="store_true", help="Tylko pokaż co zostanie zmienione, bez zapisu")
+    ap.add_argument("--check", action="store_true",
+                    help="Z --all: bez zapisu, kod wyjścia 3 gdy wykryto rozjazd")
     ap.add_argument("--verbose", action="store_true", help="Szczegółowe logi per LOT")
     args = ap.parse_args()
+    if args.check and not args.all:
+        ap.error("--check działa tylko z --all")
 
     try:
         conn = get_conn(args.db)
     except Exception as e:
-        print(f"❌ {e}")
+        print(f"❌ {e}", file=sys.stderr if args.all else sys.stdout)
         sys.exit(1)
 
+    if args.all:
+        try:
+            report = reconcile_all(conn, apply=not (args.dry_run or args.check))
+        except Exception as e:
+            print(f"❌ Błąd rekonsyliacji: {e}", file=sys.stderr)
+            sys.exit(2)
+        finally:
+            conn.close()
+        report['dry_run'] = args.dry_run
+        report['check'] = args.check
+        print(json.dumps(report, ensure_ascii=False, indent=1))
+        if args.check and (report['quantity_open']['count'] or report['lot_positions']['count']):
+            sys.exit(3)
+        return
+
     try:
         updated = reconcile_ticker(conn, args.ticker, args.dry_run, args.verbose)
         if not args.dry_run:
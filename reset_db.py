@@ -8,7 +8,6 @@ UŻYCIE: python reset_database.py
 
 import sqlite3
 import os
-from datetime import datetime
 
 # Konfiguracja
 DB_PATH = "portfolio.db"
@@ -35,15 +34,15 @@ def reset_database():
         print(f"❌ Baza danych {DB_PATH} nie istnieje!")
         return False
     
-    # Backup nazwy pliku z timestampem
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_path = f"portfolio_backup_{timestamp}.db"
-    
     try:
-        # 1. KOPIA ZAPASOWA
-        print(f"📋 Tworzę kopię zapasową: {backup_path}")
-        import shutil
-        shutil.copy2(DB_PATH, backup_path)
+        # 1. KOPIA ZAPASOWA (backup API SQLite, gzip, retencja - katalog backups/)
+        from db.backup import backup_before
+        print(f"📋 Tworzę kopię zapasową bazy {DB_PATH}")
+        backup = backup_before('reset', db_path=DB_PATH)
+        if not backup['success']:
+            print(f"❌ Kopia zapasowa nieudana - przerywam reset: {backup['message']}")
+            return False
+        backup_path = backup['path']
         print(f"✅ Kopia zapasowa utworzona pomyślnie")
         
         # 2. POŁĄCZENIE Z BAZĄ
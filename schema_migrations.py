@@ -0,0 +1,548 @@
+"""
+Wersjonowane migracje schematu bazy danych
+Jedna uporządkowana lista migracji + wersja schematu w app_info.schema_version.
+
+Migracje uruchamia raz db.init_database() (start aplikacji / CLI). Każda migracja
+jest idempotentna (CREATE IF NOT EXISTS, dodawanie tylko brakujących kolumn),
+więc baza założona ręcznie lub starymi skryptami (migration.py,
+migrate_options_cc_add_chain_id) jest bezpiecznie "dociągana" do bieżącej wersji.
+Po migracjach kod na gorących ścieżkach zakłada znany schemat - bez zapytań
+do sqlite_master / PRAGMA table_info.
+
+Dodanie migracji: nowa funkcja _mNNN_* + wpis na końcu SCHEMA_MIGRATIONS.
+Nigdy nie zmieniaj numerów ani kolejności istniejących wpisów.
+"""
+
+import sqlite3
+
+import structure
+
+
+def _existing_columns(cur, table):
+    """Nazwy kolumn tabeli (tylko w migracjach - nie na gorących ścieżkach)"""
+    cur.execute(f"PRAGMA table_info({table})")
+    return {row[1] for row in cur.fetchall()}
+
+
+def _add_missing_columns(cur, table, columns):
+    """
+    ALTER TABLE ... ADD COLUMN dla kolumn, których jeszcze nie ma
+
+    Returns:
+        list: nazwy dodanych kolumn
+    """
+    existing = _existing_columns(cur, table)
+    added = []
+    for column_name, column_def in columns:
+        if column_name not in existing:
+            cur.execute(f"ALTER TABLE {table} ADD COLUMN {column_name} {column_def}")
+            added.append(column_name)
+    return added
+
+
+def _require(ok, what):
+    # Funkcje structure.create_* zwracają False (i same pokazują st.error)
+    if not ok:
+        raise RuntimeError(f"Nie udało się utworzyć: {what}")
+
+
+# ================================
+# MIGRACJE
+# ================================
+
+def _m001_base_tables(conn):
+    """Tabele podstawowe (punkty 6-10)"""
+    for table, ok in structure.create_all_tables(conn).items():
+        _require(ok, table)
+
+
+def _m002_options_cc_columns(conn):
+    """Prowizje i powiązania w options_cc (dawniej migration.py)"""
+    cur = conn.cursor()
+    added = _add_missing_columns(cur, 'options_cc', [
+        ("broker_fee_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("reg_fee_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("broker_fee_sell_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("reg_fee_sell_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("broker_fee_buyback_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("reg_fee_buyback_usd", "DECIMAL(10,2) DEFAULT 0.00"),
+        ("total_fees_sell_pln", "DECIMAL(15,2) DEFAULT 0.00"),
+        ("total_fees_buyback_pln", "DECIMAL(15,2) DEFAULT 0.00"),
+        ("net_premium_pln", "DECIMAL(15,2)"),
+        ("premium_buyback_pln", "DECIMAL(15,2)"),
+        ("pl_usd", "DECIMAL(15,2) DEFAULT 0.00"),
+        ("parent_cc_id", "INTEGER"),
+    ])
+    if 'net_premium_pln' in added:
+        # Jak w migration.py: premium netto = premium brutto dla starych rekordów
+        cur.execute("""
+            UPDATE options_cc
+            SET net_premium_pln = premium_sell_pln,
+                total_fees_sell_pln = 0.00
+            WHERE net_premium_pln IS NULL
+        """)
+
+
+def _m003_cc_reservations(conn):
+    """Rezerwacje akcji pod CC: cc_lot_mappings (autorytatywna) + options_cc_reservations (legacy)"""
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS cc_lot_mappings (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cc_id INTEGER NOT NULL,
+            lot_id INTEGER NOT NULL,
+            shares_reserved INTEGER NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (cc_id) REFERENCES options_cc (id) ON DELETE CASCADE,
+            FOREIGN KEY (lot_id) REFERENCES lots (id) ON DELETE CASCADE,
+            UNIQUE(cc_id, lot_id)
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS options_cc_reservations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            cc_id INTEGER NOT NULL,
+            lot_id INTEGER NOT NULL,
+            qty_reserved INTEGER NOT NULL,
+            FOREIGN KEY(cc_id) REFERENCES options_cc(id) ON DELETE CASCADE,
+            FOREIGN KEY(lot_id) REFERENCES lots(id)
+        )
+    """)
+    # Zwolnienie rezerwacji legacy przy zamknięciu / usunięciu CC
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_cc_release_reservations_on_status_update
+        AFTER UPDATE OF status ON options_cc
+        WHEN NEW.status IN ('bought_back','expired','assigned')
+        BEGIN
+          DELETE FROM options_cc_reservations WHERE cc_id = NEW.id;
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_cc_release_reservations_on_cc_delete
+        AFTER DELETE ON options_cc
+        BEGIN
+          DELETE FROM options_cc_reservations WHERE cc_id = OLD.id;
+        END
+    """)
+
+
+def _m004_cc_chains(conn):
+    """CC Chains: cc_chains + options_cc.chain_id (dawniej migrate_options_cc_add_chain_id)"""
+    _require(structure.create_cc_chains_table(conn), 'cc_chains')
+    cur = conn.cursor()
+    # Kolumny statystyk dokładane wcześniej w update_chain_statistics
+    _add_missing_columns(cur, 'cc_chains', [
+        ("end_date", "DATE"),
+        ("updated_at", "TIMESTAMP"),
+        ("status", "TEXT"),
+        ("cc_count", "INTEGER"),
+        ("total_contracts", "INTEGER"),
+        ("total_premium_pln", "REAL"),
+        ("total_premium_usd", "REAL"),
+        ("total_pl_pln", "REAL"),
+        ("avg_duration_days", "REAL"),
+        ("success_rate", "REAL"),
+        ("annualized_return", "REAL"),
+    ])
+    _add_missing_columns(cur, 'options_cc', [
+        ("chain_id", "INTEGER REFERENCES cc_chains(id) ON DELETE SET NULL"),
+    ])
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_options_cc_chain_id
+        ON options_cc(chain_id)
+    """)
+
+
+def _m005_fx_refresh(conn):
+    """Kursy NBP: punkty kontrolne backfillu + watermark odświeżania w app_info"""
+    _require(structure.create_fx_backfill_checkpoints_table(conn), 'fx_backfill_checkpoints')
+    _add_missing_columns(conn.cursor(), 'app_info', [
+        ("fx_refreshed_at", "TIMESTAMP"),
+        ("fx_covered_through", "DATE"),
+        ("fx_refresh_status", "TEXT"),
+    ])
+
+
+def _m006_hot_query_indexes(conn):
+    """
+    Indeksy gorących zapytań (audyt utils/index_advisor, benchmarks/bench_indexes.py)
+
+    Tylko kandydaci, którzy na syntetycznej bazie 100k LOT-ów dają realny zysk:
+    podzapytania rezerwacji per LOT w get_lots_for_tax_fifo, zwalnianie
+    rezerwacji legacy per CC oraz predykat status/open_date/close_date otwartych CC.
+    cc_lot_mappings(cc_id) pokrywa już UNIQUE(cc_id, lot_id).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_cc_lot_mappings_lot
+        ON cc_lot_mappings(lot_id, cc_id, shares_reserved)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_options_cc_reservations_cc
+        ON options_cc_reservations(cc_id, lot_id, qty_reserved)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_options_cc_reservations_lot
+        ON options_cc_reservations(lot_id, cc_id, qty_reserved)
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_options_cc_status_dates
+        ON options_cc(status, open_date, close_date)
+    """)
+
+
+# Pozycje LOT-ów: przeliczenie liczników jednego LOT-u (używane w triggerach
+# i przy przebudowie). Rezerwacje liczone tylko dla CC ze statusem 'open'.
+_LOT_SOLD_SQL = """
+    (SELECT COALESCE(SUM(sts.qty_from_lot), 0)
+     FROM stock_trade_splits sts WHERE sts.lot_id = {lot})
+"""
+_LOT_RESERVED_SQL = """
+    (SELECT COALESCE(SUM(m.shares_reserved), 0)
+     FROM cc_lot_mappings m JOIN options_cc oc ON oc.id = m.cc_id
+     WHERE m.lot_id = {lot} AND oc.status = 'open')
+"""
+_LOT_RESERVED_LEGACY_SQL = """
+    (SELECT COALESCE(SUM(r.qty_reserved), 0)
+     FROM options_cc_reservations r JOIN options_cc oc ON oc.id = r.cc_id
+     WHERE r.lot_id = {lot} AND oc.status = 'open')
+"""
+
+
+def rebuild_lot_positions(conn):
+    """
+    Pełne przeliczenie lot_positions z tabel źródłowych (bez commita)
+
+    Args:
+        conn: sqlite3.Connection
+
+    Returns:
+        int: liczba LOT-ów w lot_positions
+    """
+    cur = conn.cursor()
+    cur.execute("DELETE FROM lot_positions")
+    cur.execute(f"""
+        INSERT INTO lot_positions (lot_id, qty_sold, qty_reserved, qty_reserved_legacy)
+        SELECT l.id,
+               {_LOT_SOLD_SQL.format(lot='l.id')},
+               {_LOT_RESERVED_SQL.format(lot='l.id')},
+               {_LOT_RESERVED_LEGACY_SQL.format(lot='l.id')}
+        FROM lots l
+    """)
+    return cur.rowcount
+
+
+def _lot_positions_refresh(column, sql, lot):
+    """Ciało triggera: przeliczenie jednej kolumny lot_positions dla LOT-u"""
+    return f"""
+        UPDATE lot_positions
+        SET {column} = {sql.format(lot=lot)},
+            updated_at = CURRENT_TIMESTAMP
+        WHERE lot_id = {lot};
+    """
+
+
+def _m007_lot_positions(conn):
+    """
+    Zmaterializowane pozycje LOT-ów (sprzedane / zarezerwowane pod otwarte CC)
+
+    Utrzymywane triggerami na lots, stock_trade_splits, cc_lot_mappings,
+    options_cc_reservations i zmianie options_cc.status. Liczniki są
+    przeliczane dla dotkniętego LOT-u (indeksy z migracji 6), nie inkrementowane,
+    więc nie dryfują przy UPDATE / kaskadach.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS lot_positions (
+            lot_id INTEGER PRIMARY KEY,
+            qty_sold INTEGER NOT NULL DEFAULT 0,
+            qty_reserved INTEGER NOT NULL DEFAULT 0,
+            qty_reserved_legacy INTEGER NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (lot_id) REFERENCES lots (id) ON DELETE CASCADE
+        )
+    """)
+
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_lot_positions_lot_insert
+        AFTER INSERT ON lots
+        BEGIN
+          INSERT OR IGNORE INTO lot_positions (lot_id) VALUES (NEW.id);
+        END
+    """)
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_lot_positions_lot_delete
+        AFTER DELETE ON lots
+        BEGIN
+          DELETE FROM lot_positions WHERE lot_id = OLD.id;
+        END
+    """)
+
+    # Tabele per-LOT: (tabela, kolumna lot_positions, SQL przeliczenia)
+    sources = [
+        ('stock_trade_splits', 'qty_sold', _LOT_SOLD_SQL),
+        ('cc_lot_mappings', 'qty_reserved', _LOT_RESERVED_SQL),
+        ('options_cc_reservations', 'qty_reserved_legacy', _LOT_RESERVED_LEGACY_SQL),
+    ]
+    for table, column, sql in sources:
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_lot_positions_{table}_insert
+            AFTER INSERT ON {table}
+            BEGIN
+              {_lot_positions_refresh(column, sql, 'NEW.lot_id')}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_lot_positions_{table}_delete
+            AFTER DELETE ON {table}
+            BEGIN
+              {_lot_positions_refresh(column, sql, 'OLD.lot_id')}
+            END
+        """)
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_lot_positions_{table}_update
+            AFTER UPDATE ON {table}
+            BEGIN
+              {_lot_positions_refresh(column, sql, 'OLD.lot_id')}
+              {_lot_positions_refresh(column, sql, 'NEW.lot_id')}
+            END
+        """)
+
+    # Zmiana statusu CC: przelicz rezerwacje LOT-ów tego CC
+    # (usunięcie CC obsługują kaskady/trigger legacy → triggery *_delete wyżej)
+    cur.execute(f"""
+        CREATE TRIGGER IF NOT EXISTS trg_lot_positions_cc_status_update
+        AFTER UPDATE OF status ON options_cc
+        WHEN OLD.status IS NOT NEW.status
+        BEGIN
+          UPDATE lot_positions
+          SET qty_reserved = {_LOT_RESERVED_SQL.format(lot='lot_positions.lot_id')},
+              qty_reserved_legacy = {_LOT_RESERVED_LEGACY_SQL.format(lot='lot_positions.lot_id')},
+              updated_at = CURRENT_TIMESTAMP
+          WHERE lot_id IN (
+              SELECT lot_id FROM cc_lot_mappings WHERE cc_id = NEW.id
+              UNION
+              SELECT lot_id FROM options_cc_reservations WHERE cc_id = NEW.id
+          );
+        END
+    """)
+
+    rebuild_lot_positions(conn)
+
+
+# Tabele z licznikiem zapisów w table_versions (klucz cache agregatów w db.py)
+VERSIONED_TABLES = [
+    'lots', 'lot_positions', 'stock_trades', 'stock_trade_splits',
+    'options_cc', 'cc_lot_mappings', 'options_cc_reservations',
+    'cc_chains', 'cashflows',
+]
+
+
+def _m008_table_versions(conn):
+    """
+    Liczniki zapisów per tabela (table_versions) podbijane triggerami
+
+    Tani token zmiany danych dla cache wyników (utils/result_cache): odczyt
+    kilku wierszy zamiast przeliczania agregatu. W przeciwieństwie do
+    PRAGMA data_version widzi też zapisy z tego samego połączenia (pula).
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS table_versions (
+            table_name TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        )
+    """)
+    for table in VERSIONED_TABLES:
+        _add_version_triggers(cur, table)
+
+
+def _add_version_triggers(cur, table):
+    """Wiersz w table_versions + triggery podbijające licznik przy każdym zapisie"""
+    cur.execute("INSERT OR IGNORE INTO table_versions (table_name, version) VALUES (?, 0)", (table,))
+    for event in ('INSERT', 'UPDATE', 'DELETE'):
+        cur.execute(f"""
+            CREATE TRIGGER IF NOT EXISTS trg_table_versions_{table}_{event.lower()}
+            AFTER {event} ON {table}
+            BEGIN
+              UPDATE table_versions SET version = version + 1 WHERE table_name = '{table}';
+            END
+        """)
+
+
+# Kwoty jako liczby całkowite (utils/money): kolumna źródłowa → (nazwa, skala)
+MINOR_UNIT_COLUMNS = {
+    'lots': [('cost_pln', 'cost_pln_cents', 100), ('broker_fee_usd', 'broker_fee_usd_cents', 100),
+             ('reg_fee_usd', 'reg_fee_usd_cents', 100), ('fx_rate', 'fx_rate_micro', 1000000)],
+    'stock_trades': [('proceeds_pln', 'proceeds_pln_cents', 100), ('cost_pln', 'cost_pln_cents', 100),
+                     ('pl_pln', 'pl_pln_cents', 100), ('fx_rate', 'fx_rate_micro', 1000000)],
+    'stock_trade_splits': [('cost_part_pln', 'cost_part_pln_cents', 100),
+                           ('commission_part_usd', 'commission_part_usd_cents', 100),
+                           ('commission_part_pln', 'commission_part_pln_cents', 100)],
+    'options_cc': [('premium_sell_pln', 'premium_sell_pln_cents', 100),
+                   ('premium_buyback_pln', 'premium_buyback_pln_cents', 100),
+                   ('pl_pln', 'pl_pln_cents', 100),
+                   ('fx_open', 'fx_open_micro', 1000000), ('fx_close', 'fx_close_micro', 1000000)],
+    'cashflows': [('amount_usd', 'amount_usd_cents', 100), ('amount_pln', 'amount_pln_cents', 100),
+                  ('fx_rate', 'fx_rate_micro', 1000000)],
+}
+
+
+def _minor_unit_column_sql(table, source, name, scale):
+    """
+    ADD COLUMN kolumny generowanej *_cents / *_micro
+
+    Podwójne ROUND: iloczyn src * scale na REAL gubi połówki (1.005 * 100 =
+    100.4999...), więc najpierw zaokrąglenie do 6 miejsc - wynik zgodny z
+    utils.money.to_cents / fx_to_micro (Decimal(str(x)), ROUND_HALF_UP).
+    """
+    return f"""
+        ALTER TABLE {table} ADD COLUMN {name} INTEGER
+        GENERATED ALWAYS AS (CAST(ROUND(ROUND({source} * {scale}, 6)) AS INTEGER)) VIRTUAL
+    """
+
+
+def _m009_minor_unit_columns(conn):
+    """
+    Kwoty w groszach/centach i kursy w mikrojednostkach jako kolumny generowane
+
+    Kolumny VIRTUAL wyliczane z istniejących DECIMAL (REAL) - zapisujący kod
+    się nie zmienia, a agregaty liczą dokładne SUM() na liczbach całkowitych.
+    PRAGMA table_info nie pokazuje kolumn generowanych - stąd table_xinfo.
+    """
+    cur = conn.cursor()
+    for table, columns in MINOR_UNIT_COLUMNS.items():
+        cur.execute(f"PRAGMA table_xinfo({table})")
+        existing = {row[1] for row in cur.fetchall()}
+        for source, name, scale in columns:
+            if name in existing:
+                continue
+            cur.execute(_minor_unit_column_sql(table, source, name, scale))
+
+
+def _m010_db_maintenance(conn):
+    """
+    Stan zadań utrzymaniowych bazy (db/maintenance.py): ostatnie uruchomienie,
+    czas, wynik, liczba zapisów (table_versions) w chwili uruchomienia
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS db_maintenance (
+            task TEXT PRIMARY KEY,
+            last_run_at TEXT,
+            duration_ms REAL,
+            status TEXT,
+            details TEXT,
+            writes_at_run INTEGER DEFAULT 0
+        )
+    """)
+
+
+def _m011_fx_rates_version(conn):
+    """
+    Licznik zapisów fx_rates w table_versions - indeks kursów w pamięci
+    (db/fx.py) wykrywa po nim zapisy z innych procesów i przeładowuje się
+    """
+    _add_version_triggers(conn.cursor(), 'fx_rates')
+
+
+def _m012_minor_unit_rounding(conn):
+    """
+    Kolumny *_cents / *_micro z migracji 9 od nowa z wyrażeniem zgodnym
+    z utils.money (pojedyncze ROUND dawało 100 zamiast 101 dla 1.005)
+
+    Kolumny VIRTUAL bez indeksów - DROP + ADD nie przepisuje tabel.
+    """
+    cur = conn.cursor()
+    for table, columns in MINOR_UNIT_COLUMNS.items():
+        cur.execute(f"PRAGMA table_xinfo({table})")
+        existing = {row[1] for row in cur.fetchall()}
+        for source, name, scale in columns:
+            if name in existing:
+                cur.execute(f"ALTER TABLE {table} DROP COLUMN {name}")
+            cur.execute(_minor_unit_column_sql(table, source, name, scale))
+
+
+# (wersja, opis, funkcja) - wyłącznie dopisywanie na końcu
+SCHEMA_MIGRATIONS = [
+    (1, "Tabele podstawowe", _m001_base_tables),
+    (2, "Prowizje i powiązania w options_cc", _m002_options_cc_columns),
+    (3, "Tabele rezerwacji CC + triggery zwalniające", _m003_cc_reservations),
+    (4, "CC Chains + options_cc.chain_id", _m004_cc_chains),
+    (5, "Punkty kontrolne backfillu NBP + watermark FX", _m005_fx_refresh),
+    (6, "Indeksy gorących zapytań", _m006_hot_query_indexes),
+    (7, "Zmaterializowane pozycje LOT-ów (lot_positions) + triggery", _m007_lot_positions),
+    (8, "Liczniki zapisów tabel (table_versions) dla cache agregatów", _m008_table_versions),
+    (9, "Kwoty w jednostkach minimalnych (kolumny *_cents / *_micro)", _m009_minor_unit_columns),
+    (10, "Stan zadań utrzymaniowych bazy (db_maintenance)", _m010_db_maintenance),
+    (11, "Licznik zapisów fx_rates dla indeksu kursów w pamięci", _m011_fx_rates_version),
+    (12, "Zaokrąglenie kolumn *_cents / *_micro zgodne z utils.money", _m012_minor_unit_rounding),
+]
+
+SCHEMA_VERSION = SCHEMA_MIGRATIONS[-1][0]
+
+
+# ================================
+# RUNNER
+# ================================
+
+def get_schema_version(conn):
+    """
+    Wersja schematu zapisana w app_info (0 = baza sprzed rejestru migracji)
+
+    Args:
+        conn: sqlite3.Connection
+    """
+    try:
+        row = conn.execute("SELECT schema_version FROM app_info ORDER BY id DESC LIMIT 1").fetchone()
+    except sqlite3.OperationalError:
+        # Brak kolumny schema_version - baza sprzed rejestru migracji
+        return 0
+    return int(row[0] or 0) if row else 0
+
+
+def _set_schema_version(conn, version):
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE app_info
+        SET schema_version = ?, last_updated = datetime('now')
+        WHERE id = (SELECT MAX(id) FROM app_info)
+    """, (version,))
+
+
+def run_migrations(conn):
+    """
+    Zastosowanie brakujących migracji (po kolei, wersja zapisywana po każdej)
+
+    Args:
+        conn: sqlite3.Connection z istniejącą tabelą app_info (z rekordem)
+
+    Returns:
+        dict: {'from_version', 'to_version', 'applied': [(wersja, opis), ...]}
+    """
+    cur = conn.cursor()
+    _add_missing_columns(cur, 'app_info', [("schema_version", "INTEGER DEFAULT 0")])
+    conn.commit()
+
+    current = get_schema_version(conn)
+    applied = []
+    for version, description, migrate in SCHEMA_MIGRATIONS:
+        if version <= current:
+            continue
+        try:
+            migrate(conn)
+            _set_schema_version(conn, version)
+            conn.commit()
+        except Exception as e:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise RuntimeError(f"Migracja {version} ({description}) nieudana: {e}") from e
+        applied.append((version, description))
+
+    return {
+        'from_version': current,
+        'to_version': applied[-1][0] if applied else current,
+        'applied': applied,
+    }
@@ -5,7 +5,6 @@ Punkt 6: Tabela fx_rates + funkcje tworzenia tabel
 
 import sqlite3
 from datetime import datetime
-import streamlit as st
 
 def create_fx_rates_table(conn):
     """
@@ -47,6 +46,7 @@ def create_fx_rates_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli fx_rates: {e}")
         return False
 
@@ -97,6 +97,7 @@ def get_table_info(conn, table_name):
         cursor.execute(f"PRAGMA table_info({table_name})")
         return cursor.fetchall()
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd pobierania informacji o tabeli {table_name}: {e}")
         return []
 
@@ -119,6 +120,7 @@ def table_exists(conn, table_name):
         """, (table_name,))
         return cursor.fetchone()[0] > 0
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd sprawdzania istnienia tabeli {table_name}: {e}")
         return False
 
@@ -141,6 +143,7 @@ def get_all_tables(conn):
         """)
         return [row[0] for row in cursor.fetchall()]
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd pobierania listy tabel: {e}")
         return []
 
@@ -224,6 +227,7 @@ def create_cashflows_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli cashflows: {e}")
         return False
 
@@ -278,6 +282,7 @@ def create_lots_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli lots: {e}")
         return False
 # DODAJ te funkcje do structure.py
@@ -327,6 +332,7 @@ def create_stock_trades_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli stock_trades: {e}")
         return False
 
@@ -373,6 +379,7 @@ def create_stock_trade_splits_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli stock_trade_splits: {e}")
         return False
 
@@ -471,6 +478,7 @@ def create_options_cc_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli options_cc: {e}")
         return False
 
@@ -517,6 +525,7 @@ def create_dividends_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli dividends: {e}")
         return False
 
@@ -560,6 +569,7 @@ def create_market_prices_table(conn):
         return True
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd tworzenia tabeli market_prices: {e}")
         return False
 
@@ -644,6 +654,7 @@ def get_database_schema_info(conn):
         return schema_info
         
     except Exception as e:
+        import streamlit as st
         st.error(f"Błąd pobierania schematu: {e}")
         return {}
 
@@ -714,4 +725,41 @@ def create_cc_chains_table(conn):
         return False
 
 
-
+def create_fx_backfill_checkpoints_table(conn):
+    """
+    Utworzenie tabeli fx_backfill_checkpoints - punkty kontrolne backfillu NBP
+    
+    Jeden wiersz na zadanie (waluta + zakres). next_date = pierwszy dzień,
+    od którego przerwany backfill zostanie wznowiony.
+    
+    Args:
+        conn: sqlite3.Connection
+    
+    Returns:
+        bool: True jeśli sukces
+    """
+    try:
+        cursor = conn.cursor()
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS fx_backfill_checkpoints (
+                job_key TEXT PRIMARY KEY,          -- np. "USD:2020-01-01:2024-12-31"
+                code TEXT NOT NULL,
+                start_date DATE NOT NULL,
+                end_date DATE NOT NULL,
+                next_date DATE NOT NULL,
+                status TEXT NOT NULL DEFAULT 'running',  -- running, done, failed
+                requests INTEGER DEFAULT 0,
+                rates_saved INTEGER DEFAULT 0,
+                last_error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        
+        conn.commit()
+        return True
+        
+    except Exception as e:
+        import streamlit as st
+        st.error(f"Błąd tworzenia tabeli fx_backfill_checkpoints: {e}")
+        return False
@@ -11,6 +11,11 @@ from .formatting import (
     format_number,
     format_fx_rate
 )
+from .business_days import (
+    is_business_day,
+    previous_business_day,
+    business_days_between
+)
 
 # Eksport głównych funkcji na poziomie pakietu
 __all__ = [
@@ -19,5 +24,8 @@ __all__ = [
     'format_percentage', 
     'format_date',
     'format_number',
-    'format_fx_rate'
-]
\ No newline at end of file
+    'format_fx_rate',
+    'is_business_day',
+    'previous_business_day',
+    'business_days_between'
+]
@@ -0,0 +1,198 @@
+"""
+Utils - Kalendarz dni roboczych NBP (święta polskie)
+Wielkanoc liczona algorytmicznie dla dowolnego roku, indeks dni roboczych
+budowany raz i rozszerzany w miarę potrzeby.
+"""
+
+import threading
+from array import array
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Optional
+
+# Domyślny zakres indeksu (rozszerzany automatycznie poza nim)
+DEFAULT_FIRST_YEAR = 2000
+DEFAULT_LAST_YEAR = 2040
+
+
+def easter_sunday(year: int) -> date:
+    """
+    Data Niedzieli Wielkanocnej (kalendarz gregoriański, algorytm Meeusa/Jonesa/Butchera)
+
+    Args:
+        year: Rok
+
+    Returns:
+        date: Niedziela Wielkanocna
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+@lru_cache(maxsize=None)
+def polish_holidays(year: int) -> FrozenSet[date]:
+    """
+    Ustawowe dni wolne w Polsce (dni bez publikacji tabeli A NBP)
+
+    Args:
+        year: Rok
+
+    Returns:
+        frozenset: Daty świąt
+    """
+    easter = easter_sunday(year)
+    holidays = {
+        date(year, 1, 1),    # Nowy Rok
+        date(year, 5, 1),    # Święto Pracy
+        date(year, 5, 3),    # Święto Konstytucji
+        date(year, 8, 15),   # Wniebowzięcie NMP
+        date(year, 11, 1),   # Wszystkich Świętych
+        date(year, 11, 11),  # Dzień Niepodległości
+        date(year, 12, 25),  # Boże Narodzenie
+        date(year, 12, 26),  # Drugi dzień Bożego Narodzenia
+        easter,                          # Wielkanoc
+        easter + timedelta(days=1),      # Poniedziałek Wielkanocny
+        easter + timedelta(days=49),     # Zielone Świątki
+        easter + timedelta(days=60),     # Boże Ciało
+    }
+    if year >= 2011:
+        holidays.add(date(year, 1, 6))    # Trzech Króli (od 2011)
+    if year >= 2025:
+        holidays.add(date(year, 12, 24))  # Wigilia (od 2025)
+    return frozenset(holidays)
+
+
+class BusinessDayIndex:
+    """
+    Indeks dni roboczych dla ciągłego zakresu lat
+
+    - _flags: bytearray 0/1 per dzień (bitmapa dni roboczych)
+    - _rank: liczba dni roboczych <= danego dnia (skumulowana)
+    - _days: ordinale kolejnych dni roboczych
+
+    Dzięki temu is_business_day i previous_business_day to O(1).
+    """
+
+    def __init__(self, first_year: int = DEFAULT_FIRST_YEAR, last_year: int = DEFAULT_LAST_YEAR):
+        self._lock = threading.Lock()
+        self._build(first_year, last_year)
+
+    def _build(self, first_year: int, last_year: int):
+        base = date(first_year, 1, 1).toordinal()
+        end = date(last_year, 12, 31).toordinal()
+
+        holidays = set()
+        for year in range(first_year, last_year + 1):
+            holidays.update(d.toordinal() for d in polish_holidays(year))
+
+        flags = bytearray(end - base + 1)
+        rank = array('l')
+        days = array('l')
+        count = 0
+        for ordinal in range(base, end + 1):
+            # ordinal 1 (0001-01-01) to poniedziałek → (ordinal - 1) % 7 = weekday()
+            if (ordinal - 1) % 7 < 5 and ordinal not in holidays:
+                flags[ordinal - base] = 1
+                days.append(ordinal)
+                count += 1
+            rank.append(count)
+
+        self.first_year, self.last_year = first_year, last_year
+        self._base, self._end = base, end
+        self._flags, self._rank, self._days = flags, rank, days
+
+    def _ensure(self, ordinal: int):
+        if self._base <= ordinal <= self._end:
+            return
+        with self._lock:
+            year = date.fromordinal(ordinal).year
+            if not (self._base <= ordinal <= self._end):
+                self._build(min(self.first_year, year - 1), max(self.last_year, year + 1))
+
+    def is_business_day(self, check_date: date) -> bool:
+        """Czy data jest dniem publikacji kursów NBP"""
+        ordinal = check_date.toordinal()
+        self._ensure(ordinal)
+        return bool(self._flags[ordinal - self._base])
+
+    def previous_business_day(self, check_date: date, n: int = 1) -> date:
+        """
+        n-ty dzień roboczy przed datą (ściśle wcześniejszy)
+
+        Args:
+            check_date: Data odniesienia
+            n: Który dzień roboczy wstecz (1 = ostatni przed datą)
+        """
+        if n < 1:
+            raise ValueError("n musi być >= 1")
+        ordinal = check_date.toordinal() - 1
+        self._ensure(ordinal)
+        while True:
+            position = self._rank[ordinal - self._base] - n
+            if position >= 0:
+                return date.fromordinal(self._days[position])
+            # Za mało dni roboczych w indeksie - rozszerz wstecz
+            self._ensure(self._base - 366)
+
+    def business_days_between(self, start_date: date, end_date: date) -> int:
+        """Liczba dni roboczych w zakresie [start_date, end_date]"""
+        if end_date < start_date:
+            return 0
+        start, end = start_date.toordinal(), end_date.toordinal()
+        self._ensure(start - 1)
+        self._ensure(end)
+        return self._rank[end - self._base] - self._rank[start - 1 - self._base]
+
+    def business_days(self, start_date: date, end_date: date):
+        """Lista dni roboczych w zakresie [start_date, end_date]"""
+        if end_date < start_date:
+            return []
+        start, end = start_date.toordinal(), end_date.toordinal()
+        self._ensure(start - 1)
+        self._ensure(end)
+        lo = self._rank[start - 1 - self._base]
+        hi = self._rank[end - self._base]
+        return [date.fromordinal(o) for o in self._days[lo:hi]]
+
+
+_index: Optional[BusinessDayIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_business_day_index() -> BusinessDayIndex:
+    """Wspólny (procesowy) indeks dni roboczych"""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = BusinessDayIndex()
+    return _index
+
+
+def is_business_day(check_date: date) -> bool:
+    """Czy data to dzień roboczy NBP (nie weekend, nie święto) - O(1)"""
+    return get_business_day_index().is_business_day(check_date)
+
+
+def previous_business_day(check_date: date, n: int = 1) -> date:
+    """n-ty dzień roboczy NBP przed datą - O(1)"""
+    return get_business_day_index().previous_business_day(check_date, n)
+
+
+def business_days_between(start_date: date, end_date: date) -> int:
+    """Liczba dni roboczych NBP w zakresie (włącznie) - O(1)"""
+    return get_business_day_index().business_days_between(start_date, end_date)
+
+
+def business_days(start_date: date, end_date: date):
+    """Lista dni roboczych NBP w zakresie (włącznie)"""
+    return get_business_day_index().business_days(start_date, end_date)
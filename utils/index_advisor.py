@@ -0,0 +1,303 @@
+"""
+Utils - Doradca indeksów: audyt EXPLAIN QUERY PLAN dla gorących zapytań aplikacji
+Katalog HOT_QUERIES to kopie rzeczywistych zapytań z db.py (z przykładowymi
+parametrami). Audyt oznacza pełne skany tabel i tymczasowe B-drzewa, proponuje
+indeksy z CANDIDATE_INDEXES i mierzy ich zysk w transakcji wycofywanej na końcu
+(baza nie jest zmieniana).
+"""
+
+import re
+import time
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+
+def _today() -> str:
+    return date.today().isoformat()
+
+
+def _in_two_weeks() -> str:
+    return (date.today() + timedelta(days=14)).isoformat()
+
+
+# Przykładowe tickery dla zapytań z listą IN (...)
+SAMPLE_TICKERS = ('AAPL', 'MSFT', 'WOLF')
+
+
+# name, source (funkcja w db.py), sql, params (callable → krotka, bo "dziś" się zmienia)
+HOT_QUERIES = [
+    {
+        'name': 'portfolio_open_cc',
+        'source': 'db.get_portfolio_summary',
+        'sql': """
+            SELECT UPPER(ticker) AS ticker, COUNT(*) AS open_cc_count,
+                   COALESCE(SUM(contracts),0) AS total_contracts
+            FROM options_cc
+            WHERE status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+              AND UPPER(ticker) IN (?, ?, ?)
+            GROUP BY UPPER(ticker)
+        """,
+        'params': lambda: (_today(), _today(), *SAMPLE_TICKERS),
+    },
+    {
+        'name': 'portfolio_lots_positions',
+        'source': 'db.get_portfolio_summary',
+        'sql': """
+            SELECT UPPER(l.ticker) AS ticker, COALESCE(SUM(l.quantity_total), 0) AS total_shares,
+                   COALESCE(SUM(p.qty_reserved), 0) AS reserved_mappings,
+                   COALESCE(SUM(p.qty_reserved_legacy), 0) AS reserved_legacy
+            FROM lots l
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
+            GROUP BY UPPER(l.ticker)
+        """,
+        'params': lambda: (),
+    },
+    {
+        'name': 'cc_expiry_alerts',
+        'source': 'db.get_cc_expiry_alerts',
+        'sql': """
+            SELECT id, ticker, contracts, strike_usd, expiry_date,
+                   CAST(julianday(expiry_date) - julianday(?) AS INTEGER) AS days_to_expiry
+            FROM options_cc
+            WHERE status = 'open'
+              AND open_date <= ?
+              AND (close_date IS NULL OR close_date > ?)
+              AND expiry_date >= ?
+              AND expiry_date <= ?
+            ORDER BY expiry_date ASC, id ASC
+        """,
+        'params': lambda: (_today(), _today(), _today(), _today(), _in_two_weeks()),
+    },
+    {
+        'name': 'timeline_lots',
+        'source': 'db.timeline.ShareTimeline.load',
+        'sql': """
+            SELECT id, quantity_total, buy_date, buy_price_usd, fx_rate, cost_pln
+            FROM lots
+            WHERE ticker = ?
+            ORDER BY buy_date ASC, id ASC
+        """,
+        'params': lambda: ('AAPL',),
+    },
+    {
+        'name': 'timeline_sales',
+        'source': 'db.timeline.ShareTimeline.load',
+        'sql': """
+            SELECT sts.lot_id, st.sell_date, COALESCE(SUM(sts.qty_from_lot), 0) AS qty
+            FROM lots l
+            CROSS JOIN stock_trade_splits sts ON sts.lot_id = l.id
+            JOIN stock_trades st ON st.id = sts.trade_id
+            WHERE l.ticker = ? AND st.sell_date IS NOT NULL
+            GROUP BY sts.lot_id, st.sell_date
+        """,
+        'params': lambda: ('AAPL',),
+    },
+    {
+        'name': 'timeline_reserved_mappings',
+        'source': 'db.timeline.ShareTimeline.load',
+        'sql': """
+            SELECT r.lot_id, l.buy_date, cc.open_date, cc.close_date,
+                   COALESCE(SUM(r.shares_reserved), 0) AS qty
+            FROM cc_lot_mappings r
+            JOIN options_cc cc ON cc.id = r.cc_id
+            JOIN lots l ON l.id = r.lot_id
+            WHERE cc.ticker = ?
+            GROUP BY r.lot_id, cc.open_date, cc.close_date
+        """,
+        'params': lambda: ('AAPL',),
+    },
+    {
+        'name': 'timeline_reserved_legacy',
+        'source': 'db.timeline.ShareTimeline.load',
+        'sql': """
+            SELECT r.lot_id, l.buy_date, cc.open_date, cc.close_date,
+                   COALESCE(SUM(r.qty_reserved), 0) AS qty
+            FROM options_cc_reservations r
+            JOIN options_cc cc ON cc.id = r.cc_id
+            JOIN lots l ON l.id = r.lot_id
+            WHERE cc.ticker = ?
+            GROUP BY r.lot_id, cc.open_date, cc.close_date
+        """,
+        'params': lambda: ('AAPL',),
+    },
+    {
+        'name': 'tax_fifo_lots',
+        'source': 'db.get_lots_for_tax_fifo',
+        'sql': """
+            SELECT l.id, l.quantity_total, COALESCE(p.qty_sold, 0) AS qty_sold_real,
+                   COALESCE(p.qty_reserved, 0) AS qty_reserved_new,
+                   COALESCE(p.qty_reserved_legacy, 0) AS qty_reserved_old
+            FROM lots l
+            LEFT JOIN lot_positions p ON p.lot_id = l.id
+            WHERE l.ticker = ?
+            ORDER BY l.buy_date ASC, l.id ASC
+        """,
+        'params': lambda: ('AAPL',),
+    },
+    {
+        'name': 'lot_positions_refresh_reserved',
+        'source': 'schema_migrations trg_lot_positions_cc_lot_mappings_*',
+        'sql': """
+            SELECT COALESCE(SUM(m.shares_reserved), 0)
+            FROM cc_lot_mappings m JOIN options_cc oc ON oc.id = m.cc_id
+            WHERE m.lot_id = ? AND oc.status = 'open'
+        """,
+        'params': lambda: (1,),
+    },
+    {
+        'name': 'release_mappings_for_cc',
+        'source': 'db.buyback_covered_call_with_fees',
+        'sql': "SELECT id, lot_id, shares_reserved FROM cc_lot_mappings WHERE cc_id = ? ORDER BY id",
+        'params': lambda: (1,),
+    },
+    {
+        'name': 'release_legacy_for_cc',
+        'source': 'db.buyback_covered_call_with_fees',
+        'sql': "SELECT id, lot_id, qty_reserved FROM options_cc_reservations WHERE cc_id = ? ORDER BY id",
+        'params': lambda: (1,),
+    },
+]
+
+
+# Indeksy-kandydaci: name → (tabela, definicja). Część jest wysyłana migracją
+# schematu (schema_migrations) - audyt pokazuje wtedy, że już istnieją.
+CANDIDATE_INDEXES = {
+    'idx_cc_lot_mappings_cc': ('cc_lot_mappings', "cc_lot_mappings(cc_id, lot_id, shares_reserved)"),
+    'idx_cc_lot_mappings_lot': ('cc_lot_mappings', "cc_lot_mappings(lot_id, cc_id, shares_reserved)"),
+    'idx_options_cc_reservations_cc': ('options_cc_reservations', "options_cc_reservations(cc_id, lot_id, qty_reserved)"),
+    'idx_options_cc_reservations_lot': ('options_cc_reservations', "options_cc_reservations(lot_id, cc_id, qty_reserved)"),
+    'idx_options_cc_status_dates': ('options_cc', "options_cc(status, open_date, close_date)"),
+    'idx_options_cc_status_expiry': ('options_cc', "options_cc(status, expiry_date)"),
+    'idx_stock_trades_date_id': ('stock_trades', "stock_trades(sell_date, id)"),
+}
+
+_FULL_SCAN = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$")
+_TABLE_IN_PLAN = re.compile(r"^(?:SCAN|SEARCH) (?:TABLE )?(\w+)")
+
+
+def explain(conn, sql: str, params=()) -> List[str]:
+    """Wiersze EXPLAIN QUERY PLAN (kolumna detail)"""
+    cur = conn.cursor()
+    cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+    return [row[3] for row in cur.fetchall()]
+
+
+def _existing_indexes(conn) -> set:
+    cur = conn.cursor()
+    cur.execute("SELECT name FROM sqlite_master WHERE type = 'index'")
+    return {row[0] for row in cur.fetchall()}
+
+
+def audit_query(conn, entry: Dict) -> Dict:
+    """
+    Plan jednego zapytania z katalogu + flagi
+
+    Returns:
+        dict: {'name', 'source', 'plan', 'full_scans', 'temp_btrees', 'tables'}
+    """
+    plan = explain(conn, entry['sql'], entry['params']())
+    full_scans, temp_btrees, tables = [], [], set()
+    for detail in plan:
+        match = _TABLE_IN_PLAN.match(detail)
+        if match:
+            tables.add(match.group(1))
+        scan = _FULL_SCAN.match(detail)
+        if scan:
+            full_scans.append(scan.group(1))
+        if 'TEMP B-TREE' in detail:
+            temp_btrees.append(detail)
+    return {
+        'name': entry['name'],
+        'source': entry['source'],
+        'plan': plan,
+        'full_scans': full_scans,
+        'temp_btrees': temp_btrees,
+        'tables': sorted(tables),
+    }
+
+
+def run_audit(conn, queries: Optional[List[Dict]] = None) -> Dict:
+    """
+    Audyt katalogu gorących zapytań
+
+    Returns:
+        dict: {'queries': [audit_query...], 'proposed': [nazwy indeksów], 'existing': [...]}
+    """
+    queries = queries or HOT_QUERIES
+    results = [audit_query(conn, entry) for entry in queries]
+    existing = _existing_indexes(conn)
+
+    flagged_tables = set()
+    for result in results:
+        flagged_tables.update(result['full_scans'])
+        if result['temp_btrees']:
+            flagged_tables.update(result['tables'])
+
+    proposed = [name for name, (table, _) in CANDIDATE_INDEXES.items()
+                if table in flagged_tables and name not in existing]
+    return {
+        'queries': results,
+        'proposed': proposed,
+        'existing': sorted(name for name in CANDIDATE_INDEXES if name in existing),
+    }
+
+
+def _time_queries(conn, queries: List[Dict], repeat: int) -> Dict[str, float]:
+    """Najlepszy z `repeat` czas (ms) każdego zapytania"""
+    timings = {}
+    for entry in queries:
+        params = entry['params']()
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            conn.execute(entry['sql'], params).fetchall()
+            elapsed = (time.perf_counter() - started) * 1000.0
+            best = elapsed if best is None else min(best, elapsed)
+        timings[entry['name']] = best
+    return timings
+
+
+def measure_candidates(conn, candidates: Optional[List[str]] = None,
+                       queries: Optional[List[Dict]] = None, repeat: int = 3) -> List[Dict]:
+    """
+    Zysk z każdego indeksu-kandydata: CREATE INDEX w transakcji → pomiar → ROLLBACK
+
+    Returns:
+        list: [{'index', 'definition', 'build_ms', 'baseline_ms', 'with_index_ms',
+                'speedup', 'best_query', 'best_query_speedup'}]
+    """
+    queries = queries or HOT_QUERIES
+    existing = _existing_indexes(conn)
+    candidates = [name for name in (candidates or CANDIDATE_INDEXES) if name not in existing]
+    if conn.in_transaction:
+        conn.commit()
+
+    baseline = _time_queries(conn, queries, repeat)
+    report = []
+    for name in candidates:
+        _, definition = CANDIDATE_INDEXES[name]
+        conn.execute("BEGIN")
+        try:
+            started = time.perf_counter()
+            conn.execute(f"CREATE INDEX {name} ON {definition}")
+            build_ms = (time.perf_counter() - started) * 1000.0
+            timed = _time_queries(conn, queries, repeat)
+        finally:
+            conn.rollback()
+
+        per_query = {q: baseline[q] / timed[q] for q in baseline if timed[q] > 0}
+        best_query = max(per_query, key=per_query.get) if per_query else None
+        total_before, total_after = sum(baseline.values()), sum(timed.values())
+        report.append({
+            'index': name,
+            'definition': definition,
+            'build_ms': round(build_ms, 2),
+            'baseline_ms': round(total_before, 3),
+            'with_index_ms': round(total_after, 3),
+            'speedup': round(total_before / total_after, 2) if total_after else None,
+            'best_query': best_query,
+            'best_query_speedup': round(per_query[best_query], 2) if best_query else None,
+        })
+    return sorted(report, key=lambda r: r['speedup'] or 0, reverse=True)
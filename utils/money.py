@@ -0,0 +1,72 @@
+"""
+Utils - Kwoty jako liczby całkowite (jednostki minimalne)
+USD/PLN w groszach/centach (x100), kursy FX w mikrojednostkach (x1 000 000).
+W bazie: kolumny *_cents / *_micro (generowane, migracja schematu 9).
+
+Zaokrąglenia: połówki od zera (ROUND_HALF_UP na Decimal(str(x)), czyli na
+kwocie dziesiętnej, a nie na binarnym float: 1.005 → 101 gr). Kolumny
+generowane w bazie liczą to samo (ROUND(ROUND(x * skala, 6)), migracja 12).
+Konwersja float ↔ int tylko na brzegu (UI, zapis); obliczenia na int.
+"""
+
+from decimal import Decimal, ROUND_HALF_UP
+
+CENTS = 100
+FX_SCALE = 1_000_000
+
+
+def div_round(numerator: int, denominator: int) -> int:
+    """Dzielenie całkowite z zaokrągleniem połówek od zera"""
+    if denominator == 0:
+        raise ZeroDivisionError("div_round: dzielnik 0")
+    if denominator < 0:
+        numerator, denominator = -numerator, -denominator
+    quotient, remainder = divmod(abs(numerator), denominator)
+    if remainder * 2 >= denominator:
+        quotient += 1
+    return quotient if numerator >= 0 else -quotient
+
+
+def to_cents(value) -> int:
+    """Kwota (float/str/Decimal/None) → grosze/centy"""
+    if value is None or value == '':
+        return 0
+    return int(Decimal(str(value)).scaleb(2).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_cents(cents) -> float:
+    """Grosze/centy → float do wyświetlenia / zapisu w starych kolumnach"""
+    return (cents or 0) / CENTS
+
+
+def fx_to_micro(rate) -> int:
+    """Kurs FX → mikrojednostki (6 miejsc jak fx_rate DECIMAL(10,6))"""
+    if rate is None or rate == '':
+        return 0
+    return int(Decimal(str(rate)).scaleb(6).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+
+def from_micro(micro) -> float:
+    return (micro or 0) / FX_SCALE
+
+
+def convert_cents(amount_cents: int, fx_micro: int) -> int:
+    """Kwota w centach USD x kurs (mikro) → grosze PLN"""
+    return div_round(amount_cents * fx_micro, FX_SCALE)
+
+
+def prorate_cents(total_cents: int, part: int, whole: int) -> int:
+    """Część kwoty proporcjonalna do part/whole (np. koszt sztuk z LOT-u)"""
+    if whole <= 0:
+        return 0
+    return div_round(total_cents * part, whole)
+
+
+def slice_cents(total_cents: int, start: int, qty: int, whole: int) -> int:
+    """
+    Koszt sztuk [start, start + qty) z LOT-u o koszcie total_cents i whole sztukach
+
+    Kolejne wycinki sumują się dokładnie do total_cents (brak zgubionych groszy
+    przy sprzedaży LOT-u w kilku transakcjach).
+    """
+    return prorate_cents(total_cents, start + qty, whole) - prorate_cents(total_cents, start, whole)
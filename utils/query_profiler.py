@@ -0,0 +1,273 @@
+"""
+Utils - Profiler zapytań SQL (instrumentacja połączeń z db.get_connection)
+Każde zapytanie: znormalizowany tekst, liczba parametrów, czas, liczba zwróconych
+wierszy i funkcja wołająca. Agregacja per rerun Streamlit (begin_run w app.py),
+historia ostatnich przebiegów do podglądu w Dev Tools.
+"""
+
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+# Ile zakończonych przebiegów trzymać w historii
+HISTORY_SIZE = 20
+
+# Próg liczby wywołań tego samego zapytania z jednej funkcji w przebiegu → podejrzenie N+1
+N_PLUS_ONE_MIN_CALLS = 10
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_VALUES_LIST = re.compile(r"(\(\s*\?(?:\s*,\s*\?)*\s*\))(?:\s*,\s*\(\s*\?(?:\s*,\s*\?)*\s*\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(sql: str) -> str:
+    """
+    Postać kanoniczna zapytania do agregacji
+
+    - literały tekstowe/liczbowe → ?
+    - listy IN (?, ?, ...) → (?...)
+    - wielowierszowe VALUES (...), (...) → jeden wiersz + "..."
+    - białe znaki zwinięte do pojedynczej spacji
+    """
+    text = _WHITESPACE.sub(" ", sql or "").strip()
+    text = _STRING_LITERAL.sub("?", text)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _VALUES_LIST.sub(r"\1, ...", text)
+    text = _PLACEHOLDER_LIST.sub("(?...)", text)
+    return text
+
+
+class QueryStats:
+    """Zagregowane statystyki jednego znormalizowanego zapytania"""
+
+    __slots__ = ('sql', 'count', 'total_ms', 'max_ms', 'rows', 'params', 'callers')
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.params = 0
+        self.callers = Counter()
+
+    def as_dict(self) -> Dict:
+        return {
+            'sql': self.sql,
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'avg_ms': round(self.total_ms / self.count, 3) if self.count else 0.0,
+            'max_ms': round(self.max_ms, 3),
+            'rows': self.rows,
+            'params': self.params,
+            'top_caller': self.callers.most_common(1)[0][0] if self.callers else '',
+        }
+
+
+class ProfilerRun:
+    """Jeden przebieg (rerun Streamlit) - zapytania zagregowane po normalized sql"""
+
+    def __init__(self, label: str):
+        self.label = label or '-'
+        self.started_at = datetime.now()
+        self.finished_at = None
+        self.queries = 0
+        self.total_ms = 0.0
+        self.stats: Dict[str, QueryStats] = {}
+
+    def summary(self) -> Dict:
+        return {
+            'label': self.label,
+            'started_at': self.started_at.isoformat(timespec="seconds"),
+            'queries': self.queries,
+            'distinct': len(self.stats),
+            'total_ms': round(self.total_ms, 3),
+        }
+
+
+class QueryProfiler:
+    """
+    Procesowy rejestrator zapytań
+
+    Włączany flagą enabled (Dev Tools) lub zmienną środowiskową CC_SQL_PROFILER=1.
+    Gdy wyłączony, połączenia tworzą zwykłe kursory - brak narzutu.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get('CC_SQL_PROFILER', '') == '1'
+        self._lock = threading.Lock()
+        self._current = ProfilerRun('start')
+        self._history = deque(maxlen=HISTORY_SIZE)
+        self._skip_codes = set()
+
+    # --- przebiegi ---
+
+    def begin_run(self, label: str):
+        """Zamyka bieżący przebieg (jeśli miał zapytania) i otwiera nowy"""
+        with self._lock:
+            if self._current.queries:
+                self._current.finished_at = datetime.now()
+                self._history.append(self._current)
+            self._current = ProfilerRun(label)
+
+    def runs(self) -> List[ProfilerRun]:
+        """Zakończone przebiegi, najnowszy pierwszy"""
+        with self._lock:
+            return list(reversed(self._history))
+
+    def current_run(self) -> ProfilerRun:
+        return self._current
+
+    def reset(self):
+        with self._lock:
+            self._history.clear()
+            self._current = ProfilerRun(self._current.label)
+
+    # --- rejestracja ---
+
+    def skip_frames_of(self, *functions):
+        """Funkcje-pośrednicy (np. Connection.execute), pomijane przy ustalaniu wołającego"""
+        for function in functions:
+            self._skip_codes.add(function.__code__)
+
+    def _caller(self) -> str:
+        frame = sys._getframe(2)
+        while frame is not None and (frame.f_code in self._skip_codes
+                                     or frame.f_code.co_filename == __file__):
+            frame = frame.f_back
+        if frame is None:
+            return '?'
+        module = os.path.splitext(os.path.basename(frame.f_code.co_filename))[0]
+        return f"{module}.{frame.f_code.co_name}"
+
+    def record(self, sql: str, params_count: int, elapsed_ms: float, rows: int = 0) -> QueryStats:
+        normalized = normalize_sql(sql)
+        caller = self._caller()
+        with self._lock:
+            run = self._current
+            stats = run.stats.get(normalized)
+            if stats is None:
+                stats = run.stats[normalized] = QueryStats(normalized)
+            stats.count += 1
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.rows += rows
+            stats.params = max(stats.params, params_count)
+            stats.callers[caller] += 1
+            run.queries += 1
+            run.total_ms += elapsed_ms
+        return stats
+
+    def add_fetch(self, stats: QueryStats, rows: int, elapsed_ms: float):
+        """Doliczenie wierszy i czasu pobierania (krokowanie SELECT-a) do zapytania"""
+        with self._lock:
+            stats.rows += rows
+            stats.total_ms += elapsed_ms
+            self._current.total_ms += elapsed_ms
+
+    # --- raporty ---
+
+    @staticmethod
+    def top_slow(run: ProfilerRun, n: int = 10) -> List[Dict]:
+        ordered = sorted(run.stats.values(), key=lambda s: s.total_ms, reverse=True)
+        return [s.as_dict() for s in ordered[:n]]
+
+    @staticmethod
+    def most_frequent(run: ProfilerRun, n: int = 10) -> List[Dict]:
+        ordered = sorted(run.stats.values(), key=lambda s: s.count, reverse=True)
+        return [s.as_dict() for s in ordered[:n]]
+
+    @staticmethod
+    def suspected_n_plus_one(run: ProfilerRun, min_calls: int = N_PLUS_ONE_MIN_CALLS) -> List[Dict]:
+        """Zapytania wołane wielokrotnie z tej samej funkcji w jednym przebiegu"""
+        suspects = []
+        for stats in run.stats.values():
+            for caller, calls in stats.callers.items():
+                if calls >= min_calls:
+                    suspects.append({
+                        'caller': caller,
+                        'calls': calls,
+                        'sql': stats.sql,
+                        'total_ms': round(stats.total_ms, 3),
+                    })
+        return sorted(suspects, key=lambda s: s['calls'], reverse=True)
+
+
+profiler = QueryProfiler()
+
+
+def _params_count(parameters) -> int:
+    try:
+        return len(parameters)
+    except TypeError:
+        return 0
+
+
+class ProfiledCursor(sqlite3.Cursor):
+    """Kursor rejestrujący execute/executemany i pobierane wiersze w profilerze"""
+
+    _prof_stats: Optional[QueryStats] = None
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self._prof_stats = profiler.record(
+                sql, _params_count(parameters), (time.perf_counter() - started) * 1000.0)
+
+    def executemany(self, sql, seq_of_parameters):
+        seq_of_parameters = list(seq_of_parameters)
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            params = _params_count(seq_of_parameters[0]) if seq_of_parameters else 0
+            self._prof_stats = profiler.record(
+                sql, params, (time.perf_counter() - started) * 1000.0, max(self.rowcount, 0))
+
+    def executescript(self, sql_script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            self._prof_stats = profiler.record(
+                sql_script, 0, (time.perf_counter() - started) * 1000.0)
+
+    def _fetched(self, rows, started):
+        if self._prof_stats is not None:
+            profiler.add_fetch(self._prof_stats, rows, (time.perf_counter() - started) * 1000.0)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(1 if row is not None else 0, started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(len(rows), started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(len(rows), started)
+        return rows
+
+    def __next__(self):
+        started = time.perf_counter()
+        row = super().__next__()
+        self._fetched(1, started)
+        return row
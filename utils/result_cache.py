@@ -0,0 +1,77 @@
+"""
+Utils - Cache wyników kosztownych agregatów (db.py) z kluczem wersji danych
+Wpis pamięta wersje tabel (table_versions, podbijane triggerami), z których
+powstał. Odczyt porównuje je z bieżącymi - zapis do dowolnej z tych tabel
+unieważnia tylko wpisy od niej zależne. LRU z limitem liczby wpisów.
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional
+
+# Domyślny limit liczby wpisów (najdawniej używane są usuwane)
+DEFAULT_MAX_ENTRIES = 128
+
+
+class ResultCache:
+    """
+    Cache LRU: klucz → (token wersji danych, wynik)
+
+    Wyniki są zwracane jako głębokie kopie - wołający może je modyfikować
+    (np. DataFrame budowany z listy dictów) bez psucia wpisu w cache.
+    """
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.enabled = True
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'evicted': 0}
+
+    def get_or_compute(self, key: Hashable, token: Optional[Hashable], compute: Callable[[], Any]) -> Any:
+        """
+        Wynik z cache, jeśli token się zgadza; w przeciwnym razie compute() i zapis
+
+        Args:
+            key: klucz wywołania (funkcja, argumenty, baza)
+            token: wersje danych, od których zależy wynik (None = nie cache'uj)
+            compute: funkcja licząca wynik
+        """
+        if not self.enabled or token is None:
+            return compute()
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == token:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return copy.deepcopy(entry[1])
+                # Dane się zmieniły - wpis nieaktualny
+                del self._entries[key]
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+
+        result = compute()
+
+        with self._lock:
+            self._entries[key] = (token, copy.deepcopy(result))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evicted'] += 1
+        return result
+
+    def invalidate(self, predicate: Optional[Callable[[Hashable], bool]] = None):
+        """Usunięcie wpisów (wszystkich lub pasujących do predicate(key))"""
+        with self._lock:
+            if predicate is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if predicate(k)]:
+                del self._entries[key]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._stats, entries=len(self._entries), max_entries=self.max_entries)